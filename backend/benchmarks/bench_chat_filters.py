@@ -0,0 +1,167 @@
+# Compares the per-document loops the chat list tools used to run with the
+# columnar NumPy path in columnar.py.
+#
+# Run from the backend directory:
+#
+#     python -m benchmarks.bench_chat_filters --sizes 1000 10000 50000
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from columnar import EventColumns, TaskColumns
+from timeutils import get_helsinki_tz, parse_iso_datetime
+
+LISTS = ["Inbox", "Work", "Personal"]
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_tasks(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    tasks = []
+    for index in range(count):
+        due = None
+        if rng.random() < 0.7:
+            due_dt = BASE + timedelta(minutes=rng.randrange(0, 2 * 365 * 24 * 60))
+            due = due_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+        tasks.append(
+            {
+                "id": f"task-{index}",
+                "title": f"Task {index}",
+                "list": rng.choice(LISTS),
+                "status": "done" if rng.random() < 0.6 else "open",
+                "dueDate": due,
+                "dueEpoch": int(parse_iso_datetime(due).timestamp()) if due else None,
+            }
+        )
+    return tasks
+
+
+def make_events(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    events = []
+    for index in range(count):
+        start = BASE + timedelta(minutes=rng.randrange(0, 2 * 365 * 24 * 60))
+        end = start + timedelta(minutes=rng.choice([30, 60, 90, 240, 24 * 60, 3 * 24 * 60]))
+        events.append(
+            {
+                "id": f"event-{index}",
+                "title": f"Event {index}",
+                "start": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "end": end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "startEpoch": int(start.timestamp()),
+                "endEpoch": int(end.timestamp()),
+                "list": rng.choice(LISTS),
+            }
+        )
+    events.sort(key=lambda ev: ev["start"])
+    return events
+
+
+def loop_tasks(tasks, list_filter, status_filter, due_after, due_before, limit):
+    filtered = []
+    for task in tasks:
+        if list_filter and task.get("list") != list_filter:
+            continue
+        if status_filter and task.get("status") != status_filter:
+            continue
+        task_due = parse_iso_datetime(task.get("dueDate"))
+        if due_after and (not task_due or task_due < due_after):
+            continue
+        if due_before and (not task_due or task_due > due_before):
+            continue
+        filtered.append(task)
+    return len(filtered), filtered[:limit]
+
+
+def loop_events(events, start_dt, end_dt, now_dt, limit):
+    filtered = []
+    for event in events:
+        event_start = parse_iso_datetime(event.get("start"))
+        event_end = parse_iso_datetime(event.get("end")) or event_start
+        if now_dt and event_end and event_end < now_dt:
+            continue
+        if start_dt and event_end and event_end <= start_dt:
+            continue
+        if end_dt and event_start and event_start >= end_dt:
+            continue
+        filtered.append(event)
+    filtered.sort(key=lambda ev: ev.get("start") or "")
+    return len(filtered), filtered[:limit]
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run(size: int, repeat: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    tz = get_helsinki_tz()
+    tasks = make_tasks(size, rng)
+    events = make_events(size, rng)
+
+    due_after = BASE + timedelta(days=200)
+    due_before = BASE + timedelta(days=400)
+    window_start = BASE + timedelta(days=300)
+    window_end = window_start + timedelta(days=7)
+    now = BASE + timedelta(days=290)
+
+    task_columns = TaskColumns(tasks, tz)
+    event_columns = EventColumns(events, tz)
+
+    def columnar_tasks():
+        matches = task_columns.select("Work", "open", int(due_after.timestamp()), int(due_before.timestamp()))
+        return matches.size, task_columns.take(matches[:20])
+
+    def columnar_events():
+        matches = event_columns.select(
+            int(window_start.timestamp()), int(window_end.timestamp()), int(now.timestamp())
+        )
+        return matches.size, event_columns.take(event_columns.earliest(matches, 20))
+
+    loop_task_result = loop_tasks(tasks, "Work", "open", due_after, due_before, 20)
+    loop_event_result = loop_events(events, window_start, window_end, now, 20)
+    assert loop_task_result[0] == columnar_tasks()[0]
+    assert loop_event_result[0] == columnar_events()[0]
+    assert [e["id"] for e in loop_event_result[1]] == [e["id"] for e in columnar_events()[1]]
+
+    return {
+        "size": size,
+        "tasks_loop_ms": timed(lambda: loop_tasks(tasks, "Work", "open", due_after, due_before, 20), repeat),
+        "tasks_build_columns_ms": timed(lambda: TaskColumns(tasks, tz), repeat),
+        "tasks_columnar_ms": timed(columnar_tasks, repeat),
+        "events_loop_ms": timed(lambda: loop_events(events, window_start, window_end, now, 20), repeat),
+        "events_build_columns_ms": timed(lambda: EventColumns(events, tz), repeat),
+        "events_columnar_ms": timed(columnar_events, repeat),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Chat list-tool filtering: loops vs columnar.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines.")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        result = run(size, args.repeat, args.seed)
+        if args.json:
+            print(json.dumps(result))
+            continue
+        print(
+            f"n={size:>7}  tasks: loop {result['tasks_loop_ms']:8.2f} ms | "
+            f"columnar {result['tasks_columnar_ms']:6.2f} ms (+build {result['tasks_build_columns_ms']:7.2f} ms)  "
+            f"events: loop {result['events_loop_ms']:8.2f} ms | "
+            f"columnar {result['events_columnar_ms']:6.2f} ms (+build {result['events_build_columns_ms']:7.2f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
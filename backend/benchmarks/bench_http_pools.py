@@ -0,0 +1,135 @@
+# Drives bursts of concurrent requests at a local HTTP/1.1 server that charges
+# a fixed delay for every new connection (standing in for the TCP + TLS
+# handshake to Cosmos or Azure OpenAI). Reports p50/p95/p99 latency and how
+# many connections were opened, for requests' default pool (10 connections)
+# and the tuned pool from http_pools.py. Between bursts a small pool keeps
+# only its maxsize idle sockets and discards the rest, so the next burst pays
+# the handshake again.
+#
+# Run from the backend directory:
+#
+#     python -m benchmarks.bench_http_pools --threads 32 --bursts 50
+#     python -m benchmarks.bench_http_pools --handshake-ms 40 --json
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+import requests
+
+from http_pools import PoolStats, pooled_session
+
+
+class HandshakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, handshake_s: float, service_s: float) -> None:
+        self.handshake_s = handshake_s
+        self.service_s = service_s
+        self.connections = 0
+        self._lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), Handler)
+
+    def finish_request(self, request: Any, client_address: Any) -> None:
+        with self._lock:
+            self.connections += 1
+        time.sleep(self.handshake_s)
+        super().finish_request(request, client_address)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs
+    # add ~40 ms to every keep-alive request and drown the difference.
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        time.sleep(self.server.service_s)  # type: ignore[attr-defined]
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(
+    session: requests.Session, url: str, threads: int, bursts: int, gap_s: float
+) -> List[float]:
+    barrier = threading.Barrier(threads)
+
+    def worker() -> List[float]:
+        latencies = []
+        for _ in range(bursts):
+            barrier.wait()
+            started = time.perf_counter()
+            session.get(url, timeout=10).raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+            barrier.wait()
+            time.sleep(gap_s)
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(worker) for _ in range(threads)]
+        return [latency for future in futures for latency in future.result()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Default vs tuned HTTP pools under concurrency.")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--bursts", type=int, default=50)
+    parser.add_argument("--gap-ms", type=float, default=20.0, help="pause between bursts")
+    parser.add_argument("--pool-size", type=int, default=32)
+    parser.add_argument("--handshake-ms", type=float, default=25.0)
+    parser.add_argument("--service-ms", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines.")
+    args = parser.parse_args()
+
+    configs = {
+        "default": lambda: requests.Session(),
+        "tuned": lambda: pooled_session(PoolStats("bench"), args.pool_size),
+    }
+    for name, make_session in configs.items():
+        server = HandshakeServer(args.handshake_ms / 1000, args.service_ms / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+        session = make_session()
+        try:
+            latencies = run(session, url, args.threads, args.bursts, args.gap_ms / 1000)
+        finally:
+            session.close()
+            server.shutdown()
+            server.server_close()
+
+        result: Dict[str, Any] = {
+            "config": name,
+            "requests": len(latencies),
+            "connections": server.connections,
+            "p50_ms": statistics.median(latencies),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+        }
+        if args.json:
+            print(json.dumps(result))
+            continue
+        print(
+            f"{name:<8} {result['requests']} requests, {result['connections']:4d} connections   "
+            f"p50 {result['p50_ms']:7.2f} ms   p95 {result['p95_ms']:7.2f} ms   p99 {result['p99_ms']:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Simulates chat turns against a stub completion endpoint to tune the split
+# between the small tool-selection deployment and the full model. Latencies
+# are drawn per model and advanced on a virtual clock, so the run is instant.
+#
+# Run from the backend directory:
+#
+#     python -m benchmarks.bench_model_routing --small-ms 300 --full-ms 1100 --schema-error-rate 0.08
+import argparse
+import json
+import random
+import statistics
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from metrics import MetricsRegistry
+from model_router import ChatModelRouter
+from rate_limiter import AdaptiveRateLimiter
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "list_tasks_overview",
+            "parameters": {
+                "type": "object",
+                "properties": {"list": {"type": "string", "enum": ["Inbox", "Work", "Personal"]}},
+                "required": [],
+            },
+        },
+    }
+]
+MESSAGES = [{"role": "user", "content": "mitä Work-listalla on?"}]
+
+
+class VirtualClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StubCompletions:
+    def __init__(self, args: argparse.Namespace, clock: VirtualClock, rng: random.Random) -> None:
+        self.args = args
+        self.clock = clock
+        self.rng = rng
+
+    def _latency(self, mean_ms: float) -> float:
+        return max(mean_ms * 0.2, self.rng.gauss(mean_ms, mean_ms * self.args.jitter)) / 1000
+
+    def create(self, model: str, messages: List[Dict[str, Any]], tools=None, **kwargs) -> Any:
+        small = model == "small"
+        self.clock.now += self._latency(self.args.small_ms if small else self.args.full_ms)
+
+        tool_calls = None
+        content = "Tässä yhteenveto."
+        if tools:
+            roll = self.rng.random()
+            if small and roll < self.args.ambiguous_rate:
+                content = "En ole varma."
+            elif small and roll < self.args.ambiguous_rate + self.args.schema_error_rate:
+                tool_calls = [self._call('{"list": "Työ"}')]
+            else:
+                tool_calls = [self._call('{"list": "Work"}')]
+        message = SimpleNamespace(tool_calls=tool_calls, content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    @staticmethod
+    def _call(arguments: str) -> Any:
+        return SimpleNamespace(
+            id="call-1", function=SimpleNamespace(name="list_tasks_overview", arguments=arguments)
+        )
+
+
+def simulate(args: argparse.Namespace, router_model: str | None) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    clock = VirtualClock()
+    registry = MetricsRegistry()
+    limiter = AdaptiveRateLimiter(1_000_000, 1_000_000_000, queue_timeout=60, max_retries=0, metrics=registry)
+    stub = StubCompletions(args, clock, rng)
+    router = ChatModelRouter(
+        create=stub.create,
+        limiter=limiter,
+        full_model="full",
+        router_model=router_model,
+        metrics=registry,
+        clock=clock,
+    )
+
+    turn_ms: List[float] = []
+    for _ in range(args.turns):
+        started = clock()
+        deadline = limiter.deadline()
+        routed = router.select_tools(MESSAGES, TOOLS, deadline)
+        if routed.message.tool_calls:
+            router.reply(MESSAGES, deadline)
+        turn_ms.append((clock() - started) * 1000)
+
+    turn_ms.sort()
+    snapshot = registry.snapshot()
+    return {
+        "mode": "two-tier" if router_model else "single",
+        "turn_p50_ms": statistics.median(turn_ms),
+        "turn_p95_ms": turn_ms[int(len(turn_ms) * 0.95) - 1],
+        "fallback_rate": snapshot["gauges"].get("chat.route.fallback_rate", 0.0),
+        "routes": {
+            name.removeprefix("chat.route.").removesuffix(".latency_ms"): {
+                "count": stats["count"],
+                "p50_ms": stats["p50"],
+                "p95_ms": stats["p95"],
+            }
+            for name, stats in snapshot["histograms"].items()
+            if name.startswith("chat.route.")
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Single model vs two-tier routing on a stub endpoint.")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--small-ms", type=float, default=300)
+    parser.add_argument("--full-ms", type=float, default=1100)
+    parser.add_argument("--jitter", type=float, default=0.3, help="Latency stddev as a fraction of the mean.")
+    parser.add_argument("--schema-error-rate", type=float, default=0.08)
+    parser.add_argument("--ambiguous-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines.")
+    args = parser.parse_args()
+
+    for router_model in (None, "small"):
+        result = simulate(args, router_model)
+        if args.json:
+            print(json.dumps(result))
+            continue
+        print(
+            f"{result['mode']:<9} turn p50 {result['turn_p50_ms']:7.0f} ms  p95 {result['turn_p95_ms']:7.0f} ms  "
+            f"fallback rate {result['fallback_rate']:.1%}"
+        )
+        for route, stats in result["routes"].items():
+            print(f"  {route:<7} n={stats['count']:<5} p50 {stats['p50_ms']:7.0f} ms  p95 {stats['p95_ms']:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Runs the same workload against each storage backend and reports per-operation
+# latency. Data is written under a throwaway user id and removed afterwards.
+#
+# Run from the backend directory:
+#
+#     python -m benchmarks.bench_storage --backends sqlite --tasks 2000 --events 5000
+#     python -m benchmarks.bench_storage --backends sqlite cosmos   # needs COSMOSDB_* settings
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict
+
+from storage import StorageBackend, create_storage
+
+LISTS = ["Inbox", "Work", "Personal"]
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def iso(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def seed(store: StorageBackend, user_id: str, tasks: int, events: int, rng: random.Random) -> None:
+    for index in range(tasks):
+        due = None
+        if rng.random() < 0.7:
+            due = iso(BASE + timedelta(minutes=rng.randrange(0, 365 * 24 * 60)))
+        task = store.create_task(user_id, f"Task {index}", rng.choice(LISTS), due)
+        if rng.random() < 0.6:
+            store.update_task(user_id, task["id"], {"status": "done"})
+
+    for index in range(events):
+        start = BASE + timedelta(minutes=rng.randrange(0, 365 * 24 * 60))
+        end = start + timedelta(minutes=rng.choice([30, 60, 90, 240, 24 * 60]))
+        store.create_event(user_id, f"Event {index}", iso(start), iso(end), rng.choice(LISTS))
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def run(store: StorageBackend, tasks: int, events: int, repeat: int, seed_value: int) -> Dict[str, Any]:
+    rng = random.Random(seed_value)
+    user_id = f"bench-{uuid.uuid4().hex[:8]}"
+
+    started = time.perf_counter()
+    seed(store, user_id, tasks, events, rng)
+    seed_ms = (time.perf_counter() - started) * 1000
+
+    week_start = BASE + timedelta(days=180)
+    month_start = BASE + timedelta(days=150)
+    scratch = store.create_task(user_id, "Scratch", "Inbox", None)
+
+    workloads: Dict[str, Callable[[], Any]] = {
+        "list_tasks": lambda: store.list_tasks(user_id),
+        "list_open_tasks": lambda: store.list_tasks_by_status(user_id, "open"),
+        "find_task_by_title": lambda: store.find_tasks_by_title(user_id, f"task {tasks // 2}"),
+        "list_events_week": lambda: store.list_events(
+            user_id, iso(week_start), iso(week_start + timedelta(days=7))
+        ),
+        "list_events_overlapping_month": lambda: store.list_events_overlapping(
+            user_id, iso(month_start), iso(month_start + timedelta(days=31))
+        ),
+        "find_events_partial_title": lambda: store.find_events_by_title(user_id, "event 12"),
+        "update_task": lambda: store.update_task(user_id, scratch["id"], {"title": uuid.uuid4().hex}),
+        "read_data_version": lambda: store.read_data_version(user_id),
+    }
+
+    try:
+        results = {name: timed(fn, repeat) for name, fn in workloads.items()}
+    finally:
+        store.delete_tasks_for_user(user_id)
+        store.delete_events_in_range(user_id, iso(BASE - timedelta(days=1)), iso(BASE + timedelta(days=400)))
+
+    return {
+        "backend": store.name,
+        "tasks": tasks,
+        "events": events,
+        "seed_ms": seed_ms,
+        "operations": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare storage backends on the same workload.")
+    parser.add_argument("--backends", nargs="+", default=["sqlite"], choices=["sqlite", "cosmos"])
+    parser.add_argument("--tasks", type=int, default=2_000)
+    parser.add_argument("--events", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--sqlite-path", help="Database file; defaults to a temporary file.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            sqlite_path = args.sqlite_path or os.path.join(tmp, "bench.db")
+            store = create_storage(backend, sqlite_path)
+            result = run(store, args.tasks, args.events, args.repeat, args.seed)
+            if hasattr(store, "close"):
+                store.close()
+
+            if args.json:
+                print(json.dumps(result))
+                continue
+            print(f"{result['backend']}: seeded {args.tasks} tasks / {args.events} events in {result['seed_ms']:.0f} ms")
+            for name, stats in result["operations"].items():
+                print(f"  {name:<32} median {stats['median_ms']:8.2f} ms   p95 {stats['p95_ms']:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
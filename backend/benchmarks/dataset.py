@@ -0,0 +1,271 @@
+# Generates a realistic dataset for one user and loads it into a storage
+# backend. The shape follows what heavy users accumulate over a couple of years:
+# - Tasks are spread over Inbox, Work and Personal; older ones are mostly done.
+#   About a third have no due date, and the rest cluster on round hours a few
+#   days after creation.
+# - Events are weekly and bi-weekly series that share a title and time of day,
+#   one-off meetings in working hours, and some all-day or multi-day ones.
+# - Titles mix Finnish and English and repeat with small variations, so the
+#   title finders see many partial matches.
+#
+# Run from the backend directory:
+#
+#     python -m benchmarks.dataset --tasks 20000 --events 30000 --out heavy.json
+#     python -m benchmarks.dataset --tasks 20000 --events 30000 --backend sqlite --sqlite-path heavy.db
+import argparse
+import json
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from storage import StorageBackend, create_storage
+from timeutils import get_helsinki_tz, normalize_iso
+
+# A Monday morning, so generated data does not depend on when it is generated.
+DEFAULT_NOW = datetime(2025, 6, 2, 9, 0, tzinfo=get_helsinki_tz())
+
+TASK_LISTS = [("Inbox", 0.45), ("Work", 0.35), ("Personal", 0.2)]
+EVENT_LISTS = [("Work", 0.6), ("Personal", 0.25), ("Default", 0.15)]
+
+TASK_TITLES = {
+    "Work": [
+        "Lähetä raportti: {topic}",
+        "Kommentoi {topic} -luonnos",
+        "Valmistele palaveri: {topic}",
+        "Review {topic} PR",
+        "Update {topic} roadmap",
+        "Reply to {person} about {topic}",
+    ],
+    "Personal": [
+        "Osta {item}",
+        "Soita {person}",
+        "Varaa aika: {errand}",
+        "Pay {bill} bill",
+        "Book {errand}",
+    ],
+    "Inbox": [
+        "Muista {topic}",
+        "Selvitä {topic}",
+        "Check {topic}",
+        "Idea: {topic}",
+    ],
+}
+SERIES_TITLES = [
+    "Viikkopalaveri",
+    "Daily standup",
+    "1:1 {person}",
+    "Sprintin suunnittelu",
+    "Retro",
+    "Salibandy",
+    "Kuoroharjoitukset",
+    "Team sync: {topic}",
+]
+EVENT_TITLES = [
+    "Palaveri: {topic}",
+    "Asiakastapaaminen {person}",
+    "Lunch with {person}",
+    "Workshop: {topic}",
+    "Hammaslääkäri",
+    "Demo: {topic}",
+    "Koodiblokki",
+    "Call with {person}",
+]
+LONG_EVENT_TITLES = ["Lomamatka", "Konferenssi: {topic}", "Mökkiviikonloppu", "Offsite", "Kesäloma", "Business trip"]
+
+TOPICS = [
+    "budjetti", "Q3 forecast", "asiakaskysely", "onboarding", "API v2", "tietoturva",
+    "rekrytointi", "migraatio", "hinnoittelu", "backlog", "analytics", "julkaisu",
+]
+PEOPLE = ["Anna", "Mikko", "Laura", "Jussi", "Sara", "Ville", "Emma", "Teemu"]
+ITEMS = ["maitoa", "leipää", "kahvia", "batteries", "lahja", "lamppu", "printer paper"]
+ERRANDS = ["kampaaja", "katsastus", "lääkäri", "car service", "passport photo"]
+BILLS = ["electricity", "internet", "phone", "vakuutus"]
+
+
+def _pick(rng: random.Random, weighted: List[Any]) -> str:
+    names, weights = zip(*weighted)
+    return rng.choices(names, weights)[0]
+
+
+def _title(rng: random.Random, template: str) -> str:
+    title = template.format(
+        topic=rng.choice(TOPICS),
+        person=rng.choice(PEOPLE),
+        item=rng.choice(ITEMS),
+        errand=rng.choice(ERRANDS),
+        bill=rng.choice(BILLS),
+    )
+    # Heavy users repeat themselves: "Osta maitoa", "Osta maitoa (2)", ...
+    if rng.random() < 0.15:
+        title = f"{title} ({rng.randint(2, 9)})"
+    return title
+
+
+def _local(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _created_at(rng: random.Random, now: datetime, history_days: int) -> datetime:
+    # Recent activity is denser than old activity.
+    age_days = min(history_days, rng.expovariate(3 / history_days))
+    return now - timedelta(days=age_days, minutes=rng.randrange(0, 24 * 60))
+
+
+def generate_tasks(
+    user_id: str, count: int, rng: random.Random, now: datetime = DEFAULT_NOW, history_days: int = 730
+) -> List[Dict[str, Any]]:
+    tz = get_helsinki_tz()
+    tasks = []
+    for _ in range(count):
+        list_name = _pick(rng, TASK_LISTS)
+        created = _created_at(rng, now, history_days)
+        age_days = (now - created).total_seconds() / 86400
+        # Open tasks are mostly recent; a tail of old ones never gets closed.
+        done = rng.random() < 0.92 * (1 - math.exp(-age_days / 30))
+
+        due_iso, due_epoch = None, None
+        if rng.random() < 0.65:
+            due_day = (created + timedelta(days=rng.choice([0, 1, 1, 2, 3, 7, 7, 14, 30]))).date()
+            hour = rng.choice([9, 12, 16, 23])
+            due_local = datetime(due_day.year, due_day.month, due_day.day, hour, 59 if hour == 23 else 0)
+            due_iso, due_epoch = normalize_iso(_local(due_local), tz)
+
+        tasks.append(
+            {
+                "id": _id(rng),
+                "userId": user_id,
+                "title": _title(rng, rng.choice(TASK_TITLES[list_name])),
+                "list": list_name,
+                "status": "done" if done else "open",
+                "createdAt": created.astimezone(timezone.utc).isoformat(),
+                "dueDate": due_iso,
+                "dueEpoch": due_epoch,
+            }
+        )
+    return tasks
+
+
+def _event(user_id: str, title: str, list_name: str, start: datetime, end: datetime, rng: random.Random) -> Dict[str, Any]:
+    tz = get_helsinki_tz()
+    start_iso, start_epoch = normalize_iso(_local(start), tz)
+    end_iso, end_epoch = normalize_iso(_local(end), tz)
+    created = (start - timedelta(days=rng.randint(0, 21), minutes=rng.randrange(0, 600))).replace(tzinfo=tz)
+    return {
+        "id": _id(rng),
+        "userId": user_id,
+        "title": title,
+        "list": list_name,
+        "start": start_iso,
+        "startEpoch": start_epoch,
+        "end": end_iso,
+        "endEpoch": end_epoch,
+        "createdAt": created.astimezone(timezone.utc).isoformat(),
+    }
+
+
+def generate_events(
+    user_id: str,
+    count: int,
+    rng: random.Random,
+    now: datetime = DEFAULT_NOW,
+    history_days: int = 730,
+    ahead_days: int = 90,
+) -> List[Dict[str, Any]]:
+    first_day = (now - timedelta(days=history_days)).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    span_days = history_days + ahead_days
+    events: List[Dict[str, Any]] = []
+
+    # About half come from recurring series: same title, weekday and time.
+    while len(events) < count // 2:
+        title = _title(rng, rng.choice(SERIES_TITLES)).split(" (")[0]
+        list_name = _pick(rng, EVENT_LISTS)
+        every_days = rng.choice([7, 7, 14])
+        hour, minute = rng.choice([(8, 30), (9, 0), (10, 0), (13, 0), (15, 30), (18, 0)])
+        length = timedelta(minutes=rng.choice([15, 30, 45, 60, 90]))
+        day = first_day + timedelta(days=rng.randrange(0, span_days))
+        for _ in range(rng.randint(5, 40)):
+            if len(events) >= count // 2 or (day - first_day).days >= span_days:
+                break
+            start = day.replace(hour=hour, minute=minute)
+            events.append(_event(user_id, title, list_name, start, start + length, rng))
+            day += timedelta(days=every_days)
+
+    while len(events) < count:
+        day = first_day + timedelta(days=rng.randrange(0, span_days))
+        roll = rng.random()
+        if roll < 0.05:
+            # All-day or multi-day: midnight to midnight, one to five days.
+            title = _title(rng, rng.choice(LONG_EVENT_TITLES))
+            events.append(_event(user_id, title, "Personal", day, day + timedelta(days=rng.randint(1, 5)), rng))
+            continue
+        start = day.replace(hour=rng.randint(7, 17), minute=rng.choice([0, 15, 30, 45]))
+        length = timedelta(minutes=rng.choice([15, 30, 30, 45, 60, 60, 90, 120, 240]))
+        events.append(_event(user_id, _title(rng, rng.choice(EVENT_TITLES)), _pick(rng, EVENT_LISTS), start, start + length, rng))
+
+    rng.shuffle(events)
+    return events
+
+
+def generate_dataset(
+    user_id: str, tasks: int, events: int, seed: int = 7, now: datetime = DEFAULT_NOW, history_days: int = 730
+) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    return {
+        "userId": user_id,
+        "now": now.isoformat(),
+        "tasks": generate_tasks(user_id, tasks, rng, now, history_days),
+        "events": generate_events(user_id, events, rng, now, history_days),
+    }
+
+
+def load_dataset(store: StorageBackend, dataset: Dict[str, Any]) -> None:
+    restore = getattr(store, "restore", None)
+    if restore is not None:
+        restore(dataset["tasks"], dataset["events"])
+        return
+
+    # Backends without a bulk path get the data through the normal writes;
+    # ids and creation times are then the backend's own.
+    for task in dataset["tasks"]:
+        created = store.create_task(task["userId"], task["title"], task["list"], task["dueDate"])
+        if task["status"] != "open":
+            store.update_task(task["userId"], created["id"], {"status": task["status"]})
+    for event in dataset["events"]:
+        store.create_event(event["userId"], event["title"], event["start"], event["end"], event["list"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a large per-user dataset.")
+    parser.add_argument("--user", default="demo-user")
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--history-days", type=int, default=730)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="write the dataset as JSON")
+    parser.add_argument("--backend", choices=["sqlite", "cosmos"], help="load the dataset into this backend")
+    parser.add_argument("--sqlite-path", default="timeplanner.db")
+    args = parser.parse_args()
+
+    dataset = generate_dataset(args.user, args.tasks, args.events, args.seed, history_days=args.history_days)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            json.dump(dataset, handle, ensure_ascii=False)
+        print(f"Wrote {len(dataset['tasks'])} tasks and {len(dataset['events'])} events to {args.out}")
+    if args.backend:
+        store = create_storage(args.backend, args.sqlite_path)
+        started = time.perf_counter()
+        load_dataset(store, dataset)
+        print(f"Loaded into {store.name} in {(time.perf_counter() - started):.1f} s")
+        if hasattr(store, "close"):
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# A stand-in for the Azure OpenAI chat completions endpoint, for load tests.
+# Latency is drawn from a lognormal distribution per call type (tool selection
+# vs. final reply), so percentiles look like a real deployment rather than a
+# constant delay. Tool calls are scripted from keywords in the user message,
+# so /api/chat exercises the same tools it would in production. A share of
+# calls can be answered with 429 + Retry-After to exercise the rate limiter.
+#
+# Point the Functions host at it with AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8099
+# and any AZURE_OPENAI_API_KEY. Run from the backend directory:
+#
+#     python -m benchmarks.fake_openai --port 8099 --select-median-ms 450 --reply-median-ms 900
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# Keyword script: the first rule whose words all occur in the lower-cased user
+# message picks the tool. Messages matching nothing get a plain-text answer.
+SCRIPT: List[Tuple[Tuple[str, ...], str]] = [
+    (("poista", "tehtävä"), "delete_task"),
+    (("lisää", "tehtävä"), "create_task"),
+    (("add", "task"), "create_task"),
+    (("siirrä", "tehtävä"), "update_task"),
+    (("palaveri",), "create_event"),
+    (("meeting",), "create_event"),
+    (("näytä", "tehtävä"), "list_tasks_overview"),
+    (("show", "task"), "list_tasks_overview"),
+    (("kalenteri",), "list_events_in_range"),
+    (("calendar",), "list_events_in_range"),
+]
+
+_QUOTED = re.compile(r"[\"'“”](.+?)[\"'“”]")
+
+
+def _utc(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def scripted_tool(message: str) -> Optional[str]:
+    text = message.lower()
+    for words, tool in SCRIPT:
+        if all(word in text for word in words):
+            return tool
+    return None
+
+
+def tool_arguments(tool: str, message: str, rng: random.Random) -> Dict[str, Any]:
+    quoted = _QUOTED.search(message)
+    title = quoted.group(1) if quoted else f"Kuormatesti {rng.randint(1, 10_000)}"
+    tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+    if tool == "create_task":
+        return {"title": title, "list": rng.choice(["Inbox", "Work", "Personal"])}
+    if tool == "delete_task":
+        return {"title": title}
+    if tool == "update_task":
+        return {"matchTitle": title, "dueDate": _utc(tomorrow)}
+    if tool == "create_event":
+        start = tomorrow.replace(hour=rng.randint(7, 15))
+        return {"title": title, "start": _utc(start), "end": _utc(start + timedelta(hours=1))}
+    if tool == "list_tasks_overview":
+        return {"status": "open", "limit": 20}
+    if tool == "list_events_in_range":
+        now = datetime.now(timezone.utc)
+        return {"start": _utc(now), "end": _utc(now + timedelta(days=7))}
+    return {}
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(
+        self,
+        port: int = 0,
+        select_median_ms: float = 450,
+        reply_median_ms: float = 900,
+        p95_ratio: float = 2.5,
+        throttle_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.select_median_ms = select_median_ms
+        self.reply_median_ms = reply_median_ms
+        # Lognormal sigma for which p95 / median == p95_ratio.
+        self.sigma = math.log(max(p95_ratio, 1.0)) / 1.645
+        self.throttle_rate = throttle_rate
+        self.rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.calls = 0
+        super().__init__(("127.0.0.1", port), Handler)
+
+    def draw(self, median_ms: float) -> float:
+        with self._rng_lock:
+            self.calls += 1
+            return self.rng.lognormvariate(math.log(median_ms), self.sigma) / 1000
+
+    def throttled(self) -> bool:
+        with self._rng_lock:
+            return self.rng.random() < self.throttle_rate
+
+    def complete(self, model: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        messages = body.get("messages") or []
+        selecting = bool(body.get("tools")) and not any(m.get("role") == "tool" for m in messages)
+        time.sleep(self.draw(self.select_median_ms if selecting else self.reply_median_ms))
+
+        user_message = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        tool = scripted_tool(user_message) if selecting else None
+        message: Dict[str, Any] = {"role": "assistant", "content": None}
+        with self._rng_lock:
+            if tool:
+                arguments = tool_arguments(tool, user_message, self.rng)
+                message["tool_calls"] = [
+                    {
+                        "id": f"call_{uuid.uuid4().hex[:12]}",
+                        "type": "function",
+                        "function": {"name": tool, "arguments": json.dumps(arguments)},
+                    }
+                ]
+            else:
+                message["content"] = "Selvä, hoidettu." if not selecting else "Miten voin auttaa?"
+            completion_tokens = self.rng.randint(15, 120)
+
+        prompt_tokens = max(1, len(json.dumps(messages)) // 4) + len(json.dumps(body.get("tools") or [])) // 4
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if tool else "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: FakeOpenAI
+
+    def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        # models.list(), used by the warm-up timer.
+        if self.path.startswith("/openai/models"):
+            self._send(200, {"object": "list", "data": []})
+        else:
+            self._send(404, {"error": {"code": "NotFound", "message": self.path}})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        match = re.match(r"^/openai/deployments/([^/]+)/chat/completions", self.path)
+        if not match:
+            self._send(404, {"error": {"code": "NotFound", "message": self.path}})
+            return
+        if self.server.throttled():
+            self._send(
+                429,
+                {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                {"Retry-After": "1"},
+            )
+            return
+        self._send(200, self.server.complete(match.group(1), body))
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def start(server: FakeOpenAI) -> threading.Thread:
+    thread = threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True)
+    thread.start()
+    return thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Azure OpenAI endpoint with scripted tool calls.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--select-median-ms", type=float, default=450.0)
+    parser.add_argument("--reply-median-ms", type=float, default=900.0)
+    parser.add_argument("--p95-ratio", type=float, default=2.5, help="p95 latency as a multiple of the median")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of calls answered with 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeOpenAI(
+        args.port,
+        args.select_median_ms,
+        args.reply_median_ms,
+        args.p95_ratio,
+        args.throttle_rate,
+        args.seed,
+    )
+    print(f"Fake Azure OpenAI listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
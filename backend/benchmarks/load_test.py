@@ -0,0 +1,322 @@
+# Mixed-workload load test against a running Functions host. Requests arrive
+# open-loop (Poisson, --rate per second) and are spread over a weighted mix of
+# routes, including the item routes, which act on tasks and events created
+# earlier in the run. Latency is measured from each request's scheduled
+# arrival, so time spent queued behind a saturated host counts too.
+#
+# The host should run against local stand-ins, so results do not depend on
+# shared cloud resources:
+#
+#     # fake Azure OpenAI with realistic latency and scripted tool calls
+#     python -m benchmarks.fake_openai --port 8099
+#     # in another terminal, with STORAGE_BACKEND=sqlite, SQLITE_PATH=:memory:,
+#     # AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8099 in local.settings.json
+#     func start
+#
+# Then, from the backend directory:
+#
+#     python -m benchmarks.load_test --rate 20 --duration 60 --users 50 --out load.json
+#     python -m benchmarks.load_test --rate 200 --users 500 --baseline load.json
+#     python -m benchmarks.load_test --mix chat=1,tasks.list=4 --start-fake-openai
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from benchmarks.fake_openai import FakeOpenAI, start as start_fake_openai
+
+DEFAULT_MIX = (
+    "chat=15,tasks.list=25,tasks.create=10,tasks.update=8,tasks.delete=4,"
+    "events.list=20,events.create=10,events.update=5,events.delete=3"
+)
+
+# Prompts the fake OpenAI server turns into tool calls (see SCRIPT there).
+CHAT_PROMPTS = [
+    'Lisää tehtävä "Kuormatesti {n}" Work-listalle',
+    "Näytä avoimet tehtävät",
+    "Mitä kalenterissa on tällä viikolla?",
+    'Lisää palaveri "Synkka {n}" huomenna',
+    'Siirrä tehtävä "Kuormatesti {n}" huomiselle',
+    "Kiitos!",
+]
+
+
+def _utc(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ROUTES:
+            raise ValueError(f"Unknown route {name.strip()!r}; choose from {', '.join(ROUTES)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Workload:
+    """Builds requests for each route, remembering ids for the item routes."""
+
+    def __init__(self, base_url: str, session: requests.Session, rng: random.Random, timeout: float) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.session = session
+        self.rng = rng
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.task_ids: List[str] = []
+        self.event_ids: List[str] = []
+
+    def _pick(self, ids: List[str], remove: bool = False) -> Optional[str]:
+        with self._lock:
+            if not ids:
+                return None
+            index = self.rng.randrange(len(ids))
+            return ids.pop(index) if remove else ids[index]
+
+    def _remember(self, ids: List[str], response: requests.Response) -> None:
+        if response.status_code == 201:
+            with self._lock:
+                ids.append(str(response.json()["id"]))
+
+    def _call(self, method: str, path: str, **kwargs: Any) -> requests.Response:
+        return self.session.request(method, f"{self.base_url}/api/{path}", timeout=self.timeout, **kwargs)
+
+    def chat(self) -> requests.Response:
+        with self._lock:
+            prompt = self.rng.choice(CHAT_PROMPTS).format(n=self.rng.randint(1, 10_000))
+        return self._call("POST", "chat", json={"message": prompt})
+
+    def tasks_list(self) -> requests.Response:
+        return self._call("GET", "tasks")
+
+    def tasks_create(self) -> requests.Response:
+        with self._lock:
+            body = {
+                "title": f"Kuormatesti {self.rng.randint(1, 10_000)}",
+                "list": self.rng.choice(["Inbox", "Work", "Personal"]),
+                "dueDate": _utc(datetime.now(timezone.utc) + timedelta(days=self.rng.randint(0, 30))),
+            }
+        response = self._call("POST", "tasks", json=body)
+        self._remember(self.task_ids, response)
+        return response
+
+    def tasks_update(self) -> requests.Response:
+        task_id = self._pick(self.task_ids)
+        if task_id is None:
+            return self.tasks_create()
+        return self._call("PUT", f"tasks/{task_id}", json={"status": self.rng.choice(["open", "done"])})
+
+    def tasks_delete(self) -> requests.Response:
+        task_id = self._pick(self.task_ids, remove=True)
+        if task_id is None:
+            return self.tasks_create()
+        return self._call("DELETE", f"tasks/{task_id}")
+
+    def events_list(self) -> requests.Response:
+        now = datetime.now(timezone.utc)
+        return self._call("GET", "events", params={"start": _utc(now), "end": _utc(now + timedelta(days=7))})
+
+    def events_create(self) -> requests.Response:
+        with self._lock:
+            start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(
+                hours=self.rng.randint(1, 24 * 14)
+            )
+            title = f"Kuormatesti {self.rng.randint(1, 10_000)}"
+        body = {"title": title, "start": _utc(start), "end": _utc(start + timedelta(hours=1))}
+        response = self._call("POST", "events", json=body)
+        self._remember(self.event_ids, response)
+        return response
+
+    def events_update(self) -> requests.Response:
+        event_id = self._pick(self.event_ids)
+        if event_id is None:
+            return self.events_create()
+        return self._call("PUT", f"events/{event_id}", json={"title": "Siirretty"})
+
+    def events_delete(self) -> requests.Response:
+        event_id = self._pick(self.event_ids, remove=True)
+        if event_id is None:
+            return self.events_create()
+        return self._call("DELETE", f"events/{event_id}")
+
+
+ROUTES: Dict[str, Callable[[Workload], requests.Response]] = {
+    "chat": Workload.chat,
+    "tasks.list": Workload.tasks_list,
+    "tasks.create": Workload.tasks_create,
+    "tasks.update": Workload.tasks_update,
+    "tasks.delete": Workload.tasks_delete,
+    "events.list": Workload.events_list,
+    "events.create": Workload.events_create,
+    "events.update": Workload.events_update,
+    "events.delete": Workload.events_delete,
+}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples: List[Tuple[float, Optional[int]]], elapsed_s: float) -> Dict[str, Any]:
+    latencies = [latency for latency, _ in samples]
+    statuses: Dict[str, int] = {}
+    for _, status in samples:
+        key = str(status) if status is not None else "exception"
+        statuses[key] = statuses.get(key, 0) + 1
+    errors = sum(1 for _, status in samples if status is None or status >= 500)
+    return {
+        "requests": len(samples),
+        "throughputRps": round(len(samples) / elapsed_s, 2) if elapsed_s else 0.0,
+        "errors": errors,
+        "errorRate": round(errors / len(samples), 4) if samples else 0.0,
+        "statuses": statuses,
+        "meanMs": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "p50Ms": round(percentile(latencies, 0.5), 2),
+        "p95Ms": round(percentile(latencies, 0.95), 2),
+        "p99Ms": round(percentile(latencies, 0.99), 2),
+    }
+
+
+def run(args: argparse.Namespace, mix: Dict[str, float]) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.users)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    workload = Workload(args.base_url, session, rng, args.timeout)
+
+    samples: Dict[str, List[Tuple[float, Optional[int]]]] = {name: [] for name in mix}
+    samples_lock = threading.Lock()
+    names, weights = list(mix), list(mix.values())
+
+    def fire(name: str, scheduled: float) -> None:
+        try:
+            status: Optional[int] = ROUTES[name](workload).status_code
+        except requests.RequestException:
+            status = None
+        latency_ms = (time.perf_counter() - scheduled) * 1000
+        with samples_lock:
+            samples[name].append((latency_ms, status))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users, thread_name_prefix="load") as pool:
+        # Arrivals follow the schedule regardless of how fast responses come
+        # back; a saturated host shows up as queueing in the latencies.
+        next_at = started
+        while next_at - started < args.duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, rng.choices(names, weights)[0], next_at)
+            next_at += rng.expovariate(args.rate)
+    elapsed = time.perf_counter() - started
+
+    every = [sample for route in samples.values() for sample in route]
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "startedAt": _utc(datetime.now(timezone.utc) - timedelta(seconds=elapsed)),
+            "baseUrl": args.base_url,
+            "rate": args.rate,
+            "durationS": round(elapsed, 2),
+            "users": args.users,
+            "mix": mix,
+            "seed": args.seed,
+        },
+        "overall": summarize(every, elapsed),
+        "routes": {name: summarize(route, elapsed) for name, route in samples.items() if route},
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    lines = [f"vs {baseline['meta'].get('commit') or 'baseline'}:"]
+    for name, current in [("overall", report["overall"]), *report["routes"].items()]:
+        before = baseline["overall"] if name == "overall" else baseline["routes"].get(name)
+        if not before:
+            continue
+        deltas = []
+        for key in ("p50Ms", "p95Ms", "p99Ms"):
+            change = (current[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            deltas.append(f"{key[:-2]} {current[key]:8.1f} ms ({change:+6.1f}%)")
+        error_change = (current["errorRate"] - before["errorRate"]) * 100
+        lines.append(f"  {name:<14} " + "   ".join(deltas) + f"   errors {error_change:+.2f} pp")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mixed-workload load test against the Functions host.")
+    parser.add_argument("--base-url", default="http://localhost:7071")
+    parser.add_argument("--rate", type=float, default=10.0, help="arrivals per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals")
+    parser.add_argument("--users", type=int, default=50, help="max concurrent requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="route=weight pairs")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument(
+        "--start-fake-openai",
+        action="store_true",
+        help="also serve the fake OpenAI endpoint from this process (see --openai-port)",
+    )
+    parser.add_argument("--openai-port", type=int, default=8099)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    fake_openai = None
+    if args.start_fake_openai:
+        fake_openai = FakeOpenAI(args.openai_port, seed=args.seed)
+        start_fake_openai(fake_openai)
+    try:
+        report = run(args, mix)
+    finally:
+        if fake_openai is not None:
+            fake_openai.shutdown()
+            fake_openai.server_close()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        overall = report["overall"]
+        print(
+            f"{overall['requests']} requests in {report['meta']['durationS']} s, "
+            f"{overall['throughputRps']} req/s, error rate {overall['errorRate']:.2%}"
+        )
+        for name, route in [("overall", overall), *report["routes"].items()]:
+            print(
+                f"  {name:<14} {route['requests']:6d}   p50 {route['p50Ms']:8.1f} ms   "
+                f"p95 {route['p95Ms']:8.1f} ms   p99 {route['p99Ms']:8.1f} ms   errors {route['errors']}"
+            )
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            print("\n".join(compare(report, json.load(handle))))
+
+
+if __name__ == "__main__":
+    main()
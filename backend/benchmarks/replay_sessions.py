@@ -0,0 +1,192 @@
+# Replays recorded chat sessions (see CHAT_RECORDING_DIR) against the current
+# code and fails when a turn got more expensive: more storage calls, more
+# OpenAI calls, or more estimated RU or prompt tokens than allowed. OpenAI is
+# answered from the recording and storage is an in-memory SQLite database
+# seeded with the session's starting data, so a replay needs no credentials
+# and gives the same numbers on every run.
+#
+# Each turn is compared with <fixture>.baseline.json when it exists, else with
+# the metrics stored in the recording itself. Run from the backend directory:
+#
+#     python -m benchmarks.replay_sessions fixtures/chat/*.jsonl
+#     python -m benchmarks.replay_sessions fixtures/chat/*.jsonl --update-baseline
+#     python -m benchmarks.replay_sessions fixtures/chat/*.jsonl --latency-tolerance 0.5 --json
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+# The replay must never reach Azure; these are read when function_app is imported.
+os.environ.update(
+    {
+        "STORAGE_BACKEND": "sqlite",
+        "SQLITE_PATH": ":memory:",
+        "AZURE_OPENAI_ENDPOINT": "http://127.0.0.1:9",
+        "AZURE_OPENAI_API_KEY": "replay",
+        "AZURE_OPENAI_DEPLOYMENT_NAME": "replay",
+    }
+)
+for name in ("CHAT_RECORDING_DIR", "PROFILING_SAMPLE_RATE", "PROFILING_KEY", "USER_DAILY_TOKEN_BUDGET"):
+    os.environ.pop(name, None)
+
+import azure.functions as func  # noqa: E402
+
+import function_app  # noqa: E402
+from chat_recording import (  # noqa: E402
+    RecordingStorage,
+    ReplayCreate,
+    Turn,
+    compare_metrics,
+    load_session,
+    recording_create,
+    recording_turn,
+)
+from rate_limiter import AdaptiveRateLimiter  # noqa: E402
+from storage_sqlite import SqliteStorage  # noqa: E402
+
+
+def chat_handler() -> Callable[[func.HttpRequest], func.HttpResponse]:
+    # @app.route leaves a FunctionBuilder in place of the function.
+    handler: Any = function_app.chat
+    if hasattr(handler, "build"):
+        handler = handler.build().get_user_function()
+    return handler
+
+
+def use_completions(create: Callable[..., Any]) -> None:
+    # Completions come from create; nothing waits on the real rate limits.
+    function_app.chat_router._create = create
+    function_app.chat_router._limiter = AdaptiveRateLimiter(10**9, 10**12, queue_timeout=1, max_retries=0)
+
+
+def chat_request(message: str) -> func.HttpRequest:
+    return func.HttpRequest(
+        method="POST",
+        url="/api/chat",
+        headers={"Content-Type": "application/json"},
+        body=json.dumps({"message": message}).encode("utf-8"),
+    )
+
+
+def baseline_path(path: str) -> str:
+    root, _ = os.path.splitext(path)
+    return f"{root}.baseline.json"
+
+
+def replay_session(path: str, handler: Callable[[func.HttpRequest], func.HttpResponse]) -> List[Dict[str, Any]]:
+    header, turns = load_session(path)
+    store = SqliteStorage(":memory:")
+    seed = header.get("seed") or {}
+    store.restore(seed.get("tasks", []), seed.get("events", []))
+
+    replay = ReplayCreate()
+    function_app.storage = RecordingStorage(store)
+    use_completions(recording_create(replay))
+
+    results = []
+    for index, recorded in enumerate(turns):
+        replay.begin(recorded)
+        now = datetime.fromisoformat(recorded["now"])
+        function_app.get_helsinki_now = lambda now=now: now
+        request = chat_request(recorded["message"])
+
+        turn = Turn(recorded["userId"], recorded["message"], recorded["now"])
+        started = time.perf_counter()
+        with recording_turn(turn):
+            response = handler(request)
+        turn.latency_ms = (time.perf_counter() - started) * 1000
+        turn.status = response.status_code
+        replay.learn_ids(recorded, turn)
+        results.append(
+            {
+                "turn": index,
+                "message": recorded["message"],
+                "status": turn.status,
+                "recordedStatus": recorded.get("status"),
+                "metrics": turn.metrics(),
+            }
+        )
+    return results
+
+
+def check(
+    results: List[Dict[str, Any]],
+    baseline: Optional[List[Dict[str, Any]]],
+    recorded: List[Dict[str, Any]],
+    tolerance: float,
+    latency_tolerance: Optional[float],
+) -> List[str]:
+    problems = []
+    if baseline is not None and len(baseline) != len(results):
+        problems.append(f"baseline has {len(baseline)} turns, replay has {len(results)}")
+        baseline = None
+    for result in results:
+        index = result["turn"]
+        if result["status"] != result["recordedStatus"]:
+            problems.append(f"turn {index}: status {result['recordedStatus']} -> {result['status']}")
+        if baseline is not None:
+            expected = baseline[index]["metrics"]
+            found = compare_metrics(expected, result["metrics"], tolerance, latency_tolerance)
+        else:
+            # Recorded latency includes real OpenAI and Cosmos time; not comparable.
+            found = compare_metrics(recorded[index]["metrics"], result["metrics"], tolerance)
+        problems.extend(f"turn {index}: {problem}" for problem in found)
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded chat sessions and check their cost.")
+    parser.add_argument("sessions", nargs="+", help="recorded session files (.jsonl)")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="allowed growth in RU and prompt tokens")
+    parser.add_argument(
+        "--latency-tolerance",
+        type=float,
+        default=None,
+        help="allowed growth in replay latency against the baseline; off by default",
+    )
+    parser.add_argument("--update-baseline", action="store_true", help="write <session>.baseline.json and exit")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    handler = chat_handler()
+    report: Dict[str, Any] = {}
+    failed = False
+    for path in args.sessions:
+        _, recorded = load_session(path)
+        results = replay_session(path, handler)
+        if args.update_baseline:
+            with open(baseline_path(path), "w", encoding="utf-8") as handle:
+                json.dump(results, handle, indent=2, ensure_ascii=False)
+            report[path] = {"turns": results, "problems": []}
+            continue
+
+        baseline = None
+        if os.path.exists(baseline_path(path)):
+            with open(baseline_path(path), encoding="utf-8") as handle:
+                baseline = json.load(handle)
+        problems = check(results, baseline, recorded, args.tolerance, args.latency_tolerance)
+        failed = failed or bool(problems)
+        report[path] = {"turns": results, "problems": problems}
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        for path, entry in report.items():
+            print(f"{path}: {len(entry['turns'])} turns, {'FAIL' if entry['problems'] else 'ok'}")
+            for result in entry["turns"]:
+                metrics = result["metrics"]
+                print(
+                    f"  {result['turn']:>3}  {metrics['latencyMs']:>8.1f} ms  {metrics['dbCalls']:>3} db"
+                    f"  {metrics['ruEstimate']:>6.1f} RU  {metrics['promptTokens']:>6} tok"
+                    f"  {metrics['completions']} llm  {result['message'][:40]!r}"
+                )
+            for problem in entry["problems"]:
+                print(f"  ! {problem}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+# Scaling curves: latency and memory of every storage function and chat tool
+# as one user's dataset grows. For each size a fresh dataset from
+# benchmarks/dataset.py is loaded, then every operation is timed. Peak
+# allocated memory comes from one extra run under tracemalloc. The report gives
+# each operation's growth exponent between the smallest and the largest size:
+# ~0 is flat, ~1 is linear in the number of documents.
+#
+# Chat tools run through the real /api/chat handler, with scripted completions
+# in place of Azure OpenAI (--tools; needs the Functions dependencies). They
+# act on DEMO_USER_ID, so they only run against SQLite, where every size gets
+# its own database.
+#
+# Run from the backend directory:
+#
+#     python -m benchmarks.scaling --sizes 1000 5000 20000 50000
+#     python -m benchmarks.scaling --sizes 1000 10000 --tools --out scaling.json
+#     python -m benchmarks.scaling --backend cosmos --sizes 1000 5000   # needs COSMOSDB_* settings
+#     python -m benchmarks.scaling --backend cosmos --emulator --sizes 1000 5000
+import argparse
+import json
+import math
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.dataset import generate_dataset, load_dataset
+from storage import StorageBackend, create_storage
+
+DEMO_USER_ID = "demo-user"
+
+
+@dataclass
+class Operation:
+    name: str
+    run: Callable[[Any], Any]
+    # Untimed; its result is passed to run. Used to create what run deletes.
+    setup: Optional[Callable[[], Any]] = None
+    # Changes the dataset, so it runs once, after everything else.
+    destructive: bool = False
+
+
+def _local(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def db_operations(store: StorageBackend, user_id: str, now: datetime) -> List[Operation]:
+    week_end = now + timedelta(days=7)
+    month_start = now - timedelta(days=15)
+    far = now + timedelta(days=400)
+
+    def scratch_task() -> Dict[str, Any]:
+        return store.create_task(user_id, f"Skaalaus {uuid.uuid4().hex[:8]}", "Inbox", None)
+
+    def scratch_event() -> Dict[str, Any]:
+        return store.create_event(user_id, f"Skaalaus {uuid.uuid4().hex[:8]}", _local(far), _local(far + timedelta(hours=1)))
+
+    return [
+        Operation("list_tasks", lambda _: store.list_tasks(user_id)),
+        Operation("list_tasks_by_status", lambda _: store.list_tasks_by_status(user_id, "open")),
+        Operation("find_tasks_by_title", lambda _: store.find_tasks_by_title(user_id, "Osta maitoa")),
+        Operation("read_task_stats", lambda _: store.read_task_stats(user_id)),
+        Operation("create_task", lambda _: store.create_task(user_id, "Skaalaustesti", "Inbox", None)),
+        Operation("update_task", lambda task: store.update_task(user_id, task["id"], {"status": "done"}), scratch_task),
+        Operation("delete_task", lambda task: store.delete_task(user_id, task["id"]), scratch_task),
+        Operation("list_events", lambda _: store.list_events(user_id, _local(now), _local(week_end))),
+        Operation(
+            "list_events_overlapping",
+            lambda _: store.list_events_overlapping(user_id, _local(month_start), _local(month_start + timedelta(days=31))),
+        ),
+        Operation("find_events_by_title", lambda _: store.find_events_by_title(user_id, "retro")),
+        Operation(
+            "create_event",
+            lambda _: store.create_event(user_id, "Skaalaustesti", _local(week_end), _local(week_end + timedelta(hours=1))),
+        ),
+        Operation("update_event", lambda event: store.update_event(user_id, event["id"], {"title": "Siirretty"}), scratch_event),
+        Operation("delete_event", lambda event: store.delete_event(user_id, event["id"]), scratch_event),
+        Operation(
+            "delete_events_in_range",
+            lambda event: store.delete_events_in_range(user_id, event["start"], event["end"]),
+            scratch_event,
+        ),
+        Operation("read_data_version", lambda _: store.read_data_version(user_id)),
+        Operation("delete_tasks_for_user", lambda _: store.delete_tasks_for_user(user_id, "Personal"), destructive=True),
+    ]
+
+
+def tool_operations(store: StorageBackend, now: datetime) -> List[Operation]:
+    # Imported here: it pulls in function_app and its Functions dependencies.
+    from benchmarks import replay_sessions
+    from chat_recording import to_namespace
+    from columnar import COLUMNS_CACHE_SIZE
+    from versioned_cache import VersionedLRUCache
+
+    function_app = replay_sessions.function_app
+    function_app.storage = store
+    function_app.get_helsinki_now = lambda: now
+    handler = replay_sessions.chat_handler()
+    script: Dict[str, Any] = {}
+
+    def create(**kwargs: Any) -> Any:
+        message: Dict[str, Any] = {"content": "Selvä.", "tool_calls": None}
+        if kwargs.get("tools"):
+            arguments = json.dumps(script["arguments"])
+            message = {
+                "content": None,
+                "tool_calls": [
+                    {"id": "call_scaling", "type": "function", "function": {"name": script["tool"], "arguments": arguments}}
+                ],
+            }
+        usage = {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2, "prompt_tokens_details": None}
+        return to_namespace({"model": kwargs.get("model"), "choices": [{"message": message}], "usage": usage})
+
+    replay_sessions.use_completions(create)
+
+    def tool(
+        name: str,
+        message: str,
+        arguments: Callable[[Any], Dict[str, Any]],
+        setup: Optional[Callable[[], Any]] = None,
+        destructive: bool = False,
+    ) -> Operation:
+        def run(target: Any) -> Any:
+            script.update(tool=name, arguments=arguments(target))
+            response = handler(replay_sessions.chat_request(message))
+            if response.status_code != 200:
+                raise RuntimeError(f"{name}: HTTP {response.status_code} {response.get_body()[:200]!r}")
+            return response
+
+        return Operation(f"tool:{name}", run, setup, destructive)
+
+    def cold_columns() -> None:
+        # The list tools' columns are rebuilt after every write; measure that path.
+        function_app.columns_cache = VersionedLRUCache(COLUMNS_CACHE_SIZE)
+
+    def scratch_task() -> str:
+        title = f"Skaalaus {uuid.uuid4().hex[:8]}"
+        store.create_task(DEMO_USER_ID, title, "Inbox", None)
+        return title
+
+    far = now + timedelta(days=400)
+
+    def scratch_event() -> Dict[str, Any]:
+        title = f"Skaalaus {uuid.uuid4().hex[:8]}"
+        return store.create_event(DEMO_USER_ID, title, _local(far), _local(far + timedelta(hours=1)))
+
+    week_end = now + timedelta(days=7)
+    return [
+        tool("list_tasks_overview", "Näytä avoimet tehtävät", lambda _: {"status": "open", "limit": 20}, cold_columns),
+        tool(
+            "list_events_in_range",
+            "Mitä kalenterissa on tällä viikolla?",
+            lambda _: {"start": _local(now), "end": _local(week_end), "onlyUpcoming": True},
+            cold_columns,
+        ),
+        tool("create_task", 'Lisää tehtävä "Skaalaustesti"', lambda _: {"title": "Skaalaustesti", "list": "Inbox"}),
+        tool(
+            "create_event",
+            'Lisää palaveri "Skaalaustesti" ensi viikolla',
+            lambda _: {"title": "Skaalaustesti", "start": _local(week_end), "end": _local(week_end + timedelta(hours=1))},
+        ),
+        tool("update_task", "Merkitse tehtävä tehdyksi", lambda title: {"matchTitle": title, "status": "done"}, scratch_task),
+        tool("delete_task", "Poista tehtävä", lambda title: {"title": title}, scratch_task),
+        tool(
+            "update_event",
+            "Nimeä tapahtuma uudelleen",
+            lambda event: {"matchTitle": event["title"], "title": "Siirretty"},
+            scratch_event,
+        ),
+        tool("delete_event", "Poista tapahtuma", lambda event: {"title": event["title"]}, scratch_event),
+        tool(
+            "delete_events_in_range",
+            "Poista sen päivän tapahtumat",
+            lambda event: {"start": _local(far), "end": _local(far + timedelta(hours=2))},
+            scratch_event,
+        ),
+        tool(
+            "delete_tasks_in_list",
+            "Poista kaikki Personal-listan tehtävät",
+            lambda _: {"list": "Personal"},
+            destructive=True,
+        ),
+    ]
+
+
+def measure(operation: Operation, repeat: int) -> Dict[str, Any]:
+    runs = 1 if operation.destructive else repeat
+    samples = []
+    for _ in range(runs):
+        target = operation.setup() if operation.setup else None
+        started = time.perf_counter()
+        operation.run(target)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+
+    peak_kib = None
+    if not operation.destructive:
+        target = operation.setup() if operation.setup else None
+        tracemalloc.start()
+        try:
+            operation.run(target)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        peak_kib = round(peak / 1024, 1)
+
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "peak_kib": peak_kib,
+    }
+
+
+def growth_exponent(sizes: List[int], values: List[Optional[float]]) -> Optional[float]:
+    # Slope of log(value) against log(size) between the ends of the curve.
+    first, last = values[0], values[-1]
+    if len(sizes) < 2 or not first or not last:
+        return None
+    return round(math.log(last / first) / math.log(sizes[-1] / sizes[0]), 2)
+
+
+def use_emulator() -> None:
+    # The Cosmos modules open their client on import through
+    # http_pools.get_cosmos_client, so this has to run before the first
+    # create_storage("cosmos"). Every module then shares one emulator.
+    import http_pools
+    from cosmos_emulator import CosmosEmulator
+
+    emulator = CosmosEmulator()
+    http_pools.get_cosmos_client = lambda endpoint, key: emulator
+    for name, value in (
+        ("COSMOSDB_ENDPOINT", "https://emulator.invalid"),
+        ("COSMOSDB_KEY", "emulator"),
+        ("COSMOSDB_DATABASE", "timeplanner"),
+        ("COSMOSDB_TASKS_CONTAINER", "tasks"),
+    ):
+        os.environ.setdefault(name, value)
+
+
+def run_size(
+    backend: str, size: int, events_per_task: float, repeat: int, seed: int, tools: bool, directory: str
+) -> Dict[str, Any]:
+    store = create_storage(backend, os.path.join(directory, f"scaling-{size}.db"))
+    user_id = DEMO_USER_ID if store.name == "sqlite" else f"scaling-{uuid.uuid4().hex[:8]}"
+    dataset = generate_dataset(user_id, size, int(size * events_per_task), seed)
+    now = datetime.fromisoformat(dataset["now"])
+
+    started = time.perf_counter()
+    load_dataset(store, dataset)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    operations = db_operations(store, user_id, now)
+    if tools:
+        operations += tool_operations(store, now)
+    operations.sort(key=lambda operation: operation.destructive)
+
+    try:
+        results = {operation.name: measure(operation, repeat) for operation in operations}
+    finally:
+        if store.name != "sqlite":
+            store.delete_tasks_for_user(user_id)
+            store.delete_events_in_range(user_id, "2000-01-01T00:00:00", "2100-01-01T00:00:00")
+        if hasattr(store, "close"):
+            store.close()
+
+    return {
+        "tasks": len(dataset["tasks"]),
+        "events": len(dataset["events"]),
+        "load_ms": round(load_ms, 1),
+        "operations": results,
+    }
+
+
+def build_report(sizes: List[int], runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    curves: Dict[str, Any] = {}
+    for name in runs[0]["operations"]:
+        points = [run["operations"][name] for run in runs]
+        curves[name] = {
+            "points": [{"tasks": size, **point} for size, point in zip(sizes, points)],
+            "latency_exponent": growth_exponent(sizes, [point["median_ms"] for point in points]),
+            "memory_exponent": growth_exponent(sizes, [point["peak_kib"] for point in points]),
+        }
+    return {
+        "sizes": [{"tasks": run["tasks"], "events": run["events"], "load_ms": run["load_ms"]} for run in runs],
+        "operations": curves,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency and memory of storage functions and chat tools by dataset size.")
+    parser.add_argument("--backend", default="sqlite", choices=["sqlite", "cosmos"])
+    parser.add_argument("--emulator", action="store_true", help="run --backend cosmos against cosmos_emulator.py")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 5_000, 20_000], help="tasks per user")
+    parser.add_argument("--events-per-task", type=float, default=1.5)
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--tools", action="store_true", help="also time the chat tools through /api/chat")
+    parser.add_argument("--out", help="write the report as JSON")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.tools and args.backend != "sqlite":
+        parser.error("--tools needs --backend sqlite; the chat tools act on the demo user")
+    if args.emulator:
+        if args.backend != "cosmos":
+            parser.error("--emulator needs --backend cosmos")
+        use_emulator()
+    sizes = sorted(args.sizes)
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            run = run_size(args.backend, size, args.events_per_task, args.repeat, args.seed, args.tools, tmp)
+            runs.append(run)
+            if not args.json:
+                print(f"{run['tasks']} tasks / {run['events']} events loaded in {run['load_ms']:.0f} ms")
+    report = build_report(sizes, runs)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    header = "".join(f"{size:>12}" for size in sizes)
+    print(f"\n{'median ms by tasks':<32}{header}{'exp':>7}{'peak KiB':>11}{'exp':>7}")
+    for name, curve in report["operations"].items():
+        medians = "".join(f"{point['median_ms']:>12.2f}" for point in curve["points"])
+        peak = curve["points"][-1]["peak_kib"]
+        print(
+            f"{name:<32}{medians}{_fmt(curve['latency_exponent']):>7}"
+            f"{_fmt(peak):>11}{_fmt(curve['memory_exponent']):>7}"
+        )
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:g}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+try:
+    from .rate_limiter import estimate_prompt_tokens
+except ImportError:
+    from rate_limiter import estimate_prompt_tokens
+
+# Set to a directory to record every /api/chat turn there, one JSON Lines file
+# per session. Sessions are named by the X-Chat-Session header, or by user and
+# UTC day when it is missing.
+CHAT_RECORDING_DIR = os.environ.get("CHAT_RECORDING_DIR") or None
+SESSION_HEADER = "X-Chat-Session"
+REDACTED = "[REDACTED]"
+
+# Values of settings with these words in their name never reach a fixture.
+_SECRET_SETTING = re.compile(r"KEY|SECRET|TOKEN|PASSWORD|CONNECTION", re.IGNORECASE)
+_SECRET_FIELDS = {"api-key", "api_key", "authorization", "password", "secret", "token", "key"}
+_SESSION_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# Rough request charges for the storage calls the chat handler makes, in RU,
+# modelled on Cosmos for ~1 KB documents with the indexing policy in
+# indexing_policy.py. Queries pay a base charge plus a share per returned
+# document. Writes include the data-version bump, and task writes also
+# include the stats patch.
+RU_POINT_READ = 1.0
+RU_QUERY_BASE = 2.8
+RU_QUERY_PER_DOC = 0.4
+RU_WRITE = 7.0
+RU_PATCH = 2.5
+
+_current_turn: ContextVar[Optional["Turn"]] = ContextVar("chat_recording_turn", default=None)
+
+
+def secret_values(environ: Mapping[str, str] = os.environ) -> List[str]:
+    return [value for name, value in environ.items() if _SECRET_SETTING.search(name) and len(value) >= 8]
+
+
+def redact(value: Any, secrets: Iterable[str]) -> Any:
+    secrets = [secret for secret in secrets if secret]
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key.lower() in _SECRET_FIELDS else redact(item, secrets)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item, secrets) for item in value]
+    if isinstance(value, str):
+        for secret in secrets:
+            value = value.replace(secret, REDACTED)
+    return value
+
+
+def estimate_ru(method: str, rows: int) -> float:
+    if method.startswith("read_"):
+        return RU_POINT_READ
+    if method.startswith(("list_", "find_")):
+        return RU_QUERY_BASE + RU_QUERY_PER_DOC * rows
+    stats_patch = RU_PATCH if "task" in method else 0.0
+    if method.startswith("create_"):
+        return RU_WRITE + RU_PATCH + stats_patch
+    if method in ("update_task", "update_event", "delete_task", "delete_event"):
+        # Point read for the current document, then the write.
+        return RU_POINT_READ + RU_WRITE + RU_PATCH + stats_patch
+    if method.startswith("delete_"):
+        # Query for the matches, then one delete each.
+        return RU_QUERY_BASE + (RU_QUERY_PER_DOC + RU_WRITE) * rows + RU_PATCH + stats_patch
+    return RU_POINT_READ
+
+
+def serialize_completion(completion: Any) -> Dict[str, Any]:
+    # Only the attributes the handler reads, so fixtures stay stable across
+    # SDK versions.
+    choices = []
+    for choice in completion.choices:
+        message = choice.message
+        tool_calls = [
+            {
+                "id": call.id,
+                "type": "function",
+                "function": {"name": call.function.name, "arguments": call.function.arguments},
+            }
+            for call in (getattr(message, "tool_calls", None) or [])
+        ]
+        choices.append({"message": {"content": message.content, "tool_calls": tool_calls or None}})
+
+    usage = getattr(completion, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "model": getattr(completion, "model", None),
+        "choices": choices,
+        "usage": {
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "total_tokens": getattr(usage, "total_tokens", None),
+            "prompt_tokens_details": {"cached_tokens": getattr(details, "cached_tokens", None)},
+        }
+        if usage is not None
+        else None,
+    }
+
+
+def to_namespace(value: Any) -> Any:
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(item) for item in value]
+    return value
+
+
+def _rows(result: Any) -> int:
+    if isinstance(result, list):
+        return len(result)
+    return 0 if result is None else 1
+
+
+class Turn:
+    """OpenAI and storage calls made while serving one chat message."""
+
+    def __init__(self, user_id: str, message: str, now: str) -> None:
+        self.user_id = user_id
+        self.message = message
+        self.now = now
+        self.completions: List[Dict[str, Any]] = []
+        self.db_calls: List[Dict[str, Any]] = []
+        self.latency_ms = 0.0
+        self.status: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def add_db_call(self, method: str, args: Dict[str, Any], result: Any, ms: float) -> None:
+        call = {"method": method, "args": args, "rows": _rows(result), "ms": round(ms, 2)}
+        if isinstance(result, dict) and "id" in result:
+            call["resultId"] = result["id"]
+        with self._lock:
+            self.db_calls.append(call)
+
+    def add_completion(self, request: Dict[str, Any], response: Dict[str, Any], ms: float) -> None:
+        with self._lock:
+            self.completions.append({"request": request, "response": response, "ms": round(ms, 2)})
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            db_calls = list(self.db_calls)
+            completions = list(self.completions)
+        return {
+            "latencyMs": round(self.latency_ms, 2),
+            "dbCalls": len(db_calls),
+            "ruEstimate": round(sum(estimate_ru(call["method"], call["rows"]) for call in db_calls), 2),
+            "promptTokens": sum(completion["request"]["promptTokens"] for completion in completions),
+            "completions": len(completions),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": "turn",
+            "userId": self.user_id,
+            "message": self.message,
+            "now": self.now,
+            "status": self.status,
+            "completions": self.completions,
+            "dbCalls": self.db_calls,
+            "metrics": self.metrics(),
+        }
+
+
+@contextmanager
+def recording_turn(turn: Turn) -> Iterator[Turn]:
+    token = _current_turn.set(turn)
+    try:
+        yield turn
+    finally:
+        _current_turn.reset(token)
+
+
+class RecordingStorage:
+    """Storage proxy that logs calls into the active turn.
+
+    The turn is looked up when a method is fetched, not when it runs, so
+    calls handed to db_io_executor (the chat prefetch) still land in the
+    turn that issued them.
+    """
+
+    def __init__(self, storage: Any, turn_of: Callable[[], Optional[Turn]] = _current_turn.get) -> None:
+        self._storage = storage
+        self._turn_of = turn_of
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._storage, name)
+        turn = self._turn_of()
+        if turn is None or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def recorded(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            result = attr(*args, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            arguments = {"args": list(args), **{key: value for key, value in kwargs.items() if key != "fields"}}
+            turn.add_db_call(name, json.loads(json.dumps(arguments, default=str)), result, elapsed_ms)
+            return result
+
+        return recorded
+
+
+def recording_create(
+    create: Callable[..., Any], turn_of: Callable[[], Optional[Turn]] = _current_turn.get
+) -> Callable[..., Any]:
+    @functools.wraps(create)
+    def recorded(**kwargs: Any) -> Any:
+        turn = turn_of()
+        if turn is None:
+            return create(**kwargs)
+        started = time.perf_counter()
+        completion = create(**kwargs)
+        tools = kwargs.get("tools") or []
+        request = {
+            "model": kwargs.get("model"),
+            "messages": kwargs.get("messages"),
+            "tools": [tool["function"]["name"] for tool in tools],
+            "max_tokens": kwargs.get("max_tokens"),
+            "promptTokens": estimate_prompt_tokens(kwargs.get("messages") or [], tools or None),
+        }
+        turn.add_completion(
+            json.loads(json.dumps(request, default=str)),
+            serialize_completion(completion),
+            (time.perf_counter() - started) * 1000,
+        )
+        return completion
+
+    return recorded
+
+
+class ChatRecorder:
+    """Writes each chat turn, with its OpenAI and storage calls, to a fixture.
+
+    A session file starts with a header line holding the user's tasks and
+    events when recording began, so a replay can start from the same data.
+    Each turn follows as one line. Secrets from the app settings are
+    replaced before anything is written.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = CHAT_RECORDING_DIR,
+        secrets: Optional[List[str]] = None,
+    ) -> None:
+        self.directory = directory
+        self._secrets = secret_values() if secrets is None else secrets
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def wrap_storage(self, storage: Any) -> Any:
+        return RecordingStorage(storage) if self.enabled else storage
+
+    def wrap_create(self, create: Callable[..., Any]) -> Callable[..., Any]:
+        return recording_create(create) if self.enabled else create
+
+    def session_path(self, session: str) -> str:
+        return os.path.join(self.directory or ".", f"{_SESSION_NAME.sub('_', session)[:80]}.jsonl")
+
+    def _append(self, path: str, lines: List[Dict[str, Any]]) -> None:
+        with self._lock, open(path, "a", encoding="utf-8") as handle:
+            for line in lines:
+                handle.write(json.dumps(redact(line, self._secrets), ensure_ascii=False) + "\n")
+
+    def wrap(
+        self,
+        user_of: Callable[[Any], str],
+        now_of: Callable[[], datetime],
+        seed_of: Callable[[str], Dict[str, Any]],
+    ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        def decorate(handler: Callable[..., Any]) -> Callable[..., Any]:
+            if not self.enabled:
+                return handler
+
+            @functools.wraps(handler)
+            def wrapper(req: Any) -> Any:
+                try:
+                    body = req.get_json()
+                except ValueError:
+                    return handler(req)
+                message = body.get("message") or "" if isinstance(body, dict) else ""
+
+                user_id = user_of(req)
+                session = req.headers.get(SESSION_HEADER) or f"{user_id}-{datetime.now(timezone.utc):%Y-%m-%d}"
+                path = self.session_path(session)
+                header: List[Dict[str, Any]] = []
+                if not os.path.exists(path):
+                    os.makedirs(self.directory or ".", exist_ok=True)
+                    header.append({"type": "session", "session": session, "userId": user_id, "seed": seed_of(user_id)})
+
+                turn = Turn(user_id, message, now_of().isoformat())
+                started = time.perf_counter()
+                try:
+                    with recording_turn(turn):
+                        response = handler(req)
+                    turn.status = getattr(response, "status_code", None)
+                    return response
+                finally:
+                    turn.latency_ms = (time.perf_counter() - started) * 1000
+                    try:
+                        self._append(path, [*header, turn.to_dict()])
+                    except OSError:
+                        logging.warning("Could not record chat turn to %s", path, exc_info=True)
+
+            return wrapper
+
+        return decorate
+
+
+# Replay
+
+
+class SessionDiverged(Exception):
+    """The handler asked for a completion the recording does not have."""
+
+
+def load_session(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    header: Dict[str, Any] = {}
+    turns: List[Dict[str, Any]] = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("type") == "session":
+                header = entry
+            else:
+                turns.append(entry)
+    return header, turns
+
+
+class ReplayCreate:
+    """Stands in for chat.completions.create, returning a turn's recorded responses.
+
+    Ids that the recording's writes produced are swapped for the ids the
+    replay's writes produced. That way, a later turn's tool call still
+    targets the document an earlier turn created.
+    """
+
+    def __init__(self) -> None:
+        self.id_map: Dict[str, str] = {}
+        self._responses: List[Dict[str, Any]] = []
+
+    def begin(self, recorded_turn: Dict[str, Any]) -> None:
+        self._responses = [completion["response"] for completion in recorded_turn.get("completions", [])]
+
+    def _remap(self, text: str) -> str:
+        for old, new in self.id_map.items():
+            text = text.replace(old, new)
+        return text
+
+    def __call__(self, **kwargs: Any) -> Any:
+        if not self._responses:
+            raise SessionDiverged("No recorded completion left for this turn")
+        response = json.loads(self._remap(json.dumps(self._responses.pop(0))))
+        return to_namespace(response)
+
+    def learn_ids(self, recorded_turn: Dict[str, Any], replayed: Turn) -> None:
+        # Writes that return a new document are paired up in call order.
+        def created(calls: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+            ids: Dict[str, List[str]] = {}
+            for call in calls:
+                if call["method"].startswith("create_") and "resultId" in call:
+                    ids.setdefault(call["method"], []).append(str(call["resultId"]))
+            return ids
+
+        recorded_ids = created(recorded_turn.get("dbCalls", []))
+        replayed_ids = created(replayed.db_calls)
+        for method, old_ids in recorded_ids.items():
+            for old, new in zip(old_ids, replayed_ids.get(method, [])):
+                self.id_map[old] = new
+
+
+def compare_metrics(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerance: float = 0.05,
+    latency_tolerance: Optional[float] = None,
+) -> List[str]:
+    problems = []
+    if current["dbCalls"] > baseline["dbCalls"]:
+        problems.append(f"db calls {baseline['dbCalls']} -> {current['dbCalls']}")
+    if current["completions"] > baseline["completions"]:
+        problems.append(f"completions {baseline['completions']} -> {current['completions']}")
+    for key, label in (("ruEstimate", "RU"), ("promptTokens", "prompt tokens")):
+        if current[key] > baseline[key] * (1 + tolerance) + 1e-9:
+            problems.append(f"{label} {baseline[key]} -> {current[key]}")
+    if latency_tolerance is not None and baseline.get("latencyMs"):
+        if current["latencyMs"] > baseline["latencyMs"] * (1 + latency_tolerance):
+            problems.append(f"latency {baseline['latencyMs']} ms -> {current['latencyMs']} ms")
+    return problems
@@ -0,0 +1,120 @@
+import os
+from datetime import tzinfo
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from .timeutils import doc_epoch
+    from .versioned_cache import VersionedLRUCache
+except ImportError:
+    from timeutils import doc_epoch
+    from versioned_cache import VersionedLRUCache
+
+COLUMNS_CACHE_SIZE = int(os.environ.get("COLUMNS_CACHE_SIZE", "64"))
+
+# Missing epochs are stored as this sentinel next to an explicit "has" mask so
+# the arrays stay plain int64.
+_NO_EPOCH = np.iinfo(np.int64).min
+
+
+def _encode(values: Sequence[Optional[str]]) -> tuple[np.ndarray, Dict[str, int]]:
+    categories: Dict[str, int] = {}
+    codes = np.fromiter(
+        (categories.setdefault(value or "", len(categories)) for value in values),
+        dtype=np.int32,
+        count=len(values),
+    )
+    return codes, categories
+
+
+def _epochs(docs: Sequence[Dict[str, Any]], iso_field: str, epoch_field: str, tz: tzinfo) -> np.ndarray:
+    return np.fromiter(
+        (
+            _NO_EPOCH if epoch is None else epoch
+            for epoch in (doc_epoch(doc, iso_field, epoch_field, tz) for doc in docs)
+        ),
+        dtype=np.int64,
+        count=len(docs),
+    )
+
+
+class TaskColumns:
+    """A user's tasks as parallel arrays, in the order the DB returned them."""
+
+    def __init__(self, docs: List[Dict[str, Any]], tz: tzinfo) -> None:
+        self.docs = docs
+        self.list_codes, self.lists = _encode([doc.get("list") for doc in docs])
+        self.status_codes, self.statuses = _encode([doc.get("status") for doc in docs])
+        self.due = _epochs(docs, "dueDate", "dueEpoch", tz)
+        self.has_due = self.due != _NO_EPOCH
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def select(
+        self,
+        list_name: Optional[str] = None,
+        status: Optional[str] = None,
+        due_after: Optional[int] = None,
+        due_before: Optional[int] = None,
+    ) -> np.ndarray:
+        mask = np.ones(len(self.docs), dtype=bool)
+        if list_name:
+            mask &= self.list_codes == self.lists.get(list_name, -1)
+        if status:
+            mask &= self.status_codes == self.statuses.get(status, -1)
+        if due_after is not None:
+            mask &= self.has_due & (self.due >= due_after)
+        if due_before is not None:
+            mask &= self.has_due & (self.due <= due_before)
+        return np.flatnonzero(mask)
+
+    def take(self, indices: np.ndarray) -> List[Dict[str, Any]]:
+        return [self.docs[index] for index in indices.tolist()]
+
+
+class EventColumns:
+    """A user's events as parallel start/end epoch arrays."""
+
+    def __init__(self, docs: List[Dict[str, Any]], tz: tzinfo) -> None:
+        starts = _epochs(docs, "start", "startEpoch", tz)
+        keep = starts != _NO_EPOCH
+        if not keep.all():
+            docs = [doc for doc, kept in zip(docs, keep.tolist()) if kept]
+            starts = starts[keep]
+        self.docs = docs
+        self.start = starts
+        ends = _epochs(docs, "end", "endEpoch", tz)
+        self.end = np.where(ends == _NO_EPOCH, starts, ends)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def select(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        not_ended_before: Optional[int] = None,
+    ) -> np.ndarray:
+        mask = np.ones(len(self.docs), dtype=bool)
+        if not_ended_before is not None:
+            mask &= self.end >= not_ended_before
+        if start is not None:
+            mask &= self.end > start
+        if end is not None:
+            mask &= self.start < end
+        return np.flatnonzero(mask)
+
+    def earliest(self, indices: np.ndarray, limit: int) -> np.ndarray:
+        # Top-k by start time without sorting the whole selection.
+        if indices.size > limit:
+            nearest = np.argpartition(self.start[indices], limit - 1)[:limit]
+            indices = indices[nearest]
+        return indices[np.argsort(self.start[indices], kind="stable")]
+
+    def take(self, indices: np.ndarray) -> List[Dict[str, Any]]:
+        return [self.docs[index] for index in indices.tolist()]
+
+
+columns_cache = VersionedLRUCache(COLUMNS_CACHE_SIZE)
@@ -0,0 +1,1173 @@
+import bisect
+import itertools
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosBatchOperationError,
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+try:
+    from .indexing_policy import POLICIES
+except ImportError:
+    from indexing_policy import POLICIES
+
+# Request charge model, in RU. Point reads cost 1 RU per started KB. Writes
+# pay a base charge plus a share per KB and per indexed path. Queries pay a
+# base charge, a share per index entry visited, and a share per document
+# loaded and per KB returned. The numbers follow the published costs for
+# ~1 KB documents closely enough to compare query shapes and spot full scans.
+RU_READ_PER_KB = 1.0
+RU_WRITE_BASE = 5.0
+RU_WRITE_PER_KB = 1.0
+RU_WRITE_PER_INDEXED_PATH = 0.25
+RU_QUERY_BASE = 2.3
+RU_QUERY_PER_INDEX_ENTRY = 0.01
+RU_QUERY_PER_LOADED_DOC = 0.1
+RU_QUERY_PER_RETURNED_KB = 0.2
+
+CHARGE_HEADER = "x-ms-request-charge"
+SESSION_TOKEN_HEADER = "x-ms-session-token"
+QUERY_METRICS_HEADER = "x-ms-documentdb-query-metrics"
+MAX_PATCH_OPERATIONS = 10
+MAX_BATCH_OPERATIONS = 100
+QUERY_CACHE_SIZE = 256
+
+# Cosmos orders mixed types undefined < null < boolean < number < string.
+_UNDEFINED = object()
+_RANK_UNDEFINED, _RANK_NULL, _RANK_BOOL, _RANK_NUMBER, _RANK_STRING, _RANK_OTHER = range(6)
+_RANK_END = 9
+
+_DEFAULT_POLICY: Dict[str, Any] = {"includedPaths": [{"path": "/*"}], "excludedPaths": [], "compositeIndexes": []}
+
+Path = Tuple[str, ...]
+Order = List[Tuple[Path, bool]]
+
+
+def _bad_request(message: str) -> CosmosHttpResponseError:
+    return CosmosHttpResponseError(status_code=400, message=message)
+
+
+def _rank(value: Any) -> int:
+    if value is _UNDEFINED:
+        return _RANK_UNDEFINED
+    if value is None:
+        return _RANK_NULL
+    if isinstance(value, bool):
+        return _RANK_BOOL
+    if isinstance(value, (int, float)):
+        return _RANK_NUMBER
+    if isinstance(value, str):
+        return _RANK_STRING
+    return _RANK_OTHER
+
+
+def _sort_key(value: Any) -> Tuple[Any, ...]:
+    rank = _rank(value)
+    if rank in (_RANK_UNDEFINED, _RANK_NULL, _RANK_OTHER):
+        return (rank,)
+    return (rank, value)
+
+
+def _clone(value: Any) -> Any:
+    # Documents are JSON; this is several times faster than copy.deepcopy.
+    if isinstance(value, dict):
+        return {key: _clone(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_clone(item) for item in value]
+    return value
+
+
+def _size_kb(doc: Any) -> float:
+    return len(json.dumps(doc, separators=(",", ":"))) / 1024
+
+
+def _get_path(doc: Any, path: Sequence[str]) -> Any:
+    for name in path:
+        if not isinstance(doc, dict) or name not in doc:
+            return _UNDEFINED
+        doc = doc[name]
+    return doc
+
+
+def _pointer(path: str) -> List[str]:
+    # JSON Pointer, as used by patch: "/counts/open:Work" -> ["counts", "open:Work"].
+    return [part.replace("~1", "/").replace("~0", "~") for part in path.split("/")[1:]]
+
+
+# SQL subset: SELECT [DISTINCT] [VALUE] [TOP n] (* | c.a, c.b.c) FROM c
+# [WHERE ...] [ORDER BY c.a [ASC|DESC], ...]. Expressions take parameters,
+# literals, = != <> < <= > >=, AND, OR, NOT, parentheses and FUNCTIONS.
+# Anything else is rejected with a 400, as the service would.
+
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+      | (?P<param>@[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op><=|>=|!=|<>|=|<|>|\(|\)|,|\.|\*)
+    )""",
+    re.VERBOSE,
+)
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+_KEYWORDS = {
+    "SELECT", "DISTINCT", "VALUE", "TOP", "FROM", "WHERE", "ORDER", "BY", "ASC", "DESC",
+    "AND", "OR", "NOT", "TRUE", "FALSE", "NULL",
+}
+
+
+def _contains(text: str, part: str, ignore_case: bool = False) -> bool:
+    return part.lower() in text.lower() if ignore_case is True else part in text
+
+
+def _startswith(text: str, part: str, ignore_case: bool = False) -> bool:
+    return text.lower().startswith(part.lower()) if ignore_case is True else text.startswith(part)
+
+
+def _endswith(text: str, part: str, ignore_case: bool = False) -> bool:
+    return text.lower().endswith(part.lower()) if ignore_case is True else text.endswith(part)
+
+
+def _strings(fn: Callable[..., Any], count: int) -> Callable[..., Any]:
+    def call(*args: Any) -> Any:
+        if any(not isinstance(arg, str) for arg in args[:count]):
+            return _UNDEFINED
+        return fn(*args)
+
+    return call
+
+
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "LOWER": _strings(str.lower, 1),
+    "UPPER": _strings(str.upper, 1),
+    "CONTAINS": _strings(_contains, 2),
+    "STARTSWITH": _strings(_startswith, 2),
+    "ENDSWITH": _strings(_endswith, 2),
+    "IS_DEFINED": lambda value: value is not _UNDEFINED,
+    "IS_NULL": lambda value: value is None,
+    "ARRAY_CONTAINS": lambda array, value: (value in array) if isinstance(array, list) else _UNDEFINED,
+}
+# These see undefined arguments; the others return undefined for them.
+_TOTAL_FUNCTIONS = {"IS_DEFINED", "IS_NULL"}
+
+
+def _tokenize(text: str) -> List[Tuple[str, Any, str]]:
+    tokens: List[Tuple[str, Any, str]] = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise _bad_request(f"Syntax error near {text[position:position + 20]!r}")
+        position = match.end()
+        kind = match.lastgroup or ""
+        raw = match.group(kind)
+        value: Any = raw
+        if kind == "string":
+            value = re.sub(r"\\(.)", lambda escape: _ESCAPES.get(escape.group(1), escape.group(1)), raw[1:-1])
+        elif kind == "number":
+            value = float(raw) if any(char in raw for char in ".eE") else int(raw)
+        elif kind == "name" and raw.upper() in _KEYWORDS:
+            kind, value = "keyword", raw.upper()
+        tokens.append((kind, value, raw))
+    return tokens
+
+
+@dataclass
+class ParsedQuery:
+    distinct: bool
+    value: bool
+    top: Any
+    select: Optional[List[Path]]
+    where: Optional[tuple]
+    order: Order = field(default_factory=list)
+    predicate: Callable[[Dict[str, Any], Dict[str, Any]], bool] = lambda doc, params: True
+    conjuncts: List[tuple] = field(default_factory=list)
+
+
+class _Parser:
+    def __init__(self, text: str) -> None:
+        self.tokens = _tokenize(text)
+        self.position = 0
+        self.alias = ""
+
+    def peek(self, offset: int = 0) -> Tuple[str, Any]:
+        index = self.position + offset
+        return self.tokens[index][:2] if index < len(self.tokens) else ("end", None)
+
+    def take(self) -> Tuple[str, Any]:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def accept(self, kind: str, value: Any = None) -> bool:
+        token = self.peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, kind: str, value: Any = None) -> Any:
+        token = self.take()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise _bad_request(f"Expected {value or kind}, found {token[1]!r}")
+        return token[1]
+
+    def parse(self) -> ParsedQuery:
+        self.expect("keyword", "SELECT")
+        distinct = self.accept("keyword", "DISTINCT")
+        value = self.accept("keyword", "VALUE")
+        top = None
+        if self.accept("keyword", "TOP"):
+            kind, top = self.take()
+            if kind not in ("number", "param") or (kind == "number" and not isinstance(top, int)):
+                raise _bad_request("TOP expects an integer or a parameter")
+            top = ("param", top) if kind == "param" else top
+
+        # The alias comes after FROM, so read it before the projection.
+        select_start = self.position
+        while self.peek() != ("keyword", "FROM"):
+            if self.take()[0] == "end":
+                raise _bad_request("Expected FROM")
+        self.position += 1
+        self.alias = self.expect("name")
+        after_from = self.position
+
+        self.position = select_start
+        select: Optional[List[Path]] = None
+        if self.accept("op", "*"):
+            if value:
+                raise _bad_request("SELECT VALUE * is not supported")
+        else:
+            select = [self.path()]
+            while self.accept("op", ","):
+                select.append(self.path())
+            if value and len(select) != 1:
+                raise _bad_request("SELECT VALUE takes one expression")
+        self.expect("keyword", "FROM")
+        self.position = after_from
+
+        where = self.expression() if self.accept("keyword", "WHERE") else None
+        order: Order = []
+        if self.accept("keyword", "ORDER"):
+            self.expect("keyword", "BY")
+            while True:
+                path = self.path()
+                descending = self.accept("keyword", "DESC")
+                if not descending:
+                    self.accept("keyword", "ASC")
+                order.append((path, descending))
+                if not self.accept("op", ","):
+                    break
+        if self.peek()[0] != "end":
+            raise _bad_request(f"Unexpected {self.peek()[1]!r}")
+        return ParsedQuery(distinct, value, top, select, where, order)
+
+    def path(self) -> Path:
+        if self.expect("name") != self.alias:
+            raise _bad_request(f"Paths must start with {self.alias}")
+        names = []
+        while self.accept("op", "."):
+            kind, _ = self.take()
+            if kind not in ("name", "keyword"):
+                raise _bad_request("Expected a property name")
+            names.append(self.tokens[self.position - 1][2])
+        if not names:
+            raise _bad_request(f"Expected {self.alias}.<property>")
+        return tuple(names)
+
+    def expression(self) -> tuple:
+        terms = [self.conjunction()]
+        while self.accept("keyword", "OR"):
+            terms.append(self.conjunction())
+        return terms[0] if len(terms) == 1 else ("or", terms)
+
+    def conjunction(self) -> tuple:
+        terms = [self.negation()]
+        while self.accept("keyword", "AND"):
+            terms.append(self.negation())
+        return terms[0] if len(terms) == 1 else ("and", terms)
+
+    def negation(self) -> tuple:
+        if self.accept("keyword", "NOT"):
+            return ("not", self.negation())
+        return self.comparison()
+
+    def comparison(self) -> tuple:
+        left = self.operand()
+        kind, op = self.peek()
+        if kind == "op" and op in ("=", "!=", "<>", "<", "<=", ">", ">="):
+            self.position += 1
+            return ("cmp", "!=" if op == "<>" else op, left, self.operand())
+        return left
+
+    def operand(self) -> tuple:
+        kind, value = self.peek()
+        if kind == "op" and value == "(":
+            self.position += 1
+            inner = self.expression()
+            self.expect("op", ")")
+            return inner
+        if kind == "param":
+            self.position += 1
+            return ("param", value)
+        if kind in ("string", "number"):
+            self.position += 1
+            return ("lit", value)
+        if kind == "keyword" and value in ("TRUE", "FALSE", "NULL"):
+            self.position += 1
+            return ("lit", {"TRUE": True, "FALSE": False, "NULL": None}[value])
+        if kind == "name" and value == self.alias:
+            return ("path", self.path())
+        if kind == "name" and self.peek(1) == ("op", "("):
+            name = value.upper()
+            if name not in FUNCTIONS:
+                raise _bad_request(f"Unsupported function {value}")
+            self.position += 2
+            args = []
+            if not self.accept("op", ")"):
+                args.append(self.expression())
+                while self.accept("op", ","):
+                    args.append(self.expression())
+                self.expect("op", ")")
+            return ("call", name, args)
+        raise _bad_request(f"Unexpected {value!r}")
+
+
+def _compare(op: str, left: Any, right: Any) -> Any:
+    # Comparisons across types, or with undefined, are undefined.
+    left_rank, right_rank = _rank(left), _rank(right)
+    if left_rank != right_rank or left_rank == _RANK_UNDEFINED:
+        return _UNDEFINED
+    if op == "=":
+        return left == right
+    if op == "!=":
+        return left != right
+    if left_rank in (_RANK_NULL, _RANK_OTHER):
+        return _UNDEFINED
+    if op == "<":
+        return left < right
+    if op == "<=":
+        return left <= right
+    if op == ">":
+        return left > right
+    return left >= right
+
+
+Compiled = Callable[[Dict[str, Any], Dict[str, Any]], Any]
+
+
+def _compile(node: tuple) -> Compiled:
+    kind = node[0]
+    if kind == "lit":
+        value = node[1]
+        return lambda doc, params: value
+    if kind == "param":
+        name = node[1]
+        return lambda doc, params: params[name]
+    if kind == "path":
+        path = node[1]
+        if len(path) == 1:
+            key = path[0]
+            return lambda doc, params: doc.get(key, _UNDEFINED)
+        return lambda doc, params: _get_path(doc, path)
+    if kind == "call":
+        fn = FUNCTIONS[node[1]]
+        args = [_compile(arg) for arg in node[2]]
+        total = node[1] in _TOTAL_FUNCTIONS
+
+        def call(doc: Dict[str, Any], params: Dict[str, Any]) -> Any:
+            values = [arg(doc, params) for arg in args]
+            if not total and any(value is _UNDEFINED for value in values):
+                return _UNDEFINED
+            try:
+                return fn(*values)
+            except TypeError:
+                raise _bad_request(f"Wrong number of arguments for {node[1]}")
+
+        return call
+    if kind == "cmp":
+        op, left, right = node[1], _compile(node[2]), _compile(node[3])
+        return lambda doc, params: _compare(op, left(doc, params), right(doc, params))
+    if kind == "not":
+        inner = _compile(node[1])
+
+        def negate(doc: Dict[str, Any], params: Dict[str, Any]) -> Any:
+            value = inner(doc, params)
+            return (not value) if isinstance(value, bool) else _UNDEFINED
+
+        return negate
+
+    # AND is false if any term is false, OR is true if any term is true;
+    # otherwise an undefined term makes the result undefined.
+    terms = [_compile(term) for term in node[1]]
+    decisive = kind == "or"
+
+    def combine(doc: Dict[str, Any], params: Dict[str, Any]) -> Any:
+        result: Any = not decisive
+        for term in terms:
+            value = term(doc, params)
+            if value is decisive:
+                return decisive
+            if value is not (not decisive):
+                result = _UNDEFINED
+        return result
+
+    return combine
+
+
+_query_cache: "OrderedDict[str, ParsedQuery]" = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+
+def parse_query(text: str) -> ParsedQuery:
+    with _query_cache_lock:
+        parsed = _query_cache.get(text)
+        if parsed is not None:
+            _query_cache.move_to_end(text)
+            return parsed
+    parsed = _Parser(text).parse()
+    if parsed.where is not None:
+        where = _compile(parsed.where)
+        parsed.predicate = lambda doc, params: where(doc, params) is True
+        parsed.conjuncts = parsed.where[1] if parsed.where[0] == "and" else [parsed.where]
+    with _query_cache_lock:
+        _query_cache[text] = parsed
+        if len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+    return parsed
+
+
+def _params_in(node: Any) -> Iterator[str]:
+    if isinstance(node, tuple) and node:
+        if node[0] == "param":
+            yield node[1]
+            return
+        for child in node[1:]:
+            yield from _params_in(child)
+    elif isinstance(node, list):
+        for child in node:
+            yield from _params_in(child)
+
+
+def _operand_value(node: tuple, params: Dict[str, Any]) -> Any:
+    if node[0] == "lit":
+        return node[1]
+    if node[0] == "param":
+        return params[node[1]]
+    return _UNDEFINED
+
+
+_FLIPPED = {"=": "=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+
+def _bound(node: tuple, params: Dict[str, Any]) -> Optional[Tuple[Path, str, Any]]:
+    # "c.path <op> value" (either side) with a scalar value, else None.
+    if node[0] != "cmp" or node[1] not in _FLIPPED:
+        return None
+    op, left, right = node[1], node[2], node[3]
+    if right[0] == "path" and left[0] in ("lit", "param"):
+        op, left, right = _FLIPPED[op], right, left
+    if left[0] != "path" or right[0] not in ("lit", "param"):
+        return None
+    value = _operand_value(right, params)
+    if _rank(value) not in (_RANK_NULL, _RANK_BOOL, _RANK_NUMBER, _RANK_STRING):
+        return None
+    if op != "=" and _rank(value) not in (_RANK_NUMBER, _RANK_STRING):
+        return None
+    return left[1], op, value
+
+
+def _top(parsed: ParsedQuery, params: Dict[str, Any]) -> Optional[int]:
+    if parsed.top is None:
+        return None
+    if isinstance(parsed.top, tuple):
+        value = params[parsed.top[1]]
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise _bad_request("TOP expects a non-negative integer")
+        return value
+    return parsed.top
+
+
+def _sorted_rows(rows: List[Dict[str, Any]], order: Order) -> List[Dict[str, Any]]:
+    # Stable sorts from the last key to the first give mixed directions.
+    rows = sorted(rows, key=lambda doc: str(doc.get("id")))
+    for path, descending in reversed(order):
+        rows.sort(key=lambda doc: _sort_key(_get_path(doc, path)), reverse=descending)
+    return rows
+
+
+# Patch
+
+
+def apply_patch(doc: Dict[str, Any], operation: Dict[str, Any]) -> None:
+    op = operation.get("op")
+    parts = _pointer(operation.get("path", ""))
+    if not parts:
+        raise _bad_request("Patch paths must not be empty")
+    parent = _get_path(doc, parts[:-1])
+    last = parts[-1]
+    if not isinstance(parent, (dict, list)):
+        raise _bad_request(f"Patch path {operation.get('path')} has no parent")
+
+    if op == "move":
+        source = _pointer(operation.get("from", ""))
+        value = _get_path(doc, source)
+        if not source or value is _UNDEFINED:
+            raise _bad_request(f"Patch source {operation.get('from')} does not exist")
+        del _get_path(doc, source[:-1])[source[-1]]
+        operation = {"op": "set", "path": operation["path"], "value": value}
+        op = "set"
+
+    if isinstance(parent, list):
+        if op == "add" and last == "-":
+            parent.append(_clone(operation["value"]))
+            return
+        if not last.isdigit():
+            raise _bad_request(f"Array index {last!r} is not a number")
+        position = int(last)
+        if op == "add" and position <= len(parent):
+            parent.insert(position, _clone(operation["value"]))
+            return
+        if position >= len(parent):
+            raise _bad_request(f"Array index {position} is out of range")
+        key: Any = position
+    else:
+        key = last
+        if op in ("replace", "remove") and key not in parent:
+            raise _bad_request(f"Patch path {operation['path']} does not exist")
+
+    if op in ("add", "set", "replace"):
+        parent[key] = _clone(operation["value"])
+    elif op == "remove":
+        del parent[key]
+    elif op == "incr":
+        current = parent.get(key, 0) if isinstance(parent, dict) else parent[key]
+        if _rank(current) != _RANK_NUMBER or _rank(operation.get("value")) != _RANK_NUMBER:
+            raise _bad_request("incr needs numbers")
+        parent[key] = current + operation["value"]
+    else:
+        raise _bad_request(f"Unsupported patch operation {op}")
+
+
+# Indexes
+
+
+def _policy_path(path: str) -> Optional[Path]:
+    # "/status/?" -> ("status",); None for wildcards.
+    parts = [part for part in _pointer(path) if part not in ("?", "")]
+    if not parts or "*" in parts:
+        return None
+    return tuple(parts)
+
+
+class SortedIndex:
+    """Entries ((key, ...), id) for one partition, kept sorted with bisect."""
+
+    def __init__(self, paths: Sequence[Path]) -> None:
+        self.paths = tuple(paths)
+        self.entries: List[Tuple[Tuple[Tuple[Any, ...], ...], str]] = []
+
+    def key(self, doc: Dict[str, Any]) -> Tuple[Tuple[Any, ...], ...]:
+        return tuple(_sort_key(_get_path(doc, path)) for path in self.paths)
+
+    def add(self, doc_id: str, doc: Dict[str, Any]) -> None:
+        bisect.insort(self.entries, (self.key(doc), doc_id))
+
+    def remove(self, doc_id: str, doc: Dict[str, Any]) -> None:
+        entry = (self.key(doc), doc_id)
+        index = bisect.bisect_left(self.entries, entry)
+        if index < len(self.entries) and self.entries[index] == entry:
+            del self.entries[index]
+
+    def span(
+        self,
+        prefix: Tuple[Tuple[Any, ...], ...],
+        low: Optional[Tuple[Any, bool]] = None,
+        high: Optional[Tuple[Any, bool]] = None,
+    ) -> Tuple[int, int]:
+        """Entry positions matching equality on the leading paths, then an
+        optional (value, inclusive) range on the next path. Ranges stay
+        within the bound's type, as Cosmos comparisons do."""
+        if low is None and high is None:
+            return (
+                bisect.bisect_left(self.entries, (prefix,)),
+                bisect.bisect_left(self.entries, (prefix + ((_RANK_END,),),)),
+            )
+        rank = _rank((low or high)[0])  # type: ignore[index]
+        if low is None:
+            start_key: Tuple[Any, ...] = (rank,)
+        else:
+            start_key = _sort_key(low[0]) if low[1] else _sort_key(low[0]) + (_RANK_END,)
+        if high is None:
+            end_key: Tuple[Any, ...] = (rank + 1,)
+        else:
+            end_key = _sort_key(high[0]) + (_RANK_END,) if high[1] else _sort_key(high[0])
+        start = bisect.bisect_left(self.entries, (prefix + (start_key,),))
+        end = bisect.bisect_left(self.entries, (prefix + (end_key,),))
+        return start, max(start, end)
+
+
+class Partition:
+    def __init__(self, index_paths: Iterable[Tuple[Path, ...]]) -> None:
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.indexes: Dict[Tuple[Path, ...], SortedIndex] = {}
+        for paths in index_paths:
+            self.add_index(paths)
+
+    def add_index(self, paths: Tuple[Path, ...]) -> None:
+        index = SortedIndex(paths)
+        index.entries = sorted((index.key(doc), doc_id) for doc_id, doc in self.docs.items())
+        self.indexes[paths] = index
+
+    def put(self, doc: Dict[str, Any]) -> None:
+        previous = self.docs.get(doc["id"])
+        for index in self.indexes.values():
+            if previous is not None:
+                index.remove(doc["id"], previous)
+            index.add(doc["id"], doc)
+        self.docs[doc["id"]] = doc
+
+    def remove(self, doc_id: str) -> Dict[str, Any]:
+        doc = self.docs.pop(doc_id)
+        for index in self.indexes.values():
+            index.remove(doc_id, doc)
+        return doc
+
+
+@dataclass
+class _Plan:
+    index: Optional[SortedIndex]
+    start: int
+    end: int
+    # Iterating the index yields ORDER BY order: forwards (False) or reversed (True).
+    reverse: Optional[bool] = None
+
+
+class EmulatedContainer:
+    """In-memory Cosmos container for the SQL subset and operations this app uses.
+
+    Documents live in partitions by the partition key path. Each partition
+    keeps sorted indexes built from the container's indexing policy (the
+    included paths and the composite indexes, minus the partition key).
+    Queries are planned against them: equality on leading index paths, then
+    a range, and ORDER BY with TOP served straight from the index when the
+    order matches. As in the service, ORDER BY on one path needs that path
+    indexed and ORDER BY on several needs a matching composite index.
+    Every operation reports an estimated request charge through
+    response_hook and adds it to request_charge.
+    """
+
+    def __init__(
+        self,
+        id: str,
+        partition_key_path: str = "/userId",
+        indexing_policy: Optional[Dict[str, Any]] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.id = id
+        self.partition_key_path = _policy_path(partition_key_path) or ("id",)
+        self.indexing_policy = indexing_policy or POLICIES.get(id) or _DEFAULT_POLICY
+        self._partitions: Dict[Any, Partition] = {}
+        self._lock = threading.RLock()
+        self._clock = clock
+        self._load_policy()
+        self.request_charge = 0.0
+        self.operations: Dict[str, int] = {}
+        # Every write advances the session token. Reads are always consistent here.
+        self._lsn = 0
+        self.client_connection = SimpleNamespace(last_response_headers={})
+
+    def _load_policy(self) -> None:
+        policy = self.indexing_policy
+        self._index_everything = any(
+            _policy_path(entry["path"]) is None for entry in policy.get("includedPaths", [])
+        )
+        self._index_paths: List[Tuple[Path, ...]] = []
+        for entry in policy.get("includedPaths", []):
+            path = _policy_path(entry["path"])
+            if path and path != self.partition_key_path:
+                self._index_paths.append((path,))
+        self._composites: List[Order] = []
+        for composite in policy.get("compositeIndexes", []):
+            # A partition holds one partition key value, so that prefix is implied.
+            spec = [
+                (_policy_path(part["path"]), part.get("order", "ascending") == "descending") for part in composite
+            ]
+            spec = [(path, descending) for path, descending in spec if path and path != self.partition_key_path]
+            self._composites.append(spec)  # type: ignore[arg-type]
+            paths = tuple(path for path, _ in spec)
+            if len(paths) > 1 and paths not in self._index_paths:
+                self._index_paths.append(paths)  # type: ignore[arg-type]
+
+    # Bookkeeping
+
+    def _partition(self, key: Any, create: bool = False) -> Optional[Partition]:
+        partition = self._partitions.get(key)
+        if partition is None and create:
+            partition = self._partitions[key] = Partition(self._index_paths)
+        return partition
+
+    def _key_of(self, doc: Dict[str, Any]) -> Any:
+        value = _get_path(doc, self.partition_key_path)
+        return None if value is _UNDEFINED else value
+
+    def _charge(self, operation: str, ru: float, kwargs: Dict[str, Any], result: Any, **headers: str) -> None:
+        ru = round(ru, 2)
+        with self._lock:
+            response_headers = {CHARGE_HEADER: str(ru), SESSION_TOKEN_HEADER: f"0:-1#{self._lsn}", **headers}
+            self.request_charge += ru
+            self.operations[operation] = self.operations.get(operation, 0) + 1
+        self.client_connection.last_response_headers = response_headers
+        hook = kwargs.get("response_hook")
+        if hook is not None:
+            hook(response_headers, result)
+
+    def _write_ru(self, doc: Dict[str, Any]) -> float:
+        indexed = len(doc) if self._index_everything else len(self._index_paths) + 1
+        return RU_WRITE_BASE + RU_WRITE_PER_KB * max(0.0, _size_kb(doc) - 1) + RU_WRITE_PER_INDEXED_PATH * indexed
+
+    def _stamp(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        doc["_etag"] = f'"{uuid.uuid4().hex}"'
+        doc["_ts"] = int(self._clock())
+        self._lsn += 1
+        return doc
+
+    def _find(self, item: Any, partition_key: Any) -> Tuple[Partition, Dict[str, Any]]:
+        item_id = item["id"] if isinstance(item, dict) else item
+        partition = self._partition(partition_key)
+        if partition is None or item_id not in partition.docs:
+            raise CosmosResourceNotFoundError(
+                status_code=404, message=f"Entity with the specified id {item_id} does not exist"
+            )
+        return partition, partition.docs[item_id]
+
+    @staticmethod
+    def _check_etag(doc: Dict[str, Any], kwargs: Dict[str, Any]) -> None:
+        # Batch operations carry their condition as if_match_etag instead.
+        if kwargs.get("if_match_etag") is not None and doc.get("_etag") != kwargs["if_match_etag"]:
+            raise CosmosAccessConditionFailedError(status_code=412, message="Precondition failed")
+        etag, condition = kwargs.get("etag"), kwargs.get("match_condition")
+        if etag is None or condition is None:
+            return
+        name = getattr(condition, "name", str(condition))
+        if name == "IfNotModified" and doc.get("_etag") != etag:
+            raise CosmosAccessConditionFailedError(status_code=412, message="Precondition failed")
+        if name == "IfModified" and doc.get("_etag") == etag:
+            raise CosmosHttpResponseError(status_code=304, message="Not modified")
+
+    # Point operations. Each _op runs under the lock and returns (result, RU).
+
+    def _create(self, body: Dict[str, Any], kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        if "id" not in body:
+            raise _bad_request("The input content is invalid because the required property 'id' is missing")
+        partition = self._partition(self._key_of(body), create=True)
+        if body["id"] in partition.docs:  # type: ignore[union-attr]
+            raise CosmosResourceExistsError(status_code=409, message="Entity with the specified id already exists")
+        doc = self._stamp(_clone(body))
+        partition.put(doc)  # type: ignore[union-attr]
+        return _clone(doc), self._write_ru(doc)
+
+    def _upsert(self, body: Dict[str, Any], kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        partition = self._partition(self._key_of(body), create=True)
+        existing = partition.docs.get(body["id"])  # type: ignore[union-attr]
+        if existing is not None:
+            self._check_etag(existing, kwargs)
+        doc = self._stamp(_clone(body))
+        partition.put(doc)  # type: ignore[union-attr]
+        return _clone(doc), self._write_ru(doc)
+
+    def _replace(self, item: Any, body: Dict[str, Any], kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        partition, existing = self._find(item, self._key_of(body))
+        self._check_etag(existing, kwargs)
+        doc = self._stamp(_clone(body))
+        partition.put(doc)
+        return _clone(doc), self._write_ru(doc)
+
+    def _read(self, item: Any, partition_key: Any, kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        _, doc = self._find(item, partition_key)
+        return _clone(doc), RU_READ_PER_KB * max(1, math.ceil(_size_kb(doc)))
+
+    def _delete(self, item: Any, partition_key: Any, kwargs: Dict[str, Any]) -> Tuple[None, float]:
+        partition, doc = self._find(item, partition_key)
+        self._check_etag(doc, kwargs)
+        partition.remove(doc["id"])
+        return None, self._write_ru(doc)
+
+    def _patch(
+        self, item: Any, partition_key: Any, operations: List[Dict[str, Any]], kwargs: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], float]:
+        if not operations or len(operations) > MAX_PATCH_OPERATIONS:
+            raise _bad_request(f"Patch takes 1 to {MAX_PATCH_OPERATIONS} operations")
+        partition, existing = self._find(item, partition_key)
+        self._check_etag(existing, kwargs)
+        condition = kwargs.get("filter_predicate")
+        if condition and not parse_query(f"SELECT * {condition}").predicate(existing, {}):
+            raise CosmosAccessConditionFailedError(status_code=412, message="Precondition failed")
+        doc = _clone(existing)
+        for operation in operations:
+            apply_patch(doc, operation)
+        if doc.get("id") != existing["id"] or self._key_of(doc) != partition_key:
+            raise _bad_request("Patch cannot change the id or the partition key")
+        partition.put(self._stamp(doc))
+        return _clone(doc), self._write_ru(doc)
+
+    def create_item(self, body: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        with self._lock:
+            result, ru = self._create(body, kwargs)
+        self._charge("create", ru, kwargs, result)
+        return result
+
+    def upsert_item(self, body: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        with self._lock:
+            result, ru = self._upsert(body, kwargs)
+        self._charge("upsert", ru, kwargs, result)
+        return result
+
+    def replace_item(self, item: Any, body: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        with self._lock:
+            result, ru = self._replace(item, body, kwargs)
+        self._charge("replace", ru, kwargs, result)
+        return result
+
+    def read_item(self, item: Any, partition_key: Any, **kwargs: Any) -> Dict[str, Any]:
+        with self._lock:
+            result, ru = self._read(item, partition_key, kwargs)
+        self._charge("read", ru, kwargs, result)
+        return result
+
+    def delete_item(self, item: Any, partition_key: Any, **kwargs: Any) -> None:
+        with self._lock:
+            _, ru = self._delete(item, partition_key, kwargs)
+        self._charge("delete", ru, kwargs, None)
+
+    def patch_item(
+        self, item: Any, partition_key: Any, patch_operations: List[Dict[str, Any]], **kwargs: Any
+    ) -> Dict[str, Any]:
+        with self._lock:
+            result, ru = self._patch(item, partition_key, patch_operations, kwargs)
+        self._charge("patch", ru, kwargs, result)
+        return result
+
+    def execute_item_batch(
+        self, batch_operations: Sequence[tuple], partition_key: Any, **kwargs: Any
+    ) -> List[Dict[str, Any]]:
+        """Runs ("create", (body,)), ("replace", (id, body)), ("patch", (id, ops))
+        and the like atomically within one partition: if one fails, none apply."""
+        if not batch_operations or len(batch_operations) > MAX_BATCH_OPERATIONS:
+            raise _bad_request(f"A batch takes 1 to {MAX_BATCH_OPERATIONS} operations")
+        results: List[Dict[str, Any]] = []
+        with self._lock:
+            partition = self._partition(partition_key, create=True)
+            snapshot = dict(partition.docs)  # type: ignore[union-attr]
+            for index, operation in enumerate(batch_operations):
+                kind, args = operation[0], tuple(operation[1]) if len(operation) > 1 else ()
+                options = dict(operation[2]) if len(operation) > 2 else {}
+                try:
+                    body, ru = self._batch_operation(kind, args, options, partition_key)
+                except CosmosHttpResponseError as error:
+                    self._rollback(partition, snapshot)  # type: ignore[arg-type]
+                    results.append({"statusCode": error.status_code, "requestCharge": 0.0})
+                    raise CosmosBatchOperationError(
+                        error_index=index,
+                        headers={},
+                        status_code=error.status_code,
+                        message=f"Batch operation {index} ({kind}) failed: {error.message}",
+                        operation_responses=results,
+                    ) from error
+                status = {"create": 201, "delete": 204}.get(kind, 200)
+                results.append({"statusCode": status, "requestCharge": round(ru, 2), "resourceBody": body})
+        self._charge("batch", sum(result["requestCharge"] for result in results), kwargs, results)
+        return results
+
+    def _batch_operation(
+        self, kind: str, args: tuple, options: Dict[str, Any], partition_key: Any
+    ) -> Tuple[Any, float]:
+        if kind in ("create", "upsert", "replace"):
+            body = args[-1]
+            if self._key_of(body) != partition_key:
+                raise _bad_request("Batch items must share the batch's partition key")
+            if kind == "replace":
+                return self._replace(args[0], body, options)
+            return (self._create if kind == "create" else self._upsert)(body, options)
+        if kind == "read":
+            return self._read(args[0], partition_key, options)
+        if kind == "delete":
+            return self._delete(args[0], partition_key, options)
+        if kind == "patch":
+            return self._patch(args[0], partition_key, args[1], options)
+        raise _bad_request(f"Unknown batch operation {kind}")
+
+    @staticmethod
+    def _rollback(partition: Partition, snapshot: Dict[str, Dict[str, Any]]) -> None:
+        for doc_id in [doc_id for doc_id in partition.docs if doc_id not in snapshot]:
+            partition.remove(doc_id)
+        for doc_id, doc in snapshot.items():
+            if partition.docs.get(doc_id) is not doc:
+                partition.put(doc)
+
+    # Queries
+
+    def query_items(
+        self,
+        query: str,
+        parameters: Optional[List[Dict[str, Any]]] = None,
+        partition_key: Any = None,
+        enable_cross_partition_query: bool = False,
+        **kwargs: Any,
+    ) -> List[Any]:
+        parsed = parse_query(query)
+        params = {param["name"]: param["value"] for param in parameters or []}
+        for name in itertools.chain(_params_in(parsed.where), _params_in(parsed.top)):
+            if name not in params:
+                raise _bad_request(f"Missing parameter {name}")
+        if parsed.order:
+            self._check_order(parsed.order)
+
+        with self._lock:
+            keys = self._target_partitions(parsed, params, partition_key, enable_cross_partition_query)
+            rows: List[Dict[str, Any]] = []
+            visited = loaded = 0
+            for key in keys:
+                partition = self._partitions.get(key)
+                if partition is not None:
+                    matches, part_visited, part_loaded = self._run(partition, parsed, params)
+                    rows.extend(matches)
+                    visited += part_visited
+                    loaded += part_loaded
+            if len(keys) > 1 and parsed.order:
+                rows = _sorted_rows(rows, parsed.order)
+            output = self._shape(parsed, params, rows)
+
+        returned_kb = sum(_size_kb(row) for row in output)
+        ru = (
+            RU_QUERY_BASE
+            + RU_QUERY_PER_INDEX_ENTRY * visited
+            + RU_QUERY_PER_LOADED_DOC * loaded
+            + RU_QUERY_PER_RETURNED_KB * returned_kb
+        )
+        metrics = (
+            f"retrievedDocumentCount={loaded};outputDocumentCount={len(output)};"
+            f"indexLookupCount={visited};indexHitRatio={(len(output) / loaded) if loaded else 1:.2f}"
+        )
+        self._charge("query", ru, kwargs, output, **{QUERY_METRICS_HEADER: metrics})
+        return output
+
+    def read_all_items(self, **kwargs: Any) -> List[Any]:
+        return self.query_items("SELECT * FROM c", enable_cross_partition_query=True, **kwargs)
+
+    def _target_partitions(
+        self, parsed: ParsedQuery, params: Dict[str, Any], partition_key: Any, cross_partition: bool
+    ) -> List[Any]:
+        if partition_key is not None:
+            return [partition_key]
+        for conjunct in parsed.conjuncts:
+            bound = _bound(conjunct, params)
+            if bound and bound[0] == self.partition_key_path and bound[1] == "=":
+                return [bound[2]]
+        if not cross_partition:
+            raise _bad_request("Cross partition query is required but disabled")
+        return list(self._partitions)
+
+    def _check_order(self, order: Order) -> None:
+        wanted = [(path, descending) for path, descending in order if path != self.partition_key_path]
+        if self._index_everything or not wanted:
+            return
+        if len(wanted) == 1:
+            if (wanted[0][0],) not in self._index_paths:
+                raise _bad_request(f"Order-by item requires a range index on /{'/'.join(wanted[0][0])}")
+            return
+        inverted = [(path, not descending) for path, descending in wanted]
+        if not any(composite in (wanted, inverted) for composite in self._composites):
+            raise _bad_request(
+                "The order by query does not have a corresponding composite index that it can be served from"
+            )
+
+    def _ensure_indexes(self, paths: Iterable[Path]) -> None:
+        # With a wildcard policy every path is indexed; build them on first use.
+        for path in paths:
+            if (path,) not in self._index_paths and path != self.partition_key_path:
+                self._index_paths.append((path,))
+                for partition in self._partitions.values():
+                    partition.add_index((path,))
+
+    def _plan(self, partition: Partition, parsed: ParsedQuery, params: Dict[str, Any]) -> _Plan:
+        equal: Dict[Path, Any] = {}
+        ranges: Dict[Path, Dict[str, Tuple[Any, bool]]] = {}
+        for conjunct in parsed.conjuncts:
+            bound = _bound(conjunct, params)
+            if bound is None:
+                continue
+            path, op, value = bound
+            if op == "=":
+                equal.setdefault(path, value)
+            else:
+                side = "low" if op in (">", ">=") else "high"
+                ranges.setdefault(path, {})[side] = (value, op in (">=", "<="))
+
+        order = [(path, descending) for path, descending in parsed.order if path != self.partition_key_path]
+        order_paths = [path for path, _ in order]
+        if self._index_everything:
+            self._ensure_indexes([*equal, *ranges, *order_paths])
+
+        # Cost is the number of documents visited; sorting afterwards costs a bit extra.
+        best = _Plan(None, 0, len(partition.docs))
+        best_cost = len(partition.docs) * (1.1 if order else 1.0)
+        for index in partition.indexes.values():
+            prefix = []
+            for path in index.paths:
+                if path not in equal:
+                    break
+                prefix.append(_sort_key(equal[path]))
+            rest = index.paths[len(prefix):]
+            low = high = None
+            if rest and rest[0] in ranges:
+                low, high = ranges[rest[0]].get("low"), ranges[rest[0]].get("high")
+                if low and high and _rank(low[0]) != _rank(high[0]):
+                    low = high = None
+            reverse = None
+            if order and list(rest[: len(order)]) == order_paths:
+                directions = {descending for _, descending in order}
+                if len(directions) == 1:
+                    reverse = directions.pop()
+            if not prefix and low is None and high is None and reverse is None:
+                continue
+            start, end = index.span(tuple(prefix), low, high)
+            cost = (end - start) * (1.1 if order and reverse is None else 1.0)
+            if reverse is not None and parsed.top is not None:
+                cost = min(cost, float(_top(parsed, params) or 0) + len(prefix))
+            if cost < best_cost:
+                best, best_cost = _Plan(index, start, end, reverse), cost
+        return best
+
+    def _run(
+        self, partition: Partition, parsed: ParsedQuery, params: Dict[str, Any]
+    ) -> Tuple[List[Dict[str, Any]], int, int]:
+        plan = self._plan(partition, parsed, params)
+        if plan.index is None:
+            candidates: Iterable[Dict[str, Any]] = partition.docs.values()
+        else:
+            entries = plan.index.entries[plan.start:plan.end]
+            if plan.reverse:
+                entries.reverse()
+            candidates = (partition.docs[doc_id] for _, doc_id in entries)
+
+        # TOP stops the scan early unless the rows still have to be sorted.
+        top = _top(parsed, params)
+        stop_at = None
+        if top is not None and not parsed.distinct and (not parsed.order or plan.reverse is not None):
+            stop_at = top
+        matches: List[Dict[str, Any]] = []
+        loaded = 0
+        for doc in candidates:
+            if stop_at is not None and len(matches) >= stop_at:
+                break
+            loaded += 1
+            if parsed.predicate(doc, params):
+                matches.append(doc)
+        if parsed.order and plan.reverse is None:
+            matches = _sorted_rows(matches, parsed.order)
+        return matches, loaded if plan.index is not None else 0, loaded
+
+    def _shape(self, parsed: ParsedQuery, params: Dict[str, Any], rows: List[Dict[str, Any]]) -> List[Any]:
+        output: List[Any] = []
+        seen = set()
+        top = _top(parsed, params)
+        for doc in rows:
+            if top is not None and len(output) >= top:
+                break
+            if parsed.select is None:
+                row: Any = doc
+            elif parsed.value:
+                row = _get_path(doc, parsed.select[0])
+                if row is _UNDEFINED:
+                    continue
+            else:
+                row = {}
+                for path in parsed.select:
+                    value = _get_path(doc, path)
+                    if value is not _UNDEFINED:
+                        row[path[-1]] = value
+            if parsed.distinct:
+                marker = json.dumps(row, sort_keys=True)
+                if marker in seen:
+                    continue
+                seen.add(marker)
+            output.append(_clone(row))
+        return output
+
+    # Introspection for tests and benchmarks
+
+    def count(self, partition_key: Any = None) -> int:
+        with self._lock:
+            if partition_key is not None:
+                partition = self._partitions.get(partition_key)
+                return len(partition.docs) if partition else 0
+            return sum(len(partition.docs) for partition in self._partitions.values())
+
+    def reset_charges(self) -> None:
+        with self._lock:
+            self.request_charge = 0.0
+            self.operations = {}
+
+
+class EmulatedDatabase:
+    def __init__(self, id: str) -> None:
+        self.id = id
+        self.containers: Dict[str, EmulatedContainer] = {}
+        self._lock = threading.Lock()
+
+    def get_container_client(self, container: str) -> EmulatedContainer:
+        with self._lock:
+            client = self.containers.get(container)
+            if client is None:
+                client = self.containers[container] = EmulatedContainer(container)
+            return client
+
+    def create_container_if_not_exists(
+        self, id: str, partition_key: Any = None, indexing_policy: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> EmulatedContainer:
+        path = getattr(partition_key, "path", None) or "/userId"
+        with self._lock:
+            client = self.containers.get(id)
+            if client is None:
+                client = self.containers[id] = EmulatedContainer(id, path, indexing_policy)
+            return client
+
+
+class CosmosEmulator:
+    """Stands in for CosmosClient. Databases and containers appear on first use;
+    containers named as in indexing_policy.POLICIES get that policy, others
+    index every path."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.databases: Dict[str, EmulatedDatabase] = {}
+        self._lock = threading.Lock()
+
+    def get_database_client(self, database: str) -> EmulatedDatabase:
+        with self._lock:
+            client = self.databases.get(database)
+            if client is None:
+                client = self.databases[database] = EmulatedDatabase(database)
+            return client
+
+    def create_database_if_not_exists(self, id: str, **kwargs: Any) -> EmulatedDatabase:
+        return self.get_database_client(id)
+
+    def containers(self) -> List[EmulatedContainer]:
+        with self._lock:
+            databases = list(self.databases.values())
+        return [container for database in databases for container in database.containers.values()]
@@ -0,0 +1,191 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Mapping, Optional, Tuple, TypeVar
+
+from azure.cosmos.exceptions import CosmosHttpResponseError
+
+try:
+    from .metrics import MetricsRegistry, metrics as default_metrics
+except ImportError:
+    from metrics import MetricsRegistry, metrics as default_metrics
+
+T = TypeVar("T")
+
+COSMOS_RU_BUDGET = float(os.environ.get("COSMOS_RU_BUDGET", "400"))
+COSMOS_BULK_SHARE = float(os.environ.get("COSMOS_BULK_SHARE", "0.8"))
+COSMOS_MAX_THROTTLE_RETRIES = int(os.environ.get("COSMOS_MAX_THROTTLE_RETRIES", "5"))
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+DEFAULT_RETRY_AFTER_SECONDS = 0.1
+# Smoothing for the per-operation request charge estimate bulk work is paced on.
+CHARGE_SMOOTHING = 0.2
+
+
+def request_charge(headers: Optional[Mapping[str, Any]]) -> float:
+    try:
+        return float((headers or {}).get("x-ms-request-charge") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def throttle_delay(exc: CosmosHttpResponseError) -> float:
+    try:
+        return float(exc.headers.get("x-ms-retry-after-ms")) / 1000
+    except (AttributeError, TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SECONDS
+
+
+class CosmosScheduler:
+    """Paces Cosmos operations against an RU/s budget.
+
+    Every call passes a response hook that records its request charge in a
+    sliding one-second window. Bulk work only starts when the window leaves
+    room within its share of the budget and no interactive call is in flight.
+    Interactive calls never queue behind the budget. Throttled calls of
+    either kind are retried after the delay the server asked for.
+    """
+
+    def __init__(
+        self,
+        ru_per_second: float,
+        bulk_share: float,
+        max_retries: int,
+        metrics: MetricsRegistry = default_metrics,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        window_seconds: float = 1.0,
+    ) -> None:
+        self.ru_per_second = ru_per_second
+        self.bulk_share = bulk_share
+        self.max_retries = max_retries
+        self.window_seconds = window_seconds
+        self._metrics = metrics
+        self._clock = clock
+        self._sleep = sleep
+        self._cond = threading.Condition()
+        self._window: Deque[Tuple[float, float]] = deque()
+        self._spent = 0.0
+        self._estimates: Dict[str, float] = {}
+        self._interactive_active = 0
+        self._throttled_until = 0.0
+
+    def _trim(self, now: float) -> None:
+        while self._window and self._window[0][0] <= now - self.window_seconds:
+            self._spent -= self._window.popleft()[1]
+        if not self._window:
+            self._spent = 0.0
+
+    def _record(self, kind: str, charge: float) -> None:
+        with self._cond:
+            now = self._clock()
+            self._trim(now)
+            self._window.append((now, charge))
+            self._spent += charge
+            previous = self._estimates.get(kind)
+            self._estimates[kind] = (
+                charge if previous is None else previous + CHARGE_SMOOTHING * (charge - previous)
+            )
+            self._cond.notify_all()
+        self._metrics.incr("cosmos.ru_consumed", charge)
+        self._metrics.set_gauge("cosmos.ru_last_second", self._spent)
+
+    def spent_in_window(self) -> float:
+        with self._cond:
+            self._trim(self._clock())
+            return self._spent
+
+    def _wait_for_bulk_slot(self, kind: str) -> None:
+        started = self._clock()
+        with self._cond:
+            while True:
+                now = self._clock()
+                self._trim(now)
+                estimate = self._estimates.get(kind, 1.0)
+                budget = self.ru_per_second * self.window_seconds * self.bulk_share
+                if self._throttled_until > now:
+                    wait = self._throttled_until - now
+                elif self._interactive_active:
+                    wait = self.window_seconds  # woken as soon as the interactive call finishes
+                elif self._window and self._spent + estimate > budget:
+                    wait = self._window[0][0] + self.window_seconds - now
+                else:
+                    break
+                self._cond.wait(wait)
+        self._metrics.observe("cosmos.bulk_wait_ms", (self._clock() - started) * 1000)
+
+    def _on_throttled(self, delay: float) -> None:
+        with self._cond:
+            self._throttled_until = max(self._throttled_until, self._clock() + delay)
+        self._metrics.incr("cosmos.throttles")
+
+    def run(self, fn: Callable[..., T], *args: Any, priority: str = INTERACTIVE, **kwargs: Any) -> T:
+        kind = getattr(fn, "__name__", "operation")
+        # A caller's own hook still sees every response.
+        caller_hook = kwargs.pop("response_hook", None)
+        interactive = priority == INTERACTIVE
+        if interactive:
+            with self._cond:
+                self._interactive_active += 1
+        try:
+            attempt = 0
+            while True:
+                if not interactive:
+                    self._wait_for_bulk_slot(kind)
+
+                charges: list[float] = []
+
+                def response_hook(headers: Any, *rest: Any) -> None:
+                    charges.append(request_charge(headers))
+                    if caller_hook is not None:
+                        caller_hook(headers, *rest)
+
+                try:
+                    return fn(*args, response_hook=response_hook, **kwargs)
+                except CosmosHttpResponseError as exc:
+                    if exc.status_code != 429 or attempt >= self.max_retries:
+                        raise
+                    delay = throttle_delay(exc)
+                    self._on_throttled(delay)
+                    logging.warning(
+                        "Cosmos %s throttled (%s), retry %d in %.2fs", kind, priority, attempt + 1, delay
+                    )
+                    if interactive:
+                        self._sleep(delay)
+                    attempt += 1
+                finally:
+                    if charges:
+                        self._record(kind, sum(charges))
+        finally:
+            if interactive:
+                with self._cond:
+                    self._interactive_active -= 1
+                    self._cond.notify_all()
+
+    def run_query(
+        self, fn: Callable[..., Iterable[T]], *args: Any, priority: str = INTERACTIVE, **kwargs: Any
+    ) -> List[T]:
+        """run() for query_items and read_all_items.
+
+        Those return lazy pagers that only fetch, and report each page's
+        charge, while they are iterated. Draining them inside run() counts
+        every page against the window and retries the query when a page is
+        throttled.
+        """
+
+        def fetch_all(*call_args: Any, **call_kwargs: Any) -> List[T]:
+            return list(fn(*call_args, **call_kwargs))
+
+        fetch_all.__name__ = getattr(fn, "__name__", "query")
+        return self.run(fetch_all, *args, priority=priority, **kwargs)
+
+
+cosmos_scheduler = CosmosScheduler(
+    ru_per_second=COSMOS_RU_BUDGET,
+    bulk_share=COSMOS_BULK_SHARE,
+    max_retries=COSMOS_MAX_THROTTLE_RETRIES,
+)
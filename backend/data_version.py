@@ -0,0 +1,122 @@
+import logging
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+
+from azure.cosmos.exceptions import (
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+try:
+    from .cosmos_scheduler import BULK, cosmos_scheduler
+    from .etags import EVENTS_SCOPE, TASKS_SCOPE
+    from .http_pools import get_cosmos_client
+    from .session_tokens import SessionContainer
+except ImportError:
+    from cosmos_scheduler import BULK, cosmos_scheduler
+    from etags import EVENTS_SCOPE, TASKS_SCOPE
+    from http_pools import get_cosmos_client
+    from session_tokens import SessionContainer
+
+COSMOS_ENDPOINT = os.environ["COSMOSDB_ENDPOINT"]
+COSMOS_KEY = os.environ["COSMOSDB_KEY"]
+COSMOS_DB_NAME = os.environ["COSMOSDB_DATABASE"]
+COSMOS_META_CONTAINER = os.environ.get("COSMOSDB_META_CONTAINER", "meta")
+
+# One document per user (partition key /userId) holding a write counter per scope.
+# The nonce changes whenever the document is recreated, so counters that restart
+# from zero never reproduce an ETag that was handed out earlier.
+VERSION_DOC_ID = "data-version"
+
+_client = get_cosmos_client(COSMOS_ENDPOINT, COSMOS_KEY)
+_db = _client.get_database_client(COSMOS_DB_NAME)
+# Version reads must see the request's own bumps, or ETags would go stale.
+_meta_container = SessionContainer(_db.get_container_client(COSMOS_META_CONTAINER))
+
+
+def read_data_version(user_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        return _meta_container.read_item(VERSION_DOC_ID, partition_key=user_id)
+    except CosmosResourceNotFoundError:
+        return None
+    except CosmosHttpResponseError:
+        logging.warning("Could not read data version for user %s", user_id, exc_info=True)
+        return None
+
+
+def _new_version_doc(user_id: str) -> Dict[str, Any]:
+    return {
+        "id": VERSION_DOC_ID,
+        "userId": user_id,
+        "nonce": uuid.uuid4().hex,
+        TASKS_SCOPE: 0,
+        EVENTS_SCOPE: 0,
+    }
+
+
+def _increment(user_id: str, scope: str) -> None:
+    operations = [{"op": "incr", "path": f"/{scope}", "value": 1}]
+    try:
+        cosmos_scheduler.run(
+            _meta_container.patch_item,
+            item=VERSION_DOC_ID,
+            partition_key=user_id,
+            patch_operations=operations,
+        )
+        return
+    except CosmosResourceNotFoundError:
+        pass
+
+    doc = _new_version_doc(user_id)
+    doc[scope] = 1
+    try:
+        cosmos_scheduler.run(_meta_container.create_item, doc)
+    except CosmosResourceExistsError:
+        # Another instance created the document first; count our write on top of it.
+        cosmos_scheduler.run(
+            _meta_container.patch_item,
+            item=VERSION_DOC_ID,
+            partition_key=user_id,
+            patch_operations=operations,
+        )
+
+
+def bump_data_version(user_id: str, scope: str) -> None:
+    """Counts a write in scope; raises if cached ETags could not be invalidated.
+
+    Throttling is retried by the scheduler. When the increment still fails,
+    the document is replaced with a fresh nonce instead, which changes every
+    ETag of the user at the cost of one extra full reload.
+    """
+    try:
+        _increment(user_id, scope)
+        return
+    except CosmosHttpResponseError:
+        logging.warning("Could not bump %s data version for user %s; resetting it", scope, user_id, exc_info=True)
+
+    try:
+        cosmos_scheduler.run(_meta_container.upsert_item, _new_version_doc(user_id))
+    except CosmosHttpResponseError:
+        logging.exception("Could not reset data version for user %s", user_id)
+        raise
+
+
+def recent_user_ids(since_epoch: float, limit: int) -> List[str]:
+    """Users whose meta documents (data version, task stats, usage) changed
+    since since_epoch, most recently active first."""
+    rows = cosmos_scheduler.run_query(
+        _meta_container.query_items,
+        "SELECT c.userId, c._ts FROM c WHERE c._ts >= @since",
+        parameters=[{"name": "@since", "value": int(since_epoch)}],
+        enable_cross_partition_query=True,
+        priority=BULK,
+    )
+    latest: Dict[str, int] = {}
+    for row in rows:
+        user_id = row.get("userId")
+        if user_id:
+            latest[user_id] = max(latest.get(user_id, 0), row.get("_ts") or 0)
+    return sorted(latest, key=lambda user_id: latest[user_id], reverse=True)[:limit]
+
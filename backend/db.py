@@ -1,31 +1,97 @@
+import logging
 import os
+import sys
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional
 
-from azure.cosmos import CosmosClient
+from azure.cosmos.exceptions import CosmosBatchOperationError, CosmosHttpResponseError, CosmosResourceNotFoundError
+
+try:
+    from .cosmos_scheduler import BULK, cosmos_scheduler
+    from .data_version import bump_data_version
+    from .etags import TASKS_SCOPE
+    from .http_pools import get_cosmos_client
+    from .projection import Fields, project, project_all, select_clause, strip_system_fields, with_fields
+    from .query_log import slow_query_log
+    from .session_tokens import SessionContainer
+    from .task_stats import (
+        STATS_DOC_ID,
+        STATS_FIELDS,
+        patch_operations,
+        remove_operations,
+        stats_delta,
+        stats_from_tasks,
+        zero_counter_paths,
+    )
+    from .timeutils import get_helsinki_tz, normalize_iso
+except ImportError:
+    from cosmos_scheduler import BULK, cosmos_scheduler
+    from data_version import bump_data_version
+    from etags import TASKS_SCOPE
+    from http_pools import get_cosmos_client
+    from projection import Fields, project, project_all, select_clause, strip_system_fields, with_fields
+    from query_log import slow_query_log
+    from session_tokens import SessionContainer
+    from task_stats import (
+        STATS_DOC_ID,
+        STATS_FIELDS,
+        patch_operations,
+        remove_operations,
+        stats_delta,
+        stats_from_tasks,
+        zero_counter_paths,
+    )
+    from timeutils import get_helsinki_tz, normalize_iso
 
 COSMOS_ENDPOINT = os.environ["COSMOSDB_ENDPOINT"]
 COSMOS_KEY = os.environ["COSMOSDB_KEY"]
 COSMOS_DB_NAME = os.environ["COSMOSDB_DATABASE"]
 COSMOS_TASKS_CONTAINER = os.environ["COSMOSDB_TASKS_CONTAINER"]
+COSMOS_META_CONTAINER = os.environ.get("COSMOSDB_META_CONTAINER", "meta")
+# Cosmos accepts at most 100 operations in one transactional batch.
+STATS_BATCH_SIZE = 100
 
-_client = CosmosClient(COSMOS_ENDPOINT, credential=COSMOS_KEY)
+_client = get_cosmos_client(COSMOS_ENDPOINT, COSMOS_KEY)
 _db = _client.get_database_client(COSMOS_DB_NAME)
-_tasks_container = _db.get_container_client(COSMOS_TASKS_CONTAINER)
+# Reads follow the request's session tokens; see session_tokens.py.
+_tasks_container = SessionContainer(_db.get_container_client(COSMOS_TASKS_CONTAINER))
+_meta_container = SessionContainer(_db.get_container_client(COSMOS_META_CONTAINER))
+
+
+def _set_due_date(task: Dict[str, Any], due_date: str | None) -> None:
+    if due_date:
+        task["dueDate"], task["dueEpoch"] = normalize_iso(due_date, get_helsinki_tz())
+    else:
+        task["dueDate"] = None
+        task["dueEpoch"] = None
+
 
+def _query(query: str, params: List[Dict[str, Any]], fields: Fields) -> List[Dict[str, Any]]:
+    # Named after the public function that issued the query, for the slow log.
+    caller = sys._getframe(1).f_code.co_name
+    items = slow_query_log.run(
+        _tasks_container, query, params, caller=caller, enable_cross_partition_query=False
+    )
+    return project_all(items, fields)
 
-def list_tasks(user_id: str) -> List[Dict[str, Any]]:
-    query = "SELECT * FROM c WHERE c.userId = @userId ORDER BY c.createdAt DESC"
+
+def list_tasks(user_id: str, fields: Fields = None) -> List[Dict[str, Any]]:
+    query = f"{select_clause(fields)} WHERE c.userId = @userId ORDER BY c.createdAt DESC"
     params = [{"name": "@userId", "value": user_id}]
-    items = list(
-        _tasks_container.query_items(
-            query=query,
-            parameters=params,
-            enable_cross_partition_query=False,
-        )
+    return _query(query, params, fields)
+
+
+def list_tasks_by_status(user_id: str, status: str, fields: Fields = None) -> List[Dict[str, Any]]:
+    query = (
+        f"{select_clause(fields)} WHERE c.userId = @userId AND c.status = @status "
+        "ORDER BY c.createdAt DESC"
     )
-    return items
+    params = [
+        {"name": "@userId", "value": user_id},
+        {"name": "@status", "value": status},
+    ]
+    return _query(query, params, fields)
 
 
 def create_task(
@@ -43,49 +109,62 @@ def create_task(
         "list": list_name,
         "status": "open",
         "createdAt": now_iso,
-        "dueDate": due_date,
     }
+    _set_due_date(task, due_date)
 
-    _tasks_container.create_item(task)
+    cosmos_scheduler.run(_tasks_container.create_item, task)
+    bump_data_version(user_id, TASKS_SCOPE)
+    _update_task_stats(user_id, added=[task])
     return task
 
 
 def delete_task(user_id: str, task_id: str) -> None:
-    _tasks_container.delete_item(task_id, partition_key=user_id)
+    # Deletes return no body, so read what the stats need first.
+    item = cosmos_scheduler.run(_tasks_container.read_item, task_id, partition_key=user_id)
+    cosmos_scheduler.run(_tasks_container.delete_item, task_id, partition_key=user_id)
+    bump_data_version(user_id, TASKS_SCOPE)
+    _update_task_stats(user_id, removed=[item])
 
 
-def delete_tasks_for_user(user_id: str, list_name: str | None = None) -> List[Dict[str, Any]]:
+def delete_tasks_for_user(
+    user_id: str, list_name: str | None = None, fields: Fields = None
+) -> List[Dict[str, Any]]:
+    select = select_clause(with_fields(fields, "id"))
     if list_name:
-        query = (
-            "SELECT * FROM c WHERE c.userId = @userId AND c.list = @list ORDER BY c.createdAt DESC"
-        )
+        query = f"{select} WHERE c.userId = @userId AND c.list = @list ORDER BY c.createdAt DESC"
         params = [
             {"name": "@userId", "value": user_id},
             {"name": "@list", "value": list_name},
         ]
     else:
-        query = "SELECT * FROM c WHERE c.userId = @userId ORDER BY c.createdAt DESC"
+        query = f"{select} WHERE c.userId = @userId ORDER BY c.createdAt DESC"
         params = [{"name": "@userId", "value": user_id}]
 
-    items = list(
-        _tasks_container.query_items(
-            query=query,
-            parameters=params,
-            enable_cross_partition_query=False,
-        )
-    )
+    items = _query(query, params, with_fields(fields, *STATS_FIELDS))
 
-    for task in items:
-        _tasks_container.delete_item(task["id"], partition_key=user_id)
+    deleted: List[Dict[str, Any]] = []
+    try:
+        for task in items:
+            cosmos_scheduler.run(
+                _tasks_container.delete_item, task["id"], partition_key=user_id, priority=BULK
+            )
+            deleted.append(task)
+    finally:
+        if items:
+            bump_data_version(user_id, TASKS_SCOPE)
+        _update_task_stats(user_id, removed=deleted)
 
-    return items
+    return [project(task, fields) for task in items]
 
 
 def update_task(user_id: str, task_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
     if not updates:
-        return _tasks_container.read_item(task_id, partition_key=user_id)
+        return strip_system_fields(
+            cosmos_scheduler.run(_tasks_container.read_item, task_id, partition_key=user_id)
+        )
 
-    item = _tasks_container.read_item(task_id, partition_key=user_id)
+    item = cosmos_scheduler.run(_tasks_container.read_item, task_id, partition_key=user_id)
+    before = {key: item.get(key) for key in STATS_FIELDS}
 
     for key in ["title", "list", "status"]:
         if key in updates and updates[key] is not None:
@@ -94,27 +173,125 @@ def update_task(user_id: str, task_id: str, updates: Dict[str, Any]) -> Dict[str
     if "dueDate" in updates:
         if updates["dueDate"] is None:
             item.pop("dueDate", None)
+            item.pop("dueEpoch", None)
         else:
-            item["dueDate"] = updates["dueDate"]
+            _set_due_date(item, updates["dueDate"])
 
-    _tasks_container.replace_item(task_id, item)
-    return item
+    cosmos_scheduler.run(_tasks_container.replace_item, task_id, item)
+    bump_data_version(user_id, TASKS_SCOPE)
+    _update_task_stats(user_id, removed=[before], added=[item])
+    return strip_system_fields(item)
 
 
-def find_tasks_by_title(user_id: str, title: str) -> List[Dict[str, Any]]:
+def find_tasks_by_title(user_id: str, title: str, fields: Fields = None) -> List[Dict[str, Any]]:
     query = (
-        "SELECT * FROM c WHERE c.userId = @userId AND LOWER(c.title) = @title "
+        f"{select_clause(fields)} WHERE c.userId = @userId AND LOWER(c.title) = @title "
         "ORDER BY c.createdAt DESC"
     )
     params = [
         {"name": "@userId", "value": user_id},
         {"name": "@title", "value": title.lower()},
     ]
-    items = list(
-        _tasks_container.query_items(
-            query=query,
-            parameters=params,
-            enable_cross_partition_query=False,
-        )
+    return _query(query, params, fields)
+
+
+def backfill_due_epochs() -> int:
+    query = (
+        "SELECT * FROM c WHERE IS_DEFINED(c.dueDate) AND NOT IS_NULL(c.dueDate) "
+        "AND NOT IS_DEFINED(c.dueEpoch)"
+    )
+    items = cosmos_scheduler.run_query(
+        _tasks_container.query_items,
+        query=query,
+        parameters=[],
+        enable_cross_partition_query=True,
+        priority=BULK,
+    )
+
+    touched_users: set[str] = set()
+    for item in items:
+        try:
+            _set_due_date(item, item.get("dueDate"))
+        except ValueError:
+            logging.warning("Skipping task %s with unparseable dueDate", item.get("id"))
+            continue
+        cosmos_scheduler.run(_tasks_container.replace_item, item["id"], item, priority=BULK)
+        touched_users.add(item["userId"])
+
+    for user_id in touched_users:
+        bump_data_version(user_id, TASKS_SCOPE)
+        repair_task_stats(user_id)
+    return sum(1 for item in items if "dueEpoch" in item)
+
+
+def _update_task_stats(
+    user_id: str,
+    removed: Iterable[Dict[str, Any]] = (),
+    added: Iterable[Dict[str, Any]] = (),
+) -> None:
+    # Increments run server-side, so concurrent writers never lose an update.
+    # All patches of one delta go in a transactional batch, so the counters
+    # move together or not at all. The task write has already succeeded; if
+    # the batch fails the document is rebuilt from the tasks instead.
+    delta = stats_delta(removed=removed, added=added)
+    if not delta:
+        return
+    patches = [("patch", (STATS_DOC_ID, operations)) for operations in patch_operations(delta)]
+    try:
+        for start in range(0, len(patches), STATS_BATCH_SIZE):
+            results = cosmos_scheduler.run(
+                _meta_container.execute_item_batch,
+                patches[start:start + STATS_BATCH_SIZE],
+                partition_key=user_id,
+            )
+    except (CosmosBatchOperationError, CosmosHttpResponseError) as error:
+        # A 404 only means the document was never built; anything else may
+        # have left it behind, so it is rebuilt either way.
+        if error.status_code != 404:
+            logging.warning("Could not update task stats for user %s; rebuilding them", user_id, exc_info=True)
+        try:
+            repair_task_stats(user_id)
+        except CosmosHttpResponseError:
+            logging.exception("Could not repair task stats for user %s", user_id)
+        return
+    _prune_zero_counters(user_id, results[-1].get("resourceBody"), delta)
+
+
+def _prune_zero_counters(user_id: str, doc: Optional[Dict[str, Any]], delta: Dict[str, int]) -> None:
+    # Without this every due second ever used would keep a key. The removal
+    # only applies if the document is still the one just patched; otherwise
+    # another writer got in between and a later write prunes instead.
+    zero = zero_counter_paths(doc, delta)
+    if not doc or not zero:
+        return
+    batches = remove_operations(zero)[:STATS_BATCH_SIZE]
+    operations = [("patch", (STATS_DOC_ID, batches[0]), {"if_match_etag": doc.get("_etag")})]
+    operations += [("patch", (STATS_DOC_ID, batch)) for batch in batches[1:]]
+    try:
+        cosmos_scheduler.run(_meta_container.execute_item_batch, operations, partition_key=user_id)
+    except (CosmosBatchOperationError, CosmosHttpResponseError):
+        logging.info("Skipped pruning task stats for user %s", user_id, exc_info=True)
+
+
+def read_task_stats(user_id: str) -> Dict[str, Any]:
+    try:
+        doc = cosmos_scheduler.run(_meta_container.read_item, STATS_DOC_ID, partition_key=user_id)
+    except CosmosResourceNotFoundError:
+        return repair_task_stats(user_id)
+    return strip_system_fields(doc)
+
+
+def repair_task_stats(user_id: str) -> Dict[str, Any]:
+    doc = stats_from_tasks(user_id, list_tasks(user_id, fields=STATS_FIELDS))
+    cosmos_scheduler.run(_meta_container.upsert_item, doc, priority=BULK)
+    return doc
+
+
+def list_task_user_ids() -> List[str]:
+    return cosmos_scheduler.run_query(
+        _tasks_container.query_items,
+        query="SELECT DISTINCT VALUE c.userId FROM c",
+        parameters=[],
+        enable_cross_partition_query=True,
+        priority=BULK,
     )
-    return items
@@ -1,54 +1,105 @@
+import logging
 import os
+import sys
 import uuid
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 
-from azure.cosmos import CosmosClient
+
+try:
+    from .cosmos_scheduler import BULK, cosmos_scheduler
+    from .data_version import bump_data_version
+    from .etags import EVENTS_SCOPE
+    from .http_pools import get_cosmos_client
+    from .projection import Fields, project, project_all, select_clause, strip_system_fields, with_fields
+    from .query_log import slow_query_log
+    from .session_tokens import SessionContainer
+    from .timeutils import get_helsinki_tz, normalize_iso
+except ImportError:
+    from cosmos_scheduler import BULK, cosmos_scheduler
+    from data_version import bump_data_version
+    from etags import EVENTS_SCOPE
+    from http_pools import get_cosmos_client
+    from projection import Fields, project, project_all, select_clause, strip_system_fields, with_fields
+    from query_log import slow_query_log
+    from session_tokens import SessionContainer
+    from timeutils import get_helsinki_tz, normalize_iso
 
 COSMOS_ENDPOINT = os.environ["COSMOSDB_ENDPOINT"]
 COSMOS_KEY = os.environ["COSMOSDB_KEY"]
 COSMOS_DB_NAME = os.environ["COSMOSDB_DATABASE"]
 COSMOS_EVENTS_CONTAINER = "events"
 
-_client = CosmosClient(COSMOS_ENDPOINT, credential=COSMOS_KEY)
+_client = get_cosmos_client(COSMOS_ENDPOINT, COSMOS_KEY)
 _db = _client.get_database_client(COSMOS_DB_NAME)
-_events_container = _db.get_container_client(COSMOS_EVENTS_CONTAINER)
+_events_container = SessionContainer(_db.get_container_client(COSMOS_EVENTS_CONTAINER))
+
+
+def _query_epoch(value: str) -> int:
+    return normalize_iso(value, get_helsinki_tz())[1]
+
+
+def _set_event_times(event: Dict[str, Any], start_iso: str, end_iso: str) -> None:
+    tz = get_helsinki_tz()
+    event["start"], event["startEpoch"] = normalize_iso(start_iso, tz)
+    event["end"], event["endEpoch"] = normalize_iso(end_iso, tz)
+
+
+def _query(query: str, params: List[Dict[str, Any]], fields: Fields) -> List[Dict[str, Any]]:
+    # Named after the public function that issued the query, for the slow log.
+    caller = sys._getframe(1).f_code.co_name
+    items = slow_query_log.run(
+        _events_container, query, params, caller=caller, enable_cross_partition_query=False
+    )
+    return project_all(items, fields)
 
 
 def list_events(
     user_id: str,
     start_iso: Optional[str] = None,
     end_iso: Optional[str] = None,
+    fields: Fields = None,
 ) -> List[Dict[str, Any]]:
     if start_iso and end_iso:
         query = (
-            "SELECT * FROM c "
+            f"{select_clause(fields)} "
             "WHERE c.userId = @userId "
-            "AND c.start >= @start "
-            "AND c.start < @end "
-            "ORDER BY c.start ASC"
+            "AND c.startEpoch >= @startEpoch "
+            "AND c.startEpoch < @endEpoch "
+            "ORDER BY c.startEpoch ASC"
         )
         params = [
             {"name": "@userId", "value": user_id},
-            {"name": "@start", "value": start_iso},
-            {"name": "@end", "value": end_iso},
+            {"name": "@startEpoch", "value": _query_epoch(start_iso)},
+            {"name": "@endEpoch", "value": _query_epoch(end_iso)},
         ]
     else:
         query = (
-            "SELECT * FROM c "
+            f"{select_clause(fields)} "
             "WHERE c.userId = @userId "
             "ORDER BY c.start ASC"
         )
         params = [{"name": "@userId", "value": user_id}]
 
-    items = list(
-        _events_container.query_items(
-            query=query,
-            parameters=params,
-            enable_cross_partition_query=False,
-        )
+    return _query(query, params, fields)
+
+
+def list_events_overlapping(
+    user_id: str, start_iso: str, end_iso: str, fields: Fields = None
+) -> List[Dict[str, Any]]:
+    query = (
+        f"{select_clause(fields)} "
+        "WHERE c.userId = @userId "
+        "AND c.startEpoch < @rangeEndEpoch "
+        "AND c.endEpoch > @rangeStartEpoch "
+        "ORDER BY c.startEpoch ASC"
     )
-    return items
+    params = [
+        {"name": "@userId", "value": user_id},
+        {"name": "@rangeStartEpoch", "value": _query_epoch(start_iso)},
+        {"name": "@rangeEndEpoch", "value": _query_epoch(end_iso)},
+    ]
+    return _query(query, params, fields)
 
 
 def create_event(
@@ -69,22 +120,26 @@ def create_event(
         "list": list_name,
         "createdAt": now_iso,
     }
+    _set_event_times(event, start_iso, end_iso)
 
-    _events_container.create_item(event)
+    cosmos_scheduler.run(_events_container.create_item, event)
+    bump_data_version(user_id, EVENTS_SCOPE)
     return event
 
 
 def delete_event(user_id: str, event_id: str) -> None:
-    _events_container.delete_item(event_id, partition_key=user_id)
+    cosmos_scheduler.run(_events_container.delete_item, event_id, partition_key=user_id)
+    bump_data_version(user_id, EVENTS_SCOPE)
 
 
-def find_events_by_title(user_id: str, title: str) -> List[Dict[str, Any]]:
+def find_events_by_title(user_id: str, title: str, fields: Fields = None) -> List[Dict[str, Any]]:
     normalized = title.strip().lower()
     if not normalized:
         return []
 
+    select = select_clause(fields)
     exact_query = (
-        "SELECT * FROM c WHERE c.userId = @userId AND LOWER(c.title) = @title "
+        f"{select} WHERE c.userId = @userId AND LOWER(c.title) = @title "
         "ORDER BY c.start DESC"
     )
     params = [
@@ -92,18 +147,12 @@ def find_events_by_title(user_id: str, title: str) -> List[Dict[str, Any]]:
         {"name": "@title", "value": normalized},
     ]
 
-    items = list(
-        _events_container.query_items(
-            query=exact_query,
-            parameters=params,
-            enable_cross_partition_query=False,
-        )
-    )
+    items = _query(exact_query, params, fields)
     if items:
         return items
 
     partial_query = (
-        "SELECT * FROM c WHERE c.userId = @userId AND CONTAINS(LOWER(c.title), @title) "
+        f"{select} WHERE c.userId = @userId AND CONTAINS(LOWER(c.title), @title) "
         "ORDER BY c.start DESC"
     )
     partial_params = [
@@ -111,32 +160,64 @@ def find_events_by_title(user_id: str, title: str) -> List[Dict[str, Any]]:
         {"name": "@title", "value": normalized},
     ]
 
-    items = list(
-        _events_container.query_items(
-            query=partial_query,
-            parameters=partial_params,
-            enable_cross_partition_query=False,
-        )
-    )
-    return items
+    return _query(partial_query, partial_params, fields)
 
 
 def update_event(user_id: str, event_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
     if not updates:
-        return _events_container.read_item(event_id, partition_key=user_id)
+        return strip_system_fields(
+            cosmos_scheduler.run(_events_container.read_item, event_id, partition_key=user_id)
+        )
 
-    item = _events_container.read_item(event_id, partition_key=user_id)
+    item = cosmos_scheduler.run(_events_container.read_item, event_id, partition_key=user_id)
 
     for key in ["title", "start", "end", "list"]:
         if key in updates and updates[key] is not None:
             item[key] = updates[key]
+    _set_event_times(item, item["start"], item["end"])
+
+    cosmos_scheduler.run(_events_container.replace_item, event_id, item)
+    bump_data_version(user_id, EVENTS_SCOPE)
+    return strip_system_fields(item)
 
-    _events_container.replace_item(event_id, item)
-    return item
 
+def delete_events_in_range(
+    user_id: str, start_iso: str, end_iso: str, fields: Fields = None
+) -> List[Dict[str, Any]]:
+    to_delete = list_events(
+        user_id=user_id, start_iso=start_iso, end_iso=end_iso, fields=with_fields(fields, "id")
+    )
+    try:
+        for event in to_delete:
+            cosmos_scheduler.run(
+                _events_container.delete_item, event["id"], partition_key=user_id, priority=BULK
+            )
+    finally:
+        if to_delete:
+            bump_data_version(user_id, EVENTS_SCOPE)
+    return [project(event, fields) for event in to_delete]
+
+
+def backfill_event_epochs() -> int:
+    query = "SELECT * FROM c WHERE NOT IS_DEFINED(c.startEpoch) OR NOT IS_DEFINED(c.endEpoch)"
+    items = cosmos_scheduler.run_query(
+        _events_container.query_items,
+        query=query,
+        parameters=[],
+        enable_cross_partition_query=True,
+        priority=BULK,
+    )
 
-def delete_events_in_range(user_id: str, start_iso: str, end_iso: str) -> List[Dict[str, Any]]:
-    to_delete = list_events(user_id=user_id, start_iso=start_iso, end_iso=end_iso)
-    for event in to_delete:
-        _events_container.delete_item(event["id"], partition_key=user_id)
-    return to_delete
+    touched_users: set[str] = set()
+    for item in items:
+        try:
+            _set_event_times(item, item.get("start"), item.get("end") or item.get("start"))
+        except ValueError:
+            logging.warning("Skipping event %s with unparseable times", item.get("id"))
+            continue
+        cosmos_scheduler.run(_events_container.replace_item, item["id"], item, priority=BULK)
+        touched_users.add(item["userId"])
+
+    for user_id in touched_users:
+        bump_data_version(user_id, EVENTS_SCOPE)
+    return sum(1 for item in items if "startEpoch" in item)
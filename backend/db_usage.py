@@ -0,0 +1,72 @@
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from azure.cosmos.exceptions import (
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+try:
+    from .cosmos_scheduler import BULK, cosmos_scheduler
+    from .http_pools import get_cosmos_client
+    from .session_tokens import SessionContainer
+except ImportError:
+    from cosmos_scheduler import BULK, cosmos_scheduler
+    from http_pools import get_cosmos_client
+    from session_tokens import SessionContainer
+
+COSMOS_ENDPOINT = os.environ["COSMOSDB_ENDPOINT"]
+COSMOS_KEY = os.environ["COSMOSDB_KEY"]
+COSMOS_DB_NAME = os.environ["COSMOSDB_DATABASE"]
+COSMOS_META_CONTAINER = os.environ.get("COSMOSDB_META_CONTAINER", "meta")
+
+# One document per user and UTC day in the meta container, next to the data
+# version and task stats. Instances add their totals with server-side increments.
+USAGE_DOC_PREFIX = "usage-"
+
+_client = get_cosmos_client(COSMOS_ENDPOINT, COSMOS_KEY)
+_db = _client.get_database_client(COSMOS_DB_NAME)
+_meta_container = SessionContainer(_db.get_container_client(COSMOS_META_CONTAINER))
+
+
+def read_usage(user_id: str, day: str) -> Optional[Dict[str, Any]]:
+    try:
+        return cosmos_scheduler.run(_meta_container.read_item, USAGE_DOC_PREFIX + day, partition_key=user_id)
+    except CosmosResourceNotFoundError:
+        return None
+
+
+def add_usage(user_id: str, day: str, totals: Dict[str, float]) -> None:
+    doc_id = USAGE_DOC_PREFIX + day
+    operations = [{"op": "incr", "path": f"/{name}", "value": value} for name, value in sorted(totals.items())]
+    # Flushes run on a timer, so they give way to interactive traffic.
+    try:
+        cosmos_scheduler.run(
+            _meta_container.patch_item,
+            item=doc_id,
+            partition_key=user_id,
+            patch_operations=operations,
+            priority=BULK,
+        )
+        return
+    except CosmosResourceNotFoundError:
+        pass
+
+    try:
+        cosmos_scheduler.run(
+            _meta_container.create_item, {"id": doc_id, "userId": user_id, "day": day, **totals}, priority=BULK
+        )
+    except CosmosResourceExistsError:
+        # Another instance created the day's document first; add on top of it.
+        cosmos_scheduler.run(
+            _meta_container.patch_item,
+            item=doc_id,
+            partition_key=user_id,
+            patch_operations=operations,
+            priority=BULK,
+        )
+    except CosmosHttpResponseError:
+        logging.exception("Could not store usage for user %s on %s", user_id, day)
+        raise
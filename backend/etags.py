@@ -0,0 +1,42 @@
+import hashlib
+from typing import Any, Dict, Optional, Sequence, Union
+
+TASKS_SCOPE = "tasks"
+EVENTS_SCOPE = "events"
+
+ETAG_SALT = "v1"
+
+
+def make_etag(
+    version_doc: Optional[Dict[str, Any]],
+    scope: Union[str, Sequence[str]],
+    *variant: Any,
+) -> Optional[str]:
+    if not version_doc:
+        return None
+
+    scopes = [scope] if isinstance(scope, str) else list(scope)
+    raw = ":".join(
+        [
+            ETAG_SALT,
+            str(version_doc.get("nonce") or ""),
+            *(f"{name}={version_doc.get(name) or 0}" for name in scopes),
+            *(str(part) for part in variant),
+        ]
+    )
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
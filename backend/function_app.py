@@ -1,29 +1,55 @@
 import os
 import json
-from datetime import datetime, timezone, timedelta
-from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from dataclasses import asdict
+from datetime import datetime, timezone
 import logging
 from typing import Any
 
 import azure.functions as func
-from openai import AzureOpenAI # type: ignore
-
-from db import (
-    list_tasks as db_list_tasks,
-    create_task as db_create_task,
-    delete_task as db_delete_task,
-    find_tasks_by_title as db_find_tasks_by_title,
-    update_task as db_update_task,
-    delete_tasks_for_user as db_delete_tasks_for_user,
+from openai import APIConnectionError, AzureOpenAI # type: ignore
+
+from chat_recording import ChatRecorder
+from columnar import EventColumns, TaskColumns, columns_cache
+from etags import (
+    TASKS_SCOPE,
+    EVENTS_SCOPE,
+    etag_matches,
+    make_etag,
 )
-from db_events import (
-    list_events as db_list_events,
-    create_event as db_create_event,
-    delete_event as db_delete_event,
-    find_events_by_title as db_find_events_by_title,
-    update_event as db_update_event,
-    delete_events_in_range as db_delete_events_in_range,
+from heatmap import build_heatmap, heatmap_cache
+from http_pools import create_openai_http_client, pool_stats_snapshot
+from metrics import metrics
+from model_router import AZURE_OPENAI_ROUTER_MODEL, ChatModelRouter
+from overview import (
+    DEFAULT_NEXT_TASKS,
+    MAX_NEXT_TASKS,
+    build_overview,
+    day_bounds,
+    events_on_day,
+    month_bounds,
+    parse_day,
+    parse_month,
 )
+from prefetch import WRITE_TOOL_SCOPES, ChatPrefetch
+from profiling import profiler
+from projection import EVENT_FIELDS, EVENT_SUMMARY_FIELDS, TASK_FIELDS, TASK_SUMMARY_FIELDS
+from query_log import slow_query_log
+from rate_limiter import RateLimitExceeded, create_openai_limiter
+from session_tokens import ContextThreadPoolExecutor, session_consistency
+from storage import create_storage
+from task_stats import summarize_task_stats
+from timeutils import get_helsinki_now, get_helsinki_tz, to_epoch
+from tool_results import compact_tool_messages
+from unit_of_work import ChatUnitOfWork
+from usage_ledger import (
+    BUDGET_DOWNGRADE,
+    BUDGET_REJECT,
+    USAGE_DOWNGRADE_MAX_TOKENS,
+    USAGE_FLUSH_SCHEDULE,
+    UsageLedger,
+    intent_of,
+)
+from warmup import WARMUP_ENABLED, WARMUP_ON_STARTUP, WARMUP_SCHEDULE, activity, users_to_preload, warm_up
 
 app = func.FunctionApp()
 
@@ -36,9 +62,44 @@ azure_openai_client = AzureOpenAI(
     api_key=AZURE_OPENAI_API_KEY,
     api_version=AZURE_OPENAI_API_VERSION,
     azure_endpoint=AZURE_OPENAI_ENDPOINT,
+    # Retries go through openai_limiter so they respect Retry-After and the shared budget.
+    max_retries=0,
+    # Explicit pool size, keep-alive and timeouts; see http_pools.py.
+    http_client=create_openai_http_client(),
+)
+openai_limiter = create_openai_limiter(transient_errors=(APIConnectionError,))
+# Records chat turns as replayable fixtures when CHAT_RECORDING_DIR is set.
+chat_recorder = ChatRecorder()
+chat_router = ChatModelRouter(
+    create=chat_recorder.wrap_create(azure_openai_client.chat.completions.create),
+    limiter=openai_limiter,
+    full_model=AZURE_OPENAI_MODEL,
+    router_model=AZURE_OPENAI_ROUTER_MODEL,
 )
 
 DEMO_USER_ID = "demo-user"
+
+# Cosmos by default; STORAGE_BACKEND=sqlite runs against a local SQLite file.
+storage = chat_recorder.wrap_storage(create_storage())
+
+# Per-user and per-intent token spend and latency; daily totals go to storage.
+usage_ledger = UsageLedger(store=storage)
+
+# Shared pool for running independent storage queries of one request side by side.
+# Calls run in the submitting request's context, so they keep its session tokens.
+db_io_executor = ContextThreadPoolExecutor(max_workers=8, thread_name_prefix="db-io")
+
+# Times user-facing requests by how warm the process was and remembers who was
+# active, so the warm-up timer knows whose caches to preload.
+track_request = activity.tracked(lambda req: DEMO_USER_ID)
+# CPU and memory profile of single requests; a no-op unless PROFILING_* is set.
+profile_request = profiler.wrap
+record_chat = chat_recorder.wrap(
+    user_of=lambda req: DEMO_USER_ID,
+    now_of=get_helsinki_now,
+    seed_of=lambda user_id: {"tasks": storage.list_tasks(user_id), "events": storage.list_events(user_id)},
+)
+
 TOOLS = [
     {
         "type": "function",
@@ -359,22 +420,38 @@ TOOLS = [
 ]
 
 
-def get_helsinki_now() -> datetime:
-    try:
-        tz = ZoneInfo("Europe/Helsinki")
-    except ZoneInfoNotFoundError:
-        tz = timezone(timedelta(hours=2))
-    return datetime.now(tz)
+def current_etag(user_id: str, scope: str | tuple[str, ...], *variant: Any) -> str | None:
+    return make_etag(storage.read_data_version(user_id), scope, *variant)
 
 
-def parse_iso_datetime(value: str | None) -> datetime | None:
-    if not value:
-        return None
-    try:
-        cleaned = value.replace("Z", "+00:00") if value.endswith("Z") else value
-        return datetime.fromisoformat(cleaned)
-    except ValueError:
-        return None
+def load_task_columns(user_id: str, store: Any = None) -> TaskColumns:
+    version = current_etag(user_id, TASKS_SCOPE, "columns")
+    columns = columns_cache.get((user_id, TASKS_SCOPE), version) if version else None
+    if columns is None:
+        columns = TaskColumns((store or storage).list_tasks(user_id=user_id, fields=TASK_SUMMARY_FIELDS), get_helsinki_tz())
+        if version:
+            columns_cache.put((user_id, TASKS_SCOPE), version, columns)
+    return columns
+
+
+def load_event_columns(user_id: str, store: Any = None) -> EventColumns:
+    version = current_etag(user_id, EVENTS_SCOPE, "columns")
+    columns = columns_cache.get((user_id, EVENTS_SCOPE), version) if version else None
+    if columns is None:
+        columns = EventColumns((store or storage).list_events(user_id=user_id, fields=EVENT_SUMMARY_FIELDS), get_helsinki_tz())
+        if version:
+            columns_cache.put((user_id, EVENTS_SCOPE), version, columns)
+    return columns
+
+
+def cache_headers(etag: str | None) -> dict[str, str]:
+    if not etag:
+        return {}
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified_response(etag: str) -> func.HttpResponse:
+    return func.HttpResponse(status_code=304, headers=cache_headers(etag))
 
 
 @app.route(route="health", auth_level=func.AuthLevel.ANONYMOUS)
@@ -389,6 +466,92 @@ def health(req: func.HttpRequest) -> func.HttpResponse:
         status_code=200,
     )
 
+
+@app.timer_trigger(
+    schedule=WARMUP_SCHEDULE,
+    arg_name="timer",
+    run_on_startup=WARMUP_ON_STARTUP,
+    use_monitor=False,
+)
+def warmup(timer: func.TimerRequest) -> None:
+    if not WARMUP_ENABLED:
+        return
+
+    def preload_recent_users() -> None:
+        for user_id in users_to_preload(activity, storage.recent_user_ids):
+            load_task_columns(user_id)
+            load_event_columns(user_id)
+
+    report = warm_up(
+        {
+            # Point read: metadata discovery plus an open connection in the pool.
+            "cosmos": lambda: storage.read_data_version(DEMO_USER_ID),
+            # Lists deployments; no tokens spent, but TLS and the pool are set up.
+            "openai": lambda: azure_openai_client.models.list(),
+            "users": preload_recent_users,
+        }
+    )
+    logging.info("Warm-up finished (past due: %s): %s", timer.past_due, json.dumps(report))
+
+
+@app.timer_trigger(schedule=USAGE_FLUSH_SCHEDULE, arg_name="timer", use_monitor=False)
+def usage_flush(timer: func.TimerRequest) -> None:
+    flushed = usage_ledger.flush()
+    if flushed:
+        logging.info("Flushed token usage for %d user-days", flushed)
+
+
+@app.route(route="diagnostics/metrics", methods=["GET"], auth_level=func.AuthLevel.FUNCTION)
+def diagnostics_metrics(req: func.HttpRequest) -> func.HttpResponse:
+    return func.HttpResponse(
+        body=json.dumps({**metrics.snapshot(), "pools": pool_stats_snapshot()}),
+        mimetype="application/json",
+        status_code=200,
+    )
+
+
+@app.route(route="diagnostics/slow-queries", methods=["GET"], auth_level=func.AuthLevel.FUNCTION)
+def diagnostics_slow_queries(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        limit = max(1, min(100, int(req.params.get("limit") or 10)))
+        top = slow_query_log.top(limit, by=req.params.get("by") or "total_ru")
+    except ValueError as e:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Invalid query parameters", "details": str(e)}),
+            mimetype="application/json",
+            status_code=400,
+        )
+    body = {
+        "thresholds": {"ms": slow_query_log.slow_ms, "ru": slow_query_log.slow_ru},
+        "sampleRate": slow_query_log.sample_rate,
+        "top": top,
+        "recent": slow_query_log.recent(limit),
+    }
+    return func.HttpResponse(body=json.dumps(body), mimetype="application/json", status_code=200)
+
+
+@app.route(route="diagnostics/usage", methods=["GET"], auth_level=func.AuthLevel.FUNCTION)
+def diagnostics_usage(req: func.HttpRequest) -> func.HttpResponse:
+    return func.HttpResponse(
+        body=json.dumps(usage_ledger.stats(req.params.get("user") or None)),
+        mimetype="application/json",
+        status_code=200,
+    )
+
+
+@app.route(route="diagnostics/profiles/{profile_id}", methods=["GET"], auth_level=func.AuthLevel.FUNCTION)
+def diagnostics_profile(req: func.HttpRequest) -> func.HttpResponse:
+    profile = profiler.load(req.route_params.get("profile_id") or "")
+    if profile is None:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Profile not found"}),
+            mimetype="application/json",
+            status_code=404,
+        )
+    if req.params.get("format") == "collapsed":
+        return func.HttpResponse(body=profile.collapsed(), mimetype="text/plain", status_code=200)
+    return func.HttpResponse(body=json.dumps(asdict(profile)), mimetype="application/json", status_code=200)
+
 MOCK_TASKS = [
     {
         "id": "1",
@@ -407,6 +570,9 @@ MOCK_TASKS = [
 ]
 
 @app.route(route="tasks", methods=["GET", "POST"], auth_level=func.AuthLevel.ANONYMOUS)
+@track_request
+@profile_request
+@session_consistency
 def tasks(req: func.HttpRequest) -> func.HttpResponse:
     method = req.method.upper()
 
@@ -414,11 +580,16 @@ def tasks(req: func.HttpRequest) -> func.HttpResponse:
 
     if method == "GET":
         try:
-            items = db_list_tasks(user_id)
+            etag = current_etag(user_id, TASKS_SCOPE)
+            if etag and etag_matches(req.headers.get("If-None-Match"), etag):
+                return not_modified_response(etag)
+
+            items = storage.list_tasks(user_id, fields=TASK_FIELDS)
             return func.HttpResponse(
                 body=json.dumps({"tasks": items}),
                 mimetype="application/json",
                 status_code=200,
+                headers=cache_headers(etag),
             )
         except Exception as e:
             return func.HttpResponse(
@@ -449,12 +620,18 @@ def tasks(req: func.HttpRequest) -> func.HttpResponse:
             )
 
         try:
-            task = db_create_task(user_id=user_id, title=title, list_name=list_name, due_date=due_date)
+            task = storage.create_task(user_id=user_id, title=title, list_name=list_name, due_date=due_date)
             return func.HttpResponse(
                 body=json.dumps(task),
                 mimetype="application/json",
                 status_code=201,
             )
+        except ValueError as e:
+            return func.HttpResponse(
+                body=json.dumps({"error": "Invalid date value", "details": str(e)}),
+                mimetype="application/json",
+                status_code=400,
+            )
         except Exception as e:
             return func.HttpResponse(
                 body=json.dumps({"error": "Failed to create task", "details": str(e)}),
@@ -469,7 +646,32 @@ def tasks(req: func.HttpRequest) -> func.HttpResponse:
     )
 
 
+@app.route(route="tasks/stats", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+@track_request
+@profile_request
+@session_consistency
+def tasks_stats(req: func.HttpRequest) -> func.HttpResponse:
+    user_id = DEMO_USER_ID
+
+    try:
+        stats = storage.read_task_stats(user_id)
+        return func.HttpResponse(
+            body=json.dumps(summarize_task_stats(stats, int(get_helsinki_now().timestamp()))),
+            mimetype="application/json",
+            status_code=200,
+        )
+    except Exception as e:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Failed to load task stats", "details": str(e)}),
+            mimetype="application/json",
+            status_code=500,
+        )
+
+
 @app.route(route="tasks/{task_id}", methods=["PUT", "DELETE"], auth_level=func.AuthLevel.ANONYMOUS)
+@track_request
+@profile_request
+@session_consistency
 def task_item(req: func.HttpRequest) -> func.HttpResponse:
     task_id = req.route_params.get("task_id")
     if not task_id:
@@ -483,7 +685,7 @@ def task_item(req: func.HttpRequest) -> func.HttpResponse:
 
     if req.method.upper() == "DELETE":
         try:
-            db_delete_task(user_id=user_id, task_id=task_id)
+            storage.delete_task(user_id=user_id, task_id=task_id)
             return func.HttpResponse(status_code=204)
         except Exception as e:
             return func.HttpResponse(
@@ -513,12 +715,18 @@ def task_item(req: func.HttpRequest) -> func.HttpResponse:
             updates["dueDate"] = data.get("dueDate") or None
 
         try:
-            updated = db_update_task(user_id=user_id, task_id=task_id, updates=updates)
+            updated = storage.update_task(user_id=user_id, task_id=task_id, updates=updates)
             return func.HttpResponse(
                 body=json.dumps(updated),
                 mimetype="application/json",
                 status_code=200,
             )
+        except ValueError as e:
+            return func.HttpResponse(
+                body=json.dumps({"error": "Invalid date value", "details": str(e)}),
+                mimetype="application/json",
+                status_code=400,
+            )
         except Exception as e:
             return func.HttpResponse(
                 body=json.dumps({"error": "Failed to update task", "details": str(e)}),
@@ -533,7 +741,120 @@ def task_item(req: func.HttpRequest) -> func.HttpResponse:
     )
 
 
+@app.route(route="overview", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+@track_request
+@profile_request
+@session_consistency
+def overview(req: func.HttpRequest) -> func.HttpResponse:
+    user_id = DEMO_USER_ID
+    tz = get_helsinki_tz()
+
+    today = get_helsinki_now().date()
+    try:
+        year, month = parse_month(req.params.get("month"), today)
+        next_limit = int(req.params.get("limit") or DEFAULT_NEXT_TASKS)
+        # Events are listed for this day only; defaults to today.
+        day = parse_day(req.params["day"]) if req.params.get("day") else today
+    except ValueError as e:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Invalid query parameters", "details": str(e)}),
+            mimetype="application/json",
+            status_code=400,
+        )
+    next_limit = max(1, min(MAX_NEXT_TASKS, next_limit))
+
+    try:
+        etag = current_etag(
+            user_id,
+            (TASKS_SCOPE, EVENTS_SCOPE),
+            "overview",
+            f"{year:04d}-{month:02d}",
+            next_limit,
+            day.isoformat(),
+        )
+        if etag and etag_matches(req.headers.get("If-None-Match"), etag):
+            return not_modified_response(etag)
+
+        range_start, range_end = month_bounds(year, month, tz)
+        tasks_future = db_io_executor.submit(
+            storage.list_tasks_by_status, user_id, "open", fields=TASK_SUMMARY_FIELDS
+        )
+        events_future = db_io_executor.submit(
+            storage.list_events_overlapping,
+            user_id,
+            range_start.isoformat(),
+            range_end.isoformat(),
+            fields=EVENT_SUMMARY_FIELDS,
+        )
+
+        payload = build_overview(
+            open_tasks=tasks_future.result(),
+            events=events_future.result(),
+            year=year,
+            month=month,
+            tz=tz,
+            next_limit=next_limit,
+            day=day,
+        )
+        return func.HttpResponse(
+            body=json.dumps(payload),
+            mimetype="application/json",
+            status_code=200,
+            headers=cache_headers(etag),
+        )
+    except Exception as e:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Failed to load overview", "details": str(e)}),
+            mimetype="application/json",
+            status_code=500,
+        )
+
+
+@app.route(route="overview/day", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+@track_request
+@profile_request
+@session_consistency
+def overview_day(req: func.HttpRequest) -> func.HttpResponse:
+    user_id = DEMO_USER_ID
+    tz = get_helsinki_tz()
+
+    try:
+        day = parse_day(req.params.get("day"))
+    except ValueError as e:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Invalid query parameters", "details": str(e)}),
+            mimetype="application/json",
+            status_code=400,
+        )
+
+    try:
+        etag = current_etag(user_id, EVENTS_SCOPE, "overview-day", day.isoformat())
+        if etag and etag_matches(req.headers.get("If-None-Match"), etag):
+            return not_modified_response(etag)
+
+        day_start, day_end = day_bounds(day, tz)
+        events = storage.list_events_overlapping(
+            user_id, day_start.isoformat(), day_end.isoformat(), fields=EVENT_SUMMARY_FIELDS
+        )
+        return func.HttpResponse(
+            body=json.dumps({"day": day.isoformat(), "events": events_on_day(events, day, tz)}),
+            mimetype="application/json",
+            status_code=200,
+            headers=cache_headers(etag),
+        )
+    except Exception as e:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Failed to load events", "details": str(e)}),
+            mimetype="application/json",
+            status_code=500,
+        )
+
+
 @app.route(route="chat", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
+@track_request
+@profile_request
+@session_consistency
+@record_chat
 def chat(req: func.HttpRequest) -> func.HttpResponse:
     try:
         data = req.get_json()
@@ -555,6 +876,17 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
 
     user_id = DEMO_USER_ID
 
+    budget = usage_ledger.check_budget(user_id)
+    if budget == BUDGET_REJECT:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Daily token budget used up, try again tomorrow"}),
+            mimetype="application/json",
+            status_code=429,
+        )
+    # Over budget but allowed through: small deployment, shorter replies.
+    router = chat_router.downgraded() if budget == BUDGET_DOWNGRADE else chat_router
+    reply_options = {"max_tokens": USAGE_DOWNGRADE_MAX_TOKENS} if budget == BUDGET_DOWNGRADE else {}
+
     helsinki_now = get_helsinki_now()
     system_message = {
         "role": "system",
@@ -590,17 +922,22 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
         {"role": "user", "content": user_message},
     ]
 
-    try:
-        first_completion = azure_openai_client.chat.completions.create(
-            model=AZURE_OPENAI_MODEL,
-            messages=messages,
-            tools=TOOLS,
-            tool_choice="auto",
-            max_tokens=400,
-            temperature=0.3,
-        )
+    # One deadline covers both completions of the turn.
+    openai_deadline = openai_limiter.deadline()
 
-        first_msg = first_completion.choices[0].message
+    # Read-heavy intents: start their queries now instead of after completion 1.
+    prefetch = ChatPrefetch(
+        db_io_executor, storage, user_id, user_message, helsinki_now, get_helsinki_tz()
+    )
+    # Memoizes this turn's reads and keeps them in step with its own writes.
+    uow = ChatUnitOfWork(storage)
+
+    try:
+        first_routed = router.select_tools(messages, TOOLS, openai_deadline)
+        first_msg = first_routed.message
+        requested_tools = [tc.function.name for tc in first_msg.tool_calls or []]
+        intent = intent_of(requested_tools)
+        usage_ledger.record(user_id, intent, first_routed.costs, requested_tools)
 
         if not first_msg.tool_calls:
             reply = first_msg.content or ""
@@ -608,7 +945,7 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                 body=json.dumps(
                     {
                         "reply": reply,
-                        "model": AZURE_OPENAI_MODEL,
+                        "model": first_routed.model,
                         "receivedAt": datetime.now(timezone.utc).isoformat(),
                         "toolUsed": None,
                     }
@@ -626,12 +963,15 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
             args_json = tool_call.function.arguments or "{}"
             args = json.loads(args_json)
 
+            if fn_name in WRITE_TOOL_SCOPES:
+                prefetch.invalidate(WRITE_TOOL_SCOPES[fn_name])
+
             if fn_name == "create_task":
                 title = (args.get("title") or "").strip()
                 list_name = args.get("list") or "Inbox"
                 due_date = args.get("dueDate") or None
 
-                task = db_create_task(
+                task = uow.create_task(
                     user_id=user_id,
                     title=title,
                     list_name=list_name,
@@ -654,7 +994,7 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                 end_iso = args.get("end")
                 list_name = args.get("list") or "Default"
 
-                event = db_create_event(
+                event = uow.create_event(
                     user_id=user_id,
                     title=title,
                     start_iso=start_iso,
@@ -682,7 +1022,9 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                 matched_tasks: list[dict[str, Any]] | None = None
 
                 if not task_id and title:
-                    matched_tasks = db_find_tasks_by_title(user_id=user_id, title=title)
+                    matched_tasks = uow.find_tasks_by_title(
+                        user_id=user_id, title=title, fields=TASK_SUMMARY_FIELDS
+                    )
                     if not matched_tasks:
                         tool_results_messages.append(
                             {
@@ -702,7 +1044,7 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
 
                     task_id = str(matched_tasks[0]["id"])
 
-                db_delete_task(user_id=user_id, task_id=task_id)
+                uow.delete_task(user_id=user_id, task_id=task_id)
 
                 tool_results_messages.append(
                     {
@@ -731,7 +1073,9 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
 
             elif fn_name == "delete_tasks_in_list":
                 list_name = args.get("list") or None
-                deleted_tasks = db_delete_tasks_for_user(user_id=user_id, list_name=list_name)
+                deleted_tasks = uow.delete_tasks_for_user(
+                    user_id=user_id, list_name=list_name, fields=TASK_SUMMARY_FIELDS
+                )
 
                 tool_results_messages.append(
                     {
@@ -769,7 +1113,9 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                 matched_events: list[dict[str, Any]] | None = None
 
                 if not event_id and title:
-                    matched_events = db_find_events_by_title(user_id=user_id, title=title)
+                    matched_events = uow.find_events_by_title(
+                        user_id=user_id, title=title, fields=EVENT_SUMMARY_FIELDS
+                    )
                     if not matched_events:
                         tool_results_messages.append(
                             {
@@ -816,7 +1162,7 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                         )
                         continue
 
-                db_delete_event(user_id=user_id, event_id=event_id)
+                uow.delete_event(user_id=user_id, event_id=event_id)
 
                 tool_results_messages.append(
                     {
@@ -852,10 +1198,11 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                 if not start_iso or not end_iso:
                     raise ValueError("start and end are required for delete_events_in_range")
 
-                deleted_events = db_delete_events_in_range(
+                deleted_events = uow.delete_events_in_range(
                     user_id=user_id,
                     start_iso=start_iso,
                     end_iso=end_iso,
+                    fields=EVENT_SUMMARY_FIELDS,
                 )
 
                 tool_results_messages.append(
@@ -891,7 +1238,9 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                 match_title = (args.get("matchTitle") or "").strip()
 
                 if not task_id and match_title:
-                    matched = db_find_tasks_by_title(user_id=user_id, title=match_title)
+                    matched = uow.find_tasks_by_title(
+                        user_id=user_id, title=match_title, fields=TASK_SUMMARY_FIELDS
+                    )
                     if not matched:
                         tool_results_messages.append(
                             {
@@ -926,7 +1275,7 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                 if not updates:
                     continue
 
-                updated_task = db_update_task(
+                updated_task = uow.update_task(
                     user_id=user_id,
                     task_id=task_id,
                     updates=updates,
@@ -953,7 +1302,9 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                 match_title = (args.get("matchTitle") or "").strip()
 
                 if not event_id and match_title:
-                    matched_events = db_find_events_by_title(user_id=user_id, title=match_title)
+                    matched_events = uow.find_events_by_title(
+                        user_id=user_id, title=match_title, fields=EVENT_SUMMARY_FIELDS
+                    )
                     if not matched_events:
                         tool_results_messages.append(
                             {
@@ -982,7 +1333,7 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                 if not updates:
                     continue
 
-                updated_event = db_update_event(
+                updated_event = uow.update_event(
                     user_id=user_id,
                     event_id=event_id,
                     updates=updates,
@@ -1007,29 +1358,23 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
             elif fn_name == "list_tasks_overview":
                 list_filter = args.get("list") or None
                 status_filter = args.get("status") or None
-                due_after = parse_iso_datetime(args.get("dueAfter"))
-                due_before = parse_iso_datetime(args.get("dueBefore"))
+                tz = get_helsinki_tz()
+                due_after = to_epoch(args.get("dueAfter"), tz)
+                due_before = to_epoch(args.get("dueBefore"), tz)
                 limit_val = args.get("limit") or 20
                 limit_val = max(1, min(50, limit_val))
 
-                all_tasks = db_list_tasks(user_id=user_id)
-                filtered: list[dict[str, Any]] = []
-                for task in all_tasks:
-                    if list_filter and task.get("list") != list_filter:
-                        continue
-                    if status_filter and task.get("status") != status_filter:
-                        continue
-
-                    task_due = parse_iso_datetime(task.get("dueDate"))
-                    if due_after and (not task_due or task_due < due_after):
-                        continue
-                    if due_before and (not task_due or task_due > due_before):
-                        continue
-
-                    filtered.append(task)
-
-                total_matches = len(filtered)
-                limited_tasks = filtered[:limit_val]
+                task_columns = prefetch.open_tasks(status_filter)
+                if task_columns is None:
+                    task_columns = load_task_columns(user_id, uow)
+                matches = task_columns.select(
+                    list_name=list_filter,
+                    status=status_filter,
+                    due_after=due_after,
+                    due_before=due_before,
+                )
+                total_matches = int(matches.size)
+                limited_tasks = task_columns.take(matches[:limit_val])
 
                 tool_results_messages.append(
                     {
@@ -1070,29 +1415,21 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                 limit_val = args.get("limit") or 20
                 limit_val = max(1, min(50, limit_val))
 
-                start_dt = parse_iso_datetime(start_iso)
-                end_dt = parse_iso_datetime(end_iso)
-                now_dt = get_helsinki_now() if only_upcoming else None
-
-                events = db_list_events(user_id=user_id)
-                filtered_events: list[dict[str, Any]] = []
-
-                for event in events:
-                    event_start = parse_iso_datetime(event.get("start"))
-                    event_end = parse_iso_datetime(event.get("end")) or event_start
-
-                    if now_dt and event_end and event_end < now_dt:
-                        continue
-
-                    if start_dt and event_end and event_end <= start_dt:
-                        continue
-                    if end_dt and event_start and event_start >= end_dt:
-                        continue
-
-                    filtered_events.append(event)
-
-                filtered_events.sort(key=lambda ev: ev.get("start") or "")
-                limited_events = filtered_events[:limit_val]
+                tz = get_helsinki_tz()
+                start_epoch = to_epoch(start_iso, tz)
+                end_epoch = to_epoch(end_iso, tz)
+                now_epoch = int(get_helsinki_now().timestamp()) if only_upcoming else None
+
+                event_columns = prefetch.events(start_epoch, end_epoch, now_epoch)
+                if event_columns is None:
+                    event_columns = load_event_columns(user_id, uow)
+                matches = event_columns.select(
+                    start=start_epoch,
+                    end=end_epoch,
+                    not_ended_before=now_epoch,
+                )
+                total_matches = int(matches.size)
+                limited_events = event_columns.take(event_columns.earliest(matches, limit_val))
 
                 tool_results_messages.append(
                     {
@@ -1102,7 +1439,7 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
                         "content": json.dumps(
                             {
                                 "count": len(limited_events),
-                                "totalMatches": len(filtered_events),
+                                "totalMatches": total_matches,
                                 "limit": limit_val,
                                 "start": start_iso,
                                 "end": end_iso,
@@ -1140,27 +1477,25 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
             ],
         }
 
+        # Bulk deletes can return hundreds of items; keep the prompt bounded.
+        compaction = compact_tool_messages(tool_results_messages)
         second_messages = [
             system_message,
             {"role": "user", "content": user_message},
             assistant_msg_for_second_call,
-            *tool_results_messages,
+            *compaction.messages,
         ]
 
-        second_completion = azure_openai_client.chat.completions.create(
-            model=AZURE_OPENAI_MODEL,
-            messages=second_messages,
-            max_tokens=400,
-            temperature=0.3,
-        )
-
-        final_reply = second_completion.choices[0].message.content or ""
+        prefetch.discard()
+        second_routed = router.reply(second_messages, openai_deadline, **reply_options)
+        usage_ledger.record(user_id, intent, second_routed.costs, used_tools)
+        final_reply = second_routed.message.content or ""
 
         return func.HttpResponse(
             body=json.dumps(
                 {
                     "reply": final_reply,
-                    "model": AZURE_OPENAI_MODEL,
+                    "model": second_routed.model,
                     "receivedAt": datetime.now(timezone.utc).isoformat(),
                     "toolUsed": used_tools,
                 }
@@ -1169,15 +1504,29 @@ def chat(req: func.HttpRequest) -> func.HttpResponse:
             status_code=200,
         )
 
+    except RateLimitExceeded as e:
+        retry_after = max(1, round(e.retry_after))
+        return func.HttpResponse(
+            body=json.dumps({"error": "Assistant is busy, try again shortly", "details": str(e)}),
+            mimetype="application/json",
+            status_code=503,
+            headers={"Retry-After": str(retry_after)},
+        )
     except Exception as e:
         return func.HttpResponse(
             body=json.dumps({"error": "OpenAI call failed", "details": str(e)}),
             mimetype="application/json",
             status_code=500,
         )
+    finally:
+        # Unused prefetches are cancelled whichever way the turn ended.
+        prefetch.discard()
 
 
 @app.route(route="events", methods=["GET", "POST"], auth_level=func.AuthLevel.ANONYMOUS)
+@track_request
+@profile_request
+@session_consistency
 def events(req: func.HttpRequest) -> func.HttpResponse:
     method = req.method.upper()
     user_id = DEMO_USER_ID
@@ -1187,11 +1536,24 @@ def events(req: func.HttpRequest) -> func.HttpResponse:
         end = req.params.get("end")
 
         try:
-            items = db_list_events(user_id=user_id, start_iso=start, end_iso=end)
+            etag = current_etag(user_id, EVENTS_SCOPE, start or "", end or "")
+            if etag and etag_matches(req.headers.get("If-None-Match"), etag):
+                return not_modified_response(etag)
+
+            items = storage.list_events(
+                user_id=user_id, start_iso=start, end_iso=end, fields=EVENT_FIELDS
+            )
             return func.HttpResponse(
                 body=json.dumps({"events": items}),
                 mimetype="application/json",
                 status_code=200,
+                headers=cache_headers(etag),
+            )
+        except ValueError as e:
+            return func.HttpResponse(
+                body=json.dumps({"error": "Invalid date value", "details": str(e)}),
+                mimetype="application/json",
+                status_code=400,
             )
         except Exception as e:
             return func.HttpResponse(
@@ -1223,7 +1585,7 @@ def events(req: func.HttpRequest) -> func.HttpResponse:
             )
 
         try:
-            event = db_create_event(
+            event = storage.create_event(
                 user_id=user_id,
                 title=title,
                 start_iso=start_iso,
@@ -1235,6 +1597,12 @@ def events(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json",
                 status_code=201,
             )
+        except ValueError as e:
+            return func.HttpResponse(
+                body=json.dumps({"error": "Invalid date value", "details": str(e)}),
+                mimetype="application/json",
+                status_code=400,
+            )
         except Exception as e:
             return func.HttpResponse(
                 body=json.dumps({"error": "Failed to create event", "details": str(e)}),
@@ -1249,7 +1617,72 @@ def events(req: func.HttpRequest) -> func.HttpResponse:
     )
 
 
+@app.route(route="events/heatmap", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+@track_request
+@profile_request
+@session_consistency
+def events_heatmap(req: func.HttpRequest) -> func.HttpResponse:
+    user_id = DEMO_USER_ID
+    tz = get_helsinki_tz()
+
+    try:
+        year, month = parse_month(req.params.get("month"), get_helsinki_now().date())
+    except ValueError as e:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Invalid query parameters", "details": str(e)}),
+            mimetype="application/json",
+            status_code=400,
+        )
+    month_key = f"{year:04d}-{month:02d}"
+
+    try:
+        etag = current_etag(user_id, (EVENTS_SCOPE, TASKS_SCOPE), "heatmap", month_key)
+        if etag and etag_matches(req.headers.get("If-None-Match"), etag):
+            return not_modified_response(etag)
+
+        body = heatmap_cache.get((user_id, month_key), etag) if etag else None
+        if body is None:
+            range_start, range_end = month_bounds(year, month, tz)
+            events_future = db_io_executor.submit(
+                storage.list_events_overlapping,
+                user_id,
+                range_start.isoformat(),
+                range_end.isoformat(),
+                fields=EVENT_SUMMARY_FIELDS,
+            )
+            tasks_future = db_io_executor.submit(
+                storage.list_tasks_by_status, user_id, "open", fields=TASK_SUMMARY_FIELDS
+            )
+            body = json.dumps(
+                build_heatmap(
+                    events=events_future.result(),
+                    open_tasks=tasks_future.result(),
+                    year=year,
+                    month=month,
+                    tz=tz,
+                )
+            )
+            if etag:
+                heatmap_cache.put((user_id, month_key), etag, body)
+
+        return func.HttpResponse(
+            body=body,
+            mimetype="application/json",
+            status_code=200,
+            headers=cache_headers(etag),
+        )
+    except Exception as e:
+        return func.HttpResponse(
+            body=json.dumps({"error": "Failed to build heatmap", "details": str(e)}),
+            mimetype="application/json",
+            status_code=500,
+        )
+
+
 @app.route(route="events/{event_id}", methods=["PUT", "DELETE"], auth_level=func.AuthLevel.ANONYMOUS)
+@track_request
+@profile_request
+@session_consistency
 def event_item(req: func.HttpRequest) -> func.HttpResponse:
     event_id = req.route_params.get("event_id")
     if not event_id:
@@ -1263,7 +1696,7 @@ def event_item(req: func.HttpRequest) -> func.HttpResponse:
 
     if req.method.upper() == "DELETE":
         try:
-            db_delete_event(user_id=user_id, event_id=event_id)
+            storage.delete_event(user_id=user_id, event_id=event_id)
             return func.HttpResponse(status_code=204)
         except Exception as e:
             return func.HttpResponse(
@@ -1293,12 +1726,18 @@ def event_item(req: func.HttpRequest) -> func.HttpResponse:
             updates["list"] = data.get("list") or "Default"
 
         try:
-            updated = db_update_event(user_id=user_id, event_id=event_id, updates=updates)
+            updated = storage.update_event(user_id=user_id, event_id=event_id, updates=updates)
             return func.HttpResponse(
                 body=json.dumps(updated),
                 mimetype="application/json",
                 status_code=200,
             )
+        except ValueError as e:
+            return func.HttpResponse(
+                body=json.dumps({"error": "Invalid date value", "details": str(e)}),
+                mimetype="application/json",
+                status_code=400,
+            )
         except Exception as e:
             return func.HttpResponse(
                 body=json.dumps({"error": "Failed to update event", "details": str(e)}),
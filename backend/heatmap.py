@@ -0,0 +1,127 @@
+import os
+from datetime import datetime, time, timedelta, tzinfo
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+try:
+    from .overview import month_bounds
+    from .timeutils import doc_epoch
+    from .versioned_cache import VersionedLRUCache
+except ImportError:
+    from overview import month_bounds
+    from timeutils import doc_epoch
+    from versioned_cache import VersionedLRUCache
+
+HEATMAP_CACHE_SIZE = int(os.environ.get("HEATMAP_CACHE_SIZE", "256"))
+
+
+def day_boundaries(year: int, month: int, tz: tzinfo) -> np.ndarray:
+    # Local midnights as epoch seconds; DST days come out as 23h or 25h long.
+    start, end = month_bounds(year, month, tz)
+    day_count = (end.date() - start.date()).days
+    first = start.date()
+    return np.array(
+        [
+            int(datetime.combine(first + timedelta(days=offset), time(), tzinfo=tz).timestamp())
+            for offset in range(day_count + 1)
+        ],
+        dtype=np.int64,
+    )
+
+
+def event_epoch_arrays(events: Iterable[Dict[str, Any]], tz: tzinfo) -> Tuple[np.ndarray, np.ndarray]:
+    starts: List[int] = []
+    ends: List[int] = []
+    for event in events:
+        start = doc_epoch(event, "start", "startEpoch", tz)
+        if start is None:
+            continue
+        end = doc_epoch(event, "end", "endEpoch", tz)
+        starts.append(start)
+        ends.append(start if end is None or end < start else end)
+    return np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+
+def merge_intervals(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    if starts.size == 0:
+        return starts, ends
+
+    order = np.argsort(starts, kind="stable")
+    sorted_starts = starts[order]
+    sorted_ends = ends[order]
+    reach = np.maximum.accumulate(sorted_ends)
+
+    opens_group = np.empty(sorted_starts.size, dtype=bool)
+    opens_group[0] = True
+    opens_group[1:] = sorted_starts[1:] > reach[:-1]
+    group_heads = np.flatnonzero(opens_group)
+    return sorted_starts[group_heads], np.maximum.reduceat(sorted_ends, group_heads)
+
+
+def touches_days(starts: np.ndarray, ends: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    # (events x days) mask. Ends are exclusive; zero-length events belong to
+    # the day they start on.
+    day_starts = bounds[None, :-1]
+    day_ends = bounds[None, 1:]
+    s = starts[:, None]
+    e = ends[:, None]
+    return (s < day_ends) & ((e > day_starts) | ((e == s) & (s >= day_starts)))
+
+
+def busy_seconds_per_day(starts: np.ndarray, ends: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    merged_starts, merged_ends = merge_intervals(starts, ends)
+    overlap = np.minimum(merged_ends[:, None], bounds[None, 1:]) - np.maximum(
+        merged_starts[:, None], bounds[None, :-1]
+    )
+    return np.clip(overlap, 0, None).sum(axis=0)
+
+
+def due_counts_per_day(due: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    in_month = due[(due >= bounds[0]) & (due < bounds[-1])]
+    day_index = np.searchsorted(bounds, in_month, side="right") - 1
+    return np.bincount(day_index, minlength=bounds.size - 1)
+
+
+def build_heatmap(
+    events: Iterable[Dict[str, Any]],
+    open_tasks: Iterable[Dict[str, Any]],
+    year: int,
+    month: int,
+    tz: tzinfo,
+) -> Dict[str, Any]:
+    bounds = day_boundaries(year, month, tz)
+    starts, ends = event_epoch_arrays(events, tz)
+
+    in_month = touches_days(starts, ends, bounds[[0, -1]])[:, 0]
+    starts, ends = starts[in_month], ends[in_month]
+
+    busy_seconds = busy_seconds_per_day(starts, ends, bounds)
+    event_counts = touches_days(starts, ends, bounds).sum(axis=0)
+
+    due = np.array(
+        [
+            epoch
+            for epoch in (doc_epoch(task, "dueDate", "dueEpoch", tz) for task in open_tasks)
+            if epoch is not None
+        ],
+        dtype=np.int64,
+    )
+    due_counts = due_counts_per_day(due, bounds)
+
+    first_day = month_bounds(year, month, tz)[0].date()
+    return {
+        "month": f"{year:04d}-{month:02d}",
+        "days": [
+            {
+                "date": (first_day + timedelta(days=index)).isoformat(),
+                "busyMinutes": int(busy_seconds[index] // 60),
+                "eventCount": int(event_counts[index]),
+                "dueTaskCount": int(due_counts[index]),
+            }
+            for index in range(bounds.size - 1)
+        ],
+    }
+
+
+heatmap_cache = VersionedLRUCache(HEATMAP_CACHE_SIZE)
@@ -0,0 +1,217 @@
+import os
+import socket
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+COSMOS_POOL_SIZE = int(os.environ.get("COSMOS_POOL_SIZE", "32"))
+COSMOS_CONNECT_TIMEOUT_SECONDS = int(os.environ.get("COSMOS_CONNECT_TIMEOUT_SECONDS", "5"))
+COSMOS_READ_TIMEOUT_SECONDS = int(os.environ.get("COSMOS_READ_TIMEOUT_SECONDS", "30"))
+# Consistency the client asks for; it may only be weaker than the account default.
+# Empty uses the account default. Session reads cost about half the RU of
+# strong or bounded-staleness reads; session_tokens.py keeps read-your-writes.
+COSMOS_CONSISTENCY_LEVEL = os.environ.get("COSMOS_CONSISTENCY_LEVEL", "Session") or None
+
+OPENAI_POOL_SIZE = int(os.environ.get("OPENAI_POOL_SIZE", "16"))
+OPENAI_KEEPALIVE_SECONDS = float(os.environ.get("OPENAI_KEEPALIVE_SECONDS", "120"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_CONNECT_TIMEOUT_SECONDS", "5"))
+OPENAI_READ_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_READ_TIMEOUT_SECONDS", "60"))
+
+# TCP keep-alive stops idle pooled sockets from being silently dropped by NAT
+# and load balancers (Azure's idle timeout is 4 minutes).
+KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+
+
+class PoolStats:
+    """In-flight requests, idle pooled connections and new-connection rate."""
+
+    def __init__(self, name: str, clock: Callable[[], float] = time.monotonic) -> None:
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._opened_total = 0
+        self._opened: Deque[float] = deque()
+        self._idle: Callable[[], int] = lambda: 0
+
+    def track_idle(self, count_idle: Callable[[], int]) -> None:
+        self._idle = count_idle
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        with self._lock:
+            self._in_use += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_use -= 1
+
+    def connection_opened(self) -> None:
+        now = self._clock()
+        with self._lock:
+            self._opened_total += 1
+            self._opened.append(now)
+            self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        while self._opened and self._opened[0] <= now - 60:
+            self._opened.popleft()
+
+    def snapshot(self) -> Dict[str, Any]:
+        idle = self._idle()
+        with self._lock:
+            self._trim(self._clock())
+            return {
+                "inUse": self._in_use,
+                "idle": idle,
+                "opened": self._opened_total,
+                "openedLastMinute": len(self._opened),
+            }
+
+
+_pool_stats: Dict[str, PoolStats] = {}
+_pool_stats_lock = threading.Lock()
+
+
+def pool_stats(name: str) -> PoolStats:
+    with _pool_stats_lock:
+        if name not in _pool_stats:
+            _pool_stats[name] = PoolStats(name)
+        return _pool_stats[name]
+
+
+def pool_stats_snapshot() -> Dict[str, Dict[str, Any]]:
+    with _pool_stats_lock:
+        stats = list(_pool_stats.values())
+    return {entry.name: entry.snapshot() for entry in stats}
+
+
+def _counting_pool(base: type, stats: PoolStats, pools: "weakref.WeakSet[Any]") -> type:
+    class CountingPool(base):  # type: ignore[misc, valid-type]
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, **kwargs)
+            pools.add(self)
+
+        def _new_conn(self) -> Any:
+            stats.connection_opened()
+            return super()._new_conn()
+
+    return CountingPool
+
+
+class CountingAdapter(HTTPAdapter):
+    """requests adapter that reports to a PoolStats and keeps sockets alive."""
+
+    def __init__(self, stats: PoolStats, **kwargs: Any) -> None:
+        self._stats = stats
+        self._pools: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        stats.track_idle(self._count_idle)
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections: int, maxsize: int, block: bool = False, **pool_kwargs: Any) -> None:
+        pool_kwargs.setdefault("socket_options", KEEPALIVE_SOCKET_OPTIONS)
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self._stats, self._pools),
+            "https": _counting_pool(HTTPSConnectionPool, self._stats, self._pools),
+        }
+
+    def _count_idle(self) -> int:
+        idle = 0
+        for pool in list(self._pools):
+            queue = getattr(pool, "pool", None)
+            if queue is not None:
+                idle += sum(1 for conn in list(queue.queue) if conn is not None)
+        return idle
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        with self._stats.request():
+            return super().send(request, **kwargs)
+
+
+def pooled_session(stats: PoolStats, pool_size: int) -> requests.Session:
+    session = requests.Session()
+    # One host per dependency, so a single pool per scheme; pool_block=False
+    # lets bursts open extra sockets instead of queueing behind the pool.
+    adapter = CountingAdapter(stats, pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_cosmos_clients: Dict[Tuple[str, str], Any] = {}
+_cosmos_clients_lock = threading.Lock()
+
+
+def get_cosmos_client(endpoint: str, key: str) -> Any:
+    # CosmosClient is thread-safe and caches account metadata and routing, so
+    # every module shares one instance and one connection pool per account.
+    # Imported here so test stubs patched onto azure.cosmos are picked up.
+    from azure.core.pipeline.transport import RequestsTransport
+    from azure.cosmos import CosmosClient
+
+    with _cosmos_clients_lock:
+        client = _cosmos_clients.get((endpoint, key))
+        if client is None:
+            session = pooled_session(pool_stats("cosmos"), COSMOS_POOL_SIZE)
+            client = CosmosClient(
+                endpoint,
+                credential=key,
+                consistency_level=COSMOS_CONSISTENCY_LEVEL,
+                transport=RequestsTransport(session=session, session_owner=False),
+                connection_timeout=COSMOS_CONNECT_TIMEOUT_SECONDS,
+                read_timeout=COSMOS_READ_TIMEOUT_SECONDS,
+            )
+            _cosmos_clients[(endpoint, key)] = client
+        return client
+
+
+def create_openai_http_client(stats: Optional[PoolStats] = None) -> Any:
+    # httpx ships with openai; imported lazily so the Cosmos-only paths and
+    # tests do not need it.
+    import httpx
+
+    stats = stats or pool_stats("openai")
+
+    class CountingTransport(httpx.HTTPTransport):
+        def __init__(self, **kwargs: Any) -> None:
+            super().__init__(**kwargs)
+            self._seen: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+        def _connections(self) -> list:
+            pool = getattr(self, "_pool", None)
+            return list(getattr(pool, "connections", []))
+
+        def handle_request(self, request: httpx.Request) -> httpx.Response:
+            with stats.request():
+                response = super().handle_request(request)
+            for conn in self._connections():
+                if conn not in self._seen:
+                    self._seen.add(conn)
+                    stats.connection_opened()
+            return response
+
+    transport = CountingTransport(
+        limits=httpx.Limits(
+            max_connections=OPENAI_POOL_SIZE,
+            max_keepalive_connections=OPENAI_POOL_SIZE,
+            keepalive_expiry=OPENAI_KEEPALIVE_SECONDS,
+        ),
+        socket_options=KEEPALIVE_SOCKET_OPTIONS,
+    )
+    stats.track_idle(lambda: sum(1 for conn in transport._connections() if conn.is_idle()))
+    return httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(OPENAI_READ_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+    )
@@ -0,0 +1,135 @@
+# Indexing policies for the Cosmos containers, kept next to the queries they
+# serve. Bump INDEXING_POLICY_VERSION whenever a policy changes and apply it
+# with `python -m scripts.apply_indexing_policy`.
+import re
+from typing import Any, Dict, List, Tuple
+
+INDEXING_POLICY_VERSION = 2
+
+
+def _paths(*props: str) -> List[Dict[str, str]]:
+    return [{"path": f"/{prop}/?"} for prop in props]
+
+
+def _composite(*pairs: Tuple[str, str]) -> List[Dict[str, str]]:
+    return [{"path": f"/{prop}", "order": order} for prop, order in pairs]
+
+
+POLICIES: Dict[str, Dict[str, Any]] = {
+    # db.py: userId partition + ORDER BY createdAt DESC, optionally filtered on
+    # status or list; LOWER(title) lookups; the dueEpoch backfill.
+    "tasks": {
+        "indexingMode": "consistent",
+        "automatic": True,
+        "includedPaths": _paths("userId", "createdAt", "status", "list", "title", "dueDate", "dueEpoch"),
+        "excludedPaths": [{"path": "/*"}],
+        "compositeIndexes": [
+            _composite(("userId", "ascending"), ("createdAt", "descending")),
+            # Equality filters first, then the ORDER BY property.
+            _composite(("userId", "ascending"), ("status", "ascending"), ("createdAt", "descending")),
+            _composite(("userId", "ascending"), ("list", "ascending"), ("createdAt", "descending")),
+        ],
+    },
+    # db_events.py: epoch range filters ordered by startEpoch, the unranged
+    # ORDER BY start, title lookups ordered by start DESC, the epoch backfill.
+    "events": {
+        "indexingMode": "consistent",
+        "automatic": True,
+        "includedPaths": _paths("userId", "start", "startEpoch", "endEpoch", "title"),
+        "excludedPaths": [{"path": "/*"}],
+        "compositeIndexes": [
+            _composite(("userId", "ascending"), ("startEpoch", "ascending")),
+            _composite(("userId", "ascending"), ("start", "ascending")),
+            _composite(("userId", "ascending"), ("start", "descending")),
+        ],
+    },
+    # data_version.py: point reads and patches, plus the warm-up's scan for
+    # users whose meta documents changed recently.
+    "meta": {
+        "indexingMode": "consistent",
+        "automatic": True,
+        "includedPaths": _paths("userId", "_ts"),
+        "excludedPaths": [{"path": "/*"}],
+        "compositeIndexes": [],
+    },
+}
+
+# Representative query per shape for the RU report. Parameters are filled in
+# by the provisioning script.
+QUERY_SHAPES: Dict[str, List[Tuple[str, str]]] = {
+    "tasks": [
+        ("list_tasks", "SELECT * FROM c WHERE c.userId = @userId ORDER BY c.createdAt DESC"),
+        (
+            "list_tasks_by_status",
+            "SELECT * FROM c WHERE c.userId = @userId AND c.status = @status ORDER BY c.createdAt DESC",
+        ),
+        (
+            "delete_tasks_for_user",
+            "SELECT * FROM c WHERE c.userId = @userId AND c.list = @list ORDER BY c.createdAt DESC",
+        ),
+        (
+            "find_tasks_by_title",
+            "SELECT * FROM c WHERE c.userId = @userId AND LOWER(c.title) = @title ORDER BY c.createdAt DESC",
+        ),
+    ],
+    "events": [
+        ("list_events", "SELECT * FROM c WHERE c.userId = @userId ORDER BY c.start ASC"),
+        (
+            "list_events_range",
+            "SELECT * FROM c WHERE c.userId = @userId AND c.startEpoch >= @startEpoch "
+            "AND c.startEpoch < @endEpoch ORDER BY c.startEpoch ASC",
+        ),
+        (
+            "list_events_overlapping",
+            "SELECT * FROM c WHERE c.userId = @userId AND c.startEpoch < @rangeEndEpoch "
+            "AND c.endEpoch > @rangeStartEpoch ORDER BY c.startEpoch ASC",
+        ),
+        (
+            "find_events_by_title",
+            "SELECT * FROM c WHERE c.userId = @userId AND CONTAINS(LOWER(c.title), @title) ORDER BY c.start DESC",
+        ),
+    ],
+    "meta": [
+        ("recent_user_ids", "SELECT c.userId, c._ts FROM c WHERE c._ts >= @since"),
+    ],
+}
+
+_SERVER_DEFAULTS = {'/"_etag"/?'}
+
+
+def normalize_policy(policy: Dict[str, Any]) -> Dict[str, Any]:
+    # Drop what the service adds on read (the _etag exclusion, index kinds)
+    # so a freshly applied policy compares equal to its definition.
+    return {
+        "indexingMode": str(policy.get("indexingMode", "consistent")).lower(),
+        "automatic": bool(policy.get("automatic", True)),
+        "includedPaths": sorted(p["path"] for p in policy.get("includedPaths", [])),
+        "excludedPaths": sorted(
+            p["path"] for p in policy.get("excludedPaths", []) if p["path"] not in _SERVER_DEFAULTS
+        ),
+        "compositeIndexes": sorted(
+            tuple((p["path"], p.get("order", "ascending").lower()) for p in composite)
+            for composite in policy.get("compositeIndexes", [])
+        ),
+    }
+
+
+def policy_diff(current: Dict[str, Any], desired: Dict[str, Any]) -> Dict[str, Any]:
+    before = normalize_policy(current)
+    after = normalize_policy(desired)
+    diff: Dict[str, Any] = {}
+    for key in after:
+        if before[key] == after[key]:
+            continue
+        if isinstance(after[key], list):
+            diff[key] = {
+                "add": [item for item in after[key] if item not in before[key]],
+                "remove": [item for item in before[key] if item not in after[key]],
+            }
+        else:
+            diff[key] = {"from": before[key], "to": after[key]}
+    return diff
+
+
+def referenced_properties(query: str) -> List[str]:
+    return sorted(set(re.findall(r"\bc\.(\w+)", query)))
@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+try:
+    from .metrics import MetricsRegistry, metrics as default_metrics
+    from .rate_limiter import AdaptiveRateLimiter, estimate_prompt_tokens
+except ImportError:
+    from metrics import MetricsRegistry, metrics as default_metrics
+    from rate_limiter import AdaptiveRateLimiter, estimate_prompt_tokens
+
+# Small, low-latency deployment for picking tools; unset keeps a single model.
+AZURE_OPENAI_ROUTER_MODEL = os.environ.get("AZURE_OPENAI_ROUTER_DEPLOYMENT_NAME") or None
+
+_JSON_TYPES: Dict[str, Any] = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "object": dict,
+    "array": list,
+}
+
+
+def validate_arguments(arguments: Optional[str], schema: Dict[str, Any]) -> Optional[str]:
+    try:
+        args = json.loads(arguments or "{}")
+    except ValueError:
+        return "arguments are not valid JSON"
+    if not isinstance(args, dict):
+        return "arguments are not an object"
+
+    properties = schema.get("properties", {})
+    for name in schema.get("required", []):
+        if args.get(name) in (None, ""):
+            return f"missing required argument {name}"
+
+    for name, value in args.items():
+        spec = properties.get(name)
+        if spec is None or value is None or value == "":
+            continue
+        expected = _JSON_TYPES.get(spec.get("type"))
+        if expected and (not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool)):
+            return f"argument {name} should be {spec['type']}"
+        if "enum" in spec and value not in spec["enum"]:
+            return f"argument {name} is not one of {spec['enum']}"
+    return None
+
+
+def validate_tool_calls(tool_calls: Iterable[Any], tools: Iterable[Dict[str, Any]]) -> Optional[str]:
+    schemas = {tool["function"]["name"]: tool["function"].get("parameters", {}) for tool in tools}
+    for tool_call in tool_calls:
+        name = tool_call.function.name
+        if name not in schemas:
+            return f"unknown tool {name}"
+        problem = validate_arguments(tool_call.function.arguments, schemas[name])
+        if problem:
+            return f"{name}: {problem}"
+    return None
+
+
+@dataclass
+class CompletionCost:
+    route: str
+    model: str
+    usage: Any
+    latency_ms: float
+
+
+@dataclass
+class RoutedMessage:
+    message: Any
+    model: str
+    fallback_reason: Optional[str] = None
+    # One entry per completion the answer took, fallbacks included.
+    costs: List[CompletionCost] = field(default_factory=list)
+
+
+class ChatModelRouter:
+    """Routes tool selection to a small deployment and everything else to the full one.
+
+    The small model's answer is used only if it calls known tools with
+    arguments matching their schemas. A plain-text answer counts as an
+    ambiguous turn. Either case falls back to the full model.
+    """
+
+    def __init__(
+        self,
+        create: Callable[..., Any],
+        limiter: AdaptiveRateLimiter,
+        full_model: str,
+        router_model: Optional[str] = None,
+        metrics: MetricsRegistry = default_metrics,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self._create = create
+        self._limiter = limiter
+        self.full_model = full_model
+        self.router_model = router_model if router_model != full_model else None
+        self._metrics = metrics
+        self._clock = clock
+
+    def _complete(
+        self,
+        route: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        deadline: float,
+        max_tokens: int,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        temperature: float = 0.3,
+        costs: Optional[List[CompletionCost]] = None,
+    ) -> Any:
+        options: Dict[str, Any] = {}
+        if tools:
+            options = {"tools": tools, "tool_choice": "auto"}
+        started = self._clock()
+        usage = None
+        try:
+            completion = self._limiter.call(
+                lambda: self._create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    **options,
+                ),
+                prompt_tokens=estimate_prompt_tokens(messages, tools),
+                max_tokens=max_tokens,
+                deadline=deadline,
+            )
+            usage = getattr(completion, "usage", None)
+            return completion
+        finally:
+            latency_ms = (self._clock() - started) * 1000
+            self._metrics.observe(f"chat.route.{route}.latency_ms", latency_ms)
+            if costs is not None:
+                costs.append(CompletionCost(route, model, usage, latency_ms))
+
+    def select_tools(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        deadline: float,
+        max_tokens: int = 400,
+    ) -> RoutedMessage:
+        costs: List[CompletionCost] = []
+        if not self.router_model:
+            completion = self._complete(
+                "select", self.full_model, messages, deadline, max_tokens, tools, costs=costs
+            )
+            return RoutedMessage(completion.choices[0].message, self.full_model, costs=costs)
+
+        completion = self._complete(
+            "router", self.router_model, messages, deadline, max_tokens, tools, 0.0, costs
+        )
+        message = completion.choices[0].message
+        if not message.tool_calls:
+            reason = "no_tool_call"
+            problem = "no tool call"
+        else:
+            problem = validate_tool_calls(message.tool_calls, tools)
+            reason = "schema" if problem else None
+
+        self._metrics.incr("chat.route.router_calls")
+        if reason is None:
+            self._publish_fallback_rate()
+            return RoutedMessage(message, self.router_model, costs=costs)
+
+        self._metrics.incr("chat.route.fallbacks")
+        self._metrics.incr(f"chat.route.fallback.{reason}")
+        self._publish_fallback_rate()
+        logging.info("Router model output rejected (%s), falling back to %s", problem, self.full_model)
+
+        completion = self._complete(
+            "select", self.full_model, messages, deadline, max_tokens, tools, costs=costs
+        )
+        return RoutedMessage(completion.choices[0].message, self.full_model, reason, costs)
+
+    def reply(
+        self,
+        messages: List[Dict[str, Any]],
+        deadline: float,
+        max_tokens: int = 400,
+    ) -> RoutedMessage:
+        costs: List[CompletionCost] = []
+        completion = self._complete("reply", self.full_model, messages, deadline, max_tokens, costs=costs)
+        return RoutedMessage(completion.choices[0].message, self.full_model, costs=costs)
+
+    def downgraded(self) -> "ChatModelRouter":
+        # Over-budget turns: the small deployment (if any) answers everything,
+        # with no fallback to the full model.
+        return ChatModelRouter(
+            self._create,
+            self._limiter,
+            full_model=self.router_model or self.full_model,
+            metrics=self._metrics,
+            clock=self._clock,
+        )
+
+    def _publish_fallback_rate(self) -> None:
+        calls = self._metrics.counter("chat.route.router_calls")
+        if calls:
+            self._metrics.set_gauge(
+                "chat.route.fallback_rate", self._metrics.counter("chat.route.fallbacks") / calls
+            )
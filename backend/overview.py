@@ -0,0 +1,165 @@
+from datetime import date, datetime, timedelta, tzinfo
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .timeutils import doc_epoch
+except ImportError:
+    from timeutils import doc_epoch
+
+TASK_LISTS = ("Inbox", "Work", "Personal")
+DEFAULT_NEXT_TASKS = 5
+MAX_NEXT_TASKS = 50
+
+
+def parse_month(value: Optional[str], today: date) -> Tuple[int, int]:
+    if not value:
+        return today.year, today.month
+
+    year_str, sep, month_str = value.partition("-")
+    if not sep or len(year_str) != 4 or len(month_str) != 2:
+        raise ValueError("month must be in YYYY-MM format")
+    year, month = int(year_str), int(month_str)
+    if not 1 <= month <= 12:
+        raise ValueError("month must be in YYYY-MM format")
+    return year, month
+
+
+def parse_day(value: Optional[str]) -> date:
+    try:
+        return date.fromisoformat(value or "")
+    except ValueError:
+        raise ValueError("day must be in YYYY-MM-DD format") from None
+
+
+def day_bounds(day: date, tz: tzinfo) -> Tuple[datetime, datetime]:
+    start = datetime(day.year, day.month, day.day, tzinfo=tz)
+    following = day + timedelta(days=1)
+    return start, datetime(following.year, following.month, following.day, tzinfo=tz)
+
+
+def month_bounds(year: int, month: int, tz: tzinfo) -> Tuple[datetime, datetime]:
+    start = datetime(year, month, 1, tzinfo=tz)
+    if month == 12:
+        end = datetime(year + 1, 1, 1, tzinfo=tz)
+    else:
+        end = datetime(year, month + 1, 1, tzinfo=tz)
+    return start, end
+
+
+def count_open_tasks_by_list(tasks: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    counts = {name: 0 for name in TASK_LISTS}
+    for task in tasks:
+        if task.get("status", "open") != "open":
+            continue
+        list_name = task.get("list") or "Inbox"
+        counts[list_name] = counts.get(list_name, 0) + 1
+    return counts
+
+
+def next_open_tasks(tasks: Iterable[Dict[str, Any]], limit: int, tz: tzinfo) -> List[Dict[str, Any]]:
+    def sort_key(task: Dict[str, Any]) -> Tuple[int, int]:
+        due = doc_epoch(task, "dueDate", "dueEpoch", tz)
+        return (0, due) if due is not None else (1, 0)
+
+    open_tasks = [task for task in tasks if task.get("status", "open") == "open"]
+    open_tasks.sort(key=sort_key)
+    return [
+        {
+            "id": str(task.get("id")),
+            "title": task.get("title"),
+            "list": task.get("list"),
+            "status": task.get("status"),
+            "dueDate": task.get("dueDate"),
+        }
+        for task in open_tasks[:limit]
+    ]
+
+
+def event_local_span(event: Dict[str, Any], tz: tzinfo) -> Optional[Tuple[datetime, datetime]]:
+    start_epoch = doc_epoch(event, "start", "startEpoch", tz)
+    if start_epoch is None:
+        return None
+    end_epoch = doc_epoch(event, "end", "endEpoch", tz)
+    if end_epoch is None or end_epoch < start_epoch:
+        end_epoch = start_epoch
+    return datetime.fromtimestamp(start_epoch, tz), datetime.fromtimestamp(end_epoch, tz)
+
+
+def bucket_events_by_day(
+    events: Iterable[Dict[str, Any]],
+    range_start: datetime,
+    range_end: datetime,
+    tz: tzinfo,
+) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
+    # Multi-day events count on every local day they touch. End times are
+    # exclusive, so an event ending at midnight does not mark the next day.
+    day_counts: Dict[str, int] = {}
+    in_range: List[Dict[str, Any]] = []
+    first_day = range_start.date()
+    last_day = (range_end - timedelta(microseconds=1)).date()
+
+    for event in events:
+        span = event_local_span(event, tz)
+        if not span:
+            continue
+        start, end = span
+        if start >= range_end:
+            continue
+        if end > start and end <= range_start:
+            continue
+        if end == start and start < range_start:
+            continue
+
+        last_touched = (end - timedelta(microseconds=1)).date() if end > start else start.date()
+        day = max(start.date(), first_day)
+        stop = min(last_touched, last_day)
+        while day <= stop:
+            key = day.isoformat()
+            day_counts[key] = day_counts.get(key, 0) + 1
+            day += timedelta(days=1)
+
+        in_range.append(
+            {
+                "id": str(event.get("id")),
+                "title": event.get("title"),
+                "start": event.get("start"),
+                "end": event.get("end"),
+                "list": event.get("list"),
+            }
+        )
+
+    return day_counts, in_range
+
+
+def events_on_day(events: Iterable[Dict[str, Any]], day: date, tz: tzinfo) -> List[Dict[str, Any]]:
+    day_start, day_end = day_bounds(day, tz)
+    _, on_day = bucket_events_by_day(events, day_start, day_end, tz)
+    return sorted(on_day, key=lambda event: doc_epoch(event, "start", "startEpoch", tz) or 0)
+
+
+def build_overview(
+    open_tasks: List[Dict[str, Any]],
+    events: List[Dict[str, Any]],
+    year: int,
+    month: int,
+    tz: tzinfo,
+    next_limit: int = DEFAULT_NEXT_TASKS,
+    day: Optional[date] = None,
+) -> Dict[str, Any]:
+    # Only the per-day markers cover the whole month; event details are sent
+    # for one day, and the client asks for other days as they are picked.
+    range_start, range_end = month_bounds(year, month, tz)
+    event_days, _ = bucket_events_by_day(events, range_start, range_end, tz)
+    task_counts = count_open_tasks_by_list(open_tasks)
+    if day is not None and (day.year, day.month) != (year, month):
+        day = None
+
+    return {
+        "month": f"{year:04d}-{month:02d}",
+        "taskCounts": task_counts,
+        "openTaskCount": sum(task_counts.values()),
+        "nextTasks": next_open_tasks(open_tasks, next_limit, tz),
+        "eventDays": event_days,
+        "day": day.isoformat() if day else None,
+        "events": events_on_day(events, day, tz) if day else [],
+    }
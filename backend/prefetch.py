@@ -0,0 +1,161 @@
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Any, Dict, List, Optional, Set
+
+try:
+    from .columnar import EventColumns, TaskColumns
+    from .etags import EVENTS_SCOPE, TASKS_SCOPE
+    from .metrics import metrics
+    from .projection import EVENT_SUMMARY_FIELDS, TASK_SUMMARY_FIELDS
+except ImportError:
+    from columnar import EventColumns, TaskColumns
+    from etags import EVENTS_SCOPE, TASKS_SCOPE
+    from metrics import metrics
+    from projection import EVENT_SUMMARY_FIELDS, TASK_SUMMARY_FIELDS
+
+CHAT_PREFETCH_ENABLED = os.environ.get("CHAT_PREFETCH_ENABLED", "true").lower() == "true"
+CHAT_PREFETCH_EVENT_DAYS = int(os.environ.get("CHAT_PREFETCH_EVENT_DAYS", "14"))
+
+# Lower-cased stems; Finnish words inflect, so match on prefixes of the word.
+TASK_HINTS = (
+    "tehtäv", "task", "todo", "to-do", "inbox", "work", "personal", "lista",
+    "avoim", "open",
+)
+EVENT_HINTS = (
+    "tapahtum", "kalenter", "palaver", "tapaami", "event", "calendar", "meeting", "schedule",
+    "tänään", "huomen", "viiko", "viikk", "today", "tomorrow", "week",
+)
+
+WRITE_TOOL_SCOPES = {
+    "create_task": TASKS_SCOPE,
+    "delete_task": TASKS_SCOPE,
+    "delete_tasks_in_list": TASKS_SCOPE,
+    "update_task": TASKS_SCOPE,
+    "create_event": EVENTS_SCOPE,
+    "delete_event": EVENTS_SCOPE,
+    "delete_events_in_range": EVENTS_SCOPE,
+    "update_event": EVENTS_SCOPE,
+}
+
+
+def prefetch_hints(message: str) -> Set[str]:
+    text = message.lower()
+    hints: Set[str] = set()
+    if any(hint in text for hint in TASK_HINTS):
+        hints.add(TASKS_SCOPE)
+    if any(hint in text for hint in EVENT_HINTS):
+        hints.add(EVENTS_SCOPE)
+    return hints
+
+
+class ChatPrefetch:
+    """Speculative reads issued while the first completion is in flight.
+
+    Only the user's open tasks and the events overlapping the next
+    CHAT_PREFETCH_EVENT_DAYS are fetched. A tool uses the data only if it
+    fully covers the tool's query. Any write in the turn drops that scope.
+    """
+
+    def __init__(
+        self,
+        executor: ThreadPoolExecutor,
+        storage: Any,
+        user_id: str,
+        message: str,
+        now: datetime,
+        tz: tzinfo,
+        enabled: bool = CHAT_PREFETCH_ENABLED,
+    ) -> None:
+        self._tz = tz
+        self._futures: Dict[str, Future] = {}
+        self._docs: Dict[str, List[Dict[str, Any]]] = {}
+        self.window_start = int(now.timestamp())
+        self.window_end = int((now + timedelta(days=CHAT_PREFETCH_EVENT_DAYS)).timestamp())
+        if not enabled:
+            return
+
+        hints = prefetch_hints(message)
+        if TASKS_SCOPE in hints:
+            self._futures[TASKS_SCOPE] = executor.submit(
+                storage.list_tasks_by_status, user_id, "open", fields=TASK_SUMMARY_FIELDS
+            )
+        if EVENTS_SCOPE in hints:
+            self._futures[EVENTS_SCOPE] = executor.submit(
+                storage.list_events_overlapping,
+                user_id,
+                _utc_iso(self.window_start),
+                _utc_iso(self.window_end),
+                fields=EVENT_SUMMARY_FIELDS,
+            )
+        for scope in self._futures:
+            metrics.incr(f"chat.prefetch.started.{scope}")
+
+    def invalidate(self, scope: str) -> None:
+        self._docs.pop(scope, None)
+        future = self._futures.pop(scope, None)
+        if future is not None:
+            future.cancel()
+            metrics.incr(f"chat.prefetch.discarded.{scope}")
+
+    def discard(self) -> None:
+        for scope in list(self._futures):
+            self.invalidate(scope)
+
+    def _covers(self, scope: str) -> bool:
+        return scope in self._docs or scope in self._futures
+
+    def _result(self, scope: str) -> Optional[List[Dict[str, Any]]]:
+        if scope in self._docs:
+            return self._docs[scope]
+        future = self._futures.pop(scope)
+        started = time.perf_counter()
+        try:
+            docs = future.result()
+        except Exception:
+            logging.warning("Prefetch of %s failed, querying directly", scope, exc_info=True)
+            return None
+        metrics.observe("chat.prefetch.wait_ms", (time.perf_counter() - started) * 1000)
+        self._docs[scope] = docs
+        return docs
+
+    def open_tasks(self, status: Optional[str]) -> Optional[TaskColumns]:
+        if not self._covers(TASKS_SCOPE):
+            return None
+        if status != "open":
+            metrics.incr(f"chat.prefetch.miss.{TASKS_SCOPE}")
+            return None
+        docs = self._result(TASKS_SCOPE)
+        if docs is None:
+            return None
+        metrics.incr(f"chat.prefetch.hit.{TASKS_SCOPE}")
+        return TaskColumns(docs, self._tz)
+
+    def events(
+        self,
+        start: Optional[int],
+        end: Optional[int],
+        not_ended_before: Optional[int],
+    ) -> Optional[EventColumns]:
+        if not self._covers(EVENTS_SCOPE):
+            return None
+        # The prefetch holds events with start < window_end and end > window_start;
+        # the query must imply both bounds to be answered from it.
+        ends_inside = end is not None and end <= self.window_end
+        starts_inside = (start is not None and start >= self.window_start) or (
+            not_ended_before is not None and not_ended_before > self.window_start
+        )
+        if not (ends_inside and starts_inside):
+            metrics.incr(f"chat.prefetch.miss.{EVENTS_SCOPE}")
+            return None
+        docs = self._result(EVENTS_SCOPE)
+        if docs is None:
+            return None
+        metrics.incr(f"chat.prefetch.hit.{EVENTS_SCOPE}")
+        return EventColumns(docs, self._tz)
+
+
+def _utc_iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
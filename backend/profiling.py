@@ -0,0 +1,251 @@
+import functools
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from .metrics import MetricsRegistry, metrics as default_metrics
+except ImportError:
+    from metrics import MetricsRegistry, metrics as default_metrics
+
+# Profiling is off unless a sample rate or a key is set. A request carrying
+# PROFILE_HEADER with the key's value is always profiled.
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_KEY = os.environ.get("PROFILING_KEY") or None
+PROFILE_HEADER = "X-Profile"
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "timeplanner-profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "2"))
+PROFILE_TOP_ALLOCATIONS = int(os.environ.get("PROFILE_TOP_ALLOCATIONS", "20"))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "50"))
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+_IGNORED_FILES = (tracemalloc.__file__, __file__)
+
+
+def _frame_name(frame: Any) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer, as collapsed stacks.
+
+    Works like py-spy inside the process: a daemon thread reads the target
+    thread's current frame every interval and counts each root-to-leaf path.
+    Handlers that fan out to db_io_executor only show their own thread.
+    """
+
+    def __init__(self, thread_id: int, interval_s: float) -> None:
+        self._thread_id = thread_id
+        self._interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self.stacks: Counter = Counter()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_s):
+            frame = sys._current_frames().get(self._thread_id)
+            names: List[str] = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+@dataclass
+class Profile:
+    id: str
+    name: str
+    started_at: str
+    wall_ms: float
+    interval_ms: float
+    samples: int
+    peak_kib: float
+    stacks: Dict[str, int] = field(default_factory=dict)
+    allocations: List[Dict[str, Any]] = field(default_factory=list)
+
+    def collapsed(self) -> str:
+        # One "root;...;leaf count" line per stack; flamegraph.pl and
+        # speedscope read this directly.
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+def top_allocations(snapshot: tracemalloc.Snapshot, limit: int) -> List[Dict[str, Any]]:
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, name) for name in _IGNORED_FILES])
+    return [
+        {
+            "file": stat.traceback[0].filename,
+            "line": stat.traceback[0].lineno,
+            "sizeKiB": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+class RequestProfiler:
+    """Opt-in CPU and memory profiling of single HTTP requests.
+
+    A profiled request runs under a StackSampler and tracemalloc; the result
+    is written to directory as JSON and the response gets X-Profile-Id and
+    X-Profile-Url headers pointing at it. Only one request is profiled at a
+    time, since tracemalloc is process-wide. When neither a sample rate nor a
+    key is configured, wrap() returns the handler untouched.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = PROFILING_SAMPLE_RATE,
+        key: Optional[str] = PROFILING_KEY,
+        directory: str = PROFILE_DIR,
+        interval_ms: float = PROFILE_INTERVAL_MS,
+        top: int = PROFILE_TOP_ALLOCATIONS,
+        keep: int = PROFILE_KEEP,
+        metrics: MetricsRegistry = default_metrics,
+        sampler: Callable[[], float] = random.random,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.key = key
+        self.directory = directory
+        self.interval_ms = interval_ms
+        self.top = top
+        self.keep = keep
+        self._metrics = metrics
+        self._sampler = sampler
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.key is not None
+
+    def requested(self, headers: Any) -> bool:
+        supplied = (headers or {}).get(PROFILE_HEADER)
+        if self.key is not None and supplied and hmac.compare_digest(supplied, self.key):
+            return True
+        return self.sample_rate > 0 and self._sampler() < self.sample_rate
+
+    def run(self, name: str, fn: Callable[[], Any]) -> Tuple[Any, Optional[Profile]]:
+        if not self._busy.acquire(blocking=False):
+            self._metrics.incr("profiling.skipped_busy")
+            return fn(), None
+
+        try:
+            sampler = StackSampler(threading.get_ident(), self.interval_ms / 1000)
+            started_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            # Leave tracing alone if something else (python -X tracemalloc) owns it.
+            owns_tracing = not tracemalloc.is_tracing()
+            if owns_tracing:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+            sampler.start()
+            started = time.perf_counter()
+            try:
+                result = fn()
+            finally:
+                wall_ms = (time.perf_counter() - started) * 1000
+                stacks = sampler.stop()
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                if owns_tracing:
+                    tracemalloc.stop()
+        finally:
+            self._busy.release()
+
+        profile = Profile(
+            id=uuid.uuid4().hex,
+            name=name,
+            started_at=started_at,
+            wall_ms=round(wall_ms, 2),
+            interval_ms=self.interval_ms,
+            samples=sum(stacks.values()),
+            peak_kib=round(peak / 1024, 1),
+            stacks=dict(stacks),
+            allocations=top_allocations(snapshot, self.top),
+        )
+        self._metrics.incr("profiling.profiles")
+        return result, profile
+
+    def save(self, profile: Profile) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{profile.id}.json")
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(asdict(profile), handle)
+        self._prune()
+        return path
+
+    def _prune(self) -> None:
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+        paths.sort(key=os.path.getmtime)
+        for path in paths[: max(0, len(paths) - self.keep)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def load(self, profile_id: str) -> Optional[Profile]:
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json"), encoding="utf-8") as handle:
+                return Profile(**json.load(handle))
+        except FileNotFoundError:
+            return None
+
+    def wrap(self, handler: Callable[..., Any]) -> Callable[..., Any]:
+        if not self.enabled:
+            return handler
+
+        @functools.wraps(handler)
+        def wrapper(req: Any) -> Any:
+            if not self.requested(getattr(req, "headers", None)):
+                return handler(req)
+
+            response, profile = self.run(handler.__name__, lambda: handler(req))
+            if profile is None:
+                return response
+            try:
+                self.save(profile)
+            except OSError:
+                logging.warning("Could not write profile %s", profile.id, exc_info=True)
+                return response
+            logging.info(
+                "Profiled %s: %.1f ms, %d samples, peak %.1f KiB, id %s",
+                profile.name,
+                profile.wall_ms,
+                profile.samples,
+                profile.peak_kib,
+                profile.id,
+            )
+            headers = getattr(response, "headers", None)
+            if headers is not None:
+                headers["X-Profile-Id"] = profile.id
+                headers["X-Profile-Url"] = f"/api/diagnostics/profiles/{profile.id}"
+            return response
+
+        return wrapper
+
+
+profiler = RequestProfiler()
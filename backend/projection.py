@@ -0,0 +1,53 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Fields = Optional[Sequence[str]]
+
+# Everything the API exposes. Cosmos system properties (_rid, _self, _etag,
+# _ts, _attachments) are never part of it.
+TASK_FIELDS = ("id", "userId", "title", "list", "status", "createdAt", "dueDate", "dueEpoch")
+EVENT_FIELDS = ("id", "userId", "title", "start", "end", "list", "createdAt", "startEpoch", "endEpoch")
+
+# What the chat tools, overview and heatmap read: the display fields, the
+# epochs the columnar filters use and the sort key the unit of work re-sorts on.
+TASK_SUMMARY_FIELDS = ("id", "title", "list", "status", "createdAt", "dueDate", "dueEpoch")
+EVENT_SUMMARY_FIELDS = ("id", "title", "list", "start", "end", "startEpoch", "endEpoch")
+
+_FIELD_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+
+
+def with_fields(fields: Fields, *required: str) -> Fields:
+    # None means every field, which already includes the required ones.
+    if fields is None:
+        return None
+    return tuple(dict.fromkeys((*fields, *required)))
+
+
+def select_clause(fields: Fields, alias: str = "c") -> str:
+    if fields is None:
+        return f"SELECT * FROM {alias}"
+    if not fields:
+        raise ValueError("fields must not be empty")
+    for field in fields:
+        # Field names end up in the SQL text, so only plain identifiers pass.
+        if not _FIELD_NAME.match(field):
+            raise ValueError(f"Invalid field name: {field!r}")
+    return "SELECT " + ", ".join(f"{alias}.{field}" for field in fields) + f" FROM {alias}"
+
+
+def strip_system_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in doc.items() if not key.startswith("_")}
+
+
+def project(doc: Dict[str, Any], fields: Fields) -> Dict[str, Any]:
+    if fields is None:
+        return strip_system_fields(doc)
+    return {field: doc[field] for field in fields if field in doc}
+
+
+def project_all(docs: Iterable[Dict[str, Any]], fields: Fields) -> List[Dict[str, Any]]:
+    return [project(doc, fields) for doc in docs]
+
+
+def fields_key(fields: Fields) -> Optional[Tuple[str, ...]]:
+    return None if fields is None else tuple(fields)
@@ -0,0 +1,221 @@
+import base64
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+try:
+    from .cosmos_scheduler import INTERACTIVE, CosmosScheduler, cosmos_scheduler
+    from .metrics import MetricsRegistry, metrics as default_metrics
+except ImportError:
+    from cosmos_scheduler import INTERACTIVE, CosmosScheduler, cosmos_scheduler
+    from metrics import MetricsRegistry, metrics as default_metrics
+
+COSMOS_QUERY_METRICS_SAMPLE_RATE = float(os.environ.get("COSMOS_QUERY_METRICS_SAMPLE_RATE", "0.1"))
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_RU = float(os.environ.get("SLOW_QUERY_RU", "10"))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", "200"))
+
+QUERY_METRICS_HEADER = "x-ms-documentdb-query-metrics"
+INDEX_METRICS_HEADER = "x-ms-cosmos-index-utilization"
+CHARGE_HEADER = "x-ms-request-charge"
+
+_sampler = random.Random()
+
+
+def parse_query_metrics(header: Optional[str]) -> Dict[str, float]:
+    # "totalExecutionTimeInMs=0.52;retrievedDocumentCount=10;..." per page.
+    parsed: Dict[str, float] = {}
+    for part in (header or "").split(";"):
+        name, sep, value = part.partition("=")
+        if sep:
+            try:
+                parsed[name.strip()] = float(value)
+            except ValueError:
+                continue
+    return parsed
+
+
+def parse_index_metrics(header: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not header:
+        return None
+    try:
+        return json.loads(base64.b64decode(header).decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+@dataclass
+class QueryRecord:
+    caller: str
+    query: str
+    ms: float
+    ru: float
+    returned: int
+    sampled: bool
+    retrieved: Optional[int] = None
+    index_hit_ratio: Optional[float] = None
+    potential_indexes: List[str] = field(default_factory=list)
+    at: str = ""
+
+
+@dataclass
+class _Offender:
+    caller: str
+    query: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    total_ru: float = 0.0
+    max_ru: float = 0.0
+    last_at: str = ""
+
+
+class SlowQueryLog:
+    """Times every Cosmos query and keeps the ones over the thresholds.
+
+    Latency and RU are measured for every query. Query and index metrics,
+    which cost extra work on the server, are requested for a sampled share
+    only. Slow queries are aggregated by caller and parameterized text, so a
+    repeated offender shows up once with its totals. With a scheduler, the
+    query and its pages run as one scheduled operation, so their charge
+    counts against the RU budget and a throttled page is retried.
+    """
+
+    def __init__(
+        self,
+        slow_ms: float = SLOW_QUERY_MS,
+        slow_ru: float = SLOW_QUERY_RU,
+        sample_rate: float = COSMOS_QUERY_METRICS_SAMPLE_RATE,
+        size: int = SLOW_QUERY_LOG_SIZE,
+        metrics: MetricsRegistry = default_metrics,
+        sampler: Callable[[], float] = _sampler.random,
+        scheduler: Optional[CosmosScheduler] = None,
+    ) -> None:
+        self.slow_ms = slow_ms
+        self.slow_ru = slow_ru
+        self.sample_rate = sample_rate
+        self._metrics = metrics
+        self._sampler = sampler
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self._recent: Deque[QueryRecord] = deque(maxlen=size)
+        self._offenders: Dict[Tuple[str, str], _Offender] = {}
+
+    def run(
+        self,
+        container: Any,
+        query: str,
+        parameters: List[Dict[str, Any]],
+        caller: str,
+        priority: str = INTERACTIVE,
+        **kwargs: Any,
+    ) -> List[Dict[str, Any]]:
+        sampled = self._sampler() < self.sample_rate
+        if sampled:
+            kwargs.update(populate_query_metrics=True, populate_index_metrics=True)
+
+        # The SDK calls the hook once per fetched page; charge and metrics
+        # headers are per page, so they are summed afterwards. The client's
+        # last_response_headers would race with other threads sharing it.
+        # Pages of throttled attempts were charged too, so they stay counted.
+        pages: List[Dict[str, Any]] = []
+        kwargs.update(
+            query=query,
+            parameters=parameters,
+            response_hook=lambda headers, *_: pages.append(dict(headers)),
+        )
+        started = time.perf_counter()
+        if self._scheduler is None:
+            items = list(container.query_items(**kwargs))
+        else:
+            items = self._scheduler.run_query(container.query_items, priority=priority, **kwargs)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        ru = 0.0
+        query_metrics: Dict[str, float] = {}
+        index_metrics: Optional[Dict[str, Any]] = None
+        for headers in pages:
+            ru += float(headers.get(CHARGE_HEADER) or 0)
+            for name, value in parse_query_metrics(headers.get(QUERY_METRICS_HEADER)).items():
+                query_metrics[name] = query_metrics.get(name, 0.0) + value
+            index_metrics = index_metrics or parse_index_metrics(headers.get(INDEX_METRICS_HEADER))
+
+        record = QueryRecord(
+            caller=caller,
+            query=query,
+            ms=round(elapsed_ms, 2),
+            ru=round(ru, 2),
+            returned=len(items),
+            sampled=sampled,
+            at=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        )
+        if "retrievedDocumentCount" in query_metrics:
+            record.retrieved = int(query_metrics["retrievedDocumentCount"])
+        if "indexHitRatio" in query_metrics:
+            record.index_hit_ratio = query_metrics["indexHitRatio"]
+        if index_metrics:
+            record.potential_indexes = [
+                entry.get("IndexSpec", "")
+                for key in ("PotentialSingleIndexes", "PotentialCompositeIndexes")
+                for entry in index_metrics.get(key) or []
+            ]
+        self.record(record)
+        return items
+
+    def record(self, record: QueryRecord) -> None:
+        self._metrics.observe("cosmos.query.ms", record.ms)
+        self._metrics.observe("cosmos.query.ru", record.ru)
+        if record.ms < self.slow_ms and record.ru < self.slow_ru:
+            return
+
+        self._metrics.incr("cosmos.query.slow")
+        logging.warning(
+            "Slow Cosmos query in %s: %.1f ms, %.2f RU, %d returned, %s retrieved: %s",
+            record.caller,
+            record.ms,
+            record.ru,
+            record.returned,
+            record.retrieved if record.retrieved is not None else "?",
+            record.query,
+        )
+        with self._lock:
+            self._recent.append(record)
+            offender = self._offenders.setdefault(
+                (record.caller, record.query), _Offender(record.caller, record.query)
+            )
+            offender.count += 1
+            offender.total_ms += record.ms
+            offender.max_ms = max(offender.max_ms, record.ms)
+            offender.total_ru += record.ru
+            offender.max_ru = max(offender.max_ru, record.ru)
+            offender.last_at = record.at
+
+    def top(self, limit: int = 10, by: str = "total_ru") -> List[Dict[str, Any]]:
+        if by not in {"count", "total_ms", "max_ms", "total_ru", "max_ru"}:
+            raise ValueError(f"Cannot rank slow queries by {by!r}")
+        with self._lock:
+            offenders = sorted(self._offenders.values(), key=lambda entry: getattr(entry, by), reverse=True)
+        return [
+            {**asdict(entry), "avg_ms": round(entry.total_ms / entry.count, 2)}
+            for entry in offenders[:limit]
+        ]
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            records = list(self._recent)[-limit:]
+        return [asdict(record) for record in reversed(records)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._offenders.clear()
+
+
+slow_query_log = SlowQueryLog(scheduler=cosmos_scheduler)
@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Deque, Iterable, Optional, Tuple, Type, TypeVar
+
+try:
+    from .metrics import MetricsRegistry, metrics as default_metrics
+except ImportError:
+    from metrics import MetricsRegistry, metrics as default_metrics
+
+T = TypeVar("T")
+
+OPENAI_RPM_LIMIT = int(os.environ.get("OPENAI_RPM_LIMIT", "60"))
+OPENAI_TPM_LIMIT = int(os.environ.get("OPENAI_TPM_LIMIT", "60000"))
+OPENAI_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_QUEUE_TIMEOUT_SECONDS", "20"))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "4"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 8.0
+
+# AIMD on the refill rate: halve on a 429, creep back after each success.
+MIN_RATE_FACTOR = 0.1
+RATE_DECREASE = 0.5
+RATE_INCREASE = 0.05
+
+_jitter = random.Random()
+
+
+class RateLimitExceeded(Exception):
+    """The call could not be admitted or retried before its deadline."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, now: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = now
+
+    def refill(self, now: float, factor: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * factor)
+        self.updated = now
+
+    def seconds_until(self, amount: float, factor: float) -> float:
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / (self.rate * factor)
+
+
+def estimate_prompt_tokens(messages: Iterable[Any], tools: Optional[Iterable[Any]] = None) -> int:
+    # Roughly four characters per token plus per-message framing; good enough
+    # for admission, and reconciled against reported usage afterwards.
+    messages = list(messages)
+    text = json.dumps(messages, ensure_ascii=False, default=str)
+    if tools:
+        text += json.dumps(list(tools), ensure_ascii=False)
+    return len(text) // 4 + 4 * len(messages)
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(attempt: int, rng: random.Random = _jitter) -> float:
+    # Full jitter: uniform over [0, base * 2^attempt], capped.
+    return rng.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+class AdaptiveRateLimiter:
+    """Process-wide RPM/TPM token buckets with a FIFO wait queue.
+
+    Callers are admitted in arrival order once both buckets can cover the
+    request's estimated tokens; anyone who cannot be served before their
+    deadline fails fast with RateLimitExceeded.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        queue_timeout: float,
+        max_retries: int,
+        name: str = "openai",
+        transient_errors: Tuple[Type[BaseException], ...] = (),
+        metrics: MetricsRegistry = default_metrics,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        now = clock()
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.name = name
+        self.transient_errors = transient_errors
+        self._metrics = metrics
+        self._clock = clock
+        self._sleep = sleep
+        self._requests = TokenBucket(requests_per_minute, now)
+        self._tokens = TokenBucket(tokens_per_minute, now)
+        self._factor = 1.0
+        self._blocked_until = 0.0
+        self._queue: Deque[object] = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def rate_factor(self) -> float:
+        return self._factor
+
+    def deadline(self, timeout: Optional[float] = None) -> float:
+        return self._clock() + (self.queue_timeout if timeout is None else timeout)
+
+    def _publish_depth(self) -> None:
+        self._metrics.set_gauge(f"{self.name}.queue_depth", len(self._queue))
+
+    def acquire(self, tokens: int, deadline: float) -> float:
+        cost = min(float(tokens), self._tokens.capacity)
+        ticket = object()
+        started = self._clock()
+        with self._cond:
+            self._queue.append(ticket)
+            self._publish_depth()
+            try:
+                while True:
+                    now = self._clock()
+                    if self._queue[0] is ticket:
+                        self._requests.refill(now, self._factor)
+                        self._tokens.refill(now, self._factor)
+                        wait = max(
+                            self._blocked_until - now,
+                            self._requests.seconds_until(1, self._factor),
+                            self._tokens.seconds_until(cost, self._factor),
+                        )
+                        if wait <= 0:
+                            self._requests.level -= 1
+                            self._tokens.level -= cost
+                            waited = now - started
+                            self._metrics.observe(f"{self.name}.wait_ms", waited * 1000)
+                            return waited
+                        if now + wait > deadline:
+                            self._metrics.incr(f"{self.name}.queue_timeouts")
+                            raise RateLimitExceeded("Rate limit queue deadline exceeded", wait)
+                    else:
+                        wait = deadline - now
+                        if wait <= 0:
+                            self._metrics.incr(f"{self.name}.queue_timeouts")
+                            raise RateLimitExceeded("Rate limit queue deadline exceeded", 1.0)
+                    self._cond.wait(wait)
+            finally:
+                self._queue.remove(ticket)
+                self._publish_depth()
+                self._cond.notify_all()
+
+    def settle(self, estimated: int, actual: Optional[int]) -> None:
+        if actual is None:
+            return
+        with self._cond:
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + estimated - actual)
+            self._cond.notify_all()
+
+    def on_throttled(self, retry_after: float) -> None:
+        with self._cond:
+            self._factor = max(MIN_RATE_FACTOR, self._factor * RATE_DECREASE)
+            self._blocked_until = max(self._blocked_until, self._clock() + retry_after)
+            self._cond.notify_all()
+        self._metrics.incr(f"{self.name}.throttles")
+        self._metrics.set_gauge(f"{self.name}.rate_factor", self._factor)
+
+    def on_success(self) -> None:
+        if self._factor < 1.0:
+            with self._cond:
+                self._factor = min(1.0, self._factor + RATE_INCREASE)
+            self._metrics.set_gauge(f"{self.name}.rate_factor", self._factor)
+
+    def _is_retryable(self, exc: BaseException) -> bool:
+        if isinstance(exc, self.transient_errors):
+            return True
+        return getattr(exc, "status_code", None) in RETRYABLE_STATUS
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        prompt_tokens: int,
+        max_tokens: int,
+        deadline: Optional[float] = None,
+    ) -> T:
+        estimated = prompt_tokens + max_tokens
+        deadline = self.deadline() if deadline is None else deadline
+        attempt = 0
+        while True:
+            self.acquire(estimated, deadline)
+            try:
+                result = fn()
+            except Exception as exc:
+                if not self._is_retryable(exc) or attempt >= self.max_retries:
+                    raise
+
+                retry_after = retry_after_seconds(exc)
+                delay = retry_after if retry_after is not None else backoff_seconds(attempt)
+                if self._clock() + delay > deadline:
+                    raise RateLimitExceeded("Upstream still throttling at deadline", delay) from exc
+
+                self._metrics.incr(f"{self.name}.retries")
+                if getattr(exc, "status_code", None) == 429:
+                    # Throttles pause every caller, not just this one.
+                    self.on_throttled(delay)
+                else:
+                    self._sleep(delay)
+                logging.warning(
+                    "%s call failed (%s), retry %d in %.2fs", self.name, exc, attempt + 1, delay
+                )
+                attempt += 1
+                continue
+
+            self.on_success()
+            usage = getattr(result, "usage", None)
+            self.settle(estimated, getattr(usage, "total_tokens", None))
+            return result
+
+
+def create_openai_limiter(transient_errors: Tuple[Type[BaseException], ...] = ()) -> AdaptiveRateLimiter:
+    return AdaptiveRateLimiter(
+        requests_per_minute=OPENAI_RPM_LIMIT,
+        tokens_per_minute=OPENAI_TPM_LIMIT,
+        queue_timeout=OPENAI_QUEUE_TIMEOUT_SECONDS,
+        max_retries=OPENAI_MAX_RETRIES,
+        transient_errors=transient_errors,
+    )
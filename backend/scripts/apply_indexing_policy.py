@@ -0,0 +1,165 @@
+# Applies the indexing policies from indexing_policy.py to the Cosmos
+# containers. For each container it shows the diff, replaces the policy, waits
+# for the online index transformation, and reports RU for the representative
+# query shapes and a probe write before and after.
+#
+# Run from the backend directory with the app's COSMOSDB_* settings exported:
+#
+#     python -m scripts.apply_indexing_policy --dry-run
+#     python -m scripts.apply_indexing_policy --report-user demo-user
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from azure.cosmos import CosmosClient, PartitionKey
+
+from indexing_policy import INDEXING_POLICY_VERSION, POLICIES, QUERY_SHAPES, policy_diff
+
+TRANSFORMATION_HEADER = "x-ms-documentdb-collection-index-transformation-progress"
+
+
+def container_names() -> Dict[str, str]:
+    return {
+        "tasks": os.environ.get("COSMOSDB_TASKS_CONTAINER", "tasks"),
+        "events": "events",
+        "meta": os.environ.get("COSMOSDB_META_CONTAINER", "meta"),
+    }
+
+
+def query_parameters(user_id: str) -> List[Dict[str, Any]]:
+    now = int(datetime.now(timezone.utc).timestamp())
+    week = int(timedelta(days=7).total_seconds())
+    return [
+        {"name": "@userId", "value": user_id},
+        {"name": "@status", "value": "open"},
+        {"name": "@list", "value": "Work"},
+        {"name": "@title", "value": "palaveri"},
+        {"name": "@startEpoch", "value": now},
+        {"name": "@endEpoch", "value": now + week},
+        {"name": "@rangeStartEpoch", "value": now},
+        {"name": "@rangeEndEpoch", "value": now + week},
+        {"name": "@since", "value": now - week},
+    ]
+
+
+def measure_query(container: Any, query: str, user_id: str) -> Dict[str, Any]:
+    params = [p for p in query_parameters(user_id) if p["name"] in query]
+    pages = container.query_items(
+        query=query,
+        parameters=params,
+        partition_key=user_id,
+        populate_query_metrics=True,
+    ).by_page()
+
+    charge = 0.0
+    items = 0
+    metrics: List[str] = []
+    for page in pages:
+        items += len(list(page))
+        headers = container.client_connection.last_response_headers
+        charge += float(headers.get("x-ms-request-charge") or 0)
+        if headers.get("x-ms-documentdb-query-metrics"):
+            metrics.append(headers["x-ms-documentdb-query-metrics"])
+    return {"ru": round(charge, 2), "items": items, "queryMetrics": metrics}
+
+
+def measure_write(container: Any, name: str, user_id: str) -> float:
+    probe: Dict[str, Any] = {
+        "id": f"index-probe-{uuid.uuid4().hex}",
+        "userId": user_id,
+        "title": "Index probe",
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+    }
+    if name == "tasks":
+        probe.update({"list": "Inbox", "status": "open", "dueDate": None, "dueEpoch": None})
+    if name == "events":
+        probe.update(
+            {
+                "start": "2000-01-01T00:00:00Z",
+                "end": "2000-01-01T01:00:00Z",
+                "startEpoch": 946684800,
+                "endEpoch": 946688400,
+            }
+        )
+
+    charges: List[float] = []
+    hook = lambda headers, *_: charges.append(float(headers.get("x-ms-request-charge") or 0))  # noqa: E731
+    container.create_item(probe, response_hook=hook)
+    container.delete_item(probe["id"], partition_key=user_id)
+    return round(charges[0], 2) if charges else 0.0
+
+
+def ru_report(container: Any, name: str, user_id: str) -> Dict[str, Any]:
+    report = {
+        query_name: measure_query(container, query, user_id)
+        for query_name, query in QUERY_SHAPES.get(name, [])
+    }
+    report["write_probe"] = {"ru": measure_write(container, name, user_id)}
+    return report
+
+
+def wait_for_transformation(container: Any, timeout: float) -> Optional[int]:
+    deadline = time.monotonic() + timeout
+    progress: Optional[int] = None
+    while time.monotonic() < deadline:
+        headers: Dict[str, Any] = {}
+        container.read(populate_quota_info=True, response_hook=lambda h, *_: headers.update(h))
+        value = headers.get(TRANSFORMATION_HEADER)
+        progress = int(value) if value is not None else 100
+        if progress >= 100:
+            return progress
+        logging.info("Index transformation at %d%%", progress)
+        time.sleep(5)
+    return progress
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=f"Apply indexing policy v{INDEXING_POLICY_VERSION}.")
+    parser.add_argument("--containers", nargs="+", default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument("--dry-run", action="store_true", help="Only print the diff.")
+    parser.add_argument("--report-user", help="Partition to run the RU report against, before and after.")
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds to wait for re-indexing.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    client = CosmosClient(os.environ["COSMOSDB_ENDPOINT"], credential=os.environ["COSMOSDB_KEY"])
+    database = client.get_database_client(os.environ["COSMOSDB_DATABASE"])
+    names = container_names()
+
+    summary: Dict[str, Any] = {"version": INDEXING_POLICY_VERSION, "containers": {}}
+    for key in args.containers:
+        container = database.get_container_client(names[key])
+        properties = container.read()
+        diff = policy_diff(properties.get("indexingPolicy", {}), POLICIES[key])
+        entry: Dict[str, Any] = {"container": names[key], "diff": diff}
+        summary["containers"][key] = entry
+
+        if not diff:
+            logging.info("%s: policy already up to date", names[key])
+            continue
+        if args.dry_run:
+            continue
+
+        if args.report_user:
+            entry["before"] = ru_report(container, key, args.report_user)
+
+        database.replace_container(
+            container,
+            partition_key=PartitionKey(path=properties["partitionKey"]["paths"][0]),
+            indexing_policy=POLICIES[key],
+        )
+        entry["transformationProgress"] = wait_for_transformation(container, args.timeout)
+
+        if args.report_user:
+            entry["after"] = ru_report(container, key, args.report_user)
+
+    print(json.dumps(summary, indent=2, default=list))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+# Backfills startEpoch/endEpoch on events and dueEpoch on tasks written before
+# those fields existed, normalizing the ISO strings to UTC on the way.
+#
+# Run from the backend directory with the app's COSMOSDB_* settings exported:
+#
+#     python -m scripts.backfill_epochs
+import logging
+
+from db import backfill_due_epochs
+from db_events import backfill_event_epochs
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    events = backfill_event_epochs()
+    tasks = backfill_due_epochs()
+    logging.info("Backfilled %d events and %d tasks", events, tasks)
+
+
+if __name__ == "__main__":
+    main()
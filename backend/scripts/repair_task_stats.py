@@ -0,0 +1,29 @@
+# Recomputes the per-user task stats documents from the task documents. Run it
+# after restoring data, after manual edits in the portal, or whenever a stats
+# update was logged as failed.
+#
+# Run from the backend directory with the app's COSMOSDB_* settings exported:
+#
+#     python -m scripts.repair_task_stats
+#     python -m scripts.repair_task_stats --user demo-user
+import argparse
+import logging
+
+from db import list_task_user_ids, repair_task_stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild per-user task stats documents.")
+    parser.add_argument("--user", help="repair a single user instead of every user with tasks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    user_ids = [args.user] if args.user else list_task_user_ids()
+    for user_id in user_ids:
+        doc = repair_task_stats(user_id)
+        logging.info("Rebuilt task stats for %s: %d counters", user_id, len(doc["counts"]))
+    logging.info("Repaired task stats for %d users", len(user_ids))
+
+
+if __name__ == "__main__":
+    main()
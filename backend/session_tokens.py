@@ -0,0 +1,175 @@
+import base64
+import binascii
+import contextvars
+import functools
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Clients get the Cosmos session tokens of their writes in this header and
+# send the last value back. Reads of that request then see those writes
+# whichever instance serves it, while the account only has to provide
+# session consistency.
+SESSION_TOKEN_HEADER = "X-Session-Token"
+COSMOS_SESSION_TOKEN_HEADER = "x-ms-session-token"
+
+READ_METHODS = {"read_item", "query_items", "read_all_items"}
+WRITE_METHODS = {"create_item", "upsert_item", "replace_item", "delete_item", "patch_item", "execute_item_batch"}
+
+_current_scope: ContextVar[Optional["SessionScope"]] = ContextVar("cosmos_session_scope", default=None)
+
+
+def _global_lsn(progress: str) -> int:
+    # "<version>#<global LSN>[#<region>=<LSN>...]"
+    parts = progress.split("#")
+    try:
+        return int(parts[1]) if len(parts) > 1 else int(parts[0])
+    except ValueError:
+        return -1
+
+
+def merge_session_tokens(current: Optional[str], new: Optional[str]) -> Optional[str]:
+    """Combines two tokens of one container, keeping the newest progress of
+    every partition key range ("<range id>:<version>#<LSN>...", comma separated)."""
+    if not current or not new:
+        return new or current
+    ranges: Dict[str, str] = {}
+    for token in (current, new):
+        for part in token.split(","):
+            range_id, _, progress = part.partition(":")
+            if not progress:
+                continue
+            previous = ranges.get(range_id)
+            if previous is None or _global_lsn(progress) >= _global_lsn(previous):
+                ranges[range_id] = progress
+    return ",".join(f"{range_id}:{progress}" for range_id, progress in ranges.items()) or new
+
+
+def encode_tokens(tokens: Dict[str, str]) -> str:
+    raw = json.dumps(tokens, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_tokens(value: Optional[str]) -> Dict[str, str]:
+    # A missing or mangled header only costs read-your-writes, never the request.
+    if not value:
+        return {}
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+    except (binascii.Error, ValueError):
+        return {}
+    if not isinstance(decoded, dict):
+        return {}
+    return {str(key): item for key, item in decoded.items() if isinstance(item, str) and item}
+
+
+class SessionScope:
+    """Session tokens of one request, per container id."""
+
+    def __init__(self, tokens: Optional[Dict[str, str]] = None) -> None:
+        self._lock = threading.Lock()
+        self._tokens = dict(tokens or {})
+        self.changed = False
+
+    def token_for(self, container: str) -> Optional[str]:
+        with self._lock:
+            return self._tokens.get(container)
+
+    def observe(self, container: str, token: Optional[str]) -> None:
+        if not token:
+            return
+        with self._lock:
+            merged = merge_session_tokens(self._tokens.get(container), token)
+            if merged and merged != self._tokens.get(container):
+                self._tokens[container] = merged
+                self.changed = True
+
+    def header_value(self) -> Optional[str]:
+        with self._lock:
+            return encode_tokens(self._tokens) if self._tokens else None
+
+
+def current_scope() -> Optional[SessionScope]:
+    return _current_scope.get()
+
+
+@contextmanager
+def session_scope(header_value: Optional[str] = None) -> Iterator[SessionScope]:
+    scope = SessionScope(decode_tokens(header_value))
+    reset = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(reset)
+
+
+def session_consistency(handler: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Runs an HTTP handler in the session of the client's X-Session-Token and
+    returns the tokens, including those of its own writes, in the response."""
+
+    @functools.wraps(handler)
+    def wrapper(req: Any) -> Any:
+        headers = getattr(req, "headers", None) or {}
+        with session_scope(headers.get(SESSION_TOKEN_HEADER)) as scope:
+            response = handler(req)
+        value = scope.header_value()
+        response_headers = getattr(response, "headers", None)
+        if value and response_headers is not None:
+            response_headers[SESSION_TOKEN_HEADER] = value
+            response_headers["Access-Control-Expose-Headers"] = SESSION_TOKEN_HEADER
+        return response
+
+    return wrapper
+
+
+class SessionContainer:
+    """Container client that reads at the request's session tokens and
+    collects the tokens its responses carry.
+
+    Outside a session scope (timers, scripts) calls pass straight through;
+    the SDK still gives read-your-writes within one client instance.
+    """
+
+    def __init__(self, container: Any) -> None:
+        self._container = container
+        self._name = str(getattr(container, "id", "") or "")
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._container, name)
+        if name not in READ_METHODS and name not in WRITE_METHODS:
+            return attr
+
+        reads = name in READ_METHODS
+
+        @functools.wraps(attr)
+        def call(*args: Any, **kwargs: Any) -> Any:
+            scope = _current_scope.get()
+            if scope is None:
+                return attr(*args, **kwargs)
+            if reads and "session_token" not in kwargs:
+                token = scope.token_for(self._name)
+                if token:
+                    kwargs["session_token"] = token
+            hook = kwargs.get("response_hook")
+
+            def response_hook(headers: Any, *rest: Any) -> None:
+                scope.observe(self._name, (headers or {}).get(COSMOS_SESSION_TOKEN_HEADER))
+                if hook is not None:
+                    hook(headers, *rest)
+
+            kwargs["response_hook"] = response_hook
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """Runs submitted calls in a copy of the submitter's context, so storage
+    reads on the pool stay in the request's session scope."""
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        context = contextvars.copy_context()
+        return super().submit(context.run, fn, *args, **kwargs)
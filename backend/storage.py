@@ -0,0 +1,188 @@
+import os
+from typing import Any, Dict, List, Optional, Protocol
+
+try:
+    from .projection import Fields
+except ImportError:
+    from projection import Fields
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "cosmos").lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "timeplanner.db")
+
+
+class StorageBackend(Protocol):
+    """Everything the HTTP and chat handlers need from a data store."""
+
+    name: str
+
+    def list_tasks(self, user_id: str, fields: Fields = None) -> List[Dict[str, Any]]: ...
+
+    def list_tasks_by_status(
+        self, user_id: str, status: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]: ...
+
+    def create_task(
+        self, user_id: str, title: str, list_name: str, due_date: Optional[str]
+    ) -> Dict[str, Any]: ...
+
+    def delete_task(self, user_id: str, task_id: str) -> None: ...
+
+    def delete_tasks_for_user(
+        self, user_id: str, list_name: Optional[str] = None, fields: Fields = None
+    ) -> List[Dict[str, Any]]: ...
+
+    def update_task(self, user_id: str, task_id: str, updates: Dict[str, Any]) -> Dict[str, Any]: ...
+
+    def find_tasks_by_title(
+        self, user_id: str, title: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]: ...
+
+    def read_task_stats(self, user_id: str) -> Dict[str, Any]: ...
+
+    def list_events(
+        self,
+        user_id: str,
+        start_iso: Optional[str] = None,
+        end_iso: Optional[str] = None,
+        fields: Fields = None,
+    ) -> List[Dict[str, Any]]: ...
+
+    def list_events_overlapping(
+        self, user_id: str, start_iso: str, end_iso: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]: ...
+
+    def create_event(
+        self, user_id: str, title: str, start_iso: str, end_iso: str, list_name: str = "Default"
+    ) -> Dict[str, Any]: ...
+
+    def delete_event(self, user_id: str, event_id: str) -> None: ...
+
+    def find_events_by_title(
+        self, user_id: str, title: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]: ...
+
+    def update_event(self, user_id: str, event_id: str, updates: Dict[str, Any]) -> Dict[str, Any]: ...
+
+    def delete_events_in_range(
+        self, user_id: str, start_iso: str, end_iso: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]: ...
+
+    def read_data_version(self, user_id: str) -> Optional[Dict[str, Any]]: ...
+
+    def recent_user_ids(self, since_epoch: float, limit: int) -> List[str]: ...
+
+    def read_usage(self, user_id: str, day: str) -> Optional[Dict[str, Any]]: ...
+
+    def add_usage(self, user_id: str, day: str, totals: Dict[str, float]) -> None: ...
+
+
+class CosmosStorage:
+    """Delegates to the Cosmos modules; importing them opens the client."""
+
+    name = "cosmos"
+
+    def __init__(self) -> None:
+        try:
+            from . import data_version, db, db_events, db_usage
+        except ImportError:
+            import data_version
+            import db
+            import db_events
+            import db_usage
+
+        self._tasks = db
+        self._events = db_events
+        self._versions = data_version
+        self._usage = db_usage
+
+    def list_tasks(self, user_id: str, fields: Fields = None) -> List[Dict[str, Any]]:
+        return self._tasks.list_tasks(user_id, fields)
+
+    def list_tasks_by_status(
+        self, user_id: str, status: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        return self._tasks.list_tasks_by_status(user_id, status, fields)
+
+    def create_task(
+        self, user_id: str, title: str, list_name: str, due_date: Optional[str]
+    ) -> Dict[str, Any]:
+        return self._tasks.create_task(user_id, title, list_name, due_date)
+
+    def delete_task(self, user_id: str, task_id: str) -> None:
+        self._tasks.delete_task(user_id, task_id)
+
+    def delete_tasks_for_user(
+        self, user_id: str, list_name: Optional[str] = None, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        return self._tasks.delete_tasks_for_user(user_id, list_name, fields)
+
+    def update_task(self, user_id: str, task_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        return self._tasks.update_task(user_id, task_id, updates)
+
+    def find_tasks_by_title(
+        self, user_id: str, title: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        return self._tasks.find_tasks_by_title(user_id, title, fields)
+
+    def read_task_stats(self, user_id: str) -> Dict[str, Any]:
+        return self._tasks.read_task_stats(user_id)
+
+    def list_events(
+        self,
+        user_id: str,
+        start_iso: Optional[str] = None,
+        end_iso: Optional[str] = None,
+        fields: Fields = None,
+    ) -> List[Dict[str, Any]]:
+        return self._events.list_events(user_id, start_iso, end_iso, fields)
+
+    def list_events_overlapping(
+        self, user_id: str, start_iso: str, end_iso: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        return self._events.list_events_overlapping(user_id, start_iso, end_iso, fields)
+
+    def create_event(
+        self, user_id: str, title: str, start_iso: str, end_iso: str, list_name: str = "Default"
+    ) -> Dict[str, Any]:
+        return self._events.create_event(user_id, title, start_iso, end_iso, list_name)
+
+    def delete_event(self, user_id: str, event_id: str) -> None:
+        self._events.delete_event(user_id, event_id)
+
+    def find_events_by_title(
+        self, user_id: str, title: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        return self._events.find_events_by_title(user_id, title, fields)
+
+    def update_event(self, user_id: str, event_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        return self._events.update_event(user_id, event_id, updates)
+
+    def delete_events_in_range(
+        self, user_id: str, start_iso: str, end_iso: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        return self._events.delete_events_in_range(user_id, start_iso, end_iso, fields)
+
+    def read_data_version(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self._versions.read_data_version(user_id)
+
+    def recent_user_ids(self, since_epoch: float, limit: int) -> List[str]:
+        return self._versions.recent_user_ids(since_epoch, limit)
+
+    def read_usage(self, user_id: str, day: str) -> Optional[Dict[str, Any]]:
+        return self._usage.read_usage(user_id, day)
+
+    def add_usage(self, user_id: str, day: str, totals: Dict[str, float]) -> None:
+        self._usage.add_usage(user_id, day, totals)
+
+
+def create_storage(backend: Optional[str] = None, sqlite_path: Optional[str] = None) -> StorageBackend:
+    backend = (backend or STORAGE_BACKEND).lower()
+    if backend == "cosmos":
+        return CosmosStorage()
+    if backend == "sqlite":
+        try:
+            from .storage_sqlite import SqliteStorage
+        except ImportError:
+            from storage_sqlite import SqliteStorage
+        return SqliteStorage(sqlite_path or SQLITE_PATH)
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,523 @@
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from .etags import EVENTS_SCOPE, TASKS_SCOPE
+    from .projection import Fields, project
+    from .task_stats import STATS_FIELDS, stats_from_tasks
+    from .timeutils import get_helsinki_tz, normalize_iso
+except ImportError:
+    from etags import EVENTS_SCOPE, TASKS_SCOPE
+    from projection import Fields, project
+    from task_stats import STATS_FIELDS, stats_from_tasks
+    from timeutils import get_helsinki_tz, normalize_iso
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    title_norm TEXT NOT NULL,
+    list TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    due_date TEXT,
+    due_epoch INTEGER,
+    PRIMARY KEY (user_id, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_tasks_user_created ON tasks (user_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_tasks_user_status_created ON tasks (user_id, status, created_at);
+CREATE INDEX IF NOT EXISTS ix_tasks_user_title ON tasks (user_id, title_norm);
+
+CREATE TABLE IF NOT EXISTS events (
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    title_norm TEXT NOT NULL,
+    list TEXT,
+    start_at TEXT NOT NULL,
+    start_epoch INTEGER NOT NULL,
+    end_at TEXT NOT NULL,
+    end_epoch INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (user_id, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_events_user_start ON events (user_id, start_epoch);
+CREATE INDEX IF NOT EXISTS ix_events_user_end ON events (user_id, end_epoch);
+CREATE INDEX IF NOT EXISTS ix_events_user_title ON events (user_id, title_norm);
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    user_id TEXT PRIMARY KEY,
+    nonce TEXT NOT NULL,
+    tasks INTEGER NOT NULL DEFAULT 0,
+    events INTEGER NOT NULL DEFAULT 0,
+    updated_epoch INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS usage_daily (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    cached_tokens INTEGER NOT NULL DEFAULT 0,
+    calls INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+) WITHOUT ROWID;
+"""
+
+# Scope names double as column names, so only these may reach the SQL text.
+_VERSION_COLUMNS = {TASKS_SCOPE: "tasks", EVENTS_SCOPE: "events"}
+
+
+def _normalize_title(title: str) -> str:
+    return title.strip().lower()
+
+
+def _task_doc(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "userId": row["user_id"],
+        "title": row["title"],
+        "list": row["list"],
+        "status": row["status"],
+        "createdAt": row["created_at"],
+        "dueDate": row["due_date"],
+        "dueEpoch": row["due_epoch"],
+    }
+
+
+def _event_doc(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "userId": row["user_id"],
+        "title": row["title"],
+        "start": row["start_at"],
+        "end": row["end_at"],
+        "list": row["list"],
+        "createdAt": row["created_at"],
+        "startEpoch": row["start_epoch"],
+        "endEpoch": row["end_epoch"],
+    }
+
+
+class SqliteStorage:
+    """Single-file storage backend; one connection per thread, WAL journaling."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str) -> None:
+        if path == ":memory:":
+            # A private shared-cache database so every thread sees the same data.
+            self._target = f"file:timeplanner-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        else:
+            self._target = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(data_versions)")}
+        if "updated_epoch" not in columns:
+            # Files created before the warm-up read recent users from here.
+            conn.execute("ALTER TABLE data_versions ADD COLUMN updated_epoch INTEGER NOT NULL DEFAULT 0")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self._target,
+                uri=self._target.startswith("file:"),
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front, so read-then-write sequences
+        # never fail halfway with SQLITE_BUSY on the upgrade.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _query(self, sql: str, params: tuple) -> List[sqlite3.Row]:
+        return self._connection().execute(sql, params).fetchall()
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _bump(self, conn: sqlite3.Connection, user_id: str, scope: str) -> None:
+        column = _VERSION_COLUMNS[scope]
+        conn.execute(
+            "INSERT INTO data_versions (user_id, nonce) VALUES (?, ?) ON CONFLICT (user_id) DO NOTHING",
+            (user_id, uuid.uuid4().hex),
+        )
+        conn.execute(
+            f"UPDATE data_versions SET {column} = {column} + 1, updated_epoch = ? WHERE user_id = ?",
+            (int(datetime.now(timezone.utc).timestamp()), user_id),
+        )
+
+    def read_data_version(self, user_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT * FROM data_versions WHERE user_id = ?", (user_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        return {
+            "userId": row["user_id"],
+            "nonce": row["nonce"],
+            TASKS_SCOPE: row["tasks"],
+            EVENTS_SCOPE: row["events"],
+        }
+
+    def recent_user_ids(self, since_epoch: float, limit: int) -> List[str]:
+        # Writes stamp data_versions; chat-only users show up in usage_daily.
+        since_day = datetime.fromtimestamp(since_epoch, timezone.utc).date().isoformat()
+        rows = self._query(
+            "SELECT user_id, MAX(seen) AS seen FROM ("
+            "SELECT user_id, updated_epoch AS seen FROM data_versions WHERE updated_epoch >= ? "
+            "UNION ALL "
+            "SELECT user_id, CAST(strftime('%s', day) AS INTEGER) AS seen FROM usage_daily WHERE day >= ?"
+            ") GROUP BY user_id ORDER BY seen DESC LIMIT ?",
+            (int(since_epoch), since_day, limit),
+        )
+        return [row["user_id"] for row in rows]
+
+    def read_usage(self, user_id: str, day: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT * FROM usage_daily WHERE user_id = ? AND day = ?", (user_id, day))
+        if not rows:
+            return None
+        row = rows[0]
+        return {
+            "userId": row["user_id"],
+            "day": row["day"],
+            "promptTokens": row["prompt_tokens"],
+            "completionTokens": row["completion_tokens"],
+            "cachedTokens": row["cached_tokens"],
+            "calls": row["calls"],
+        }
+
+    def add_usage(self, user_id: str, day: str, totals: Dict[str, float]) -> None:
+        values = (
+            user_id,
+            day,
+            int(totals.get("promptTokens", 0)),
+            int(totals.get("completionTokens", 0)),
+            int(totals.get("cachedTokens", 0)),
+            int(totals.get("calls", 0)),
+        )
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO usage_daily (user_id, day, prompt_tokens, completion_tokens, cached_tokens, calls) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, day) DO UPDATE SET "
+                "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                "cached_tokens = cached_tokens + excluded.cached_tokens, "
+                "calls = calls + excluded.calls",
+                values,
+            )
+
+    # Tasks
+
+    def list_tasks(self, user_id: str, fields: Fields = None) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT * FROM tasks WHERE user_id = ? ORDER BY created_at DESC", (user_id,)
+        )
+        return [project(_task_doc(row), fields) for row in rows]
+
+    def list_tasks_by_status(
+        self, user_id: str, status: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT * FROM tasks WHERE user_id = ? AND status = ? ORDER BY created_at DESC",
+            (user_id, status),
+        )
+        return [project(_task_doc(row), fields) for row in rows]
+
+    def create_task(
+        self, user_id: str, title: str, list_name: str, due_date: Optional[str]
+    ) -> Dict[str, Any]:
+        due_iso, due_epoch = normalize_iso(due_date, get_helsinki_tz()) if due_date else (None, None)
+        task = {
+            "id": str(uuid.uuid4()),
+            "userId": user_id,
+            "title": title,
+            "list": list_name,
+            "status": "open",
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+            "dueDate": due_iso,
+            "dueEpoch": due_epoch,
+        }
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO tasks (user_id, id, title, title_norm, list, status, created_at, due_date, due_epoch) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    user_id,
+                    task["id"],
+                    title,
+                    _normalize_title(title),
+                    list_name,
+                    task["status"],
+                    task["createdAt"],
+                    due_iso,
+                    due_epoch,
+                ),
+            )
+            self._bump(conn, user_id, TASKS_SCOPE)
+        return task
+
+    def delete_task(self, user_id: str, task_id: str) -> None:
+        with self._write() as conn:
+            cursor = conn.execute("DELETE FROM tasks WHERE user_id = ? AND id = ?", (user_id, task_id))
+            if cursor.rowcount == 0:
+                raise LookupError(f"Task {task_id} not found")
+            self._bump(conn, user_id, TASKS_SCOPE)
+
+    def delete_tasks_for_user(
+        self, user_id: str, list_name: Optional[str] = None, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        where = "user_id = ? AND list = ?" if list_name else "user_id = ?"
+        params = (user_id, list_name) if list_name else (user_id,)
+        with self._write() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM tasks WHERE {where} ORDER BY created_at DESC", params
+            ).fetchall()
+            if rows:
+                conn.execute(f"DELETE FROM tasks WHERE {where}", params)
+                self._bump(conn, user_id, TASKS_SCOPE)
+        return [project(_task_doc(row), fields) for row in rows]
+
+    def update_task(self, user_id: str, task_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        with self._write() as conn:
+            rows = conn.execute(
+                "SELECT * FROM tasks WHERE user_id = ? AND id = ?", (user_id, task_id)
+            ).fetchall()
+            if not rows:
+                raise LookupError(f"Task {task_id} not found")
+            task = _task_doc(rows[0])
+            if not updates:
+                return task
+
+            for key in ["title", "list", "status"]:
+                if key in updates and updates[key] is not None:
+                    task[key] = updates[key]
+            if "dueDate" in updates:
+                if updates["dueDate"] is None:
+                    task["dueDate"], task["dueEpoch"] = None, None
+                else:
+                    task["dueDate"], task["dueEpoch"] = normalize_iso(
+                        updates["dueDate"], get_helsinki_tz()
+                    )
+
+            conn.execute(
+                "UPDATE tasks SET title = ?, title_norm = ?, list = ?, status = ?, due_date = ?, due_epoch = ? "
+                "WHERE user_id = ? AND id = ?",
+                (
+                    task["title"],
+                    _normalize_title(task["title"]),
+                    task["list"],
+                    task["status"],
+                    task["dueDate"],
+                    task["dueEpoch"],
+                    user_id,
+                    task_id,
+                ),
+            )
+            self._bump(conn, user_id, TASKS_SCOPE)
+        return task
+
+    def find_tasks_by_title(
+        self, user_id: str, title: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT * FROM tasks WHERE user_id = ? AND title_norm = ? ORDER BY created_at DESC",
+            (user_id, _normalize_title(title)),
+        )
+        return [project(_task_doc(row), fields) for row in rows]
+
+    def read_task_stats(self, user_id: str) -> Dict[str, Any]:
+        # Writes and reads share one local file, so the stats are computed from
+        # the indexed rows instead of being kept in a separate document.
+        return stats_from_tasks(user_id, self.list_tasks(user_id, fields=STATS_FIELDS))
+
+    def restore(self, tasks: List[Dict[str, Any]], events: List[Dict[str, Any]]) -> None:
+        # Loads documents as they are, ids included; used to seed replayed sessions.
+        with self._write() as conn:
+            for task in tasks:
+                conn.execute(
+                    "INSERT OR REPLACE INTO tasks "
+                    "(user_id, id, title, title_norm, list, status, created_at, due_date, due_epoch) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        task["userId"],
+                        task["id"],
+                        task["title"],
+                        _normalize_title(task["title"]),
+                        task.get("list"),
+                        task.get("status") or "open",
+                        task.get("createdAt") or datetime.now(timezone.utc).isoformat(),
+                        task.get("dueDate"),
+                        task.get("dueEpoch"),
+                    ),
+                )
+            for event in events:
+                self._insert_event(conn, {"list": None, "createdAt": datetime.now(timezone.utc).isoformat(), **event})
+            for user_id in {task["userId"] for task in tasks}:
+                self._bump(conn, user_id, TASKS_SCOPE)
+            for user_id in {event["userId"] for event in events}:
+                self._bump(conn, user_id, EVENTS_SCOPE)
+
+    # Events
+
+    def list_events(
+        self,
+        user_id: str,
+        start_iso: Optional[str] = None,
+        end_iso: Optional[str] = None,
+        fields: Fields = None,
+    ) -> List[Dict[str, Any]]:
+        if start_iso and end_iso:
+            tz = get_helsinki_tz()
+            rows = self._query(
+                "SELECT * FROM events WHERE user_id = ? AND start_epoch >= ? AND start_epoch < ? "
+                "ORDER BY start_epoch ASC",
+                (user_id, normalize_iso(start_iso, tz)[1], normalize_iso(end_iso, tz)[1]),
+            )
+        else:
+            rows = self._query(
+                "SELECT * FROM events WHERE user_id = ? ORDER BY start_epoch ASC", (user_id,)
+            )
+        return [project(_event_doc(row), fields) for row in rows]
+
+    def list_events_overlapping(
+        self, user_id: str, start_iso: str, end_iso: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        tz = get_helsinki_tz()
+        rows = self._query(
+            "SELECT * FROM events WHERE user_id = ? AND start_epoch < ? AND end_epoch > ? "
+            "ORDER BY start_epoch ASC",
+            (user_id, normalize_iso(end_iso, tz)[1], normalize_iso(start_iso, tz)[1]),
+        )
+        return [project(_event_doc(row), fields) for row in rows]
+
+    def create_event(
+        self, user_id: str, title: str, start_iso: str, end_iso: str, list_name: str = "Default"
+    ) -> Dict[str, Any]:
+        tz = get_helsinki_tz()
+        event = {
+            "id": str(uuid.uuid4()),
+            "userId": user_id,
+            "title": title,
+            "list": list_name,
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+        }
+        event["start"], event["startEpoch"] = normalize_iso(start_iso, tz)
+        event["end"], event["endEpoch"] = normalize_iso(end_iso, tz)
+        with self._write() as conn:
+            self._insert_event(conn, event)
+            self._bump(conn, user_id, EVENTS_SCOPE)
+        return event
+
+    def _insert_event(self, conn: sqlite3.Connection, event: Dict[str, Any]) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO events "
+            "(user_id, id, title, title_norm, list, start_at, start_epoch, end_at, end_epoch, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                event["userId"],
+                event["id"],
+                event["title"],
+                _normalize_title(event["title"]),
+                event["list"],
+                event["start"],
+                event["startEpoch"],
+                event["end"],
+                event["endEpoch"],
+                event["createdAt"],
+            ),
+        )
+
+    def delete_event(self, user_id: str, event_id: str) -> None:
+        with self._write() as conn:
+            cursor = conn.execute(
+                "DELETE FROM events WHERE user_id = ? AND id = ?", (user_id, event_id)
+            )
+            if cursor.rowcount == 0:
+                raise LookupError(f"Event {event_id} not found")
+            self._bump(conn, user_id, EVENTS_SCOPE)
+
+    def find_events_by_title(
+        self, user_id: str, title: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        normalized = _normalize_title(title)
+        if not normalized:
+            return []
+
+        rows = self._query(
+            "SELECT * FROM events WHERE user_id = ? AND title_norm = ? ORDER BY start_epoch DESC",
+            (user_id, normalized),
+        )
+        if not rows:
+            rows = self._query(
+                "SELECT * FROM events WHERE user_id = ? AND instr(title_norm, ?) > 0 "
+                "ORDER BY start_epoch DESC",
+                (user_id, normalized),
+            )
+        return [project(_event_doc(row), fields) for row in rows]
+
+    def update_event(self, user_id: str, event_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        with self._write() as conn:
+            rows = conn.execute(
+                "SELECT * FROM events WHERE user_id = ? AND id = ?", (user_id, event_id)
+            ).fetchall()
+            if not rows:
+                raise LookupError(f"Event {event_id} not found")
+            event = _event_doc(rows[0])
+            if not updates:
+                return event
+
+            for key in ["title", "start", "end", "list"]:
+                if key in updates and updates[key] is not None:
+                    event[key] = updates[key]
+            tz = get_helsinki_tz()
+            event["start"], event["startEpoch"] = normalize_iso(event["start"], tz)
+            event["end"], event["endEpoch"] = normalize_iso(event["end"], tz)
+
+            self._insert_event(conn, event)
+            self._bump(conn, user_id, EVENTS_SCOPE)
+        return event
+
+    def delete_events_in_range(
+        self, user_id: str, start_iso: str, end_iso: str, fields: Fields = None
+    ) -> List[Dict[str, Any]]:
+        tz = get_helsinki_tz()
+        where = "user_id = ? AND start_epoch >= ? AND start_epoch < ?"
+        params = (user_id, normalize_iso(start_iso, tz)[1], normalize_iso(end_iso, tz)[1])
+        with self._write() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM events WHERE {where} ORDER BY start_epoch ASC", params
+            ).fetchall()
+            if rows:
+                conn.execute(f"DELETE FROM events WHERE {where}", params)
+                self._bump(conn, user_id, EVENTS_SCOPE)
+        return [project(_event_doc(row), fields) for row in rows]
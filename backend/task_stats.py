@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    from .overview import TASK_LISTS
+except ImportError:
+    from overview import TASK_LISTS
+
+# One document per user in the meta container, next to the data version.
+# "counts" maps "<status>:<list>" to a task count and "openDue" maps the due
+# epoch of open tasks to how many share it. Both maps are flat so every change
+# is a single server-side increment on a path whose parent always exists.
+# Counters that drop to zero are removed again, so the document only holds
+# keys that are in use.
+STATS_DOC_ID = "task-stats"
+
+# Fields a task contributes to the stats; reads feeding them project to these.
+STATS_FIELDS = ("id", "list", "status", "dueEpoch")
+
+
+def _pointer(key: str) -> str:
+    # JSON Pointer escaping, since list names are free text.
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def _unpointer(key: str) -> str:
+    return key.replace("~1", "/").replace("~0", "~")
+
+
+def count_key(task: Dict[str, Any]) -> str:
+    return f"{task.get('status') or 'open'}:{task.get('list') or 'Inbox'}"
+
+
+def task_contribution(task: Dict[str, Any]) -> Dict[str, int]:
+    paths = {f"/counts/{_pointer(count_key(task))}": 1}
+    due = task.get("dueEpoch")
+    if (task.get("status") or "open") == "open" and due is not None:
+        paths[f"/openDue/{int(due)}"] = 1
+    return paths
+
+
+def stats_delta(
+    removed: Iterable[Dict[str, Any]] = (),
+    added: Iterable[Dict[str, Any]] = (),
+) -> Dict[str, int]:
+    delta: Dict[str, int] = {}
+    for sign, tasks in ((-1, removed), (1, added)):
+        for task in tasks:
+            for path, value in task_contribution(task).items():
+                delta[path] = delta.get(path, 0) + sign * value
+    return {path: value for path, value in delta.items() if value}
+
+
+def patch_operations(delta: Dict[str, int], batch_size: int = 10) -> List[List[Dict[str, Any]]]:
+    # Cosmos accepts at most 10 operations per patch request.
+    operations = [{"op": "incr", "path": path, "value": value} for path, value in sorted(delta.items())]
+    return [operations[start:start + batch_size] for start in range(0, len(operations), batch_size)]
+
+
+def remove_operations(paths: Iterable[str], batch_size: int = 10) -> List[List[Dict[str, Any]]]:
+    operations = [{"op": "remove", "path": path} for path in sorted(paths)]
+    return [operations[start:start + batch_size] for start in range(0, len(operations), batch_size)]
+
+
+def zero_counter_paths(doc: Optional[Dict[str, Any]], paths: Iterable[str]) -> List[str]:
+    # Negative counters mean drift; those are left for a repair to correct.
+    zero: List[str] = []
+    for path in sorted(paths):
+        _, section, key = path.split("/", 2)
+        if ((doc or {}).get(section) or {}).get(_unpointer(key)) == 0:
+            zero.append(path)
+    return zero
+
+
+def stats_from_tasks(user_id: str, tasks: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    counts: Dict[str, int] = {}
+    open_due: Dict[str, int] = {}
+    for path, value in stats_delta(added=tasks).items():
+        _, section, key = path.split("/", 2)
+        target = counts if section == "counts" else open_due
+        key = _unpointer(key)
+        target[key] = target.get(key, 0) + value
+    return {
+        "id": STATS_DOC_ID,
+        "userId": user_id,
+        "counts": counts,
+        "openDue": open_due,
+        "rebuiltAt": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+
+def summarize_task_stats(doc: Optional[Dict[str, Any]], now_epoch: int) -> Dict[str, Any]:
+    doc = doc or {}
+    lists: Dict[str, Dict[str, int]] = {name: {"open": 0, "done": 0} for name in TASK_LISTS}
+    for key, value in (doc.get("counts") or {}).items():
+        status, _, list_name = key.partition(":")
+        if value > 0:
+            lists.setdefault(list_name, {"open": 0, "done": 0})[status] = value
+
+    overdue = 0
+    next_due: Optional[int] = None
+    for epoch_key, value in (doc.get("openDue") or {}).items():
+        if value <= 0:
+            continue
+        epoch = int(epoch_key)
+        if epoch < now_epoch:
+            overdue += value
+        elif next_due is None or epoch < next_due:
+            next_due = epoch
+
+    return {
+        "lists": lists,
+        "openCount": sum(counts.get("open", 0) for counts in lists.values()),
+        "doneCount": sum(counts.get("done", 0) for counts in lists.values()),
+        "overdueCount": overdue,
+        "nextDueDate": (
+            datetime.fromtimestamp(next_due, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            if next_due is not None
+            else None
+        ),
+    }
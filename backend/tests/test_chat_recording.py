@@ -0,0 +1,209 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from backend import chat_recording
+from backend.chat_recording import (
+    REDACTED,
+    ChatRecorder,
+    RecordingStorage,
+    ReplayCreate,
+    SessionDiverged,
+    Turn,
+    compare_metrics,
+    estimate_ru,
+    load_session,
+    recording_create,
+    recording_turn,
+    redact,
+    secret_values,
+    serialize_completion,
+)
+
+
+class FakeStorage:
+    def __init__(self):
+        self.tasks = [{"id": "t1", "userId": "u", "title": "Milk"}]
+
+    def list_tasks(self, user_id, fields=None):
+        return list(self.tasks)
+
+    def create_task(self, user_id, title, list_name, due_date):
+        task = {"id": f"t{len(self.tasks) + 1}", "userId": user_id, "title": title}
+        self.tasks.append(task)
+        return task
+
+    def list_events(self, user_id):
+        return []
+
+
+class FakeRequest:
+    def __init__(self, body, headers=None):
+        self._body = body
+        self.headers = headers or {}
+
+    def get_json(self):
+        if self._body is None:
+            raise ValueError("no body")
+        return self._body
+
+
+def completion(content=None, tool=None, arguments="{}", prompt_tokens=10):
+    tool_calls = None
+    if tool:
+        tool_calls = [SimpleNamespace(id="call_1", function=SimpleNamespace(name=tool, arguments=arguments))]
+    return SimpleNamespace(
+        model="gpt",
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=tool_calls))],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=5,
+            total_tokens=prompt_tokens + 5,
+            prompt_tokens_details=None,
+        ),
+    )
+
+
+def test_redact_replaces_secret_fields_and_values():
+    secrets = secret_values({"AZURE_OPENAI_API_KEY": "sk-abcdefgh", "TIMEZONE": "Europe/Helsinki"})
+    assert secrets == ["sk-abcdefgh"]
+
+    value = {"api-key": "x", "messages": [{"content": "key is sk-abcdefgh"}], "count": 3}
+    assert redact(value, secrets) == {
+        "api-key": REDACTED,
+        "messages": [{"content": f"key is {REDACTED}"}],
+        "count": 3,
+    }
+
+
+def test_estimate_ru_scales_queries_with_rows():
+    assert estimate_ru("read_data_version", 1) == chat_recording.RU_POINT_READ
+    assert estimate_ru("list_tasks", 10) > estimate_ru("list_tasks", 0)
+    assert estimate_ru("create_task", 1) > estimate_ru("create_event", 1)
+
+
+def test_recording_storage_captures_calls_from_executor_threads():
+    storage = RecordingStorage(FakeStorage())
+    turn = Turn("u", "hi", "2024-01-01T12:00:00+02:00")
+
+    with recording_turn(turn), ThreadPoolExecutor(max_workers=1) as executor:
+        # Bound on this thread, run on the executor's, like ChatPrefetch.
+        executor.submit(storage.list_tasks, "u", fields=["id"]).result()
+        storage.create_task("u", "Report", "Work", None)
+
+    assert [call["method"] for call in turn.db_calls] == ["list_tasks", "create_task"]
+    assert turn.db_calls[0]["rows"] == 1
+    assert turn.db_calls[0]["args"] == {"args": ["u"]}
+    assert turn.db_calls[1]["resultId"] == "t2"
+
+    # Outside a turn nothing is recorded.
+    storage.list_tasks("u")
+    assert len(turn.db_calls) == 2
+
+
+def test_recording_create_round_trips_through_serialization():
+    create = recording_create(lambda **kwargs: completion(tool="create_task", arguments='{"title": "Milk"}'))
+    turn = Turn("u", "add milk", "2024-01-01T12:00:00+02:00")
+    tools = [{"type": "function", "function": {"name": "create_task", "parameters": {}}}]
+
+    with recording_turn(turn):
+        create(model="gpt", messages=[{"role": "user", "content": "add milk"}], tools=tools)
+
+    request = turn.completions[0]["request"]
+    assert request["tools"] == ["create_task"]
+    assert request["promptTokens"] > 0
+
+    replayed = chat_recording.to_namespace(json.loads(json.dumps(turn.completions[0]["response"])))
+    call = replayed.choices[0].message.tool_calls[0]
+    assert call.function.name == "create_task"
+    assert replayed.usage.prompt_tokens == 10
+    assert serialize_completion(replayed) == turn.completions[0]["response"]
+
+
+def test_recorder_writes_header_once_and_redacts(tmp_path):
+    recorder = ChatRecorder(str(tmp_path), secrets=["sk-abcdefgh"])
+    storage = recorder.wrap_storage(FakeStorage())
+    create = recorder.wrap_create(lambda **kwargs: completion(content="Done"))
+
+    @recorder.wrap(lambda req: "u", lambda: datetime(2024, 1, 1, 12), lambda user_id: {"tasks": [], "events": []})
+    def handler(req):
+        storage.list_tasks("u")
+        create(model="gpt", messages=[{"role": "user", "content": req.get_json()["message"]}])
+        return SimpleNamespace(status_code=200)
+
+    handler(FakeRequest({"message": "hello sk-abcdefgh"}, {"X-Chat-Session": "demo"}))
+    handler(FakeRequest({"message": "again"}, {"X-Chat-Session": "demo"}))
+
+    header, turns = load_session(str(tmp_path / "demo.jsonl"))
+    assert header["session"] == "demo"
+    assert [turn["message"] for turn in turns] == [f"hello {REDACTED}", "again"]
+    assert turns[0]["status"] == 200
+    assert turns[0]["metrics"]["dbCalls"] == 1
+    assert turns[0]["metrics"]["completions"] == 1
+
+
+def test_disabled_recorder_leaves_everything_untouched():
+    recorder = ChatRecorder(None, secrets=[])
+    storage = FakeStorage()
+
+    def handler(req):
+        return req
+
+    assert recorder.wrap_storage(storage) is storage
+    assert recorder.wrap(lambda req: "u", datetime.now, lambda user_id: {})(handler) is handler
+
+
+def test_replay_create_remaps_created_ids():
+    replay = ReplayCreate()
+    first = {
+        "completions": [{"response": {"choices": [{"message": {"content": "ok", "tool_calls": None}}]}}],
+        "dbCalls": [{"method": "create_task", "rows": 1, "resultId": "old-id"}],
+    }
+    second = {
+        "completions": [
+            {
+                "response": {
+                    "choices": [
+                        {
+                            "message": {
+                                "content": None,
+                                "tool_calls": [
+                                    {
+                                        "id": "call_1",
+                                        "type": "function",
+                                        "function": {"name": "delete_task", "arguments": '{"id": "old-id"}'},
+                                    }
+                                ],
+                            }
+                        }
+                    ]
+                }
+            }
+        ]
+    }
+
+    replay.begin(first)
+    replay()
+    replayed = Turn("u", "add", "now")
+    replayed.add_db_call("create_task", {}, {"id": "new-id"}, 1.0)
+    replay.learn_ids(first, replayed)
+
+    replay.begin(second)
+    message = replay().choices[0].message
+    assert json.loads(message.tool_calls[0].function.arguments) == {"id": "new-id"}
+    with pytest.raises(SessionDiverged):
+        replay()
+
+
+def test_compare_metrics_flags_growth_beyond_tolerance():
+    baseline = {"latencyMs": 10.0, "dbCalls": 3, "ruEstimate": 10.0, "promptTokens": 1000, "completions": 2}
+
+    assert compare_metrics(baseline, dict(baseline, ruEstimate=10.4, promptTokens=1040)) == []
+    problems = compare_metrics(baseline, dict(baseline, dbCalls=4, promptTokens=1200, latencyMs=30.0))
+    assert problems == ["db calls 3 -> 4", "prompt tokens 1000 -> 1200"]
+    assert compare_metrics(baseline, dict(baseline, latencyMs=30.0), latency_tolerance=0.5) == [
+        "latency 10.0 ms -> 30.0 ms"
+    ]
@@ -0,0 +1,60 @@
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from backend.columnar import EventColumns, TaskColumns
+
+HELSINKI = ZoneInfo("Europe/Helsinki")
+
+
+def _task(task_id, list_name, status, due=None, due_epoch=None):
+    task = {"id": task_id, "title": task_id, "list": list_name, "status": status, "dueDate": due}
+    if due_epoch is not None:
+        task["dueEpoch"] = due_epoch
+    return task
+
+
+def test_task_select_combines_filters_and_keeps_db_order():
+    columns = TaskColumns(
+        [
+            _task("a", "Work", "open", "2025-01-03T00:00:00Z", 300),
+            _task("b", "Work", "done", "2025-01-02T00:00:00Z", 200),
+            _task("c", "Inbox", "open"),
+            _task("d", "Work", "open", "2025-01-01T00:00:00Z", 100),
+        ],
+        HELSINKI,
+    )
+
+    assert columns.take(columns.select(list_name="Work", status="open")) == [
+        columns.docs[0],
+        columns.docs[3],
+    ]
+    assert [t["id"] for t in columns.take(columns.select(due_after=150))] == ["a", "b"]
+    assert [t["id"] for t in columns.take(columns.select(due_before=200))] == ["b", "d"]
+    assert columns.select(list_name="Unknown").size == 0
+
+
+def test_task_columns_fall_back_to_parsing_legacy_due_dates():
+    columns = TaskColumns([_task("legacy", "Inbox", "open", "1970-01-01T00:01:40Z")], HELSINKI)
+
+    assert columns.due.tolist() == [100]
+    assert columns.select(due_after=100).tolist() == [0]
+
+
+def test_event_select_window_upcoming_and_top_k():
+    docs = [
+        {"id": str(i), "start": "x", "end": "x", "startEpoch": start, "endEpoch": end}
+        for i, (start, end) in enumerate([(50, 60), (10, 20), (30, 40), (0, 100), (70, 80)])
+    ]
+    docs.append({"id": "no-start", "title": "broken"})
+    columns = EventColumns(docs, HELSINKI)
+
+    assert len(columns) == 5
+    in_window = columns.select(start=15, end=55)
+    assert sorted(columns.docs[i]["id"] for i in in_window) == ["0", "1", "2", "3"]
+
+    upcoming = columns.select(not_ended_before=45)
+    assert sorted(columns.docs[i]["id"] for i in upcoming) == ["0", "3", "4"]
+
+    earliest = columns.earliest(np.arange(len(columns)), 3)
+    assert [columns.docs[i]["id"] for i in earliest] == ["3", "1", "2"]
@@ -0,0 +1,235 @@
+import os
+
+import pytest
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosBatchOperationError,
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+os.environ.setdefault("COSMOSDB_ENDPOINT", "https://localhost:8081")
+os.environ.setdefault("COSMOSDB_KEY", "ZmFrZS1rZXk=")
+os.environ.setdefault("COSMOSDB_DATABASE", "test-db")
+os.environ.setdefault("COSMOSDB_TASKS_CONTAINER", "tasks")
+os.environ.setdefault("COSMOSDB_EVENTS_CONTAINER", "events")
+
+from backend import http_pools
+from backend.cosmos_emulator import CosmosEmulator, EmulatedContainer, parse_query
+
+# The storage modules open their client on import; hand them an emulator.
+with pytest.MonkeyPatch.context() as patch:
+    patch.setattr(http_pools, "get_cosmos_client", lambda endpoint, key: CosmosEmulator())
+    from backend import data_version, db, db_events
+
+from backend.metrics import MetricsRegistry
+from backend.query_log import SlowQueryLog
+
+
+def params(**values):
+    return [{"name": f"@{name}", "value": value} for name, value in values.items()]
+
+
+@pytest.fixture
+def tasks():
+    container = EmulatedContainer("tasks")
+    for index in range(30):
+        container.create_item(
+            {
+                "id": f"t{index}",
+                "userId": "u1" if index < 20 else "u2",
+                "title": f"Report {index}" if index % 3 else f"Osta maitoa {index}",
+                "list": "Work" if index % 2 else "Inbox",
+                "status": "open" if index % 4 else "done",
+                "createdAt": f"2024-01-{index + 1:02d}T08:00:00+00:00",
+                "dueEpoch": 1000 + index * 10,
+            }
+        )
+    container.reset_charges()
+    return container
+
+
+def test_parse_query_caches_and_rejects_unsupported_syntax():
+    text = "SELECT * FROM c WHERE c.userId = @userId"
+    assert parse_query(text) is parse_query(text)
+
+    for bad in ("SELECT * FROM c JOIN t IN c.tags", "SELECT COUNT(1) FROM c", "SELECT * FROM c WHERE d.x = 1"):
+        with pytest.raises(CosmosHttpResponseError) as error:
+            parse_query(bad)
+        assert error.value.status_code == 400
+
+
+def test_query_filters_projects_and_orders(tasks):
+    rows = tasks.query_items(
+        "SELECT TOP 3 c.id, c.dueEpoch FROM c WHERE c.userId = @userId AND c.dueEpoch >= @low "
+        "AND c.dueEpoch < @high ORDER BY c.createdAt DESC",
+        parameters=params(userId="u1", low=1050, high=1150),
+    )
+    assert rows == [{"id": "t14", "dueEpoch": 1140}, {"id": "t13", "dueEpoch": 1130}, {"id": "t12", "dueEpoch": 1120}]
+
+    titles = tasks.query_items(
+        "SELECT VALUE c.title FROM c WHERE c.userId = 'u1' AND CONTAINS(LOWER(c.title), @title) "
+        "ORDER BY c.createdAt ASC",
+        parameters=params(title="maitoa"),
+    )
+    assert titles == [f"Osta maitoa {index}" for index in (0, 3, 6, 9, 12, 15, 18)]
+
+    statuses = tasks.query_items(
+        "SELECT DISTINCT VALUE c.status FROM c WHERE c.userId = @userId AND NOT IS_DEFINED(c.missing)",
+        parameters=params(userId="u2"),
+    )
+    assert sorted(statuses) == ["done", "open"]
+
+
+def test_query_undefined_and_mixed_types_never_match(tasks):
+    tasks.create_item({"id": "odd", "userId": "u1", "dueEpoch": "soon", "createdAt": "2023-01-01"})
+    rows = tasks.query_items(
+        "SELECT VALUE c.id FROM c WHERE c.userId = @userId AND (c.dueEpoch > 1180 OR c.missing = 1)",
+        parameters=params(userId="u1"),
+    )
+    assert rows == ["t19"]
+
+
+def test_query_partition_and_index_rules(tasks):
+    with pytest.raises(CosmosHttpResponseError, match="Cross partition"):
+        tasks.query_items("SELECT * FROM c WHERE c.status = 'open'")
+    assert len(tasks.query_items("SELECT * FROM c WHERE c.status = 'open'", enable_cross_partition_query=True)) == 22
+
+    # ORDER BY needs a range index, and several keys need a composite index.
+    with pytest.raises(CosmosHttpResponseError, match="range index"):
+        tasks.query_items("SELECT * FROM c WHERE c.userId = 'u1' ORDER BY c.missing")
+    with pytest.raises(CosmosHttpResponseError, match="composite index"):
+        tasks.query_items("SELECT * FROM c WHERE c.userId = 'u1' ORDER BY c.title, c.createdAt")
+    tasks.query_items("SELECT * FROM c WHERE c.userId = 'u1' ORDER BY c.status ASC, c.createdAt DESC")
+
+
+def test_indexed_query_is_cheaper_than_a_scan(tasks):
+    charges = []
+    tasks.query_items(
+        "SELECT * FROM c WHERE c.userId = @userId AND c.status = @status ORDER BY c.createdAt DESC",
+        parameters=params(userId="u1", status="done"),
+        response_hook=lambda headers, _: charges.append(headers),
+    )
+    tasks.query_items(
+        "SELECT * FROM c WHERE c.userId = @userId AND ENDSWITH(c.title, '4')",
+        parameters=params(userId="u1"),
+        response_hook=lambda headers, _: charges.append(headers),
+    )
+    assert "retrievedDocumentCount=5;" in charges[0]["x-ms-documentdb-query-metrics"]
+    assert "retrievedDocumentCount=20;" in charges[1]["x-ms-documentdb-query-metrics"]
+    assert float(charges[0]["x-ms-request-charge"]) < float(charges[1]["x-ms-request-charge"])
+    assert tasks.operations == {"query": 2}
+
+
+def test_point_operations_and_etags(tasks):
+    with pytest.raises(CosmosResourceExistsError):
+        tasks.create_item({"id": "t0", "userId": "u1"})
+    with pytest.raises(CosmosResourceNotFoundError):
+        tasks.read_item("t0", partition_key="u2")
+
+    item = tasks.read_item("t0", partition_key="u1")
+    item["title"] = "Changed"
+    tasks.replace_item("t0", item, etag=item["_etag"], match_condition="IfNotModified")
+    with pytest.raises(CosmosAccessConditionFailedError):
+        tasks.replace_item("t0", item, etag=item["_etag"], match_condition="IfNotModified")
+
+    tasks.delete_item("t0", partition_key="u1")
+    assert tasks.count("u1") == 19
+    assert float(tasks.client_connection.last_response_headers["x-ms-request-charge"]) > 5
+
+
+def test_patch_operations_and_filter_predicate():
+    meta = EmulatedContainer("meta")
+    meta.create_item({"id": "stats", "userId": "u1", "counts": {"open:Work": 1}, "note": "x"})
+
+    doc = meta.patch_item(
+        "stats",
+        "u1",
+        [
+            {"op": "incr", "path": "/counts/open:Work", "value": 2},
+            {"op": "incr", "path": "/counts/done:Work", "value": 1},
+            {"op": "set", "path": "/tags", "value": ["a"]},
+            {"op": "add", "path": "/tags/-", "value": "b"},
+            {"op": "remove", "path": "/note"},
+        ],
+    )
+    assert doc["counts"] == {"open:Work": 3, "done:Work": 1}
+    assert doc["tags"] == ["a", "b"]
+    assert "note" not in doc
+
+    with pytest.raises(CosmosAccessConditionFailedError):
+        meta.patch_item(
+            "stats",
+            "u1",
+            [{"op": "set", "path": "/x", "value": 1}],
+            filter_predicate="FROM c WHERE c.counts.missing > 0",
+        )
+    with pytest.raises(CosmosHttpResponseError, match="1 to 10"):
+        meta.patch_item("stats", "u1", [{"op": "set", "path": f"/x{index}", "value": 1} for index in range(11)])
+    with pytest.raises(CosmosHttpResponseError):
+        meta.patch_item("stats", "u1", [{"op": "remove", "path": "/note"}])
+
+
+def test_batch_is_atomic(tasks):
+    operations = [
+        ("create", ({"id": "new", "userId": "u1", "createdAt": "2025-01-01"},)),
+        ("patch", ("t1", [{"op": "set", "path": "/status", "value": "done"}])),
+        ("create", ({"id": "t2", "userId": "u1"},)),
+    ]
+    with pytest.raises(CosmosBatchOperationError) as error:
+        tasks.execute_item_batch(operations, partition_key="u1")
+    assert error.value.error_index == 2
+    assert tasks.count("u1") == 20
+    assert tasks.read_item("t1", "u1")["status"] == "open"
+    done = tasks.query_items(
+        "SELECT VALUE c.id FROM c WHERE c.userId = 'u1' AND c.status = 'done' ORDER BY c.createdAt ASC"
+    )
+    assert done == ["t0", "t4", "t8", "t12", "t16"]
+
+    results = tasks.execute_item_batch(operations[:2], partition_key="u1")
+    assert [result["statusCode"] for result in results] == [201, 200]
+    assert tasks.count("u1") == 21
+
+
+def test_slow_query_log_reads_emulated_charges(tasks):
+    log = SlowQueryLog(slow_ms=10_000, slow_ru=0, metrics=MetricsRegistry(), sampler=lambda: 0.0)
+    log.run(tasks, "SELECT * FROM c WHERE c.userId = @userId", params(userId="u1"), caller="list_tasks")
+    record = log.recent(1)[0]
+    assert record["ru"] > 0
+    assert record["returned"] == 20
+
+
+def test_emulator_hands_out_one_container_per_name():
+    client = CosmosEmulator()
+    container = client.get_database_client("db").get_container_client("tasks")
+    assert container is client.get_database_client("db").get_container_client("tasks")
+
+
+@pytest.fixture
+def emulated(monkeypatch):
+    database = CosmosEmulator().get_database_client("test-db")
+    monkeypatch.setattr(db, "_tasks_container", database.get_container_client("tasks"))
+    monkeypatch.setattr(db, "_meta_container", database.get_container_client("meta"))
+    monkeypatch.setattr(data_version, "_meta_container", database.get_container_client("meta"))
+    monkeypatch.setattr(db_events, "_events_container", database.get_container_client("events"))
+    return database
+
+
+def test_storage_modules_run_against_the_emulator(emulated):
+    first = db.create_task("u1", "Write report", "Work", "2024-05-01T12:00:00")
+    db.create_task("u1", "Buy milk", "Personal", None)
+    db.update_task("u1", first["id"], {"status": "done"})
+
+    assert [task["title"] for task in db.list_tasks("u1")] == ["Buy milk", "Write report"]
+    assert [task["id"] for task in db.list_tasks_by_status("u1", "done")] == [first["id"]]
+    assert [task["id"] for task in db.find_tasks_by_title("u1", "WRITE REPORT")] == [first["id"]]
+    assert db.read_task_stats("u1")["counts"] == {"open:Personal": 1, "done:Work": 1}
+    assert data_version.read_data_version("u1")["tasks"] == 3
+
+    db_events.create_event("u1", "Standup", "2024-05-02T09:00:00", "2024-05-02T09:15:00", "Work")
+    db_events.create_event("u1", "Retro", "2024-05-03T14:00:00", "2024-05-03T15:00:00", "Work")
+    ranged = db_events.list_events("u1", "2024-05-02T00:00:00", "2024-05-03T00:00:00")
+    assert [event["title"] for event in ranged] == ["Standup"]
+    assert [event["title"] for event in db_events.find_events_by_title("u1", "etr")] == ["Retro"]
+    assert db.list_task_user_ids() == ["u1"]
@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+from azure.cosmos.exceptions import CosmosHttpResponseError
+
+from backend import cosmos_scheduler as scheduling
+from backend.metrics import MetricsRegistry
+
+
+def throttled(retry_after_ms: str) -> CosmosHttpResponseError:
+    exc = CosmosHttpResponseError(status_code=429, message="Request rate is large")
+    exc.headers = {"x-ms-retry-after-ms": retry_after_ms}
+    return exc
+
+
+def charging(ru: float, calls: list | None = None):
+    def delete_item(item_id, partition_key, response_hook=None):
+        if calls is not None:
+            calls.append(item_id)
+        response_hook({"x-ms-request-charge": str(ru)}, None)
+
+    return delete_item
+
+
+def make_scheduler(**overrides) -> scheduling.CosmosScheduler:
+    options = dict(ru_per_second=1000, bulk_share=1.0, max_retries=3, metrics=MetricsRegistry())
+    options.update(overrides)
+    return scheduling.CosmosScheduler(**options)
+
+
+def test_request_charges_are_recorded():
+    scheduler = make_scheduler()
+    scheduler.run(charging(5.5), "a", partition_key="u")
+    scheduler.run(charging(4.5), "b", partition_key="u")
+
+    assert scheduler.spent_in_window() == pytest.approx(10)
+    assert scheduler._metrics.snapshot()["counters"]["cosmos.ru_consumed"] == pytest.approx(10)
+
+
+def test_throttled_operation_retries_after_server_delay():
+    slept: list[float] = []
+    scheduler = make_scheduler(sleep=slept.append)
+    attempts: list[int] = []
+
+    def read_item(item_id, partition_key, response_hook=None):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise throttled("250")
+        response_hook({"x-ms-request-charge": "1"}, None)
+        return {"id": item_id}
+
+    assert scheduler.run(read_item, "x", partition_key="u") == {"id": "x"}
+    assert slept == [0.25]
+    assert scheduler._metrics.snapshot()["counters"]["cosmos.throttles"] == 1
+
+
+def test_other_errors_and_exhausted_retries_propagate():
+    scheduler = make_scheduler(max_retries=1, sleep=lambda seconds: None)
+
+    def always_throttled(*args, **kwargs):
+        raise throttled("1")
+
+    def missing(*args, **kwargs):
+        raise CosmosHttpResponseError(status_code=404, message="gone")
+
+    with pytest.raises(CosmosHttpResponseError):
+        scheduler.run(always_throttled, "x", partition_key="u")
+    with pytest.raises(CosmosHttpResponseError):
+        scheduler.run(missing, "x", partition_key="u")
+
+
+def test_queries_are_drained_inside_the_scheduled_operation():
+    slept: list[float] = []
+    scheduler = make_scheduler(sleep=slept.append)
+    own_hook: list[str] = []
+    attempts: list[int] = []
+
+    def query_items(query, response_hook=None, **kwargs):
+        # Like the SDK's pager: nothing is fetched until iteration.
+        attempts.append(1)
+        response_hook({"x-ms-request-charge": "3"}, None)
+        yield {"id": "1"}
+        if len(attempts) == 1:
+            raise throttled("100")
+        response_hook({"x-ms-request-charge": "4"}, None)
+        yield {"id": "2"}
+
+    items = scheduler.run_query(
+        query_items,
+        query="SELECT * FROM c",
+        response_hook=lambda headers, *_: own_hook.append(headers["x-ms-request-charge"]),
+    )
+
+    assert items == [{"id": "1"}, {"id": "2"}]
+    assert slept == [0.1]
+    # The throttled attempt's first page was charged as well.
+    assert scheduler.spent_in_window() == pytest.approx(10)
+    assert own_hook == ["3", "3", "4"]
+
+
+def test_bulk_work_is_paced_to_the_budget():
+    # 100 RU/s over a 0.1s window leaves room for two 4 RU deletes per window.
+    scheduler = make_scheduler(ru_per_second=100, window_seconds=0.1)
+    calls: list[str] = []
+    delete = charging(4, calls)
+
+    started = time.monotonic()
+    for item_id in ["a", "b", "c"]:
+        scheduler.run(delete, item_id, partition_key="u", priority=scheduling.BULK)
+
+    assert calls == ["a", "b", "c"]
+    assert time.monotonic() - started >= 0.09
+
+
+def test_bulk_waits_for_in_flight_interactive_calls():
+    scheduler = make_scheduler()
+    release = threading.Event()
+    order: list[str] = []
+
+    def read_item(item_id, partition_key, response_hook=None):
+        release.wait(1)
+        order.append("interactive")
+        response_hook({"x-ms-request-charge": "1"}, None)
+
+    def delete_item(item_id, partition_key, response_hook=None):
+        order.append("bulk")
+        response_hook({"x-ms-request-charge": "1"}, None)
+
+    interactive = threading.Thread(target=scheduler.run, args=(read_item, "x"), kwargs={"partition_key": "u"})
+    interactive.start()
+    time.sleep(0.02)
+    bulk = threading.Thread(
+        target=scheduler.run,
+        args=(delete_item, "y"),
+        kwargs={"partition_key": "u", "priority": scheduling.BULK},
+    )
+    bulk.start()
+    time.sleep(0.05)
+    assert order == []
+
+    release.set()
+    interactive.join()
+    bulk.join()
+    assert order == ["interactive", "bulk"]
@@ -0,0 +1,163 @@
+import os
+import copy
+
+import pytest
+import azure.cosmos  # type: ignore
+from azure.cosmos.exceptions import (
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+
+class FakeMetaContainer:
+    """In-memory stand-in for the meta container, keyed by (partition, id)."""
+
+    def __init__(self) -> None:
+        self.items: dict[tuple[str, str], dict] = {}
+
+    def read_item(self, item_id: str, partition_key: str, **kwargs) -> dict:
+        key = (partition_key, item_id)
+        if key not in self.items:
+            raise CosmosResourceNotFoundError(message="not found")
+        return copy.deepcopy(self.items[key])
+
+    def create_item(self, item: dict, **kwargs) -> None:
+        key = (item["userId"], item["id"])
+        if key in self.items:
+            raise CosmosResourceExistsError(message="conflict")
+        self.items[key] = copy.deepcopy(item)
+
+    def upsert_item(self, item: dict, **kwargs) -> None:
+        self.items[(item["userId"], item["id"])] = copy.deepcopy(item)
+
+    def patch_item(self, item: str, partition_key: str, patch_operations: list, **kwargs) -> dict:
+        key = (partition_key, item)
+        if key not in self.items:
+            raise CosmosResourceNotFoundError(message="not found")
+        doc = self.items[key]
+        for operation in patch_operations:
+            assert operation["op"] == "incr"
+            field = operation["path"].lstrip("/")
+            doc[field] = doc.get(field, 0) + operation["value"]
+        return copy.deepcopy(doc)
+
+
+class _StubCosmosClient:
+    """Prevents outbound calls during module import."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        self._container = FakeMetaContainer()
+
+    def get_database_client(self, name):
+        return self
+
+    def get_container_client(self, name):
+        return self._container
+
+
+os.environ.setdefault("COSMOSDB_ENDPOINT", "https://localhost:8081")
+os.environ.setdefault("COSMOSDB_KEY", "ZmFrZS1rZXk=")
+os.environ.setdefault("COSMOSDB_DATABASE", "test-db")
+
+azure.cosmos.CosmosClient = _StubCosmosClient
+
+from backend import data_version
+from backend.cosmos_emulator import EmulatedContainer
+from backend.etags import EVENTS_SCOPE, TASKS_SCOPE, etag_matches, make_etag
+from backend.indexing_policy import POLICIES
+
+
+def current_etag(user_id, scope, *variant):
+    # What the HTTP handlers compute from storage.read_data_version.
+    return make_etag(data_version.read_data_version(user_id), scope, *variant)
+
+
+@pytest.fixture(autouse=True)
+def fake_container(monkeypatch):
+    container = FakeMetaContainer()
+    monkeypatch.setattr(data_version, "_meta_container", container)
+    return container
+
+
+def test_missing_version_document_yields_no_etag():
+    assert data_version.read_data_version("user-1") is None
+    assert current_etag("user-1", TASKS_SCOPE) is None
+
+
+def test_bump_creates_then_increments_scope(fake_container):
+    data_version.bump_data_version("user-1", TASKS_SCOPE)
+    data_version.bump_data_version("user-1", TASKS_SCOPE)
+    data_version.bump_data_version("user-1", EVENTS_SCOPE)
+
+    doc = fake_container.items[("user-1", data_version.VERSION_DOC_ID)]
+    assert doc["tasks"] == 2
+    assert doc["events"] == 1
+    assert doc["nonce"]
+
+
+def test_etag_changes_only_for_written_scope():
+    data_version.bump_data_version("user-2", TASKS_SCOPE)
+    tasks_before = current_etag("user-2", TASKS_SCOPE)
+    events_before = current_etag("user-2", EVENTS_SCOPE)
+
+    data_version.bump_data_version("user-2", EVENTS_SCOPE)
+
+    assert current_etag("user-2", TASKS_SCOPE) == tasks_before
+    assert current_etag("user-2", EVENTS_SCOPE) != events_before
+    assert current_etag("user-2", EVENTS_SCOPE, "a", "b") != (
+        current_etag("user-2", EVENTS_SCOPE)
+    )
+
+
+def test_recreated_document_does_not_reuse_etag(fake_container):
+    data_version.bump_data_version("user-3", TASKS_SCOPE)
+    first = current_etag("user-3", TASKS_SCOPE)
+
+    fake_container.items.clear()
+    data_version.bump_data_version("user-3", TASKS_SCOPE)
+
+    assert current_etag("user-3", TASKS_SCOPE) != first
+
+
+def test_recent_user_ids_come_from_recently_changed_meta_documents(monkeypatch):
+    clock = [1000.0]
+    container = EmulatedContainer("meta", indexing_policy=POLICIES["meta"], clock=lambda: clock[0])
+    monkeypatch.setattr(data_version, "_meta_container", container)
+
+    data_version.bump_data_version("idle", TASKS_SCOPE)
+    clock[0] = 5000.0
+    data_version.bump_data_version("writer", TASKS_SCOPE)
+    container.create_item({"id": "usage-2024-05-01", "userId": "chatter", "calls": 1})
+    clock[0] = 6000.0
+    data_version.bump_data_version("writer", EVENTS_SCOPE)
+
+    assert data_version.recent_user_ids(4000, limit=10) == ["writer", "chatter"]
+    assert data_version.recent_user_ids(4000, limit=1) == ["writer"]
+    assert data_version.recent_user_ids(7000, limit=10) == []
+
+
+def test_failed_increment_resets_the_nonce_so_cached_etags_miss(fake_container, monkeypatch):
+    data_version.bump_data_version("user-4", TASKS_SCOPE)
+    cached = current_etag("user-4", TASKS_SCOPE)
+
+    def unavailable(*args, **kwargs):
+        raise CosmosHttpResponseError(status_code=503, message="service unavailable")
+
+    monkeypatch.setattr(fake_container, "patch_item", unavailable)
+    data_version.bump_data_version("user-4", TASKS_SCOPE)
+
+    # The client's next If-None-Match no longer matches, so it gets a 200.
+    assert not etag_matches(cached, current_etag("user-4", TASKS_SCOPE))
+
+
+def test_bump_raises_when_the_version_cannot_be_reset(fake_container, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise CosmosHttpResponseError(status_code=503, message="service unavailable")
+
+    monkeypatch.setattr(fake_container, "patch_item", unavailable)
+    monkeypatch.setattr(fake_container, "create_item", unavailable)
+    monkeypatch.setattr(fake_container, "upsert_item", unavailable)
+
+    with pytest.raises(CosmosHttpResponseError):
+        data_version.bump_data_version("user-5", TASKS_SCOPE)
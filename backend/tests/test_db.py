@@ -3,6 +3,7 @@ import copy
 
 import pytest
 import azure.cosmos  # type: ignore
+from azure.cosmos.exceptions import CosmosBatchOperationError, CosmosHttpResponseError, CosmosResourceNotFoundError
 
 
 class FakeTasksContainer:
@@ -10,14 +11,17 @@ class FakeTasksContainer:
 
     def __init__(self) -> None:
         self.items: dict[str, dict] = {}
+        self.queries: list[str] = []
 
-    def create_item(self, item: dict) -> None:
+    def create_item(self, item: dict, **kwargs) -> None:
         self.items[item["id"]] = copy.deepcopy(item)
 
-    def query_items(self, query: str, parameters: list, enable_cross_partition_query: bool = False):
+    def query_items(self, query: str, parameters: list, enable_cross_partition_query: bool = False, **kwargs):
+        self.queries.append(query)
         params = {param["name"]: param["value"] for param in parameters}
         user_id = params.get("@userId")
         list_name = params.get("@list")
+        status = params.get("@status")
         title = params.get("@title")
 
         results: list[dict] = []
@@ -26,6 +30,8 @@ class FakeTasksContainer:
                 continue
             if list_name and item.get("list") != list_name:
                 continue
+            if status and item.get("status") != status:
+                continue
             if title is not None:
                 current = (item.get("title") or "").lower()
                 if current != title:
@@ -36,16 +42,68 @@ class FakeTasksContainer:
         results.sort(key=lambda entry: entry.get("createdAt") or "", reverse=reverse)
         return results
 
-    def read_item(self, item_id: str, partition_key: str) -> dict:
+    def read_item(self, item_id: str, partition_key: str, **kwargs) -> dict:
         return copy.deepcopy(self.items[item_id])
 
-    def replace_item(self, item_id: str, item: dict) -> None:
+    def replace_item(self, item_id: str, item: dict, **kwargs) -> None:
         self.items[item_id] = copy.deepcopy(item)
 
-    def delete_item(self, item_id: str, partition_key: str) -> None:
+    def delete_item(self, item_id: str, partition_key: str, **kwargs) -> None:
         self.items.pop(item_id, None)
 
 
+class FakeMetaContainer:
+    """Point reads, upserts and incr/remove patches and batches on the meta container."""
+
+    def __init__(self) -> None:
+        self.items: dict[tuple[str, str], dict] = {}
+        self.fail_batches = False
+        self._etags = 0
+
+    def read_item(self, item_id: str, partition_key: str, **kwargs) -> dict:
+        if (partition_key, item_id) not in self.items:
+            raise CosmosResourceNotFoundError(message="missing")
+        return copy.deepcopy(self.items[(partition_key, item_id)])
+
+    def upsert_item(self, item: dict, **kwargs) -> dict:
+        self._etags += 1
+        stored = {**copy.deepcopy(item), "_etag": f'"{self._etags}"'}
+        self.items[(item["userId"], item["id"])] = stored
+        return copy.deepcopy(stored)
+
+    def patch_item(self, item: str, partition_key: str, patch_operations: list, **kwargs) -> dict:
+        doc = self.read_item(item, partition_key)
+        if kwargs.get("if_match_etag") not in (None, doc["_etag"]):
+            raise CosmosHttpResponseError(status_code=412, message="Precondition failed")
+        for operation in patch_operations:
+            assert operation["op"] in ("incr", "remove")
+            _, section, key = operation["path"].split("/", 2)
+            key = key.replace("~1", "/").replace("~0", "~")
+            if operation["op"] == "remove":
+                del doc[section][key]
+            else:
+                doc[section][key] = doc[section].get(key, 0) + operation["value"]
+        return self.upsert_item(doc)
+
+    def execute_item_batch(self, batch_operations: list, partition_key: str, **kwargs) -> list:
+        snapshot = copy.deepcopy(self.items)
+        results: list[dict] = []
+        for index, (kind, (item, operations), *options) in enumerate(batch_operations):
+            assert kind == "patch"
+            try:
+                if self.fail_batches:
+                    raise CosmosHttpResponseError(status_code=503, message="unavailable")
+                body = self.patch_item(item, partition_key, operations, **(options[0] if options else {}))
+            except CosmosHttpResponseError as error:
+                self.items = snapshot
+                raise CosmosBatchOperationError(
+                    error_index=index, headers={}, status_code=error.status_code, message=error.message,
+                    operation_responses=results,
+                ) from error
+            results.append({"statusCode": 200, "requestCharge": 1.0, "resourceBody": body})
+        return results
+
+
 class _StubCosmosClient:
     """Prevents outbound calls during module import time."""
 
@@ -76,6 +134,20 @@ def fake_container(monkeypatch):
     return container
 
 
+@pytest.fixture(autouse=True)
+def meta_container(monkeypatch):
+    container = FakeMetaContainer()
+    monkeypatch.setattr(db, "_meta_container", container)
+    return container
+
+
+@pytest.fixture(autouse=True)
+def version_bumps(monkeypatch):
+    bumps: list[tuple[str, str]] = []
+    monkeypatch.setattr(db, "bump_data_version", lambda user_id, scope: bumps.append((user_id, scope)))
+    return bumps
+
+
 def test_create_task_persists_defaults(fake_container):
     task = db.create_task(
         user_id="user-1",
@@ -144,3 +216,114 @@ def test_list_tasks_returns_user_items_sorted(fake_container):
 
     results = db.list_tasks("user-4")
     assert [task["id"] for task in results] == [task2["id"], task1["id"]]
+
+
+def test_writes_bump_tasks_data_version(fake_container, version_bumps):
+    task = db.create_task(user_id="user-5", title="Versioned", list_name="Inbox", due_date=None)
+    db.update_task(user_id="user-5", task_id=task["id"], updates={"status": "done"})
+    db.delete_task(user_id="user-5", task_id=task["id"])
+    db.delete_tasks_for_user(user_id="user-5")
+
+    assert version_bumps == [("user-5", "tasks")] * 3
+
+
+def test_list_tasks_by_status_filters_status(fake_container):
+    open_task = db.create_task(user_id="user-6", title="Open", list_name="Inbox", due_date=None)
+    done_task = db.create_task(user_id="user-6", title="Done", list_name="Work", due_date=None)
+    db.update_task(user_id="user-6", task_id=done_task["id"], updates={"status": "done"})
+
+    results = db.list_tasks_by_status("user-6", "open")
+    assert [task["id"] for task in results] == [open_task["id"]]
+
+
+def test_due_date_is_normalized_with_epoch(fake_container):
+    task = db.create_task(
+        user_id="user-7",
+        title="Offset due",
+        list_name="Inbox",
+        due_date="2025-11-25T12:00:00+02:00",
+    )
+
+    stored = fake_container.items[task["id"]]
+    assert stored["dueDate"] == "2025-11-25T10:00:00Z"
+    assert stored["dueEpoch"] == 1764064800
+
+    cleared = db.update_task(user_id="user-7", task_id=task["id"], updates={"dueDate": None})
+    assert "dueEpoch" not in cleared
+
+
+def test_projected_queries_select_only_requested_fields(fake_container):
+    task = db.create_task(user_id="user-8", title="Slim", list_name="Inbox", due_date=None)
+    fake_container.items[task["id"]]["_rid"] = "abc=="
+
+    results = db.list_tasks("user-8", fields=("id", "title"))
+
+    assert fake_container.queries[-1].startswith("SELECT c.id, c.title FROM c WHERE")
+    assert results == [{"id": task["id"], "title": "Slim"}]
+
+
+def test_system_fields_never_leave_the_db_layer(fake_container):
+    task = db.create_task(user_id="user-9", title="Clean", list_name="Inbox", due_date=None)
+    fake_container.items[task["id"]].update({"_rid": "abc==", "_etag": '"0"', "_ts": 1})
+
+    listed = db.list_tasks("user-9")
+    updated = db.update_task(user_id="user-9", task_id=task["id"], updates={"status": "done"})
+    deleted = db.delete_tasks_for_user(user_id="user-9", fields=("title",))
+
+    assert not [key for key in listed[0] if key.startswith("_")]
+    assert not [key for key in updated if key.startswith("_")]
+    assert deleted == [{"title": "Clean"}]
+
+
+def test_task_stats_follow_every_write(fake_container, meta_container):
+    first = db.create_task(user_id="user-10", title="A", list_name="Work", due_date="2025-11-25T10:00:00Z")
+    second = db.create_task(user_id="user-10", title="B", list_name="Work/Side", due_date=None)
+    db.create_task(user_id="user-10", title="C", list_name="Inbox", due_date=None)
+
+    db.update_task(user_id="user-10", task_id=first["id"], updates={"status": "done"})
+    db.update_task(user_id="user-10", task_id=second["id"], updates={"dueDate": "2025-12-01T10:00:00Z"})
+    db.delete_tasks_for_user(user_id="user-10", list_name="Inbox")
+
+    maintained = db.read_task_stats("user-10")
+    rebuilt = db.repair_task_stats("user-10")
+    assert maintained["counts"] == {"done:Work": 1, "open:Work/Side": 1}
+    assert maintained["counts"] == rebuilt["counts"]
+    assert maintained["openDue"] == rebuilt["openDue"]
+
+    db.delete_task(user_id="user-10", task_id=second["id"])
+    assert db.read_task_stats("user-10")["openDue"] == {}
+
+
+def test_missing_task_stats_are_rebuilt_from_tasks(fake_container, meta_container):
+    fake_container.create_item(
+        {"id": "legacy", "userId": "user-11", "title": "Old", "list": "Work", "status": "open"}
+    )
+
+    stats = db.read_task_stats("user-11")
+
+    assert stats["counts"] == {"open:Work": 1}
+    assert ("user-11", "task-stats") in meta_container.items
+
+
+def test_failed_task_stat_batches_rebuild_the_stats(fake_container, meta_container):
+    db.create_task(user_id="user-12", title="A", list_name="Work", due_date=None)
+    meta_container.fail_batches = True
+
+    db.create_task(user_id="user-12", title="B", list_name="Home", due_date=None)
+
+    assert db.read_task_stats("user-12")["counts"] == {"open:Work": 1, "open:Home": 1}
+
+
+def test_task_stats_keep_counters_when_the_document_moved_on(fake_container, meta_container, monkeypatch):
+    task = db.create_task(user_id="user-13", title="A", list_name="Work", due_date=None)
+    patch_item = meta_container.patch_item
+
+    def concurrent_write(item, partition_key, patch_operations, **kwargs):
+        if kwargs.get("if_match_etag"):
+            meta_container.upsert_item(meta_container.read_item(item, partition_key))
+        return patch_item(item, partition_key, patch_operations, **kwargs)
+
+    monkeypatch.setattr(meta_container, "patch_item", concurrent_write)
+    db.update_task(user_id="user-13", task_id=task["id"], updates={"status": "done"})
+
+    assert meta_container.items[("user-13", "task-stats")]["counts"] == {"open:Work": 0, "done:Work": 1}
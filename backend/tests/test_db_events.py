@@ -1,5 +1,6 @@
 import os
 import copy
+from datetime import datetime
 
 import pytest
 import azure.cosmos  # type: ignore
@@ -11,22 +12,31 @@ class FakeEventsContainer:
     def __init__(self) -> None:
         self.items: dict[str, dict] = {}
 
-    def create_item(self, item: dict) -> None:
+    def create_item(self, item: dict, **kwargs) -> None:
         self.items[item["id"]] = copy.deepcopy(item)
 
-    def query_items(self, query: str, parameters: list, enable_cross_partition_query: bool = False):
+    def query_items(self, query: str, parameters: list, enable_cross_partition_query: bool = False, **kwargs):
         user_id = next((p["value"] for p in parameters if p["name"] == "@userId"), None)
-        start = next((p["value"] for p in parameters if p["name"] == "@start"), None)
-        end = next((p["value"] for p in parameters if p["name"] == "@end"), None)
+        start = next((p["value"] for p in parameters if p["name"] == "@startEpoch"), None)
+        end = next((p["value"] for p in parameters if p["name"] == "@endEpoch"), None)
+        range_start = next((p["value"] for p in parameters if p["name"] == "@rangeStartEpoch"), None)
+        range_end = next((p["value"] for p in parameters if p["name"] == "@rangeEndEpoch"), None)
+        missing_epochs = "NOT IS_DEFINED(C.STARTEPOCH)" in query.upper()
         title = next((p["value"].lower() for p in parameters if p["name"] == "@title"), None)
 
         results: list[dict] = []
         for item in self.items.values():
             if user_id and item.get("userId") != user_id:
                 continue
-            if start and item.get("start") < start:
+            if missing_epochs and "startEpoch" in item and "endEpoch" in item:
                 continue
-            if end and item.get("start") >= end:
+            if start is not None and item["startEpoch"] < start:
+                continue
+            if end is not None and item["startEpoch"] >= end:
+                continue
+            if range_end is not None and item["startEpoch"] >= range_end:
+                continue
+            if range_start is not None and item["endEpoch"] <= range_start:
                 continue
             if title is not None:
                 current = (item.get("title") or "").lower()
@@ -42,13 +52,13 @@ class FakeEventsContainer:
         results.sort(key=lambda ev: ev.get("start") or "", reverse=reverse)
         return results
 
-    def read_item(self, item_id: str, partition_key: str) -> dict:
+    def read_item(self, item_id: str, partition_key: str, **kwargs) -> dict:
         return copy.deepcopy(self.items[item_id])
 
-    def replace_item(self, item_id: str, item: dict) -> None:
+    def replace_item(self, item_id: str, item: dict, **kwargs) -> None:
         self.items[item_id] = copy.deepcopy(item)
 
-    def delete_item(self, item_id: str, partition_key: str) -> None:
+    def delete_item(self, item_id: str, partition_key: str, **kwargs) -> None:
         self.items.pop(item_id, None)
 
 
@@ -75,6 +85,14 @@ azure.cosmos.CosmosClient = _StubCosmosClient
 from backend import db_events
 
 
+def stored_event(**fields) -> dict:
+    """Builds a document the way create_event stores it, epoch fields included."""
+    event = dict(fields)
+    event["startEpoch"] = int(datetime.fromisoformat(event["start"]).timestamp())
+    event["endEpoch"] = int(datetime.fromisoformat(event["end"]).timestamp())
+    return event
+
+
 @pytest.fixture(autouse=True)
 def fake_container(monkeypatch):
     container = FakeEventsContainer()
@@ -82,6 +100,15 @@ def fake_container(monkeypatch):
     return container
 
 
+@pytest.fixture(autouse=True)
+def version_bumps(monkeypatch):
+    bumps: list[tuple[str, str]] = []
+    monkeypatch.setattr(
+        db_events, "bump_data_version", lambda user_id, scope: bumps.append((user_id, scope))
+    )
+    return bumps
+
+
 def test_create_event_sets_fields(fake_container):
     event = db_events.create_event(
         user_id="user1",
@@ -101,38 +128,38 @@ def test_create_event_sets_fields(fake_container):
 
 
 def test_list_events_filters_by_range(fake_container):
-    fake_container.create_item({
-        "id": "1",
-        "userId": "user1",
-        "title": "Before",
-        "start": "2024-01-01T08:00:00Z",
-        "end": "2024-01-01T09:00:00Z",
-        "list": "Default",
-    })
-    fake_container.create_item({
-        "id": "2",
-        "userId": "user1",
-        "title": "Inside window",
-        "start": "2024-01-01T10:00:00Z",
-        "end": "2024-01-01T11:00:00Z",
-        "list": "Default",
-    })
-    fake_container.create_item({
-        "id": "3",
-        "userId": "user1",
-        "title": "After",
-        "start": "2024-01-01T12:00:00Z",
-        "end": "2024-01-01T13:00:00Z",
-        "list": "Default",
-    })
-    fake_container.create_item({
-        "id": "4",
-        "userId": "other",
-        "title": "Other user",
-        "start": "2024-01-01T10:30:00Z",
-        "end": "2024-01-01T11:30:00Z",
-        "list": "Default",
-    })
+    fake_container.create_item(stored_event(
+        id="1",
+        userId="user1",
+        title="Before",
+        start="2024-01-01T08:00:00Z",
+        end="2024-01-01T09:00:00Z",
+        list="Default",
+    ))
+    fake_container.create_item(stored_event(
+        id="2",
+        userId="user1",
+        title="Inside window",
+        start="2024-01-01T10:00:00Z",
+        end="2024-01-01T11:00:00Z",
+        list="Default",
+    ))
+    fake_container.create_item(stored_event(
+        id="3",
+        userId="user1",
+        title="After",
+        start="2024-01-01T12:00:00Z",
+        end="2024-01-01T13:00:00Z",
+        list="Default",
+    ))
+    fake_container.create_item(stored_event(
+        id="4",
+        userId="other",
+        title="Other user",
+        start="2024-01-01T10:30:00Z",
+        end="2024-01-01T11:30:00Z",
+        list="Default",
+    ))
 
     results = db_events.list_events(
         user_id="user1",
@@ -144,22 +171,22 @@ def test_list_events_filters_by_range(fake_container):
 
 
 def test_delete_events_in_range_removes_only_matches(fake_container):
-    inside = {
-        "id": "5",
-        "userId": "user1",
-        "title": "Inside",
-        "start": "2024-01-02T10:00:00Z",
-        "end": "2024-01-02T11:00:00Z",
-        "list": "Default",
-    }
-    outside = {
-        "id": "6",
-        "userId": "user1",
-        "title": "Outside",
-        "start": "2024-01-02T12:00:00Z",
-        "end": "2024-01-02T13:00:00Z",
-        "list": "Default",
-    }
+    inside = stored_event(
+        id="5",
+        userId="user1",
+        title="Inside",
+        start="2024-01-02T10:00:00Z",
+        end="2024-01-02T11:00:00Z",
+        list="Default",
+    )
+    outside = stored_event(
+        id="6",
+        userId="user1",
+        title="Outside",
+        start="2024-01-02T12:00:00Z",
+        end="2024-01-02T13:00:00Z",
+        list="Default",
+    )
     fake_container.create_item(inside)
     fake_container.create_item(outside)
 
@@ -201,3 +228,123 @@ def test_find_events_by_title(fake_container):
     assert {event["id"] for event in partial_matches} == {"7", "8"}
 
 
+def test_event_writes_bump_events_data_version(fake_container, version_bumps):
+    event = db_events.create_event(
+        user_id="user1",
+        title="Versioned",
+        start_iso="2024-01-05T10:00:00Z",
+        end_iso="2024-01-05T11:00:00Z",
+    )
+    db_events.update_event(user_id="user1", event_id=event["id"], updates={"title": "Renamed"})
+    db_events.delete_events_in_range(
+        user_id="user1",
+        start_iso="2024-01-06T00:00:00Z",
+        end_iso="2024-01-07T00:00:00Z",
+    )
+    db_events.delete_event(user_id="user1", event_id=event["id"])
+
+    assert version_bumps == [("user1", "events")] * 3
+
+
+def test_list_events_overlapping_includes_spanning_events(fake_container):
+    fake_container.create_item(stored_event(
+        id="9",
+        userId="user1",
+        title="Trip",
+        start="2024-01-30T08:00:00Z",
+        end="2024-02-02T18:00:00Z",
+        list="Default",
+    ))
+    fake_container.create_item(stored_event(
+        id="10",
+        userId="user1",
+        title="Ended in January",
+        start="2024-01-31T08:00:00Z",
+        end="2024-01-31T09:00:00Z",
+        list="Default",
+    ))
+
+    results = db_events.list_events_overlapping(
+        user_id="user1",
+        start_iso="2024-02-01T00:00:00Z",
+        end_iso="2024-03-01T00:00:00Z",
+    )
+
+    assert [event["id"] for event in results] == ["9"]
+
+
+def test_create_event_normalizes_offsets_to_utc_with_epochs(fake_container):
+    event = db_events.create_event(
+        user_id="user1",
+        title="Helsinki time",
+        start_iso="2024-06-01T12:00:00+03:00",
+        end_iso="2024-06-01T13:30:00",
+    )
+
+    stored = fake_container.items[event["id"]]
+    assert stored["start"] == "2024-06-01T09:00:00Z"
+    # Naive values are interpreted as Europe/Helsinki local time.
+    assert stored["end"] == "2024-06-01T10:30:00Z"
+    assert stored["startEpoch"] == int(datetime.fromisoformat("2024-06-01T09:00:00+00:00").timestamp())
+    assert stored["endEpoch"] - stored["startEpoch"] == 90 * 60
+
+
+def test_list_events_range_compares_instants_not_strings(fake_container):
+    # 23:30 local on Jan 1 is 21:30Z: inside a Jan 1 range given in UTC even
+    # though its original string would sort after the range end.
+    db_events.create_event(
+        user_id="user1",
+        title="Late",
+        start_iso="2024-01-01T23:30:00+02:00",
+        end_iso="2024-01-02T00:30:00+02:00",
+    )
+
+    results = db_events.list_events(
+        user_id="user1",
+        start_iso="2024-01-01T00:00:00Z",
+        end_iso="2024-01-01T22:00:00Z",
+    )
+
+    assert [event["title"] for event in results] == ["Late"]
+
+
+def test_update_event_recomputes_epochs(fake_container):
+    event = db_events.create_event(
+        user_id="user1",
+        title="Movable",
+        start_iso="2024-01-05T10:00:00Z",
+        end_iso="2024-01-05T11:00:00Z",
+    )
+
+    updated = db_events.update_event(
+        user_id="user1", event_id=event["id"], updates={"start": "2024-01-05T09:00:00Z"}
+    )
+
+    assert updated["startEpoch"] == event["startEpoch"] - 3600
+    assert updated["endEpoch"] == event["endEpoch"]
+
+
+def test_backfill_event_epochs_adds_missing_fields(fake_container, version_bumps):
+    fake_container.create_item({
+        "id": "legacy",
+        "userId": "user1",
+        "title": "Legacy",
+        "start": "2024-01-03T09:00:00+02:00",
+        "end": "2024-01-03T10:00:00+02:00",
+        "list": "Default",
+    })
+    fake_container.create_item(stored_event(
+        id="current",
+        userId="user1",
+        title="Current",
+        start="2024-01-03T09:00:00Z",
+        end="2024-01-03T10:00:00Z",
+        list="Default",
+    ))
+
+    assert db_events.backfill_event_epochs() == 1
+
+    legacy = fake_container.items["legacy"]
+    assert legacy["start"] == "2024-01-03T07:00:00Z"
+    assert legacy["endEpoch"] - legacy["startEpoch"] == 3600
+    assert version_bumps == [("user1", "events")]
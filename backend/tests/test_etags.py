@@ -0,0 +1,18 @@
+import pytest
+
+from backend import etags
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"other", "abc"', True),
+        ("*", True),
+        ('"other"', False),
+    ],
+)
+def test_etag_matches(header, expected):
+    assert etags.etag_matches(header, '"abc"') is expected
@@ -0,0 +1,72 @@
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from backend import heatmap
+
+HELSINKI = ZoneInfo("Europe/Helsinki")
+
+
+def _day(payload, date):
+    return next(day for day in payload["days"] if day["date"] == date)
+
+
+def test_day_boundaries_cover_dst_switch():
+    bounds = heatmap.day_boundaries(2025, 10, HELSINKI)
+    lengths = np.diff(bounds) // 3600
+
+    assert bounds.size == 32
+    # Clocks go back on Sunday 26 October 2025.
+    assert lengths[25] == 25
+    assert set(lengths[:25]) == {24}
+
+
+def test_merge_intervals_unions_overlaps():
+    starts = np.array([30, 0, 100], dtype=np.int64)
+    ends = np.array([60, 40, 120], dtype=np.int64)
+
+    merged_starts, merged_ends = heatmap.merge_intervals(starts, ends)
+
+    assert merged_starts.tolist() == [0, 100]
+    assert merged_ends.tolist() == [60, 120]
+
+
+def test_build_heatmap_splits_midnight_and_counts_once_per_day():
+    events = [
+        # 22:00-02:00 local across midnight.
+        {"id": "1", "start": "2025-11-03T22:00:00+02:00", "end": "2025-11-04T02:00:00+02:00"},
+        # Overlaps the first event; busy time is the union, not the sum.
+        {"id": "2", "start": "2025-11-03T23:00:00+02:00", "end": "2025-11-04T00:00:00+02:00"},
+        {"id": "3", "start": "2025-10-31T23:30:00+02:00", "end": "2025-11-01T00:30:00+02:00"},
+    ]
+    tasks = [
+        {"id": "t1", "dueDate": "2025-11-04T10:00:00Z"},
+        {"id": "t2", "dueDate": "2025-11-04T21:59:00Z"},
+        {"id": "t3", "dueDate": "2025-11-04T22:00:00Z"},
+        {"id": "t4"},
+    ]
+
+    payload = heatmap.build_heatmap(events, tasks, 2025, 11, HELSINKI)
+
+    assert len(payload["days"]) == 30
+    assert _day(payload, "2025-11-01") == {
+        "date": "2025-11-01",
+        "busyMinutes": 30,
+        "eventCount": 1,
+        "dueTaskCount": 0,
+    }
+    assert _day(payload, "2025-11-03")["busyMinutes"] == 120
+    assert _day(payload, "2025-11-03")["eventCount"] == 2
+    assert _day(payload, "2025-11-04")["busyMinutes"] == 120
+    assert _day(payload, "2025-11-04")["eventCount"] == 1
+    assert _day(payload, "2025-11-04")["dueTaskCount"] == 2
+    assert _day(payload, "2025-11-05")["dueTaskCount"] == 1
+
+
+def test_build_heatmap_full_dst_day_is_25_hours():
+    events = [{"id": "1", "start": "2025-10-26T00:00:00", "end": "2025-10-27T00:00:00"}]
+
+    payload = heatmap.build_heatmap(events, [], 2025, 10, HELSINKI)
+
+    assert _day(payload, "2025-10-26")["busyMinutes"] == 25 * 60
+    assert _day(payload, "2025-10-27")["eventCount"] == 0
@@ -0,0 +1,64 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.http_pools import PoolStats, pooled_session
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_opened_per_minute_is_a_sliding_window():
+    clock = FakeClock()
+    stats = PoolStats("test", clock=clock)
+
+    stats.connection_opened()
+    clock.now = 30
+    stats.connection_opened()
+    clock.now = 61
+
+    assert stats.snapshot()["opened"] == 2
+    assert stats.snapshot()["openedLastMinute"] == 1
+
+
+def test_pooled_session_reuses_one_connection_and_reports_it(server_url):
+    stats = PoolStats("test")
+    session = pooled_session(stats, pool_size=4)
+
+    for _ in range(5):
+        assert session.get(server_url, timeout=5).text == "ok"
+
+    snapshot = stats.snapshot()
+    assert snapshot["opened"] == 1
+    assert snapshot["idle"] == 1
+    assert snapshot["inUse"] == 0
+    session.close()
@@ -0,0 +1,58 @@
+import re
+
+import pytest
+
+from backend import indexing_policy
+
+
+@pytest.mark.parametrize("container", sorted(indexing_policy.QUERY_SHAPES))
+def test_every_queried_property_is_indexed(container):
+    policy = indexing_policy.POLICIES[container]
+    included = {entry["path"] for entry in policy["includedPaths"]}
+
+    for name, query in indexing_policy.QUERY_SHAPES[container]:
+        for prop in indexing_policy.referenced_properties(query):
+            assert f"/{prop}/?" in included, f"{container}.{name} filters or sorts on unindexed {prop}"
+
+
+@pytest.mark.parametrize("container", sorted(indexing_policy.QUERY_SHAPES))
+def test_equality_filters_with_order_by_have_composite_indexes(container):
+    composites = [
+        [(entry["path"].lstrip("/"), entry["order"]) for entry in composite]
+        for composite in indexing_policy.POLICIES[container]["compositeIndexes"]
+    ]
+
+    for name, query in indexing_policy.QUERY_SHAPES[container]:
+        order = re.search(r"ORDER BY c\.(\w+) (ASC|DESC)", query)
+        equalities = re.findall(r"\bc\.(\w+) = @", query)
+        if not order or not equalities:
+            continue
+        direction = "ascending" if order.group(2) == "ASC" else "descending"
+        wanted = [(prop, "ascending") for prop in equalities] + [(order.group(1), direction)]
+        assert wanted in composites, f"{container}.{name} needs composite index {wanted}"
+
+
+def test_unqueried_paths_are_excluded():
+    for policy in indexing_policy.POLICIES.values():
+        assert {"path": "/*"} in policy["excludedPaths"]
+
+
+def test_policy_diff_ignores_server_defaults():
+    desired = indexing_policy.POLICIES["tasks"]
+    from_server = {
+        **desired,
+        "indexingMode": "Consistent",
+        "excludedPaths": desired["excludedPaths"] + [{"path": '/"_etag"/?'}],
+    }
+    assert indexing_policy.policy_diff(from_server, desired) == {}
+
+    default_policy = {
+        "indexingMode": "consistent",
+        "automatic": True,
+        "includedPaths": [{"path": "/*"}],
+        "excludedPaths": [{"path": '/"_etag"/?'}],
+    }
+    diff = indexing_policy.policy_diff(default_policy, desired)
+    assert diff["includedPaths"]["remove"] == ["/*"]
+    assert diff["excludedPaths"]["add"] == ["/*"]
+    assert len(diff["compositeIndexes"]["add"]) == len(desired["compositeIndexes"])
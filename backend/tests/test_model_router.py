@@ -0,0 +1,130 @@
+from types import SimpleNamespace
+
+from backend import model_router
+from backend.metrics import MetricsRegistry
+from backend.rate_limiter import AdaptiveRateLimiter
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "create_task",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "list": {"type": "string", "enum": ["Inbox", "Work", "Personal"]},
+                    "limit": {"type": "integer"},
+                },
+                "required": ["title"],
+            },
+        },
+    }
+]
+
+
+def tool_call(name: str, arguments: str):
+    return SimpleNamespace(id="call-1", function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def completion(tool_calls=None, content=None):
+    message = SimpleNamespace(tool_calls=tool_calls, content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+class FakeCreate:
+    def __init__(self, responses: dict) -> None:
+        self.responses = responses
+        self.models: list[str] = []
+
+    def __call__(self, model, messages, **kwargs):
+        self.models.append(model)
+        return self.responses[model]
+
+
+def make_router(create, router_model="small"):
+    registry = MetricsRegistry()
+    limiter = AdaptiveRateLimiter(6000, 600_000, queue_timeout=1, max_retries=0, metrics=registry)
+    router = model_router.ChatModelRouter(
+        create=create, limiter=limiter, full_model="full", router_model=router_model, metrics=registry
+    )
+    return router, registry
+
+
+MESSAGES = [{"role": "user", "content": "lisää tehtävä"}]
+
+
+def test_validate_arguments_checks_required_types_and_enums():
+    schema = TOOLS[0]["function"]["parameters"]
+    assert model_router.validate_arguments('{"title": "x", "list": "Work", "limit": 3}', schema) is None
+    assert model_router.validate_arguments('{"title": "x", "list": ""}', schema) is None
+    assert "missing" in model_router.validate_arguments('{"list": "Work"}', schema)
+    assert "one of" in model_router.validate_arguments('{"title": "x", "list": "Home"}', schema)
+    assert "integer" in model_router.validate_arguments('{"title": "x", "limit": true}', schema)
+    assert "JSON" in model_router.validate_arguments("{title: x}", schema)
+
+
+def test_valid_router_output_is_used_without_full_model():
+    create = FakeCreate({"small": completion([tool_call("create_task", '{"title": "Osta maitoa"}')])})
+    router, registry = make_router(create)
+
+    routed = router.select_tools(MESSAGES, TOOLS, deadline=router._limiter.deadline())
+
+    assert routed.model == "small"
+    assert routed.fallback_reason is None
+    assert create.models == ["small"]
+    snapshot = registry.snapshot()
+    assert snapshot["gauges"]["chat.route.fallback_rate"] == 0
+    assert snapshot["histograms"]["chat.route.router.latency_ms"]["count"] == 1
+
+
+def test_schema_failure_falls_back_to_full_model():
+    create = FakeCreate(
+        {
+            "small": completion([tool_call("create_task", '{"list": "Nowhere"}')]),
+            "full": completion([tool_call("create_task", '{"title": "Osta maitoa"}')]),
+        }
+    )
+    router, registry = make_router(create)
+
+    routed = router.select_tools(MESSAGES, TOOLS, deadline=router._limiter.deadline())
+
+    assert routed.model == "full"
+    assert routed.fallback_reason == "schema"
+    assert create.models == ["small", "full"]
+    assert [(cost.route, cost.model) for cost in routed.costs] == [("router", "small"), ("select", "full")]
+    assert registry.counter("chat.route.fallback.schema") == 1
+    assert registry.snapshot()["gauges"]["chat.route.fallback_rate"] == 1
+
+
+def test_text_answer_from_router_counts_as_ambiguous():
+    create = FakeCreate(
+        {"small": completion(content="En ole varma"), "full": completion(content="Tarkoititko...")}
+    )
+    router, registry = make_router(create)
+
+    routed = router.select_tools(MESSAGES, TOOLS, deadline=router._limiter.deadline())
+
+    assert routed.message.content == "Tarkoititko..."
+    assert routed.fallback_reason == "no_tool_call"
+
+
+def test_routing_disabled_uses_full_model_everywhere():
+    create = FakeCreate({"full": completion(content="Hei")})
+    router, registry = make_router(create, router_model=None)
+
+    assert router.select_tools(MESSAGES, TOOLS, router._limiter.deadline()).model == "full"
+    assert router.reply(MESSAGES, router._limiter.deadline()).model == "full"
+    assert create.models == ["full", "full"]
+    assert registry.counter("chat.route.router_calls") == 0
+
+
+def test_downgraded_router_answers_on_the_small_model_only():
+    create = FakeCreate({"small": completion(content="Hei")})
+    router, _ = make_router(create)
+
+    downgraded = router.downgraded()
+
+    assert downgraded.reply(MESSAGES, router._limiter.deadline()).model == "small"
+    assert downgraded.select_tools(MESSAGES, TOOLS, router._limiter.deadline()).fallback_reason is None
+    assert create.models == ["small", "small"]
@@ -0,0 +1,115 @@
+import json
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from backend import overview
+
+HELSINKI = ZoneInfo("Europe/Helsinki")
+
+
+def test_parse_month_defaults_and_validates():
+    assert overview.parse_month(None, date(2025, 11, 19)) == (2025, 11)
+    assert overview.parse_month("2026-02", date(2025, 11, 19)) == (2026, 2)
+    for bad in ["2025-13", "2025/11", "25-11", "abcd-ef"]:
+        with pytest.raises(ValueError):
+            overview.parse_month(bad, date(2025, 11, 19))
+
+
+def test_task_counts_and_next_tasks_order():
+    tasks = [
+        {"id": "a", "title": "No due", "list": "Work", "status": "open"},
+        {"id": "b", "title": "Later", "list": "Inbox", "status": "open", "dueDate": "2025-11-20T10:00:00Z"},
+        {"id": "c", "title": "Sooner", "list": "Inbox", "status": "open", "dueDate": "2025-11-19T12:00:00+02:00"},
+        {"id": "d", "title": "Done", "list": "Personal", "status": "done"},
+    ]
+
+    assert overview.count_open_tasks_by_list(tasks) == {"Inbox": 2, "Work": 1, "Personal": 0}
+    assert [t["id"] for t in overview.next_open_tasks(tasks, 2, HELSINKI)] == ["c", "b"]
+
+
+def test_bucket_events_splits_multi_day_and_clips_to_month():
+    start, end = overview.month_bounds(2025, 11, HELSINKI)
+    events = [
+        # 23:30-01:00 local on Oct 31 -> Nov 1 touches only Nov 1 inside the month.
+        {"id": "1", "title": "Late", "start": "2025-10-31T21:30:00Z", "end": "2025-10-31T23:00:00Z"},
+        # Ends exactly at local midnight: must not mark Nov 4.
+        {"id": "2", "title": "Evening", "start": "2025-11-03T20:00:00+02:00", "end": "2025-11-04T00:00:00+02:00"},
+        # Naive values are local time.
+        {"id": "3", "title": "Trip", "start": "2025-11-29T10:00:00", "end": "2025-12-02T10:00:00"},
+        {"id": "4", "title": "October", "start": "2025-10-10T10:00:00Z", "end": "2025-10-10T11:00:00Z"},
+    ]
+
+    days, month_events = overview.bucket_events_by_day(events, start, end, HELSINKI)
+
+    assert days == {
+        "2025-11-01": 1,
+        "2025-11-03": 1,
+        "2025-11-29": 1,
+        "2025-11-30": 1,
+    }
+    assert [ev["id"] for ev in month_events] == ["1", "2", "3"]
+
+
+def test_month_bounds_follow_dst():
+    start, end = overview.month_bounds(2025, 10, HELSINKI)
+    assert start.astimezone(timezone.utc) == datetime(2025, 9, 30, 21, 0, tzinfo=timezone.utc)
+    assert end.astimezone(timezone.utc) == datetime(2025, 10, 31, 22, 0, tzinfo=timezone.utc)
+
+
+def test_build_overview_shape():
+    payload = overview.build_overview(
+        open_tasks=[{"id": "t1", "title": "Task", "list": "Work", "status": "open"}],
+        events=[{"id": "e1", "title": "Meet", "start": "2025-11-05T10:00:00Z", "end": "2025-11-05T11:00:00Z"}],
+        year=2025,
+        month=11,
+        tz=HELSINKI,
+        day=date(2025, 11, 5),
+    )
+
+    assert payload["month"] == "2025-11"
+    assert payload["openTaskCount"] == 1
+    assert payload["taskCounts"]["Work"] == 1
+    assert payload["eventDays"] == {"2025-11-05": 1}
+    assert payload["nextTasks"][0]["id"] == "t1"
+    assert payload["day"] == "2025-11-05"
+    assert [ev["id"] for ev in payload["events"]] == ["e1"]
+
+
+def test_day_outside_the_month_lists_no_events():
+    payload = overview.build_overview([], [], 2025, 11, HELSINKI, day=date(2025, 12, 1))
+    assert payload["day"] is None
+    assert payload["events"] == []
+
+
+def test_events_on_day_include_spanning_events_sorted_by_start():
+    events = [
+        {"id": "late", "title": "Late", "start": "2025-11-05T18:00:00+02:00", "end": "2025-11-05T19:00:00+02:00"},
+        {"id": "trip", "title": "Trip", "start": "2025-11-04T10:00:00+02:00", "end": "2025-11-06T10:00:00+02:00"},
+        {"id": "next", "title": "Next", "start": "2025-11-06T00:00:00+02:00", "end": "2025-11-06T01:00:00+02:00"},
+    ]
+    assert [ev["id"] for ev in overview.events_on_day(events, date(2025, 11, 5), HELSINKI)] == ["trip", "late"]
+    with pytest.raises(ValueError):
+        overview.parse_day("2025-11")
+
+
+def test_payload_stays_bounded_for_a_busy_month():
+    events = [
+        {
+            "id": f"e-{day}-{hour}",
+            "title": f"Palaveri {day}.{hour}",
+            "start": f"2025-11-{day:02d}T{hour:02d}:00:00+02:00",
+            "end": f"2025-11-{day:02d}T{hour:02d}:30:00+02:00",
+            "list": "Work",
+        }
+        for day in range(1, 31)
+        for hour in range(8, 20)
+    ]
+
+    payload = overview.build_overview([], events, 2025, 11, HELSINKI, day=date(2025, 11, 12))
+
+    assert len(payload["events"]) == 12
+    assert sum(payload["eventDays"].values()) == len(events)
+    # Markers grow with the days of the month, details only with one day.
+    assert len(json.dumps(payload)) < 3000
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend import prefetch
+from backend.etags import EVENTS_SCOPE, TASKS_SCOPE
+from backend.storage_sqlite import SqliteStorage
+
+NOW = datetime(2024, 5, 6, 9, 0, tzinfo=timezone.utc)
+
+
+def epoch(value: datetime) -> int:
+    return int(value.timestamp())
+
+
+@pytest.fixture
+def store():
+    backend = SqliteStorage(":memory:")
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+def test_hints_follow_keywords():
+    assert prefetch.prefetch_hints("Näytä avoimet tehtävät") == {TASKS_SCOPE}
+    assert prefetch.prefetch_hints("Mitä kalenterissa on huomenna?") == {EVENTS_SCOPE}
+    assert prefetch.prefetch_hints("Kiitos!") == set()
+
+
+def test_open_tasks_are_reused_only_for_open_queries(store, executor):
+    store.create_task("user1", "Avoin", "Work", None)
+    done = store.create_task("user1", "Valmis", "Work", None)
+    store.update_task("user1", done["id"], {"status": "done"})
+
+    fetched = prefetch.ChatPrefetch(executor, store, "user1", "näytä tehtävät", NOW, timezone.utc)
+
+    assert fetched.open_tasks("done") is None
+    columns = fetched.open_tasks("open")
+    assert [task["title"] for task in columns.docs] == ["Avoin"]
+
+
+def test_events_reused_only_when_window_covers_query(store, executor):
+    store.create_event("user1", "Palaveri", "2024-05-07T10:00:00Z", "2024-05-07T11:00:00Z")
+    store.create_event("user1", "Kaukana", "2024-07-01T10:00:00Z", "2024-07-01T11:00:00Z")
+
+    fetched = prefetch.ChatPrefetch(executor, store, "user1", "mitä kalenterissa", NOW, timezone.utc)
+
+    tomorrow = NOW + timedelta(days=1)
+    columns = fetched.events(epoch(tomorrow), epoch(tomorrow + timedelta(days=1)), None)
+    assert [event["title"] for event in columns.docs] == ["Palaveri"]
+
+    assert fetched.events(epoch(NOW - timedelta(days=3)), epoch(NOW), None) is None
+    assert fetched.events(epoch(NOW), None, None) is None
+    assert fetched.events(None, epoch(NOW + timedelta(days=30)), epoch(NOW) + 60) is None
+
+
+def test_writes_in_the_turn_invalidate_prefetched_scope(store, executor):
+    store.create_task("user1", "Avoin", "Inbox", None)
+    fetched = prefetch.ChatPrefetch(executor, store, "user1", "lisää tehtävä", NOW, timezone.utc)
+
+    fetched.invalidate(prefetch.WRITE_TOOL_SCOPES["create_task"])
+
+    assert fetched.open_tasks("open") is None
+
+
+def test_disabled_prefetch_issues_no_queries(store, executor):
+    calls: list[str] = []
+    store.list_tasks_by_status = lambda *args: calls.append("tasks") or []
+
+    fetched = prefetch.ChatPrefetch(
+        executor, store, "user1", "näytä tehtävät", NOW, timezone.utc, enabled=False
+    )
+
+    assert fetched.open_tasks("open") is None
+    assert calls == []
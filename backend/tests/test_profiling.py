@@ -0,0 +1,64 @@
+import time
+from types import SimpleNamespace
+
+from backend.metrics import MetricsRegistry
+from backend.profiling import PROFILE_HEADER, RequestProfiler
+
+
+def make_profiler(tmp_path, **kwargs):
+    return RequestProfiler(directory=str(tmp_path), metrics=MetricsRegistry(), **kwargs)
+
+
+def busy_handler(req):
+    # Spin and allocate so both the sampler and tracemalloc have something to see.
+    blocks = [bytearray(64 * 1024) for _ in range(16)]
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    return SimpleNamespace(headers={}, blocks=blocks)
+
+
+def test_disabled_profiler_returns_the_handler_itself(tmp_path):
+    profiler = make_profiler(tmp_path, sample_rate=0, key=None)
+
+    assert profiler.wrap(busy_handler) is busy_handler
+
+
+def test_header_with_key_profiles_and_links_the_artifact(tmp_path):
+    profiler = make_profiler(tmp_path, sample_rate=0, key="secret", interval_ms=1)
+    handler = profiler.wrap(busy_handler)
+
+    plain = handler(SimpleNamespace(headers={}))
+    wrong = handler(SimpleNamespace(headers={PROFILE_HEADER: "guess"}))
+    profiled = handler(SimpleNamespace(headers={PROFILE_HEADER: "secret"}))
+
+    assert "X-Profile-Id" not in plain.headers
+    assert "X-Profile-Id" not in wrong.headers
+    profile_id = profiled.headers["X-Profile-Id"]
+    assert profiled.headers["X-Profile-Url"].endswith(profile_id)
+
+    profile = profiler.load(profile_id)
+    assert profile.name == "busy_handler"
+    assert profile.samples > 0
+    assert any("test_profiling.py:busy_handler" in line for line in profile.collapsed().splitlines())
+    assert profile.peak_kib >= 1024
+    assert profile.allocations[0]["sizeKiB"] >= 1024
+
+
+def test_sampling_rate_profiles_without_a_header(tmp_path):
+    profiler = make_profiler(tmp_path, sample_rate=0.5, key=None, sampler=lambda: 0.1)
+
+    response = profiler.wrap(busy_handler)(SimpleNamespace(headers={}))
+
+    assert "X-Profile-Id" in response.headers
+
+
+def test_old_profiles_are_pruned_and_ids_are_validated(tmp_path):
+    profiler = make_profiler(tmp_path, sample_rate=1.0, key=None, keep=2)
+    handler = profiler.wrap(lambda req: SimpleNamespace(headers={}))
+
+    ids = [handler(SimpleNamespace(headers={})).headers["X-Profile-Id"] for _ in range(3)]
+
+    assert len(list(tmp_path.iterdir())) == 2
+    assert sum(profiler.load(profile_id) is not None for profile_id in ids) == 2
+    assert profiler.load("../../etc/passwd") is None
@@ -0,0 +1,23 @@
+import pytest
+
+from backend import projection
+
+
+def test_select_clause_lists_fields_or_falls_back_to_star():
+    assert projection.select_clause(None) == "SELECT * FROM c"
+    assert projection.select_clause(("id", "dueEpoch")) == "SELECT c.id, c.dueEpoch FROM c"
+
+
+@pytest.mark.parametrize("fields", [(), ("id", "title FROM c --"), ("_rid",)])
+def test_select_clause_rejects_unsafe_fields(fields):
+    with pytest.raises(ValueError):
+        projection.select_clause(fields)
+
+
+def test_project_keeps_requested_fields_and_drops_system_fields():
+    doc = {"id": "1", "title": "A", "list": "Inbox", "_rid": "x", "_ts": 1}
+
+    assert projection.project(doc, None) == {"id": "1", "title": "A", "list": "Inbox"}
+    assert projection.project(doc, ("title", "missing")) == {"title": "A"}
+    assert projection.with_fields(("title",), "id", "title") == ("title", "id")
+    assert projection.with_fields(None, "id") is None
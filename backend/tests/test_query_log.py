@@ -0,0 +1,115 @@
+import base64
+import json
+
+import pytest
+
+from backend.cosmos_scheduler import CosmosScheduler
+from backend.metrics import MetricsRegistry
+from backend.query_log import QueryRecord, SlowQueryLog, parse_index_metrics, parse_query_metrics
+
+
+class FakeContainer:
+    """Serves pages and reports per-page headers through the response hook."""
+
+    def __init__(self, pages: list, headers: list) -> None:
+        self.pages = pages
+        self.headers = headers
+        self.calls: list = []
+
+    def query_items(self, query: str, parameters: list, response_hook=None, **kwargs):
+        self.calls.append(kwargs)
+        for page, headers in zip(self.pages, self.headers):
+            response_hook(headers, page)
+            yield from page
+
+
+def _record(caller: str, query: str, ms: float, ru: float) -> QueryRecord:
+    return QueryRecord(caller=caller, query=query, ms=ms, ru=ru, returned=1, sampled=False)
+
+
+def test_parse_query_metrics_reads_semicolon_separated_pairs():
+    parsed = parse_query_metrics("retrievedDocumentCount=120;indexHitRatio=0.25;bad=x")
+
+    assert parsed == {"retrievedDocumentCount": 120.0, "indexHitRatio": 0.25}
+    assert parse_query_metrics(None) == {}
+
+
+def test_parse_index_metrics_decodes_base64_json():
+    header = base64.b64encode(json.dumps({"PotentialSingleIndexes": []}).encode()).decode()
+
+    assert parse_index_metrics(header) == {"PotentialSingleIndexes": []}
+    assert parse_index_metrics("not base64!") is None
+
+
+def test_run_sums_charge_and_metrics_across_pages_when_sampled():
+    index = {"PotentialCompositeIndexes": [{"IndexSpec": "/userId ASC, /createdAt DESC"}]}
+    container = FakeContainer(
+        pages=[[{"id": "1"}], [{"id": "2"}]],
+        headers=[
+            {
+                "x-ms-request-charge": "3.5",
+                "x-ms-documentdb-query-metrics": "retrievedDocumentCount=40",
+                "x-ms-cosmos-index-utilization": base64.b64encode(json.dumps(index).encode()).decode(),
+            },
+            {"x-ms-request-charge": "8", "x-ms-documentdb-query-metrics": "retrievedDocumentCount=60"},
+        ],
+    )
+    log = SlowQueryLog(slow_ms=10_000, slow_ru=10, sample_rate=1.0, metrics=MetricsRegistry(), sampler=lambda: 0.0)
+
+    items = log.run(container, "SELECT * FROM c", [], caller="list_tasks", enable_cross_partition_query=False)
+
+    assert [item["id"] for item in items] == ["1", "2"]
+    assert container.calls[0]["populate_query_metrics"] is True
+    [record] = log.recent()
+    assert record["ru"] == 11.5
+    assert record["retrieved"] == 100
+    assert record["returned"] == 2
+    assert record["potential_indexes"] == ["/userId ASC, /createdAt DESC"]
+
+
+def test_unsampled_queries_do_not_request_metrics_and_fast_ones_are_not_kept():
+    registry = MetricsRegistry()
+    container = FakeContainer(pages=[[{"id": "1"}]], headers=[{"x-ms-request-charge": "2.8"}])
+    log = SlowQueryLog(slow_ms=10_000, slow_ru=10, sample_rate=0.1, metrics=registry, sampler=lambda: 0.5)
+
+    log.run(container, "SELECT * FROM c", [], caller="list_tasks")
+
+    assert "populate_query_metrics" not in container.calls[0]
+    assert log.recent() == []
+    assert registry.snapshot()["histograms"]["cosmos.query.ru"]["count"] == 1
+
+
+def test_scheduled_queries_count_every_page_against_the_budget():
+    registry = MetricsRegistry()
+    scheduler = CosmosScheduler(ru_per_second=1000, bulk_share=1.0, max_retries=3, metrics=registry)
+    container = FakeContainer(
+        pages=[[{"id": "1"}], [{"id": "2"}]],
+        headers=[{"x-ms-request-charge": "6"}, {"x-ms-request-charge": "9"}],
+    )
+    log = SlowQueryLog(slow_ms=10_000, slow_ru=100, metrics=registry, sampler=lambda: 0.5, scheduler=scheduler)
+
+    items = log.run(container, "SELECT * FROM c", [], caller="list_events")
+
+    assert [item["id"] for item in items] == ["1", "2"]
+    assert scheduler.spent_in_window() == 15
+    assert registry.snapshot()["histograms"]["cosmos.query.ru"]["max"] == 15
+
+
+def test_top_aggregates_repeated_offenders():
+    registry = MetricsRegistry()
+    log = SlowQueryLog(slow_ms=100, slow_ru=10, metrics=registry)
+    log.record(_record("list_tasks", "Q1", ms=150, ru=2))
+    log.record(_record("list_tasks", "Q1", ms=250, ru=4))
+    log.record(_record("search", "Q2", ms=5, ru=30))
+    log.record(_record("fast", "Q3", ms=5, ru=1))
+
+    by_ms = log.top(by="total_ms")
+    assert [(entry["caller"], entry["count"]) for entry in by_ms] == [("list_tasks", 2), ("search", 1)]
+    assert by_ms[0]["avg_ms"] == 200
+    assert log.top(by="max_ru")[0]["caller"] == "search"
+    assert registry.counter("cosmos.query.slow") == 3
+
+
+def test_top_rejects_unknown_ranking():
+    with pytest.raises(ValueError):
+        SlowQueryLog(metrics=MetricsRegistry()).top(by="query")
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from backend import rate_limiter
+from backend.metrics import MetricsRegistry
+
+
+class FakeResponse:
+    def __init__(self, headers: dict) -> None:
+        self.headers = headers
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code: int, headers: dict | None = None) -> None:
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(headers or {})
+
+
+class FakeUsage:
+    def __init__(self, total_tokens: int) -> None:
+        self.total_tokens = total_tokens
+
+
+class FakeCompletion:
+    def __init__(self, total_tokens: int) -> None:
+        self.usage = FakeUsage(total_tokens)
+
+
+def make_limiter(**overrides) -> rate_limiter.AdaptiveRateLimiter:
+    options = dict(
+        requests_per_minute=6000,
+        tokens_per_minute=600_000,
+        queue_timeout=2.0,
+        max_retries=3,
+        metrics=MetricsRegistry(),
+        sleep=lambda seconds: None,
+    )
+    options.update(overrides)
+    return rate_limiter.AdaptiveRateLimiter(**options)
+
+
+def test_retry_after_headers_are_parsed():
+    assert rate_limiter.retry_after_seconds(FakeAPIError(429, {"retry-after-ms": "250"})) == 0.25
+    assert rate_limiter.retry_after_seconds(FakeAPIError(429, {"retry-after": "3"})) == 3.0
+    assert rate_limiter.retry_after_seconds(FakeAPIError(429)) is None
+
+
+def test_throttled_call_waits_for_retry_after_and_adapts_rate():
+    limiter = make_limiter()
+    outcomes = [FakeAPIError(429, {"retry-after-ms": "50"}), FakeCompletion(10)]
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    started = time.monotonic()
+    result = limiter.call(flaky, prompt_tokens=100, max_tokens=50)
+
+    assert isinstance(result, FakeCompletion)
+    assert time.monotonic() - started >= 0.05
+    assert limiter.rate_factor == pytest.approx(rate_limiter.RATE_DECREASE + rate_limiter.RATE_INCREASE)
+    counters = limiter._metrics.snapshot()["counters"]
+    assert counters["openai.throttles"] == 1
+    assert counters["openai.retries"] == 1
+
+
+@pytest.mark.parametrize("status", [400, 409])
+def test_non_retryable_errors_propagate(status):
+    limiter = make_limiter()
+    calls = []
+
+    def bad_request():
+        calls.append(status)
+        raise FakeAPIError(status)
+
+    with pytest.raises(FakeAPIError):
+        limiter.call(bad_request, prompt_tokens=10, max_tokens=10)
+    assert calls == [status]
+
+
+def test_retry_that_would_miss_deadline_raises_rate_limit_exceeded():
+    limiter = make_limiter(queue_timeout=0.5)
+
+    def throttled():
+        raise FakeAPIError(429, {"retry-after": "30"})
+
+    with pytest.raises(rate_limiter.RateLimitExceeded) as info:
+        limiter.call(throttled, prompt_tokens=10, max_tokens=10)
+    assert info.value.retry_after == 30
+
+
+def test_token_budget_queues_callers_and_settles_actual_usage():
+    limiter = make_limiter(requests_per_minute=6000, tokens_per_minute=600)
+    deadline = limiter.deadline()
+
+    # Drain the bucket; reported usage lower than the estimate is refunded.
+    limiter.acquire(600, deadline)
+    limiter.settle(600, 500)
+    assert limiter._tokens.level == pytest.approx(100, abs=1)
+
+    # The next caller needs ~200 tokens at 10/s, so it would wait ~10s.
+    with pytest.raises(rate_limiter.RateLimitExceeded):
+        limiter.acquire(300, limiter.deadline(0.2))
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    limiter = make_limiter(requests_per_minute=600)  # 10 requests/s refill
+    deadline = limiter.deadline()
+    limiter._requests.level = 0
+
+    order: list[int] = []
+
+    def worker(index: int) -> None:
+        limiter.acquire(1, deadline)
+        order.append(index)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(3)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert order == [0, 1, 2]
+    assert limiter._metrics.snapshot()["gauges"]["openai.queue_depth"] == 0
+
+
+def test_estimate_prompt_tokens_grows_with_content():
+    short = rate_limiter.estimate_prompt_tokens([{"role": "user", "content": "hi"}])
+    long = rate_limiter.estimate_prompt_tokens([{"role": "user", "content": "hi " * 400}])
+    assert long > short + 250
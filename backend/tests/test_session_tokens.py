@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+from backend.cosmos_emulator import EmulatedContainer
+from backend.session_tokens import (
+    SESSION_TOKEN_HEADER,
+    ContextThreadPoolExecutor,
+    SessionContainer,
+    current_scope,
+    decode_tokens,
+    encode_tokens,
+    merge_session_tokens,
+    session_consistency,
+    session_scope,
+)
+
+
+class FakeContainer:
+    """Answers every call with a fixed session token and remembers the kwargs."""
+
+    id = "tasks"
+
+    def __init__(self, token="0:-1#5"):
+        self.token = token
+        self.calls = []
+
+    def _respond(self, name, kwargs):
+        self.calls.append((name, dict(kwargs)))
+        hook = kwargs.get("response_hook")
+        if hook is not None:
+            hook({"x-ms-session-token": self.token}, None)
+        return {"id": "t1"}
+
+    def read_item(self, item, partition_key, **kwargs):
+        return self._respond("read_item", kwargs)
+
+    def create_item(self, body, **kwargs):
+        return self._respond("create_item", kwargs)
+
+
+def test_merge_keeps_the_newest_progress_per_range():
+    assert merge_session_tokens(None, "0:-1#5") == "0:-1#5"
+    assert merge_session_tokens("0:-1#5", None) == "0:-1#5"
+    assert merge_session_tokens("0:-1#9", "0:-1#5") == "0:-1#9"
+    assert merge_session_tokens("0:1#5#3=4,1:1#7", "1:1#8") == "0:1#5#3=4,1:1#8"
+
+
+def test_header_round_trip_tolerates_garbage():
+    tokens = {"tasks": "0:-1#5", "meta": "0:1#12#3=4"}
+    assert decode_tokens(encode_tokens(tokens)) == tokens
+    assert decode_tokens(None) == {}
+    assert decode_tokens("not base64 !!") == {}
+    assert decode_tokens(encode_tokens({"tasks": 5})) == {}
+
+
+def test_container_passes_through_outside_a_scope():
+    container = FakeContainer()
+    SessionContainer(container).read_item("t1", partition_key="u")
+    assert container.calls == [("read_item", {})]
+
+
+def test_reads_use_and_writes_update_the_scope_tokens():
+    container = FakeContainer(token="0:-1#5")
+    wrapped = SessionContainer(container)
+    own_hook = []
+
+    with session_scope(encode_tokens({"tasks": "0:-1#5"})) as scope:
+        wrapped.read_item("t1", partition_key="u")
+        assert not scope.changed
+        container.token = "0:-1#7"
+        wrapped.create_item({"id": "t2"}, response_hook=lambda headers, _: own_hook.append(headers))
+
+    assert container.calls[0][1]["session_token"] == "0:-1#5"
+    assert own_hook == [{"x-ms-session-token": "0:-1#7"}]
+    assert scope.changed
+    assert scope.token_for("tasks") == "0:-1#7"
+    assert wrapped.create_item.__name__ == "create_item"
+
+
+def test_handler_returns_tokens_in_the_response_header():
+    container = SessionContainer(FakeContainer(token="0:-1#3"))
+
+    @session_consistency
+    def handler(req):
+        container.create_item({"id": "t1"})
+        return SimpleNamespace(headers={})
+
+    response = handler(SimpleNamespace(headers={}))
+    assert decode_tokens(response.headers[SESSION_TOKEN_HEADER]) == {"tasks": "0:-1#3"}
+    assert current_scope() is None
+
+    @session_consistency
+    def read_only(req):
+        return SimpleNamespace(headers={})
+
+    assert SESSION_TOKEN_HEADER not in read_only(SimpleNamespace(headers={})).headers
+
+
+def test_executor_keeps_the_request_scope():
+    with session_scope() as scope, ContextThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(current_scope).result() is scope
+    with ContextThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(current_scope).result() is None
+
+
+def test_emulated_writes_advance_the_session_token():
+    tasks = SessionContainer(EmulatedContainer("tasks"))
+    with session_scope() as scope:
+        tasks.create_item({"id": "t1", "userId": "u"})
+        first = scope.token_for("tasks")
+        tasks.upsert_item({"id": "t1", "userId": "u", "title": "x"})
+        tasks.query_items("SELECT * FROM c WHERE c.userId = 'u'")
+
+    assert first == "0:-1#1"
+    assert scope.token_for("tasks") == "0:-1#2"
@@ -0,0 +1,183 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from backend import storage
+from backend.storage_sqlite import SqliteStorage
+
+
+@pytest.fixture
+def store(tmp_path):
+    backend = SqliteStorage(str(tmp_path / "planner.db"))
+    yield backend
+    backend.close()
+
+
+def test_create_storage_selects_sqlite(tmp_path):
+    backend = storage.create_storage("sqlite", str(tmp_path / "x.db"))
+    assert backend.name == "sqlite"
+    backend.close()
+
+    with pytest.raises(ValueError):
+        storage.create_storage("mongo")
+
+
+def test_file_database_uses_wal(store):
+    mode = store._connection().execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+
+
+def test_tasks_round_trip(store):
+    first = store.create_task("user1", "Buy milk", "Personal", None)
+    second = store.create_task("user1", "Report", "Work", "2024-03-01T12:00:00")
+    store.create_task("other", "Buy milk", "Inbox", None)
+
+    assert [task["id"] for task in store.list_tasks("user1")] == [second["id"], first["id"]]
+    assert second["dueDate"] == "2024-03-01T10:00:00Z"
+
+    store.update_task("user1", first["id"], {"status": "done"})
+    assert [task["id"] for task in store.list_tasks_by_status("user1", "open")] == [second["id"]]
+
+    assert [task["id"] for task in store.find_tasks_by_title("user1", "BUY MILK")] == [first["id"]]
+
+    cleared = store.update_task("user1", second["id"], {"dueDate": None})
+    assert cleared["dueDate"] is None and cleared["dueEpoch"] is None
+
+    deleted = store.delete_tasks_for_user("user1", "Work")
+    assert [task["id"] for task in deleted] == [second["id"]]
+    store.delete_task("user1", first["id"])
+    assert store.list_tasks("user1") == []
+    assert len(store.list_tasks("other")) == 1
+
+
+def test_missing_task_raises_lookup_error(store):
+    with pytest.raises(LookupError):
+        store.update_task("user1", "missing", {"title": "x"})
+    with pytest.raises(LookupError):
+        store.delete_task("user1", "missing")
+
+
+def test_event_range_queries_compare_epochs(store):
+    late = store.create_event("user1", "Late", "2024-01-01T23:30:00+02:00", "2024-01-02T00:30:00+02:00")
+    trip = store.create_event("user1", "Trip", "2023-12-30T08:00:00Z", "2024-01-02T18:00:00Z")
+
+    in_range = store.list_events("user1", "2024-01-01T00:00:00Z", "2024-01-01T22:00:00Z")
+    assert [event["id"] for event in in_range] == [late["id"]]
+
+    overlapping = store.list_events_overlapping("user1", "2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z")
+    assert [event["id"] for event in overlapping] == [trip["id"], late["id"]]
+
+    moved = store.update_event("user1", late["id"], {"start": "2024-01-01T20:30:00Z"})
+    assert moved["startEpoch"] == late["startEpoch"] - 3600
+    assert moved["endEpoch"] == late["endEpoch"]
+
+    deleted = store.delete_events_in_range("user1", "2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z")
+    assert [event["id"] for event in deleted] == [late["id"]]
+    assert [event["id"] for event in store.list_events("user1")] == [trip["id"]]
+
+
+def test_find_events_prefers_exact_title(store):
+    exact = store.create_event("user1", "Team Meeting", "2024-01-03T09:00:00Z", "2024-01-03T10:00:00Z")
+    partial = store.create_event("user1", "Weekly team sync", "2024-01-04T09:00:00Z", "2024-01-04T10:00:00Z")
+
+    assert [event["id"] for event in store.find_events_by_title("user1", " team meeting ")] == [exact["id"]]
+    assert [event["id"] for event in store.find_events_by_title("user1", "team")] == [
+        partial["id"],
+        exact["id"],
+    ]
+    assert store.find_events_by_title("user1", "  ") == []
+
+
+def test_writes_bump_only_their_scope(store):
+    assert store.read_data_version("user1") is None
+
+    task = store.create_task("user1", "Versioned", "Inbox", None)
+    store.update_task("user1", task["id"], {"title": "Renamed"})
+    store.create_event("user1", "Event", "2024-01-05T10:00:00Z", "2024-01-05T11:00:00Z")
+    store.delete_events_in_range("user1", "2025-01-01T00:00:00Z", "2025-01-02T00:00:00Z")
+
+    version = store.read_data_version("user1")
+    assert version["tasks"] == 2
+    assert version["events"] == 1
+    assert version["nonce"]
+
+
+def test_range_queries_use_indexes(store):
+    plan = " ".join(
+        row["detail"]
+        for row in store._connection().execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM events WHERE user_id = ? AND start_epoch >= ? "
+            "AND start_epoch < ? ORDER BY start_epoch ASC",
+            ("user1", 0, 1),
+        )
+    )
+    assert "ix_events_user_start" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_memory_database_is_shared_across_threads():
+    backend = SqliteStorage(":memory:")
+    backend.create_task("user1", "From main", "Inbox", None)
+
+    seen: list[int] = []
+    worker = threading.Thread(target=lambda: seen.append(len(backend.list_tasks("user1"))))
+    worker.start()
+    worker.join()
+
+    assert seen == [1]
+    backend.close()
+
+
+def test_task_stats_match_the_rows(store):
+    task = store.create_task("user1", "Report", "Work", "2025-11-25T10:00:00Z")
+    store.create_task("user1", "Milk", "Inbox", None)
+    store.update_task("user1", task["id"], {"status": "done"})
+
+    stats = store.read_task_stats("user1")
+
+    assert stats["counts"] == {"done:Work": 1, "open:Inbox": 1}
+    assert stats["openDue"] == {}
+
+
+def test_usage_totals_accumulate_per_day(store):
+    assert store.read_usage("u1", "2025-03-01") is None
+
+    store.add_usage("u1", "2025-03-01", {"promptTokens": 100, "completionTokens": 20, "cachedTokens": 0, "calls": 1})
+    store.add_usage("u1", "2025-03-01", {"promptTokens": 50, "completionTokens": 5, "cachedTokens": 40, "calls": 1})
+    store.add_usage("u1", "2025-03-02", {"promptTokens": 7, "completionTokens": 1, "cachedTokens": 0, "calls": 1})
+
+    usage = store.read_usage("u1", "2025-03-01")
+    assert (usage["promptTokens"], usage["completionTokens"], usage["cachedTokens"], usage["calls"]) == (150, 25, 40, 2)
+
+
+def test_restore_keeps_ids_and_bumps_versions(store):
+    source = SqliteStorage(":memory:")
+    task = source.create_task("user1", "Report", "Work", "2024-03-01T12:00:00")
+    event = source.create_event("user1", "Standup", "2024-03-01T09:00:00", "2024-03-01T09:15:00")
+    assert store.read_data_version("user1") is None
+
+    store.restore(source.list_tasks("user1"), source.list_events("user1"))
+
+    assert store.list_tasks("user1") == [task]
+    assert [restored["id"] for restored in store.list_events("user1")] == [event["id"]]
+    version = store.read_data_version("user1")
+    assert version["tasks"] and version["events"]
+    source.close()
+
+
+def test_files_from_before_activity_stamps_are_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE data_versions (user_id TEXT PRIMARY KEY, nonce TEXT NOT NULL, "
+        "tasks INTEGER NOT NULL DEFAULT 0, events INTEGER NOT NULL DEFAULT 0)"
+    )
+    conn.close()
+
+    backend = SqliteStorage(path)
+    backend.create_task("user1", "Report", "Work", None)
+    assert backend.recent_user_ids(0, 10) == ["user1"]
+    assert backend.recent_user_ids(time.time() + 60, 10) == []
+    backend.close()
@@ -0,0 +1,54 @@
+from backend import task_stats
+
+NOW = 1_764_000_000
+
+
+def test_delta_moves_a_task_between_counters():
+    before = {"id": "1", "list": "Work", "status": "open", "dueEpoch": NOW}
+    after = {"id": "1", "list": "Work", "status": "done", "dueEpoch": NOW}
+
+    assert task_stats.stats_delta(removed=[before], added=[after]) == {
+        "/counts/open:Work": -1,
+        "/counts/done:Work": 1,
+        f"/openDue/{NOW}": -1,
+    }
+    assert task_stats.stats_delta(removed=[before], added=[before]) == {}
+
+
+def test_patch_operations_respect_the_cosmos_limit():
+    delta = {f"/openDue/{NOW + offset}": 1 for offset in range(23)}
+
+    batches = task_stats.patch_operations(delta)
+
+    assert [len(batch) for batch in batches] == [10, 10, 3]
+    assert batches[0][0] == {"op": "incr", "path": f"/openDue/{NOW}", "value": 1}
+
+
+def test_only_counters_that_reached_zero_are_pruned():
+    doc = {"counts": {"open:Work/Side": 0, "done:Work": 1, "open:Home": -1}, "openDue": {str(NOW): 0}}
+    delta = {"/counts/open:Work~1Side": -1, "/counts/done:Work": 1, "/counts/open:Home": -1, f"/openDue/{NOW}": -1}
+
+    assert task_stats.zero_counter_paths(doc, delta) == ["/counts/open:Work~1Side", f"/openDue/{NOW}"]
+    assert task_stats.zero_counter_paths(None, delta) == []
+
+
+def test_summary_splits_overdue_from_next_due():
+    doc = task_stats.stats_from_tasks(
+        "user1",
+        [
+            {"list": "Work", "status": "open", "dueEpoch": NOW - 60},
+            {"list": "Work", "status": "open", "dueEpoch": NOW + 3600},
+            {"list": "Projects/2025", "status": "open", "dueEpoch": NOW + 60},
+            {"list": "Inbox", "status": "done", "dueEpoch": NOW - 3600},
+        ],
+    )
+
+    summary = task_stats.summarize_task_stats(doc, NOW)
+
+    assert summary["lists"]["Work"] == {"open": 2, "done": 0}
+    assert summary["lists"]["Projects/2025"] == {"open": 1, "done": 0}
+    assert summary["lists"]["Personal"] == {"open": 0, "done": 0}
+    assert summary["openCount"] == 3
+    assert summary["doneCount"] == 1
+    assert summary["overdueCount"] == 1
+    assert summary["nextDueDate"] == "2025-11-24T16:01:00Z"
@@ -0,0 +1,90 @@
+import json
+
+from backend.metrics import MetricsRegistry
+from backend.tool_results import TRUNCATED_KEY, compact_tool_messages, compact_value
+
+
+def tool_message(name, result):
+    return {"role": "tool", "tool_call_id": f"call_{name}", "name": name, "content": json.dumps(result)}
+
+
+def deleted_tasks(count):
+    return {
+        "deleted": True,
+        "count": count,
+        "list": "Work",
+        "tasks": [
+            {"id": f"task-{index}", "title": f"Lähetä raportti {index}", "list": "Work", "status": "open"}
+            for index in range(count)
+        ],
+    }
+
+
+def test_compact_value_strips_system_fields_and_marks_truncation():
+    value = {
+        "updated": True,
+        "task": {"id": "t1", "title": "Milk", "_etag": '"abc"', "_ts": 1, "_rid": "x"},
+        "matches": [1, 2, 3, 4],
+    }
+    compacted, omitted = compact_value(value, 2)
+
+    assert compacted == {
+        "updated": True,
+        "task": {"id": "t1", "title": "Milk"},
+        "matches": [1, 2],
+        TRUNCATED_KEY: {"matches": {"shown": 2, "total": 4}},
+    }
+    assert omitted == 2
+    assert compact_value([1, 2, 3], 1) == ({"items": [1], TRUNCATED_KEY: {"items": {"shown": 1, "total": 3}}}, 2)
+    assert compact_value(value, None)[1] == 0
+
+
+def test_small_results_only_lose_system_fields():
+    metrics = MetricsRegistry()
+    messages = [tool_message("update_task", {"updated": True, "task": {"id": "t1", "_etag": '"abc"'}})]
+
+    compaction = compact_tool_messages(messages, budget=1000, max_items=50, metrics=metrics)
+
+    assert json.loads(compaction.messages[0]["content"]) == {"updated": True, "task": {"id": "t1"}}
+    assert compaction.messages[0]["tool_call_id"] == "call_update_task"
+    assert compaction.omitted_items == 0
+    assert compaction.tokens_saved > 0
+    assert "chat.tool_results.truncated" not in metrics.snapshot()["counters"]
+
+
+def test_bulk_results_are_cut_to_the_turn_budget():
+    metrics = MetricsRegistry()
+    messages = [
+        tool_message("delete_tasks_in_list", deleted_tasks(500)),
+        tool_message("create_task", {"id": "new", "title": "Soita Annalle"}),
+    ]
+
+    compaction = compact_tool_messages(messages, budget=400, max_items=50, metrics=metrics)
+
+    assert compaction.tokens_after <= 400
+    assert compaction.tokens_saved == compaction.tokens_before - compaction.tokens_after
+    result = json.loads(compaction.messages[0]["content"])
+    assert result["count"] == 500
+    assert [task["id"] for task in result["tasks"]] == [f"task-{index}" for index in range(compaction.max_items)]
+    assert result[TRUNCATED_KEY] == {"tasks": {"shown": compaction.max_items, "total": 500}}
+    assert compaction.omitted_items == 500 - compaction.max_items
+    assert json.loads(compaction.messages[1]["content"]) == {"id": "new", "title": "Soita Annalle"}
+    assert metrics.snapshot()["counters"]["chat.tool_results.tokens_saved"] == compaction.tokens_saved
+
+
+def test_budget_can_drop_every_item_but_keeps_totals():
+    compaction = compact_tool_messages(
+        [tool_message("delete_tasks_in_list", deleted_tasks(100))], budget=10, max_items=50, metrics=MetricsRegistry()
+    )
+
+    result = json.loads(compaction.messages[0]["content"])
+    assert compaction.max_items == 0
+    assert result["tasks"] == []
+    assert result["count"] == 100
+    assert result[TRUNCATED_KEY] == {"tasks": {"shown": 0, "total": 100}}
+
+
+def test_non_json_content_passes_through():
+    messages = [{"role": "tool", "tool_call_id": "call_1", "name": "x", "content": "plain text"}]
+    compaction = compact_tool_messages(messages, budget=1, max_items=1, metrics=MetricsRegistry())
+    assert compaction.messages == messages
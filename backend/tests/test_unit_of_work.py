@@ -0,0 +1,128 @@
+import pytest
+
+from backend.storage_sqlite import SqliteStorage
+from backend.unit_of_work import ChatUnitOfWork
+
+
+class CountingStorage:
+    """Passes calls through to a real backend and counts the reads."""
+
+    def __init__(self, backend: SqliteStorage) -> None:
+        self._backend = backend
+        self.name = backend.name
+        self.reads: list[str] = []
+
+    def __getattr__(self, name):
+        method = getattr(self._backend, name)
+        if name.startswith(("list_", "find_")):
+            def counted(*args, **kwargs):
+                self.reads.append(name)
+                return method(*args, **kwargs)
+            return counted
+        return method
+
+
+@pytest.fixture
+def backend():
+    store = SqliteStorage(":memory:")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def counting(backend):
+    return CountingStorage(backend)
+
+
+def test_repeated_reads_hit_the_backend_once(backend, counting):
+    backend.create_task("user1", "Raportti", "Work", None)
+    uow = ChatUnitOfWork(counting)
+
+    first = uow.find_tasks_by_title("user1", "raportti")
+    second = uow.find_tasks_by_title("user1", "RAPORTTI")
+    uow.list_tasks("user1")
+    uow.list_tasks("user1")
+
+    assert first == second
+    assert counting.reads == ["find_tasks_by_title", "list_tasks"]
+
+
+def test_task_writes_update_memoized_views(backend, counting):
+    keep = backend.create_task("user1", "Keep", "Work", None)
+    drop = backend.create_task("user1", "Drop", "Work", None)
+    uow = ChatUnitOfWork(counting)
+
+    assert len(uow.list_tasks("user1")) == 2
+    assert [task["id"] for task in uow.list_tasks_by_status("user1", "open")] == [drop["id"], keep["id"]]
+
+    uow.delete_task("user1", drop["id"])
+    added = uow.create_task("user1", "New", "Inbox", None)
+    uow.update_task("user1", keep["id"], {"status": "done"})
+
+    assert [task["id"] for task in uow.list_tasks("user1")] == [added["id"], keep["id"]]
+    assert [task["id"] for task in uow.list_tasks_by_status("user1", "open")] == [added["id"]]
+    assert uow.find_tasks_by_title("user1", "new")[0]["id"] == added["id"]
+    assert counting.reads == ["list_tasks", "list_tasks_by_status", "find_tasks_by_title"]
+    # The memoized view matches what the backend now holds.
+    assert uow.list_tasks("user1") == backend.list_tasks("user1")
+
+
+def test_event_ranges_follow_updates(backend, counting):
+    event = backend.create_event("user1", "Palaveri", "2024-01-05T10:00:00Z", "2024-01-05T11:00:00Z")
+    uow = ChatUnitOfWork(counting)
+
+    day = ("2024-01-05T00:00:00Z", "2024-01-06T00:00:00Z")
+    assert [ev["id"] for ev in uow.list_events("user1", *day)] == [event["id"]]
+
+    uow.update_event("user1", event["id"], {"start": "2024-01-06T10:00:00Z", "end": "2024-01-06T11:00:00Z"})
+    assert uow.list_events("user1", *day) == []
+
+    uow.create_event("user1", "Toinen", "2024-01-05T08:00:00Z", "2024-01-05T09:00:00Z")
+    assert [ev["title"] for ev in uow.list_events("user1", *day)] == ["Toinen"]
+    assert counting.reads == ["list_events"]
+
+
+def test_event_title_lookup_stays_exact_across_writes(backend, counting):
+    partial = backend.create_event("user1", "Weekly team sync", "2024-01-04T09:00:00Z", "2024-01-04T10:00:00Z")
+    uow = ChatUnitOfWork(counting)
+
+    assert [ev["id"] for ev in uow.find_events_by_title("user1", "team meeting")] == []
+    assert [ev["id"] for ev in uow.find_events_by_title("user1", "team")] == [partial["id"]]
+
+    exact = uow.create_event("user1", "Team", "2024-01-03T09:00:00Z", "2024-01-03T10:00:00Z")
+    # An exact title match now exists, so substring matches drop out, as in the backend.
+    assert [ev["id"] for ev in uow.find_events_by_title("user1", "team")] == [exact["id"]]
+    assert counting.reads == ["find_events_by_title", "find_events_by_title"]
+
+    uow.delete_event("user1", exact["id"])
+    # Back to the substring matches, still without another query.
+    assert [ev["id"] for ev in uow.find_events_by_title("user1", "team")] == [partial["id"]]
+    assert len(counting.reads) == 2
+
+
+def test_bulk_deletes_remove_rows_from_views(backend, counting):
+    backend.create_task("user1", "Work 1", "Work", None)
+    inbox = backend.create_task("user1", "Inbox 1", "Inbox", None)
+    uow = ChatUnitOfWork(counting)
+    uow.list_tasks("user1")
+
+    uow.delete_tasks_for_user("user1", "Work")
+
+    assert [task["id"] for task in uow.list_tasks("user1")] == [inbox["id"]]
+
+
+def test_projected_reads_stay_projected_after_writes(backend, counting):
+    backend.create_task("user1", "Old", "Work", None)
+    uow = ChatUnitOfWork(counting)
+
+    assert [set(task) for task in uow.list_tasks("user1", fields=("id", "title"))] == [
+        {"id", "title", "createdAt"}
+    ]
+    uow.create_task("user1", "New", "Inbox", None)
+    tasks = uow.list_tasks("user1", fields=("id", "title"))
+
+    assert [task["title"] for task in tasks] == ["New", "Old"]
+    assert all(set(task) == {"id", "title", "createdAt"} for task in tasks)
+    # A different projection is its own read.
+    assert "userId" in uow.list_tasks("user1")[0]
+    assert counting.reads == ["list_tasks", "list_tasks"]
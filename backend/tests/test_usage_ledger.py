@@ -0,0 +1,168 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.metrics import MetricsRegistry
+from backend.model_router import CompletionCost
+from backend.usage_ledger import BUDGET_DOWNGRADE, BUDGET_OK, BUDGET_REJECT, UsageLedger, intent_of, token_counts
+
+DAY = 1_740_830_400.0  # 2025-03-01T12:00:00Z
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = DAY
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeStore:
+    def __init__(self) -> None:
+        self.days: dict = {}
+        self.fail = False
+
+    def read_usage(self, user_id, day):
+        return self.days.get((user_id, day))
+
+    def add_usage(self, user_id, day, totals):
+        if self.fail:
+            raise RuntimeError("storage down")
+        stored = self.days.setdefault((user_id, day), {})
+        for name, value in totals.items():
+            stored[name] = stored.get(name, 0) + value
+
+
+def cost(prompt, completion_tokens, latency_ms=100.0, cached=0, model="full", route="reply"):
+    usage = SimpleNamespace(
+        prompt_tokens=prompt,
+        completion_tokens=completion_tokens,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached),
+    )
+    return CompletionCost(route, model, usage, latency_ms)
+
+
+def make_ledger(store=None, **kwargs):
+    clock = FakeClock()
+    return UsageLedger(store=store, metrics=MetricsRegistry(), clock=clock, **kwargs), clock
+
+
+def test_token_counts_tolerate_missing_usage_and_details():
+    assert token_counts(None) == (0, 0, 0)
+    assert token_counts(SimpleNamespace(prompt_tokens=10, completion_tokens=2)) == (10, 2, 0)
+
+
+def test_intent_is_the_sorted_tool_set():
+    assert intent_of(["list_tasks_overview", "create_task", "create_task"]) == "create_task+list_tasks_overview"
+    assert intent_of([]) == "conversation"
+
+
+def test_stats_group_by_user_and_intent_with_percentiles():
+    ledger, _ = make_ledger()
+    ledger.record("a", "create_task", [cost(100, 10, 50, cached=64, route="select"), cost(200, 30, 300)], ["create_task"])
+    ledger.record("b", "conversation", [cost(80, 20, 120, route="select")])
+
+    stats = ledger.stats()
+
+    assert stats["totals"]["calls"] == 3
+    assert stats["totals"]["totalTokens"] == 440
+    assert stats["users"]["a"]["cachedTokens"] == 64
+    assert stats["intents"]["create_task"]["latencyMs"]["max"] == 300
+    assert stats["intents"]["conversation"]["calls"] == 1
+    assert set(ledger.stats(user_id="b")["users"]) == {"b"}
+
+
+def test_records_outside_the_window_are_left_out():
+    ledger, clock = make_ledger(window_seconds=3600)
+    ledger.record("a", "conversation", [cost(10, 1)])
+    clock.now += 7200
+    ledger.record("a", "conversation", [cost(20, 2)])
+
+    assert ledger.stats()["totals"]["totalTokens"] == 22
+
+
+def test_budget_downgrades_or_rejects_once_spent():
+    ledger, _ = make_ledger(daily_budget=500, budget_action=BUDGET_DOWNGRADE)
+    ledger.record("a", "conversation", [cost(400, 50)])
+    assert ledger.check_budget("a") == BUDGET_OK
+    ledger.record("a", "conversation", [cost(40, 10)])
+    assert ledger.check_budget("a") == BUDGET_DOWNGRADE
+    assert ledger.check_budget("b") == BUDGET_OK
+
+    strict, _ = make_ledger(daily_budget=100, budget_action=BUDGET_REJECT)
+    strict.record("a", "conversation", [cost(90, 10)])
+    assert strict.check_budget("a") == BUDGET_REJECT
+
+
+def test_budget_resets_on_a_new_utc_day():
+    ledger, clock = make_ledger(daily_budget=100, budget_action=BUDGET_REJECT)
+    ledger.record("a", "conversation", [cost(90, 10)])
+    clock.now += 86400
+
+    assert ledger.check_budget("a") == BUDGET_OK
+
+
+def test_flush_adds_daily_totals_and_budgets_resume_from_storage():
+    store = FakeStore()
+    ledger, _ = make_ledger(store, daily_budget=300, budget_action=BUDGET_REJECT)
+    ledger.record("a", "conversation", [cost(100, 20, cached=50), cost(120, 10)])
+
+    assert ledger.flush() == 1
+    assert store.days[("a", "2025-03-01")] == {
+        "promptTokens": 220,
+        "completionTokens": 30,
+        "cachedTokens": 50,
+        "calls": 2,
+    }
+    assert ledger.flush() == 0
+
+    # A fresh process (or another instance) picks up what was stored.
+    restarted, _ = make_ledger(store, daily_budget=300, budget_action=BUDGET_REJECT)
+    assert restarted.spent_today("a") == 250
+    restarted.record("a", "conversation", [cost(40, 10)])
+    assert restarted.check_budget("a") == BUDGET_REJECT
+
+
+def test_failed_flush_keeps_totals_for_the_next_one():
+    store = FakeStore()
+    ledger, _ = make_ledger(store)
+    ledger.record("a", "conversation", [cost(10, 1)])
+    store.fail = True
+    assert ledger.flush() == 0
+
+    store.fail = False
+    ledger.record("a", "conversation", [cost(5, 1)])
+    assert ledger.flush() == 1
+    assert store.days[("a", "2025-03-01")]["promptTokens"] == 15
+
+
+def test_spend_flushed_by_other_instances_counts_against_the_budget():
+    store = FakeStore()
+    clock = FakeClock()
+    first, second = (
+        UsageLedger(store=store, daily_budget=1000, budget_action=BUDGET_REJECT, clock=clock, refresh_seconds=60)
+        for _ in range(2)
+    )
+    assert second.spent_today("a") == 0
+
+    first.record("a", "conversation", [cost(500, 100)])
+    first.flush()
+    second.record("a", "conversation", [cost(300, 50)])
+    # The second instance's stored total is still fresh, so it has only its own spend.
+    assert second.spent_today("a") == 350
+
+    clock.now += 61
+    assert second.spent_today("a") == 950
+
+    # Its own flush reads the total back instead of counting its tokens twice.
+    second.flush()
+    first.record("a", "conversation", [cost(40, 10)])
+    first.flush()
+    assert first.spent_today("a") == 1000
+    assert second.spent_today("a") == 950
+    assert first.check_budget("a") == BUDGET_REJECT
+
+
+def test_unknown_budget_action_is_rejected():
+    with pytest.raises(ValueError):
+        UsageLedger(budget_action="ignore")
@@ -0,0 +1,24 @@
+from backend.versioned_cache import VersionedLRUCache
+
+
+def test_serves_only_matching_version():
+    cache = VersionedLRUCache(max_entries=2)
+    cache.put(("u", "2025-11"), '"v1"', "body-1")
+
+    assert cache.get(("u", "2025-11"), '"v1"') == "body-1"
+    assert cache.get(("u", "2025-11"), '"v2"') is None
+    # A version mismatch evicts the stale entry.
+    assert cache.get(("u", "2025-11"), '"v1"') is None
+
+
+def test_evicts_least_recently_used():
+    cache = VersionedLRUCache(max_entries=2)
+    cache.put("a", "v", 1)
+    cache.put("b", "v", 2)
+    assert cache.get("a", "v") == 1
+
+    cache.put("c", "v", 3)
+
+    assert cache.get("b", "v") is None
+    assert cache.get("a", "v") == 1
+    assert cache.get("c", "v") == 3
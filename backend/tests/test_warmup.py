@@ -0,0 +1,83 @@
+import time
+
+from backend.metrics import MetricsRegistry
+from backend.storage_sqlite import SqliteStorage
+from backend.usage_ledger import utc_day
+from backend.warmup import ActivityTracker, users_to_preload, warm_up
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_requests_are_timed_by_how_long_the_process_was_idle():
+    registry = MetricsRegistry()
+    clock = FakeClock()
+    tracker = ActivityTracker(idle_seconds=300, metrics=registry, clock=clock)
+    handler = tracker.tracked(lambda req: req["user"])(lambda req: "ok")
+
+    assert handler({"user": "a"}) == "ok"
+    clock.now += 10
+    handler({"user": "b"})
+    clock.now += 301
+    handler({"user": "a"})
+
+    histograms = registry.snapshot()["histograms"]
+    assert histograms["http.cold_request_ms"]["count"] == 1
+    assert histograms["http.warm_request_ms"]["count"] == 1
+    assert histograms["http.after_idle_request_ms"]["count"] == 1
+
+
+def test_recent_users_are_newest_first_and_bounded():
+    clock = FakeClock()
+    tracker = ActivityTracker(metrics=MetricsRegistry(), clock=clock)
+    for user_id in ["old", "mid", "new"]:
+        tracker.touch(user_id)
+        clock.now += 100
+
+    assert tracker.recent_users(within_seconds=250, limit=5) == ["new", "mid"]
+    assert tracker.recent_users(within_seconds=1000, limit=1) == ["new"]
+
+
+def test_failing_step_does_not_stop_the_others():
+    registry = MetricsRegistry()
+    ran = []
+
+    def broken() -> None:
+        raise ConnectionError("down")
+
+    report = warm_up({"cosmos": broken, "openai": lambda: ran.append("openai")}, metrics=registry)
+
+    assert report["cosmos"]["ok"] is False
+    assert report["openai"]["ok"] is True
+    assert ran == ["openai"]
+    snapshot = registry.snapshot()
+    assert snapshot["counters"]["warmup.failures.cosmos"] == 1
+    assert snapshot["counters"]["warmup.runs"] == 1
+
+
+def test_fresh_process_preloads_users_from_the_store():
+    store = SqliteStorage(":memory:")
+    store.create_task("writer", "Maito", "Inbox", None)
+    store.add_usage("chatter", utc_day(time.time()), {"promptTokens": 10, "calls": 1})
+    tracker = ActivityTracker(metrics=MetricsRegistry(), clock=FakeClock())
+
+    users = users_to_preload(tracker, store.recent_user_ids, within_seconds=3600, limit=5)
+
+    assert sorted(users) == ["chatter", "writer"]
+
+
+def test_process_users_come_first_and_store_failures_are_tolerated():
+    tracker = ActivityTracker(metrics=MetricsRegistry(), clock=FakeClock())
+    tracker.touch("local")
+
+    def failing(since_epoch, limit):
+        raise RuntimeError("store down")
+
+    assert users_to_preload(tracker, lambda since, limit: ["stored", "local"], limit=5) == ["local", "stored"]
+    assert users_to_preload(tracker, lambda since, limit: ["stored"], limit=1) == ["local"]
+    assert users_to_preload(tracker, failing, limit=5) == ["local"]
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone, tzinfo
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+HELSINKI_TZ_NAME = "Europe/Helsinki"
+
+
+def get_helsinki_tz() -> tzinfo:
+    try:
+        return ZoneInfo(HELSINKI_TZ_NAME)
+    except ZoneInfoNotFoundError:
+        return timezone(timedelta(hours=2))
+
+
+def get_helsinki_now() -> datetime:
+    return datetime.now(get_helsinki_tz())
+
+
+def parse_iso_datetime(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        cleaned = value.replace("Z", "+00:00") if value.endswith("Z") else value
+        return datetime.fromisoformat(cleaned)
+    except ValueError:
+        return None
+
+
+def to_local(value: datetime, tz: tzinfo) -> datetime:
+    # Naive values come from the model or the client and are meant as local time.
+    if value.tzinfo is None:
+        return value.replace(tzinfo=tz)
+    return value.astimezone(tz)
+
+
+def to_epoch(value: str | None, tz: tzinfo) -> int | None:
+    parsed = parse_iso_datetime(value)
+    if not parsed:
+        return None
+    return int(to_local(parsed, tz).timestamp())
+
+
+def normalize_iso(value: str, tz: tzinfo) -> tuple[str, int]:
+    # Stored times are UTC ("...Z") plus an integer epoch for range queries.
+    parsed = parse_iso_datetime(value)
+    if not parsed:
+        raise ValueError(f"Invalid ISO 8601 datetime: {value!r}")
+    utc_value = to_local(parsed, tz).astimezone(timezone.utc)
+    return utc_value.strftime("%Y-%m-%dT%H:%M:%SZ"), int(utc_value.timestamp())
+
+
+def doc_epoch(doc: dict, iso_field: str, epoch_field: str, tz: tzinfo) -> int | None:
+    # Documents written before epoch fields existed fall back to parsing.
+    epoch = doc.get(epoch_field)
+    if epoch is not None:
+        return int(epoch)
+    return to_epoch(doc.get(iso_field), tz)
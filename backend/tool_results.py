@@ -0,0 +1,136 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .metrics import MetricsRegistry, metrics as default_metrics
+    from .projection import strip_system_fields
+except ImportError:
+    from metrics import MetricsRegistry, metrics as default_metrics
+    from projection import strip_system_fields
+
+# Prompt tokens all tool results of one chat turn may take in the second
+# completion; 0 disables the budget.
+TOOL_RESULT_TOKEN_BUDGET = int(os.environ.get("TOOL_RESULT_TOKEN_BUDGET", "2000"))
+# Items kept per list even when the budget allows more. The list tools cap
+# their own limit at 50, so this only cuts the bulk-delete results.
+TOOL_RESULT_MAX_ITEMS = int(os.environ.get("TOOL_RESULT_MAX_ITEMS", "50"))
+
+# Added next to a shortened list: {"tasks": {"shown": 5, "total": 480}}.
+TRUNCATED_KEY = "truncated"
+
+
+def content_tokens(content: str) -> int:
+    # Same four-characters-per-token estimate as rate_limiter.estimate_prompt_tokens.
+    return len(content) // 4
+
+
+def compact_value(value: Any, max_items: Optional[int]) -> Tuple[Any, int]:
+    """Strips system fields and keeps the first max_items of every list.
+
+    Returns the compacted value and how many list items were left out. Dicts
+    that lose items get a TRUNCATED_KEY entry with what was shown out of the
+    total, so counts stay right even when the items are gone.
+    """
+    if isinstance(value, list):
+        items, omitted = _compact_list(value, max_items)
+        if len(items) == len(value):
+            return items, omitted
+        return {"items": items, TRUNCATED_KEY: {"items": {"shown": len(items), "total": len(value)}}}, omitted
+
+    if not isinstance(value, dict):
+        return value, 0
+
+    compacted: Dict[str, Any] = {}
+    truncated: Dict[str, Dict[str, int]] = dict(value.get(TRUNCATED_KEY) or {})
+    omitted = 0
+    for key, item in strip_system_fields(value).items():
+        if key == TRUNCATED_KEY:
+            continue
+        if isinstance(item, list):
+            compacted[key], dropped = _compact_list(item, max_items)
+            if len(compacted[key]) < len(item):
+                truncated[key] = {"shown": len(compacted[key]), "total": len(item)}
+        else:
+            compacted[key], dropped = compact_value(item, max_items)
+        omitted += dropped
+    if truncated:
+        compacted[TRUNCATED_KEY] = truncated
+    return compacted, omitted
+
+
+def _compact_list(items: List[Any], max_items: Optional[int]) -> Tuple[List[Any], int]:
+    kept = items if max_items is None else items[:max_items]
+    omitted = len(items) - len(kept)
+    compacted = []
+    for item in kept:
+        item, dropped = compact_value(item, max_items)
+        compacted.append(item)
+        omitted += dropped
+    return compacted, omitted
+
+
+@dataclass
+class Compaction:
+    messages: List[Dict[str, Any]]
+    tokens_before: int
+    tokens_after: int
+    omitted_items: int
+    max_items: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def compact_tool_messages(
+    messages: List[Dict[str, Any]],
+    budget: int = TOOL_RESULT_TOKEN_BUDGET,
+    max_items: int = TOOL_RESULT_MAX_ITEMS,
+    metrics: MetricsRegistry = default_metrics,
+) -> Compaction:
+    """Shrinks the tool messages of one turn to fit the token budget.
+
+    Every list is first cut to max_items. While the results together are
+    over budget, the per-list cap is halved, down to no items at all; totals
+    and the truncation markers are always kept. Messages whose content is
+    not JSON pass through unchanged.
+    """
+    parsed: List[Any] = []
+    for message in messages:
+        try:
+            parsed.append(json.loads(message.get("content") or ""))
+        except ValueError:
+            parsed.append(None)
+    tokens_before = sum(content_tokens(message.get("content") or "") for message in messages)
+
+    cap = max(0, max_items)
+    while True:
+        compacted, tokens_after, omitted = _render(messages, parsed, cap)
+        if not budget or tokens_after <= budget or not cap:
+            break
+        cap //= 2
+
+    result = Compaction(compacted, tokens_before, tokens_after, omitted, cap)
+    metrics.observe("chat.tool_results.tokens", tokens_after)
+    if result.tokens_saved > 0:
+        metrics.incr("chat.tool_results.tokens_saved", result.tokens_saved)
+    if omitted:
+        metrics.incr("chat.tool_results.truncated")
+    return result
+
+
+def _render(
+    messages: List[Dict[str, Any]], parsed: List[Any], cap: int
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    rendered: List[Dict[str, Any]] = []
+    tokens = omitted = 0
+    for message, value in zip(messages, parsed):
+        if value is not None:
+            value, dropped = compact_value(value, cap)
+            message = {**message, "content": json.dumps(value, ensure_ascii=False)}
+            omitted += dropped
+        rendered.append(message)
+        tokens += content_tokens(message.get("content") or "")
+    return rendered, tokens, omitted
@@ -0,0 +1,279 @@
+from dataclasses import dataclass
+from typing import AbstractSet, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from .etags import EVENTS_SCOPE, TASKS_SCOPE
+    from .metrics import metrics
+    from .projection import Fields, fields_key, project, with_fields
+    from .timeutils import doc_epoch, get_helsinki_tz, normalize_iso
+except ImportError:
+    from etags import EVENTS_SCOPE, TASKS_SCOPE
+    from metrics import metrics
+    from projection import Fields, fields_key, project, with_fields
+    from timeutils import doc_epoch, get_helsinki_tz, normalize_iso
+
+Doc = Dict[str, Any]
+
+# Fields the unit of work itself needs on memoized docs: the id to patch by and
+# the key each read is ordered by.
+_TASK_KEYS = ("id", "createdAt")
+_EVENT_KEYS = ("id", "start", "startEpoch")
+
+
+@dataclass
+class _Read:
+    scope: str
+    user_id: str
+    matches: Callable[[Doc], bool]
+    order: Callable[[List[Doc]], None]
+    fields: Fields
+    docs: List[Doc]
+
+
+@dataclass
+class _TitleRead:
+    # Event title lookups return exact matches if any exist, else substring
+    # matches; both halves are tracked so writes keep the answer exact.
+    user_id: str
+    title: str
+    fields: Fields
+    exact: List[Doc]
+    partial: Optional[List[Doc]]
+
+
+def _newest_first(docs: List[Doc]) -> None:
+    docs.sort(key=lambda doc: doc.get("createdAt") or "", reverse=True)
+
+
+class ChatUnitOfWork:
+    """Storage view for one chat turn.
+
+    Reads are memoized per call. Writes go straight to the backend and then
+    patch every memoized result of the same scope, re-checking that query's
+    own filter. Later tools in the turn see earlier writes without querying
+    again.
+    """
+
+    def __init__(self, storage: Any) -> None:
+        self._storage = storage
+        self.name = storage.name
+        self._tz = get_helsinki_tz()
+        self._reads: Dict[Tuple[Any, ...], _Read] = {}
+        self._event_titles: Dict[Tuple[Any, ...], _TitleRead] = {}
+
+    def _start_epoch(self, doc: Doc) -> int:
+        return doc_epoch(doc, "start", "startEpoch", self._tz) or 0
+
+    def _end_epoch(self, doc: Doc) -> int:
+        end = doc_epoch(doc, "end", "endEpoch", self._tz)
+        return self._start_epoch(doc) if end is None else end
+
+    def _by_start(self, reverse: bool = False) -> Callable[[List[Doc]], None]:
+        return lambda docs: docs.sort(key=self._start_epoch, reverse=reverse)
+
+    def _memo(
+        self,
+        key: Tuple[Any, ...],
+        scope: str,
+        user_id: str,
+        matches: Callable[[Doc], bool],
+        order: Callable[[List[Doc]], None],
+        fields: Fields,
+        load: Callable[[Fields], List[Doc]],
+    ) -> List[Doc]:
+        key = (*key, fields_key(fields))
+        read = self._reads.get(key)
+        if read is None:
+            metrics.incr("chat.uow.misses")
+            read = self._reads[key] = _Read(scope, user_id, matches, order, fields, list(load(fields)))
+        else:
+            metrics.incr("chat.uow.hits")
+        return list(read.docs)
+
+    def _apply(
+        self,
+        scope: str,
+        user_id: str,
+        upserted: Sequence[Doc] = (),
+        deleted_ids: AbstractSet[str] = frozenset(),
+    ) -> None:
+        changed_ids = deleted_ids | {doc["id"] for doc in upserted}
+        for read in self._reads.values():
+            if read.scope != scope or read.user_id != user_id:
+                continue
+            read.docs = [doc for doc in read.docs if doc.get("id") not in changed_ids]
+            added = [project(doc, read.fields) for doc in upserted if read.matches(doc)]
+            if added:
+                read.docs.extend(added)
+                read.order(read.docs)
+
+        if scope == EVENTS_SCOPE:
+            for read in self._event_titles.values():
+                if read.user_id != user_id:
+                    continue
+                read.exact = [doc for doc in read.exact if doc.get("id") not in changed_ids]
+                if read.partial is not None:
+                    read.partial = [doc for doc in read.partial if doc.get("id") not in changed_ids]
+                for doc in upserted:
+                    title = (doc.get("title") or "").lower()
+                    if title == read.title:
+                        read.exact.append(project(doc, read.fields))
+                    if read.partial is not None and read.title in title:
+                        read.partial.append(project(doc, read.fields))
+                self._by_start(reverse=True)(read.exact)
+                if read.partial is not None:
+                    self._by_start(reverse=True)(read.partial)
+
+    def read_data_version(self, user_id: str) -> Optional[Doc]:
+        return self._storage.read_data_version(user_id)
+
+    # Tasks
+
+    def list_tasks(self, user_id: str, fields: Fields = None) -> List[Doc]:
+        return self._memo(
+            ("list_tasks", user_id),
+            TASKS_SCOPE,
+            user_id,
+            lambda doc: True,
+            _newest_first,
+            with_fields(fields, *_TASK_KEYS),
+            lambda wanted: self._storage.list_tasks(user_id, fields=wanted),
+        )
+
+    def list_tasks_by_status(self, user_id: str, status: str, fields: Fields = None) -> List[Doc]:
+        return self._memo(
+            ("list_tasks_by_status", user_id, status),
+            TASKS_SCOPE,
+            user_id,
+            lambda doc: doc.get("status") == status,
+            _newest_first,
+            with_fields(fields, *_TASK_KEYS),
+            lambda wanted: self._storage.list_tasks_by_status(user_id, status, fields=wanted),
+        )
+
+    def find_tasks_by_title(self, user_id: str, title: str, fields: Fields = None) -> List[Doc]:
+        normalized = title.lower()
+        return self._memo(
+            ("find_tasks_by_title", user_id, normalized),
+            TASKS_SCOPE,
+            user_id,
+            lambda doc: (doc.get("title") or "").lower() == normalized,
+            _newest_first,
+            with_fields(fields, *_TASK_KEYS),
+            lambda wanted: self._storage.find_tasks_by_title(user_id, title, fields=wanted),
+        )
+
+    def create_task(self, user_id: str, title: str, list_name: str, due_date: Optional[str]) -> Doc:
+        task = self._storage.create_task(user_id, title, list_name, due_date)
+        self._apply(TASKS_SCOPE, user_id, upserted=[task])
+        return task
+
+    def update_task(self, user_id: str, task_id: str, updates: Dict[str, Any]) -> Doc:
+        task = self._storage.update_task(user_id, task_id, updates)
+        self._apply(TASKS_SCOPE, user_id, upserted=[task])
+        return task
+
+    def delete_task(self, user_id: str, task_id: str) -> None:
+        self._storage.delete_task(user_id, task_id)
+        self._apply(TASKS_SCOPE, user_id, deleted_ids={task_id})
+
+    def delete_tasks_for_user(
+        self, user_id: str, list_name: Optional[str] = None, fields: Fields = None
+    ) -> List[Doc]:
+        deleted = self._storage.delete_tasks_for_user(
+            user_id, list_name, fields=with_fields(fields, "id")
+        )
+        self._apply(TASKS_SCOPE, user_id, deleted_ids={doc["id"] for doc in deleted})
+        return deleted
+
+    # Events
+
+    def list_events(
+        self,
+        user_id: str,
+        start_iso: Optional[str] = None,
+        end_iso: Optional[str] = None,
+        fields: Fields = None,
+    ) -> List[Doc]:
+        if start_iso and end_iso:
+            start = normalize_iso(start_iso, self._tz)[1]
+            end = normalize_iso(end_iso, self._tz)[1]
+            key: Tuple[Any, ...] = ("list_events", user_id, start, end)
+            matches = lambda doc: start <= self._start_epoch(doc) < end  # noqa: E731
+        else:
+            key = ("list_events", user_id)
+            matches = lambda doc: True  # noqa: E731
+        return self._memo(
+            key,
+            EVENTS_SCOPE,
+            user_id,
+            matches,
+            self._by_start(),
+            with_fields(fields, *_EVENT_KEYS),
+            lambda wanted: self._storage.list_events(user_id, start_iso, end_iso, fields=wanted),
+        )
+
+    def list_events_overlapping(
+        self, user_id: str, start_iso: str, end_iso: str, fields: Fields = None
+    ) -> List[Doc]:
+        start = normalize_iso(start_iso, self._tz)[1]
+        end = normalize_iso(end_iso, self._tz)[1]
+        return self._memo(
+            ("list_events_overlapping", user_id, start, end),
+            EVENTS_SCOPE,
+            user_id,
+            lambda doc: self._start_epoch(doc) < end and self._end_epoch(doc) > start,
+            self._by_start(),
+            with_fields(fields, *_EVENT_KEYS),
+            lambda wanted: self._storage.list_events_overlapping(
+                user_id, start_iso, end_iso, fields=wanted
+            ),
+        )
+
+    def find_events_by_title(self, user_id: str, title: str, fields: Fields = None) -> List[Doc]:
+        normalized = title.strip().lower()
+        if not normalized:
+            return []
+
+        fields = with_fields(fields, *_EVENT_KEYS)
+        key = (user_id, normalized, fields_key(fields))
+        read = self._event_titles.get(key)
+        if read is not None and (read.exact or read.partial is not None):
+            metrics.incr("chat.uow.hits")
+            return list(read.exact or read.partial)
+
+        metrics.incr("chat.uow.misses")
+        docs = self._storage.find_events_by_title(user_id, title, fields=fields)
+        exact = [doc for doc in docs if (doc.get("title") or "").lower() == normalized]
+        if docs and len(exact) == len(docs):
+            # Exact hits short-circuit the backend, so the substring set is unknown.
+            read = _TitleRead(user_id, normalized, fields, exact, None)
+        else:
+            read = _TitleRead(user_id, normalized, fields, [], list(docs))
+        self._event_titles[key] = read
+        return list(docs)
+
+    def create_event(
+        self, user_id: str, title: str, start_iso: str, end_iso: str, list_name: str = "Default"
+    ) -> Doc:
+        event = self._storage.create_event(user_id, title, start_iso, end_iso, list_name)
+        self._apply(EVENTS_SCOPE, user_id, upserted=[event])
+        return event
+
+    def update_event(self, user_id: str, event_id: str, updates: Dict[str, Any]) -> Doc:
+        event = self._storage.update_event(user_id, event_id, updates)
+        self._apply(EVENTS_SCOPE, user_id, upserted=[event])
+        return event
+
+    def delete_event(self, user_id: str, event_id: str) -> None:
+        self._storage.delete_event(user_id, event_id)
+        self._apply(EVENTS_SCOPE, user_id, deleted_ids={event_id})
+
+    def delete_events_in_range(
+        self, user_id: str, start_iso: str, end_iso: str, fields: Fields = None
+    ) -> List[Doc]:
+        deleted = self._storage.delete_events_in_range(
+            user_id, start_iso, end_iso, fields=with_fields(fields, "id")
+        )
+        self._apply(EVENTS_SCOPE, user_id, deleted_ids={doc["id"] for doc in deleted})
+        return deleted
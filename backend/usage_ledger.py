@@ -0,0 +1,280 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .metrics import MetricsRegistry, metrics as default_metrics
+except ImportError:
+    from metrics import MetricsRegistry, metrics as default_metrics
+
+USAGE_WINDOW_HOURS = float(os.environ.get("USAGE_WINDOW_HOURS", "24"))
+USAGE_LEDGER_SIZE = int(os.environ.get("USAGE_LEDGER_SIZE", "5000"))
+# Prompt + completion tokens a user may spend per UTC day; 0 disables budgets.
+USER_DAILY_TOKEN_BUDGET = int(os.environ.get("USER_DAILY_TOKEN_BUDGET", "0"))
+# "downgrade" keeps answering over-budget users on the small deployment with a
+# shorter reply; "reject" turns them away until the next day.
+USAGE_BUDGET_ACTION = os.environ.get("USAGE_BUDGET_ACTION", "downgrade").lower()
+USAGE_DOWNGRADE_MAX_TOKENS = int(os.environ.get("USAGE_DOWNGRADE_MAX_TOKENS", "150"))
+# Six-field CRON expression of the usage_flush timer, read when the functions
+# are indexed so the setting is optional.
+USAGE_FLUSH_SCHEDULE = os.environ.get("USAGE_FLUSH_SCHEDULE", "0 * * * * *")
+# How old a stored daily total may get before a budget check reads it again.
+# Other instances flush every minute by default, so reading more often buys nothing.
+USAGE_REFRESH_SECONDS = float(os.environ.get("USAGE_REFRESH_SECONDS", "60"))
+
+BUDGET_OK = "ok"
+BUDGET_DOWNGRADE = "downgrade"
+BUDGET_REJECT = "reject"
+
+# Keys of the per-user daily totals handed to storage.
+USAGE_TOTAL_KEYS = ("promptTokens", "completionTokens", "cachedTokens", "calls")
+
+
+@dataclass
+class UsageRecord:
+    user_id: str
+    intent: str
+    route: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    latency_ms: float
+    tools: Tuple[str, ...] = ()
+    at: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+def token_counts(usage: Any) -> Tuple[int, int, int]:
+    # Cached prompt tokens are only reported by newer API versions.
+    if usage is None:
+        return 0, 0, 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (
+        int(getattr(usage, "prompt_tokens", 0) or 0),
+        int(getattr(usage, "completion_tokens", 0) or 0),
+        int(getattr(details, "cached_tokens", 0) or 0),
+    )
+
+
+def intent_of(tool_names: Iterable[str]) -> str:
+    names = sorted(set(tool_names))
+    return "+".join(names) if names else "conversation"
+
+
+def utc_day(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+
+    def percentile(fraction: float) -> float:
+        if not ordered:
+            return 0.0
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 2)
+
+    return {
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": round(ordered[-1], 2) if ordered else 0.0,
+    }
+
+
+def summarize_usage(records: List[UsageRecord]) -> Dict[str, Any]:
+    return {
+        "calls": len(records),
+        "promptTokens": sum(record.prompt_tokens for record in records),
+        "completionTokens": sum(record.completion_tokens for record in records),
+        "cachedTokens": sum(record.cached_tokens for record in records),
+        "totalTokens": sum(record.total_tokens for record in records),
+        "latencyMs": _distribution([record.latency_ms for record in records]),
+        "tokensPerCall": _distribution([float(record.total_tokens) for record in records]),
+    }
+
+
+class UsageLedger:
+    """Rolling record of OpenAI calls by user and intent, plus daily budgets.
+
+    Calls are kept in memory for the stats endpoint. Per-user daily totals
+    accumulate until flush() adds them to storage. A user's spend is the
+    stored total for the day plus what this process has not flushed yet. The
+    stored total is read again after each flush and whenever it is older
+    than refresh_seconds, so spend flushed by other instances counts against
+    the budget within about one flush interval.
+    """
+
+    def __init__(
+        self,
+        store: Any = None,
+        window_seconds: float = USAGE_WINDOW_HOURS * 3600,
+        size: int = USAGE_LEDGER_SIZE,
+        daily_budget: int = USER_DAILY_TOKEN_BUDGET,
+        budget_action: str = USAGE_BUDGET_ACTION,
+        metrics: MetricsRegistry = default_metrics,
+        clock: Callable[[], float] = time.time,
+        refresh_seconds: float = USAGE_REFRESH_SECONDS,
+    ) -> None:
+        if budget_action not in (BUDGET_DOWNGRADE, BUDGET_REJECT):
+            raise ValueError(f"Unknown usage budget action: {budget_action}")
+        self._store = store
+        self.window_seconds = window_seconds
+        self.daily_budget = daily_budget
+        self.budget_action = budget_action
+        self.refresh_seconds = refresh_seconds
+        self._metrics = metrics
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._records: Deque[UsageRecord] = deque(maxlen=size)
+        self._pending: Dict[Tuple[str, str], Dict[str, float]] = {}
+        # Stored daily totals, when they were read, and tokens recorded here
+        # that those totals do not include yet.
+        self._stored: Dict[Tuple[str, str], int] = {}
+        self._stored_at: Dict[Tuple[str, str], float] = {}
+        self._unflushed: Dict[Tuple[str, str], int] = {}
+
+    def _read_stored(self, key: Tuple[str, str]) -> Optional[int]:
+        if self._store is None:
+            return 0
+        try:
+            totals = self._store.read_usage(*key) or {}
+            return int(totals.get("promptTokens", 0)) + int(totals.get("completionTokens", 0))
+        except Exception:
+            logging.warning("Could not read stored usage for user %s", key[0], exc_info=True)
+            return None
+
+    def _refresh(self, key: Tuple[str, str]) -> None:
+        now = self._clock()
+        with self._lock:
+            # Yesterday's counters are no longer needed once a new day starts.
+            for stale in [entry for entry in self._stored_at if entry[1] != key[1]]:
+                self._stored_at.pop(stale, None)
+                self._stored.pop(stale, None)
+                self._unflushed.pop(stale, None)
+            fetched = self._stored_at.get(key)
+            if fetched is not None and now - fetched < self.refresh_seconds:
+                return
+            # Claimed before reading, so concurrent checks do not all hit storage.
+            self._stored_at[key] = now
+
+        stored = self._read_stored(key)
+        if stored is not None:
+            with self._lock:
+                self._stored[key] = stored
+
+    def spent_today(self, user_id: str) -> int:
+        key = (user_id, utc_day(self._clock()))
+        self._refresh(key)
+        with self._lock:
+            return self._stored.get(key, 0) + self._unflushed.get(key, 0)
+
+    def check_budget(self, user_id: str) -> str:
+        if self.daily_budget <= 0 or self.spent_today(user_id) < self.daily_budget:
+            return BUDGET_OK
+        self._metrics.incr(f"usage.budget.{self.budget_action}")
+        return self.budget_action
+
+    def record(self, user_id: str, intent: str, costs: Iterable[Any], tools: Iterable[str] = ()) -> None:
+        now = self._clock()
+        key = (user_id, utc_day(now))
+        self._refresh(key)
+        tool_names = tuple(tools)
+        for cost in costs:
+            prompt, completion, cached = token_counts(cost.usage)
+            record = UsageRecord(
+                user_id=user_id,
+                intent=intent,
+                route=cost.route,
+                model=cost.model,
+                prompt_tokens=prompt,
+                completion_tokens=completion,
+                cached_tokens=cached,
+                latency_ms=round(cost.latency_ms, 2),
+                tools=tool_names,
+                at=now,
+            )
+            self._metrics.incr("openai.tokens.prompt", prompt)
+            self._metrics.incr("openai.tokens.completion", completion)
+            self._metrics.incr("openai.tokens.cached", cached)
+            with self._lock:
+                self._records.append(record)
+                self._unflushed[key] = self._unflushed.get(key, 0) + record.total_tokens
+                if self._store is None:
+                    continue
+                pending = self._pending.setdefault(key, dict.fromkeys(USAGE_TOTAL_KEYS, 0))
+                pending["promptTokens"] += prompt
+                pending["completionTokens"] += completion
+                pending["cachedTokens"] += cached
+                pending["calls"] += 1
+
+    def flush(self) -> int:
+        if self._store is None:
+            return 0
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        flushed = 0
+        for (user_id, day), totals in pending.items():
+            try:
+                self._store.add_usage(user_id, day, totals)
+                flushed += 1
+            except Exception:
+                logging.warning("Could not flush usage for user %s", user_id, exc_info=True)
+                # Keep the totals for the next flush instead of losing them.
+                with self._lock:
+                    merged = self._pending.setdefault((user_id, day), dict.fromkeys(USAGE_TOTAL_KEYS, 0))
+                    for name, value in totals.items():
+                        merged[name] += value
+                continue
+            self._after_flush((user_id, day), int(totals["promptTokens"] + totals["completionTokens"]))
+        return flushed
+
+    def _after_flush(self, key: Tuple[str, str], tokens: int) -> None:
+        # The stored total now holds these tokens, plus whatever other
+        # instances flushed meanwhile; read it so both are counted once.
+        with self._lock:
+            if key not in self._stored_at:
+                return
+        stored = self._read_stored(key)
+        with self._lock:
+            if key not in self._stored_at:
+                return
+            self._stored[key] = self._stored.get(key, 0) + tokens if stored is None else stored
+            self._stored_at[key] = self._clock()
+            self._unflushed[key] = self._unflushed.get(key, 0) - tokens
+
+    def stats(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        cutoff = self._clock() - self.window_seconds
+        with self._lock:
+            records = [
+                record
+                for record in self._records
+                if record.at >= cutoff and (user_id is None or record.user_id == user_id)
+            ]
+
+        def grouped(key: Callable[[UsageRecord], str]) -> Dict[str, Any]:
+            groups: Dict[str, List[UsageRecord]] = {}
+            for record in records:
+                groups.setdefault(key(record), []).append(record)
+            return {name: summarize_usage(group) for name, group in sorted(groups.items())}
+
+        report: Dict[str, Any] = {
+            "windowHours": self.window_seconds / 3600,
+            "totals": summarize_usage(records),
+            "users": grouped(lambda record: record.user_id),
+            "intents": grouped(lambda record: record.intent),
+            "models": grouped(lambda record: record.model),
+            "budget": {"dailyTokens": self.daily_budget, "action": self.budget_action},
+        }
+        if user_id is not None:
+            report["budget"]["spentToday"] = self.spent_today(user_id)
+        return report
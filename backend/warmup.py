@@ -0,0 +1,134 @@
+import functools
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from .metrics import MetricsRegistry, metrics as default_metrics
+except ImportError:
+    from metrics import MetricsRegistry, metrics as default_metrics
+
+# Six-field CRON expression of the warmup timer. Read when the functions are
+# indexed, so deployments without the setting still get a schedule.
+WARMUP_SCHEDULE = os.environ.get("WARMUP_SCHEDULE", "0 */5 * * * *")
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "true").lower() == "true"
+WARMUP_IDLE_SECONDS = float(os.environ.get("WARMUP_IDLE_SECONDS", "300"))
+WARMUP_ACTIVE_USER_HOURS = float(os.environ.get("WARMUP_ACTIVE_USER_HOURS", "24"))
+WARMUP_MAX_USERS = int(os.environ.get("WARMUP_MAX_USERS", "20"))
+
+
+class ActivityTracker:
+    """Remembers recently active users and times requests that follow idle gaps.
+
+    The first request a process serves is recorded as http.cold_request_ms.
+    A request arriving after more than idle_seconds without traffic is recorded
+    as http.after_idle_request_ms. Every other request goes to
+    http.warm_request_ms, so the three can be compared side by side.
+    """
+
+    def __init__(
+        self,
+        idle_seconds: float = WARMUP_IDLE_SECONDS,
+        metrics: MetricsRegistry = default_metrics,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.idle_seconds = idle_seconds
+        self._metrics = metrics
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_request: Optional[float] = None
+        self._users: Dict[str, float] = {}
+
+    def touch(self, user_id: str) -> None:
+        with self._lock:
+            self._users[user_id] = self._clock()
+
+    def recent_users(
+        self,
+        within_seconds: float = WARMUP_ACTIVE_USER_HOURS * 3600,
+        limit: int = WARMUP_MAX_USERS,
+    ) -> List[str]:
+        cutoff = self._clock() - within_seconds
+        with self._lock:
+            active = [(seen, user_id) for user_id, seen in self._users.items() if seen >= cutoff]
+        return [user_id for _, user_id in sorted(active, reverse=True)[:limit]]
+
+    def _begin(self) -> str:
+        now = self._clock()
+        with self._lock:
+            last, self._last_request = self._last_request, now
+        if last is None:
+            return "cold"
+        return "after_idle" if now - last > self.idle_seconds else "warm"
+
+    def tracked(self, user_of: Callable[[Any], str]) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        def decorate(handler: Callable[..., Any]) -> Callable[..., Any]:
+            @functools.wraps(handler)
+            def wrapper(req: Any) -> Any:
+                kind = self._begin()
+                self.touch(user_of(req))
+                started = time.perf_counter()
+                try:
+                    return handler(req)
+                finally:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    self._metrics.observe(f"http.{kind}_request_ms", elapsed_ms)
+
+            return wrapper
+
+        return decorate
+
+
+def users_to_preload(
+    tracker: ActivityTracker,
+    persisted: Callable[[float, int], List[str]],
+    within_seconds: float = WARMUP_ACTIVE_USER_HOURS * 3600,
+    limit: int = WARMUP_MAX_USERS,
+    clock: Callable[[], float] = time.time,
+) -> List[str]:
+    """Users this process served recently, topped up from the store.
+
+    A fresh instance has served nobody, so after a cold start the list comes
+    from persisted per-user state: persisted(since_epoch, limit) returns the
+    users whose data or usage changed since then, most recent first.
+    """
+    users = tracker.recent_users(within_seconds, limit)
+    if len(users) >= limit:
+        return users
+    try:
+        stored = persisted(clock() - within_seconds, limit)
+    except Exception:
+        logging.warning("Could not list recently active users", exc_info=True)
+        stored = []
+    users.extend(user_id for user_id in stored if user_id not in users)
+    return users[:limit]
+
+
+def warm_up(
+    steps: Dict[str, Callable[[], Any]],
+    metrics: MetricsRegistry = default_metrics,
+) -> Dict[str, Any]:
+    # Steps are independent; one failing dependency must not stop the others
+    # from being primed.
+    report: Dict[str, Any] = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        try:
+            step()
+            ok = True
+        except Exception:
+            logging.warning("Warm-up step %s failed", name, exc_info=True)
+            ok = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.observe(f"warmup.{name}_ms", elapsed_ms)
+        if not ok:
+            metrics.incr(f"warmup.failures.{name}")
+        report[name] = {"ok": ok, "ms": round(elapsed_ms, 1)}
+    metrics.incr("warmup.runs")
+    return report
+
+
+activity = ActivityTracker()
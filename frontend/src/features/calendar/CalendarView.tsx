@@ -26,6 +26,7 @@ import {
   IconClockHour4,
 } from "@tabler/icons-react";
 import { emitEventsUpdated } from "../../utils/dataRefresh";
+import { apiFetch } from "../../utils/apiFetch";
 
 interface CalendarEvent {
   id: string;
@@ -103,7 +104,7 @@ export function CalendarView() {
       setLoading(true);
       setError(null);
 
-      const res = await fetch("/api/events");
+      const res = await apiFetch("/api/events");
       if (!res.ok) {
         throw new Error(`Request failed with status ${res.status}`);
       }
@@ -209,7 +210,7 @@ export function CalendarView() {
         list: "Default",
       };
 
-      const res = await fetch("/api/events", {
+      const res = await apiFetch("/api/events", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(body),
@@ -237,7 +238,7 @@ export function CalendarView() {
     id: string,
     payload: Record<string, unknown>
   ) => {
-    const res = await fetch(`/api/events/${id}`, {
+    const res = await apiFetch(`/api/events/${id}`, {
       method: "PUT",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify(payload),
@@ -258,7 +259,7 @@ export function CalendarView() {
   const handleDeleteEvent = async (id: string) => {
     try {
       setError(null);
-      const res = await fetch(`/api/events/${id}`, { method: "DELETE" });
+      const res = await apiFetch(`/api/events/${id}`, { method: "DELETE" });
       if (!res.ok) {
         throw new Error(`Request failed with status ${res.status}`);
       }
@@ -9,11 +9,14 @@ import {
   Text,
   Textarea,
 } from '@mantine/core';
+import dayjs from 'dayjs';
 import type { ChatMessage } from './types';
 import { ChatMessageBubble } from './ChatMessageBubble';
 import { MiniCalendarCard } from './MiniCalendarCard';
 import { MiniTasksCard } from './MiniTasksCard';
+import { useOverview } from './overviewApi';
 import { emitEventsUpdated, emitTasksUpdated } from '../../utils/dataRefresh';
+import { apiFetch } from '../../utils/apiFetch';
 
 function createInitialMessages(): ChatMessage[] {
   return [
@@ -31,6 +34,10 @@ export function ChatView() {
   const [messages, setMessages] = useState<ChatMessage[]>(createInitialMessages);
   const [input, setInput] = useState('');
   const messagesEndRef = useRef<HTMLDivElement | null>(null);
+  const [currentMonth, setCurrentMonth] = useState(() => dayjs().startOf('month'));
+  const [selectedDay, setSelectedDay] = useState<dayjs.Dayjs | null>(() => dayjs());
+  const { overview, loading: overviewLoading, error: overviewError, refresh } =
+    useOverview(currentMonth);
 
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth', block: 'end' });
@@ -51,7 +58,7 @@ export function ChatView() {
     setInput('');
 
     try {
-      const res = await fetch('/api/chat', {
+      const res = await apiFetch('/api/chat', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -156,8 +163,17 @@ export function ChatView() {
         </Card>
 
         <Stack gap="lg" style={{ minHeight: '60vh' }}>
-          <MiniCalendarCard />
-          <MiniTasksCard />
+          <MiniCalendarCard
+            overview={overview}
+            loading={overviewLoading}
+            error={overviewError}
+            currentMonth={currentMonth}
+            onMonthChange={setCurrentMonth}
+            selectedDay={selectedDay}
+            onSelectDay={setSelectedDay}
+            onRefresh={() => void refresh()}
+          />
+          <MiniTasksCard overview={overview} loading={overviewLoading} error={overviewError} />
         </Stack>
       </SimpleGrid>
     </Stack>
@@ -1,4 +1,4 @@
-import { useCallback, useEffect, useMemo, useState } from 'react';
+import { useMemo } from 'react';
 import {
   ActionIcon,
   Badge,
@@ -12,80 +12,38 @@ import {
 } from '@mantine/core';
 import dayjs from 'dayjs';
 import { IconChevronLeft, IconChevronRight, IconRefresh } from '@tabler/icons-react';
-import { subscribeEventsUpdated } from '../../utils/dataRefresh';
-
-interface CalendarEvent {
-  id: string;
-  title: string;
-  start: string;
-  end: string;
-  list?: string;
-}
+import { useDayEvents, type Overview } from './overviewApi';
 
 interface MiniCalendarCardProps {
-  refreshKey?: number;
+  overview: Overview | null;
+  loading: boolean;
+  error: string | null;
+  currentMonth: dayjs.Dayjs;
+  onMonthChange: (month: dayjs.Dayjs) => void;
+  selectedDay: dayjs.Dayjs | null;
+  onSelectDay: (day: dayjs.Dayjs) => void;
+  onRefresh: () => void;
 }
 
-export function MiniCalendarCard({ refreshKey = 0 }: MiniCalendarCardProps) {
-  const [events, setEvents] = useState<CalendarEvent[]>([]);
-  const [loading, setLoading] = useState(true);
-  const [error, setError] = useState<string | null>(null);
-  const [currentMonth, setCurrentMonth] = useState(() => dayjs().startOf('month'));
-  const [selectedDay, setSelectedDay] = useState<dayjs.Dayjs | null>(dayjs());
-
-  const fetchEvents = useCallback(async () => {
-    try {
-      setLoading(true);
-      setError(null);
-      const res = await fetch('/api/events');
-      if (!res.ok) {
-        throw new Error(`Request failed with status ${res.status}`);
-      }
-      const data = await res.json();
-      const apiEvents = (data.events ?? []) as CalendarEvent[];
-      setEvents(apiEvents);
-    } catch (err) {
-      console.error('Failed to fetch events', err);
-      setError('Tapahtumien haku epäonnistui');
-    } finally {
-      setLoading(false);
-    }
-  }, []);
-
-  useEffect(() => {
-    void fetchEvents();
-  }, [fetchEvents, refreshKey]);
-
-  useEffect(() => subscribeEventsUpdated(() => void fetchEvents()), [fetchEvents]);
-
-  const eventsByDay = useMemo(() => {
-    const grouped: Record<string, CalendarEvent[]> = {};
-    for (const event of events) {
-      let cursor = dayjs(event.start).startOf('day');
-      let last = dayjs(event.end).startOf('day');
+export function MiniCalendarCard({
+  overview,
+  loading,
+  error,
+  currentMonth,
+  onMonthChange,
+  selectedDay,
+  onSelectDay,
+  onRefresh,
+}: MiniCalendarCardProps) {
+  const eventDays = overview?.eventDays ?? {};
 
-      if (last.isBefore(cursor)) {
-        last = cursor;
-      }
-
-      while (cursor.isBefore(last) || cursor.isSame(last, 'day')) {
-        const key = cursor.format('YYYY-MM-DD');
-        if (!grouped[key]) {
-          grouped[key] = [];
-        }
-        grouped[key].push(event);
-
-        if (cursor.isSame(last, 'day')) {
-          break;
-        }
-        cursor = cursor.add(1, 'day');
-      }
-    }
-    for (const list of Object.values(grouped)) {
-      list.sort((a, b) => dayjs(a.start).valueOf() - dayjs(b.start).valueOf());
-    }
-    return grouped;
-  }, [events]);
+  const selectedKey = selectedDay?.format('YYYY-MM-DD');
+  const {
+    events: selectedEvents,
+    loading: dayLoading,
+    error: dayError,
+  } = useDayEvents(selectedDay, overview);
+  const eventsLoading = loading || dayLoading;
 
   const weekdayLabels = ['Ma', 'Ti', 'Ke', 'To', 'Pe', 'La', 'Su'];
 
@@ -96,9 +54,7 @@ export function MiniCalendarCard({ refreshKey = 0 }: MiniCalendarCardProps) {
     return Array.from({ length: 42 }, (_, index) => gridStart.add(index, 'day'));
   }, [currentMonth]);
 
-  const selectedKey = selectedDay?.format('YYYY-MM-DD');
   const selectedDayMoment = selectedKey ? dayjs(selectedKey) : null;
-  const selectedEvents = selectedKey ? eventsByDay[selectedKey] ?? [] : [];
 
   return (
     <Card withBorder radius="md" p="md" miw={280}>
@@ -109,7 +65,7 @@ export function MiniCalendarCard({ refreshKey = 0 }: MiniCalendarCardProps) {
               size="sm"
               variant="subtle"
               aria-label="Edellinen kuukausi"
-              onClick={() => setCurrentMonth((prev) => prev.subtract(1, 'month'))}
+              onClick={() => onMonthChange(currentMonth.subtract(1, 'month'))}
             >
               <IconChevronLeft size={16} />
             </ActionIcon>
@@ -117,7 +73,7 @@ export function MiniCalendarCard({ refreshKey = 0 }: MiniCalendarCardProps) {
               size="sm"
               variant="subtle"
               aria-label="Seuraava kuukausi"
-              onClick={() => setCurrentMonth((prev) => prev.add(1, 'month'))}
+              onClick={() => onMonthChange(currentMonth.add(1, 'month'))}
             >
               <IconChevronRight size={16} />
             </ActionIcon>
@@ -127,15 +83,15 @@ export function MiniCalendarCard({ refreshKey = 0 }: MiniCalendarCardProps) {
             size="sm"
             variant="subtle"
             aria-label="Päivitä tapahtumat"
-            onClick={() => void fetchEvents()}
+            onClick={onRefresh}
           >
             <IconRefresh size={16} />
           </ActionIcon>
         </Group>
 
-        {error && (
+        {(error || dayError) && (
           <Text fz="xs" c="red">
-            {error}
+            {error ?? dayError}
           </Text>
         )}
 
@@ -156,7 +112,7 @@ export function MiniCalendarCard({ refreshKey = 0 }: MiniCalendarCardProps) {
           >
             {calendarDays.map((day) => {
               const key = day.format('YYYY-MM-DD');
-              const eventCount = eventsByDay[key]?.length ?? 0;
+              const eventCount = eventDays[key] ?? 0;
               const isCurrent = day.isSame(currentMonth, 'month');
               const isSelected = selectedKey ? day.isSame(selectedDay, 'day') : false;
               const isToday = day.isSame(dayjs(), 'day');
@@ -165,7 +121,12 @@ export function MiniCalendarCard({ refreshKey = 0 }: MiniCalendarCardProps) {
                 <button
                   key={key}
                   type="button"
-                  onClick={() => setSelectedDay(day.clone())}
+                  onClick={() => {
+                    onSelectDay(day.clone());
+                    if (!isCurrent) {
+                      onMonthChange(day.startOf('month'));
+                    }
+                  }}
                   style={{
                     border: isToday ? '1px solid var(--mantine-color-blue-filled)' : '1px solid transparent',
                     borderRadius: 8,
@@ -199,8 +160,8 @@ export function MiniCalendarCard({ refreshKey = 0 }: MiniCalendarCardProps) {
 
         <ScrollArea w="100%" h={150} offsetScrollbars>
           <Stack gap="xs" pr="xs">
-            {loading && events.length === 0 && <Loader size="sm" />}
-            {!loading && selectedEvents.length === 0 && (
+            {eventsLoading && selectedEvents.length === 0 && <Loader size="sm" />}
+            {!eventsLoading && selectedEvents.length === 0 && (
               <Text fz="sm" c="dimmed">
                 Ei tapahtumia valitulle päivälle.
               </Text>
@@ -0,0 +1,122 @@
+import { useCallback, useEffect, useState } from 'react';
+import type dayjs from 'dayjs';
+import type { Task } from '../tasks/types';
+import { subscribeEventsUpdated, subscribeTasksUpdated } from '../../utils/dataRefresh';
+import { apiFetch } from '../../utils/apiFetch';
+
+export interface OverviewTask {
+  id: string;
+  title: string;
+  list: Task['list'];
+  status: Task['status'];
+  dueDate?: string | null;
+}
+
+export interface OverviewEvent {
+  id: string;
+  title: string;
+  start: string;
+  end: string;
+  list?: string;
+}
+
+export interface Overview {
+  month: string;
+  taskCounts: Record<Task['list'], number>;
+  openTaskCount: number;
+  nextTasks: OverviewTask[];
+  eventDays: Record<string, number>;
+  // Event details cover this one day (today by default), not the whole month.
+  day: string | null;
+  events: OverviewEvent[];
+}
+
+export interface DayEvents {
+  day: string;
+  events: OverviewEvent[];
+}
+
+const NEXT_TASKS_LIMIT = 20;
+
+export function useOverview(month: dayjs.Dayjs) {
+  const [overview, setOverview] = useState<Overview | null>(null);
+  const [loading, setLoading] = useState(true);
+  const [error, setError] = useState<string | null>(null);
+  const monthKey = month.format('YYYY-MM');
+
+  const fetchOverview = useCallback(async () => {
+    try {
+      setLoading(true);
+      setError(null);
+
+      const res = await apiFetch(`/api/overview?month=${monthKey}&limit=${NEXT_TASKS_LIMIT}`);
+      if (!res.ok) {
+        throw new Error(`Request failed with status ${res.status}`);
+      }
+
+      const payload = (await res.json()) as Overview;
+      setOverview(payload);
+    } catch (err) {
+      console.error('Failed to fetch overview', err);
+      setError('Yhteenvedon haku epäonnistui');
+    } finally {
+      setLoading(false);
+    }
+  }, [monthKey]);
+
+  useEffect(() => {
+    void fetchOverview();
+  }, [fetchOverview]);
+
+  useEffect(() => subscribeTasksUpdated(() => void fetchOverview()), [fetchOverview]);
+  useEffect(() => subscribeEventsUpdated(() => void fetchOverview()), [fetchOverview]);
+
+  return { overview, loading, error, refresh: fetchOverview };
+}
+
+export function useDayEvents(day: dayjs.Dayjs | null, overview: Overview | null) {
+  const [fetched, setFetched] = useState<DayEvents | null>(null);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+  const dayKey = day ? day.format('YYYY-MM-DD') : null;
+  // The overview already carries the events of its own day, so only other
+  // days are fetched, and only once the overview has said which day it has.
+  const ready = overview !== null;
+  const included = ready && overview.day === dayKey;
+
+  const fetchDay = useCallback(async () => {
+    if (!dayKey || !ready || included) {
+      return;
+    }
+    try {
+      setLoading(true);
+      setError(null);
+
+      const res = await apiFetch(`/api/overview/day?day=${dayKey}`);
+      if (!res.ok) {
+        throw new Error(`Request failed with status ${res.status}`);
+      }
+
+      setFetched((await res.json()) as DayEvents);
+    } catch (err) {
+      console.error('Failed to fetch day events', err);
+      setError('Päivän tapahtumien haku epäonnistui');
+    } finally {
+      setLoading(false);
+    }
+  }, [dayKey, ready, included]);
+
+  useEffect(() => {
+    void fetchDay();
+  }, [fetchDay]);
+
+  useEffect(() => subscribeEventsUpdated(() => void fetchDay()), [fetchDay]);
+
+  let events: OverviewEvent[] = [];
+  if (overview && overview.day === dayKey) {
+    events = overview.events;
+  } else if (fetched && fetched.day === dayKey) {
+    events = fetched.events;
+  }
+  return { events, loading, error };
+}
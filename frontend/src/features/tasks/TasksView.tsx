@@ -18,6 +18,7 @@ import type { Task } from "./types";
 import { normalizeTask, parseTaskPayload, parseTasksResponse } from "./taskApi";
 import { TaskItem } from "./TaskItem";
 import { emitTasksUpdated } from "../../utils/dataRefresh";
+import { apiFetch } from "../../utils/apiFetch";
 
 const TASK_LISTS: Array<"Inbox" | "Work" | "Personal"> = [
   "Inbox",
@@ -45,7 +46,7 @@ export function TasksView() {
       try {
         setLoading(true);
         setError(null);
-        const res = await fetch("/api/tasks");
+        const res = await apiFetch("/api/tasks");
         if (!res.ok) {
           throw new Error(`Request failed with status ${res.status}`);
         }
@@ -76,7 +77,7 @@ export function TasksView() {
         dueDate: dueDate ? dueDate.toISOString() : null,
       };
 
-      const res = await fetch("/api/tasks", {
+      const res = await apiFetch("/api/tasks", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(body),
@@ -104,7 +105,7 @@ export function TasksView() {
     id: string,
     payload: Record<string, unknown>
   ) => {
-    const res = await fetch(`/api/tasks/${id}`, {
+    const res = await apiFetch(`/api/tasks/${id}`, {
       method: "PUT",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify(payload),
@@ -141,7 +142,7 @@ export function TasksView() {
   const handleDelete = async (id: string) => {
     try {
       setError(null);
-      const res = await fetch(`/api/tasks/${id}`, { method: "DELETE" });
+      const res = await apiFetch(`/api/tasks/${id}`, { method: "DELETE" });
       if (!res.ok) {
         throw new Error(`Request failed with status ${res.status}`);
       }
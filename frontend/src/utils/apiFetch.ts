@@ -0,0 +1,25 @@
+// The backend returns Cosmos session tokens after writes in this header.
+// Sending the latest one back lets reads run at session consistency and
+// still see this browser's own edits, whichever instance answers.
+const SESSION_TOKEN_HEADER = 'X-Session-Token';
+const STORAGE_KEY = 'timeplanner.sessionToken';
+
+const safeStorage = typeof window !== 'undefined' ? window.sessionStorage : undefined;
+
+let sessionToken: string | null = safeStorage?.getItem(STORAGE_KEY) ?? null;
+
+export async function apiFetch(input: RequestInfo | URL, init: RequestInit = {}): Promise<Response> {
+  const headers = new Headers(init.headers);
+  if (sessionToken && !headers.has(SESSION_TOKEN_HEADER)) {
+    headers.set(SESSION_TOKEN_HEADER, sessionToken);
+  }
+
+  const res = await fetch(input, { ...init, headers });
+
+  const received = res.headers.get(SESSION_TOKEN_HEADER);
+  if (received && received !== sessionToken) {
+    sessionToken = received;
+    safeStorage?.setItem(STORAGE_KEY, received);
+  }
+  return res;
+}